@@ -16,9 +16,11 @@ import time           as _time
 from .. import optimize as _opt
 from .. import tools    as _tools
 from .. import objects  as _objs
+from ..tools import mpitools as _mpit
 _dummy_profiler = _objs.profiler.DummyProfiler()
 
 CUSTOMLM = True
+_STREAM_JAC_BLOCK_MEM = 100*1024**2 # bytes of jacobian rows held at once when streaming
 #from .track_allocations import AllocationTracker
 
 #Note on where 4x4 or possibly other integral-qubit dimensions are needed:
@@ -882,7 +884,10 @@ def do_mc2gst(dataset, startGateset, gateStringsToUse,
               regularizeFactor=0, verbosity=0, check=False,
               check_jacobian=False, gatestringWeights=None,
               gateLabelAliases=None, memLimit=None, comm=None,
-              distributeMethod = "gatestrings", profiler=None):
+              distributeMethod = "gatestrings", profiler=None,
+              evaltree_cache=None, streamJacobian=False,
+              broydenUpdates=0, geodesicAccel=False, distributedSolve=False,
+              optimizerState=None):
     """
     Performs Least-Squares Gate Set Tomography on the dataset.
 
@@ -973,6 +978,55 @@ def do_mc2gst(dataset, startGateset, gateStringsToUse,
     profiler : Profiler, optional
         A profiler object used for to track timing and memory usage.
 
+    evaltree_cache : dict, optional
+        A dictionary which serves as a cache for the computed EvalTree used
+        in this computation.  If an empty dictionary is supplied, it is filled
+        with cached values to speed up subsequent executions of this function
+        which use the *same* `startGateset`, `gateStringsToUse`, `memLimit`,
+        `comm`, and `distributeMethod`.  Alternatively, a dictionary with an
+        `'unsplitTree'` key (initially a new, empty, EvalTree) and a
+        `'gateStrings'` key (initially an empty list) allows subsequent
+        executions to use a list of gate strings which *begins with* the
+        current one, and extends the cached tree rather than building a new
+        one (this is what the iterative GST functions do).  Finally, an
+        `EvalTreeCache` can be given to store and load trees on disk.
+
+    streamJacobian : bool, optional
+        If True, the least-squares optimizer is given the products J^T J
+        and J^T f of the jacobian J, which are accumulated from blocks of
+        J's rows (about 100MB each, and never spanning more than one
+        evaluation sub-tree), instead of J itself.  This avoids storing
+        J, which is usually the largest array, so that more memory is
+        left for the tree (see `memLimit`).
+
+    broydenUpdates : int, optional
+        The maximum number of successive optimizer iterations which use a
+        rank-one (Broyden) update of the previous jacobian instead of
+        computing it anew.  The jacobian is still recomputed whenever
+        progress stalls and before convergence is declared.  Ignored when
+        `streamJacobian` is True.
+
+    geodesicAccel : bool, optional
+        Whether the optimizer's steps include a "geodesic acceleration"
+        correction, which costs an extra objective function evaluation per
+        step but can reduce the number of (much more expensive) jacobian
+        evaluations.  Ignored when `streamJacobian` is True.
+
+    distributedSolve : bool, optional
+        If True, and `comm` has more than one processor, each processor
+        keeps only its block of rows of J^T J and the damped normal
+        equations are solved by a distributed conjugate gradient method.
+        This divides the memory of J^T J among the processors (with
+        `streamJacobian`, J^T J is also summed straight into these blocks),
+        but is usually slower than the default direct solve unless J^T J
+        is very large.
+
+    optimizerState : CustomLMState, optional
+        The damping state of the least-squares optimizer, used (when it holds
+        the state of a previous, similar, optimization) to warm-start the
+        optimizer and updated with its final state.  The iterative GST
+        functions use this to carry the state from one iteration to the next.
+
 
     Returns
     -------
@@ -1018,7 +1072,12 @@ def do_mc2gst(dataset, startGateset, gateStringsToUse,
     C = 1.0/1024.0**3
 
     #  Estimate & check persistent memory (from allocs directly below)
-    persistentMem = 8* (ng*(ns + ns*ne + 1 + 3*ns)) # final results in bytes
+    streamJacobian = streamJacobian and CUSTOMLM #only custom_leastsq uses J^T J
+    if streamJacobian: # J^T J and a block of jacobian rows instead of the jacobian
+        jacRowBlk = int(max(1, min(ng, _STREAM_JAC_BLOCK_MEM // (8*ns*ne))))
+        persistentMem = 8* (ng*(ns + 1 + 3*ns) + ne*ne + ns*jacRowBlk*ne) # final results in bytes
+    else:
+        persistentMem = 8* (ng*(ns + ns*ne + 1 + 3*ns)) # final results in bytes
     if memLimit is not None and memLimit < persistentMem:
         raise MemoryError("Memory limit (%g GB) is " % (memLimit*C) +
                           "< memory required to hold final results (%g GB)"
@@ -1034,9 +1093,9 @@ def do_mc2gst(dataset, startGateset, gateStringsToUse,
         printer.log("Cur, Persist, Gather = %.2f, %.2f, %.2f GB" %
                     (curMem*C, persistentMem*C, gthrMem*C))
     else: gthrMem = mlim = None
-    evTree, wrtBlkSize, _ = gs.bulk_evaltree_from_resources(
-        gateStringsToUse, comm, mlim, distributeMethod,
-        ["bulk_fill_probs","bulk_fill_dprobs"], printer) 
+    evTree, wrtBlkSize = _get_evaltree(gs, gateStringsToUse, comm, mlim,
+                                       distributeMethod, printer, evaltree_cache,
+                                       memLimit)
     profiler.add_time("do_mc2gst: pre-opt treegen",tStart)
 
     # permute (if needed) gate string list for efficient subtree division
@@ -1072,7 +1131,8 @@ def do_mc2gst(dataset, startGateset, gateStringsToUse,
     #  (must be AFTER possible gate string permutation by
     #   tree and initialization of dsGateStringsToUse)
     probs  = _np.empty( (len(spamLabels),len(gateStringsToUse)) )
-    jac    = _np.empty( (len(spamLabels)*len(gateStringsToUse)+ex,vec_gs_len) )
+    jac    = _np.empty( (len(spamLabels)*len(gateStringsToUse)+ex,vec_gs_len) ) \
+        if not streamJacobian else None
 
     N =_np.array([dataset[gateStr].total() for gateStr in dsGateStringsToUse],'d')
     f =_np.empty( (len(spamLabels),len(gateStringsToUse)) )
@@ -1100,15 +1160,15 @@ def do_mc2gst(dataset, startGateset, gateStringsToUse,
     maxGateStringLength = max([len(x) for x in gateStringsToUse])
 
     if useFreqWeightedChiSq:
-        def get_weights(p):
-            return fweights
-        def get_dweights(p,wts):
-            return z
+        def get_weights(p, slc=slice(None)):
+            return fweights[:,slc]
+        def get_dweights(p, wts, slc=slice(None)):
+            return z[:,slc]
     else:
-        def get_weights(p):
+        def get_weights(p, slc=slice(None)): #p holds the probabilities of the gate strings in slc
             cp = _np.clip(p,minProbClipForWeighting,1-minProbClipForWeighting)
-            return _np.sqrt(N / cp)  # nSpamLabels x nGateStrings array (K x M)
-        def get_dweights(p,wts):  #derivative of weights w.r.t. p
+            return _np.sqrt(N[slc] / cp)  # nSpamLabels x nGateStrings array (K x M)
+        def get_dweights(p, wts, slc=slice(None)):  #derivative of weights w.r.t. p
             cp = _np.clip(p,minProbClipForWeighting,1-minProbClipForWeighting)
             dw = -0.5 * wts / cp   # nSpamLabels x nGateStrings array (K x M)
             dw[ _np.logical_or(p < minProbClipForWeighting, p>(1-minProbClipForWeighting)) ] = 0.0
@@ -1325,6 +1385,35 @@ def do_mc2gst(dataset, startGateset, gateStringsToUse,
         #                           for (i,gateStr) in enumerate(gateStringsToUse) ], axis=0 ) #RESTRICTION: 'plus' assumes only a single 'plus' spam label
         # jacobian[k,l] = derivative of p[k] wrt vectorGS[l].  Just concatenate derivative of p[k]'s multiplied by weights
 
+    if streamJacobian: # Computes (J^T J, J^T f) without storing the jacobian
+        rowBlocks = _stream_row_blocks(gs, evTree, jacRowBlk)
+
+        def get_dprobs_factor(p, slc): # (K,M) for the gate strings in slc
+            weights = get_weights(p, slc)
+            return weights+(p-f[:,slc])*get_dweights(p, weights, slc)
+
+        def jacobian_products(vectorGS, fvec):
+            tm = _time.time()
+            gs.from_vector(vectorGS)
+
+            extraJac = None
+            if regularizeFactor != 0:
+                extraJac = _np.diag( [ (regularizeFactor * _np.sign(x) if abs(x) > 1.0 else 0.0) for x in vectorGS ] )
+            elif cptp_penalty_factor != 0:
+                extraJac = _np.empty( (ex,vec_gs_len), 'd' )
+                _cptp_penalty_jac_fill(extraJac, gs, cptp_penalty_factor,
+                                       vec_gs_len, nGateParams, nSpamParams,
+                                       gateBasis)
+
+            JTJ, JTf = _stream_jtj_jtf(gs, evTree, rowBlocks, spam_lbl_rows,
+                                       get_dprobs_factor, fvec, extraJac,
+                                       probClipInterval, comm, wrtBlkSize,
+                                       profiler, gthrMem, check, distributedSolve)
+            profiler.add_time("do_mc2gst: JACOBIAN",tm)
+            return JTJ, JTf
+    else:
+        jacobian_products = None
+
 #OLD CPTP penalty factors
 #    else:
 #        raise NotImplementedError("CPTP-penalized MC2GST not implemented.")
@@ -1354,7 +1443,10 @@ def do_mc2gst(dataset, startGateset, gateStringsToUse,
             objective_func, jacobian, x0, f_norm2_tol=tol,
             jac_norm_tol=tol, rel_ftol=tol, rel_xtol=tol,
             max_iter=maxiter, comm=comm,
-            verbosity=printer.verbosity-1, profiler=profiler)
+            verbosity=printer.verbosity-1, profiler=profiler,
+            jtjf_fn=jacobian_products, broyden_updates=broydenUpdates,
+            geodesic_accel=geodesicAccel, distributed_solve=distributedSolve,
+            state=optimizerState)
         printer.log("Least squares message = %s" % msg,2)
         assert(converged)
     else:
@@ -1619,7 +1711,10 @@ def do_iterative_mc2gst(dataset, startGateset, gateStringSetsToUseInEstimation,
                         check=False, check_jacobian=False,
                         gatestringWeightsDict=None, memLimit=None,
                         profiler=None, comm=None, 
-                        distributeMethod = "gatestrings"):
+                        distributeMethod = "gatestrings", evaltree_cache=None,
+                        cachePrecision=None, streamJacobian=False,
+                        broydenUpdates=0, geodesicAccel=False, distributedSolve=False,
+                        warmStart=True):
     """
     Performs Iterative Minimum Chi^2 Gate Set Tomography on the dataset.
 
@@ -1715,6 +1810,31 @@ def do_iterative_mc2gst(dataset, startGateset, gateStringSetsToUseInEstimation,
         when comm is not None).  "gatestrings" will divide the list of
         gatestrings; "deriv" will divide the columns of the jacobian matrix.
 
+    evaltree_cache : EvalTreeCache, optional
+        An on-disk cache used to store, and to load when available, the
+        evaluation tree of each iteration.  If None, each iteration's tree
+        is instead created by extending the previous iteration's tree.
+
+    cachePrecision : {"double", "single"}, optional
+        The precision of the product and derivative caches (see
+        `GateSet.cache_precision`) used during all but the last iteration,
+        which is always performed in double precision.  The returned gate
+        sets use double precision.  If None, the precision of
+        `startGateset` is used.
+
+    streamJacobian : bool, optional
+        Whether each optimization accumulates J^T J and J^T f from blocks
+        of rows of the jacobian instead of storing it (see
+        :func:`do_mc2gst`).
+
+    broydenUpdates, geodesicAccel, distributedSolve : optional
+        Options of each least-squares optimization (see :func:`do_mc2gst`).
+
+    warmStart : bool, optional
+        Whether each optimization starts from the final damping of the
+        previous one (see `optimizerState` of :func:`do_mc2gst`) instead of
+        the default initial damping.
+
 
     Returns
     -------
@@ -1742,6 +1862,11 @@ def do_iterative_mc2gst(dataset, startGateset, gateStringSetsToUseInEstimation,
     #Run MC2GST iteratively on given sets of estimatable strings
     lsgstGatesets = [ ]; minErrs = [ ] #for returnAll == True case
     lsgstGateset = startGateset.copy(); nIters = len(gateStringLists)    
+    optimizerState = _opt.CustomLMState() if warmStart else None #carried between iterations
+    if cachePrecision is not None:
+        lsgstGateset.cache_precision = cachePrecision
+    if evaltree_cache is None:
+        evaltree_cache = _create_incremental_evaltree_cache()
     tStart = _time.time()
     tRef = tStart
 
@@ -1761,6 +1886,8 @@ def do_iterative_mc2gst(dataset, startGateset, gateStringSetsToUseInEstimation,
             else: gatestringWeights = None
             lsgstGateset.set_basis(startGateset.get_basis_name(),
                                    startGateset.get_basis_dimension())
+            if i == nIters-1: #final iteration in double precision
+                lsgstGateset.cache_precision = "double"
 
             minErr, lsgstGateset = \
                 do_mc2gst( dataset, lsgstGateset, stringsToEstimate,
@@ -1769,7 +1896,10 @@ def do_iterative_mc2gst(dataset, startGateset, gateStringSetsToUseInEstimation,
                            useFreqWeightedChiSq, regularizeFactor,
                            printer-1, check, check_jacobian,
                            gatestringWeights, None, memLimit, comm,
-                           distributeMethod, profiler)
+                           distributeMethod, profiler, evaltree_cache,
+                           streamJacobian=streamJacobian,
+                           broydenUpdates=broydenUpdates, geodesicAccel=geodesicAccel,
+                           distributedSolve=distributedSolve, optimizerState=optimizerState)
             if returnAll:
                 lsgstGatesets.append(lsgstGateset)
                 minErrs.append(minErr)
@@ -1780,6 +1910,9 @@ def do_iterative_mc2gst(dataset, startGateset, gateStringSetsToUseInEstimation,
             printer.log('',2) #extra newline
             tRef=tNxt
 
+    for gs in lsgstGatesets + [lsgstGateset]:
+        gs.cache_precision = "double" #returned gate sets compute in double precision
+
     printer.log('Iterative MC2GST Total Time: %.1fs' % (_time.time()-tStart))
     profiler.add_time('do_iterative_mc2gst: total time', tStart)
 
@@ -1995,7 +2128,10 @@ def do_mlgst(dataset, startGateset, gateStringsToUse,
              probClipInterval=(-1e6,1e6), radius=1e-4,
              poissonPicture=True, verbosity=0, check=False,
              gateLabelAliases=None, memLimit=None, comm=None,
-             distributeMethod = "deriv", profiler=None):
+             distributeMethod = "deriv", profiler=None, evaltree_cache=None,
+             streamJacobian=False,
+             broydenUpdates=0, geodesicAccel=False, distributedSolve=False,
+             optimizerState=None):
 
     """
     Performs Maximum Likelihood Estimation Gate Set Tomography on the dataset.
@@ -2066,6 +2202,55 @@ def do_mlgst(dataset, startGateset, gateStringsToUse,
     profiler : Profiler, optional
         A profiler object used for to track timing and memory usage.
 
+    evaltree_cache : dict, optional
+        A dictionary which serves as a cache for the computed EvalTree used
+        in this computation.  If an empty dictionary is supplied, it is filled
+        with cached values to speed up subsequent executions of this function
+        which use the *same* `startGateset`, `gateStringsToUse`, `memLimit`,
+        `comm`, and `distributeMethod`.  Alternatively, a dictionary with an
+        `'unsplitTree'` key (initially a new, empty, EvalTree) and a
+        `'gateStrings'` key (initially an empty list) allows subsequent
+        executions to use a list of gate strings which *begins with* the
+        current one, and extends the cached tree rather than building a new
+        one (this is what the iterative GST functions do).  Finally, an
+        `EvalTreeCache` can be given to store and load trees on disk.
+
+    streamJacobian : bool, optional
+        If True, the least-squares optimizer is given the products J^T J
+        and J^T f of the jacobian J, which are accumulated from blocks of
+        J's rows (about 100MB each, and never spanning more than one
+        evaluation sub-tree), instead of J itself.  This avoids storing
+        J, which is usually the largest array, so that more memory is
+        left for the tree (see `memLimit`).
+
+    broydenUpdates : int, optional
+        The maximum number of successive optimizer iterations which use a
+        rank-one (Broyden) update of the previous jacobian instead of
+        computing it anew.  The jacobian is still recomputed whenever
+        progress stalls and before convergence is declared.  Ignored when
+        `streamJacobian` is True.
+
+    geodesicAccel : bool, optional
+        Whether the optimizer's steps include a "geodesic acceleration"
+        correction, which costs an extra objective function evaluation per
+        step but can reduce the number of (much more expensive) jacobian
+        evaluations.  Ignored when `streamJacobian` is True.
+
+    distributedSolve : bool, optional
+        If True, and `comm` has more than one processor, each processor
+        keeps only its block of rows of J^T J and the damped normal
+        equations are solved by a distributed conjugate gradient method.
+        This divides the memory of J^T J among the processors (with
+        `streamJacobian`, J^T J is also summed straight into these blocks),
+        but is usually slower than the default direct solve unless J^T J
+        is very large.
+
+    optimizerState : CustomLMState, optional
+        The damping state of the least-squares optimizer, used (when it holds
+        the state of a previous, similar, optimization) to warm-start the
+        optimizer and updated with its final state.  The iterative GST
+        functions use this to carry the state from one iteration to the next.
+
 
     Returns
     -------
@@ -2078,7 +2263,10 @@ def do_mlgst(dataset, startGateset, gateStringsToUse,
                           maxfev, tol,cptp_penalty_factor, minProbClip,
                           probClipInterval, radius, poissonPicture, verbosity,
                           check, gateLabelAliases, memLimit, comm,
-                          distributeMethod, profiler, None, None)
+                          distributeMethod, profiler, evaltree_cache, None,
+                          streamJacobian=streamJacobian,
+                          broydenUpdates=broydenUpdates, geodesicAccel=geodesicAccel,
+                          distributedSolve=distributedSolve, optimizerState=optimizerState)
 
 
 def _do_mlgst_base(dataset, startGateset, gateStringsToUse,
@@ -2089,7 +2277,9 @@ def _do_mlgst_base(dataset, startGateset, gateStringsToUse,
                    gateLabelAliases=None, memLimit=None, comm=None,
                    distributeMethod = "deriv", profiler=None,
                    evaltree_cache=None, forcefn_grad=None,
-                   shiftFctr=100):
+                   shiftFctr=100, streamJacobian=False,
+                   broydenUpdates=0, geodesicAccel=False, distributedSolve=False,
+                   optimizerState=None):
     """ 
     Same args and behavior as do_mlgst, but with additional:
     
@@ -2100,7 +2290,13 @@ def _do_mlgst_base(dataset, startGateset, gateStringsToUse,
         in this computation.  If an empty dictionary is supplied, it is filled
         with cached values to speed up subsequent executions of this function
         which use the *same* `startGateset`, `gateStringsToUse`, `memLimit`,
-        `comm`, and `distributeMethod`.
+        `comm`, and `distributeMethod`.  Alternatively, a dictionary with an
+        `'unsplitTree'` key (initially a new, empty, EvalTree) and a
+        `'gateStrings'` key (initially an empty list) allows subsequent
+        executions to use a list of gate strings which *begins with* the
+        current one, and extends the cached tree rather than building a new
+        one (this is what the iterative GST functions do).  Finally, an
+        `EvalTreeCache` can be given to store and load trees on disk.
        
     forcefn_grad : numpy array, optional
         An array of shape `(D,nParams)`, where `D` is the dimsion of the
@@ -2114,6 +2310,14 @@ def _do_mlgst_base(dataset, startGateset, gateStringsToUse,
         This should be > 1, and the larger the value the more positive-shift 
         is applied to keep the forcing term positive.  Thus, if you receive
         an "Inadequate forcing shift" error, make this value larger.
+
+    streamJacobian : bool, optional
+        If True, the least-squares optimizer is given J^T J and J^T f,
+        accumulated from blocks of rows of the jacobian J, instead of J.
+        See :func:`do_mc2gst`.
+
+    broydenUpdates, geodesicAccel, distributedSolve, optimizerState : optional
+        Options of each least-squares optimization (see :func:`do_mc2gst`).
     """
 
     printer = _objs.VerbosityPrinter.build_printer(verbosity, comm)
@@ -2156,7 +2360,12 @@ def _do_mlgst_base(dataset, startGateset, gateStringsToUse,
     C = 1.0/1024.0**3
 
     #  Estimate & check persistent memory (from allocs directly below)
-    persistentMem = 8* (ng*(ns + ns*ne + 1*ns)) # final results in bytes
+    streamJacobian = streamJacobian and CUSTOMLM #only custom_leastsq uses J^T J
+    if streamJacobian: # J^T J and a block of jacobian rows instead of the jacobian
+        jacRowBlk = int(max(1, min(ng, _STREAM_JAC_BLOCK_MEM // (8*ns*ne))))
+        persistentMem = 8* (ng*(ns + 1*ns) + ne*ne + ns*jacRowBlk*ne) # final results in bytes
+    else:
+        persistentMem = 8* (ng*(ns + ns*ne + 1*ns)) # final results in bytes
     if memLimit is not None and memLimit < persistentMem:
         raise MemoryError("Memory limit (%g GB) is " % (memLimit*C) +
                           "< memory required to hold final results (%g GB)"
@@ -2172,21 +2381,9 @@ def _do_mlgst_base(dataset, startGateset, gateStringsToUse,
                     (curMem*C, persistentMem*C, gthrMem*C))
     else: gthrMem = mlim = None
     
-    if evaltree_cache and evaltree_cache.has_key('evTree') \
-            and evaltree_cache.has_key('wrtBlkSize'):
-        #use cache dictionary to speed multiple calls which use
-        # the same gateset, gate strings, comm, memlim, etc.
-        evTree = evaltree_cache['evTree']
-        wrtBlkSize = evaltree_cache['wrtBlkSize']
-    else:
-        evTree, wrtBlkSize, _ = gs.bulk_evaltree_from_resources(
-            gateStringsToUse, comm, mlim, distributeMethod,
-            ["bulk_fill_probs","bulk_fill_dprobs"], printer)
-        
-        #Fill cache dict if one was given
-        if evaltree_cache is not None:
-            evaltree_cache['evTree'] = evTree
-            evaltree_cache['wrtBlkSize'] = wrtBlkSize
+    evTree, wrtBlkSize = _get_evaltree(gs, gateStringsToUse, comm, mlim,
+                                       distributeMethod, printer, evaltree_cache,
+                                       memLimit)
 
     # permute (if needed) gate string list for efficient subtree division
     # Note: cannot rely on order of gateStringsToUse above this point --
@@ -2215,7 +2412,8 @@ def _do_mlgst_base(dataset, startGateset, gateStringsToUse,
     #Allocate peristent memory
     cntVecMx = _np.empty( (len(spamLabels),len(gateStringsToUse)), 'd' )
     probs = _np.empty( (len(spamLabels),len(gateStringsToUse)), 'd' )
-    jac    = _np.empty( (len(spamLabels)*len(gateStringsToUse)+ex,vec_gs_len) )
+    jac    = _np.empty( (len(spamLabels)*len(gateStringsToUse)+ex,vec_gs_len) ) \
+        if not streamJacobian else None
 
     spam_lbl_rows = { sl:i for (i,sl) in enumerate(spamLabels) }
     _tools.fill_count_vecs(cntVecMx, spam_lbl_rows, dataset, dsGateStringsToUse)
@@ -2298,6 +2496,27 @@ def _do_mlgst_base(dataset, startGateset, gateStringsToUse,
         #  if p <  p_min then term == sqrt( N_{i,sl} * -log(p_min) + N[i] * p_min + S*(p-p_min) )
         #   and deriv == 0.5 / sqrt(...) * S * dp
 
+        def get_dprobs_factor(probs, slc=slice(None)):
+            #probs holds the probabilities of the final gate strings in slc
+            minusCnts = minusCntVecMx[:,slc]; fTerm = freqTerm[:,slc]
+            totalCnts = totalCntVec[None,slc]
+            pos_probs = _np.where(probs < min_p, min_p, probs)
+            S = minusCnts / min_p + totalCnts
+            S2 = -0.5 * minusCnts / (min_p**2)
+            v = fTerm + minusCnts * _np.log(pos_probs) + totalCnts*pos_probs # dims K x M (K = nSpamLabels, M = nGateStrings)
+            v = _np.maximum(v,0)  #remove small negative elements due to roundoff error (above expression *cannot* really be negative)
+            v = _np.where( probs < min_p, v + S*(probs - min_p) + S2*(probs - min_p)**2, v) #quadratic extrapolation of logl at min_p for probabilities < min_p
+            v = _np.where( minusCnts == 0, totalCnts * _np.where(probs >= a, probs, (-1.0/(3*a**2))*probs**3 + probs**2/a + a/3.0), v)
+
+            v = _np.sqrt( v )
+            v = _np.maximum(v,1e-100) #derivative diverges as v->0, but v always >= 0 so clip v to a small positive value to avoid divide by zero below
+            dprobs_factor_pos = (0.5 / v) * (minusCnts / pos_probs + totalCnts)
+            dprobs_factor_neg = (0.5 / v) * (S + 2*S2*(probs - min_p))
+            dprobs_factor_zerofreq = (0.5 / v) * totalCnts * _np.where( probs >= a, 1.0, (-1.0/a**2)*probs**2 + 2*probs/a )
+            dprobs_factor = _np.where( probs < min_p, dprobs_factor_neg, dprobs_factor_pos)
+            dprobs_factor = _np.where( minusCnts == 0, dprobs_factor_zerofreq, dprobs_factor )
+            return dprobs_factor
+
         def jacobian(vectorGS):
             tm = _time.time()
             dprobs = jac[0:KM,:] #avoid mem copying: use jac mem for dprobs
@@ -2307,23 +2526,7 @@ def _do_mlgst_base(dataset, startGateset, gateStringsToUse,
                                 prMxToFill=probs, clipTo=probClipInterval,
                                 check=check, comm=comm, wrtBlockSize=wrtBlkSize,
                                 profiler=profiler, gatherMemLimit=gthrMem)
-
-            pos_probs = _np.where(probs < min_p, min_p, probs)
-            S = minusCntVecMx / min_p + totalCntVec[None,:]
-            S2 = -0.5 * minusCntVecMx / (min_p**2)
-            v = freqTerm + minusCntVecMx * _np.log(pos_probs) + totalCntVec[None,:]*pos_probs # dims K x M (K = nSpamLabels, M = nGateStrings)
-            v = _np.maximum(v,0)  #remove small negative elements due to roundoff error (above expression *cannot* really be negative)
-            v = _np.where( probs < min_p, v + S*(probs - min_p) + S2*(probs - min_p)**2, v) #quadratic extrapolation of logl at min_p for probabilities < min_p
-            v = _np.where( minusCntVecMx == 0, totalCntVec[None,:] * _np.where(probs >= a, probs, (-1.0/(3*a**2))*probs**3 + probs**2/a + a/3.0), v)
-
-            v = _np.sqrt( v )
-            v = _np.maximum(v,1e-100) #derivative diverges as v->0, but v always >= 0 so clip v to a small positive value to avoid divide by zero below
-            dprobs_factor_pos = (0.5 / v) * (minusCntVecMx / pos_probs + totalCntVec[None,:])
-            dprobs_factor_neg = (0.5 / v) * (S + 2*S2*(probs - min_p))
-            dprobs_factor_zerofreq = (0.5 / v) * totalCntVec[None,:] * _np.where( probs >= a, 1.0, (-1.0/a**2)*probs**2 + 2*probs/a )
-            dprobs_factor = _np.where( probs < min_p, dprobs_factor_neg, dprobs_factor_pos)
-            dprobs_factor = _np.where( minusCntVecMx == 0, dprobs_factor_zerofreq, dprobs_factor )
-            dprobs *= dprobs_factor[:,:,None] # (K,M,N) * (K,M,1)   (N = dim of vectorized gateset)
+            dprobs *= get_dprobs_factor(probs)[:,:,None] # (K,M,N) * (K,M,1)   (N = dim of vectorized gateset)
               #Note: this also sets jac[0:KM,:]
 
             if cptp_penalty_factor != 0:
@@ -2387,6 +2590,25 @@ def _do_mlgst_base(dataset, startGateset, gateStringsToUse,
         #  if p <  p_min then term == sqrt( N_{i,sl} * -log(p_min) + N[i] * p_min + S*(p-p_min) )
         #   and deriv == 0.5 / sqrt(...) * S * dp
 
+        def get_dprobs_factor(probs, slc=slice(None)):
+            #probs holds the probabilities of the final gate strings in slc
+            minusCnts = minusCntVecMx[:,slc]; fTerm = freqTerm[:,slc]
+            pos_probs = _np.where(probs < min_p, min_p, probs)
+            S = minusCnts / min_p
+            S2 = -0.5 * minusCnts / (min_p**2)
+            v = fTerm + minusCnts * _np.log(pos_probs) # dims K x M (K = nSpamLabels, M = nGateStrings)
+            v = _np.maximum(v,0)  #remove small negative elements due to roundoff error (above expression *cannot* really be negative)
+            v = _np.where( probs < min_p, v + S*(probs - min_p) + S2*(probs - min_p)**2, v) #quadratic extrapolation of logl at min_p for probabilities < min_p
+            v = _np.where( minusCnts == 0, 0.0, v)
+            v = _np.sqrt( v )
+
+            v = _np.maximum(v,1e-100) #derivative diverges as v->0, but v always >= 0 so clip v to a small positive value to avoid divide by zero below
+            dprobs_factor_pos = (0.5 / v) * (minusCnts / pos_probs)
+            dprobs_factor_neg = (0.5 / v) * (S + 2*S2*(probs - min_p))
+            dprobs_factor = _np.where( probs < min_p, dprobs_factor_neg, dprobs_factor_pos)
+            dprobs_factor = _np.where( minusCnts == 0, 0.0, dprobs_factor )
+            return dprobs_factor
+
         def jacobian(vectorGS):
             tm = _time.time()
             dprobs = jac[0:KM,:] #avoid mem copying: use jac mem for dprobs
@@ -2396,22 +2618,7 @@ def _do_mlgst_base(dataset, startGateset, gateStringsToUse,
                                 prMxToFill=probs, clipTo=probClipInterval,
                                 check=check, comm=comm, wrtBlockSize=wrtBlkSize,
                                 profiler=profiler, gatherMemLimit=gthrMem)
-
-            pos_probs = _np.where(probs < min_p, min_p, probs)
-            S = minusCntVecMx / min_p
-            S2 = -0.5 * minusCntVecMx / (min_p**2)
-            v = freqTerm + minusCntVecMx * _np.log(pos_probs) # dims K x M (K = nSpamLabels, M = nGateStrings)
-            v = _np.maximum(v,0)  #remove small negative elements due to roundoff error (above expression *cannot* really be negative)
-            v = _np.where( probs < min_p, v + S*(probs - min_p) + S2*(probs - min_p)**2, v) #quadratic extrapolation of logl at min_p for probabilities < min_p
-            v = _np.where( minusCntVecMx == 0, 0.0, v)
-            v = _np.sqrt( v )
-
-            v = _np.maximum(v,1e-100) #derivative diverges as v->0, but v always >= 0 so clip v to a small positive value to avoid divide by zero below
-            dprobs_factor_pos = (0.5 / v) * (minusCntVecMx / pos_probs)
-            dprobs_factor_neg = (0.5 / v) * (S + 2*S2*(probs - min_p))
-            dprobs_factor = _np.where( probs < min_p, dprobs_factor_neg, dprobs_factor_pos)
-            dprobs_factor = _np.where( minusCntVecMx == 0, 0.0, dprobs_factor )
-            dprobs *= dprobs_factor[:,:,None] # (K,M,N) * (K,M,1)   (N = dim of vectorized gateset)
+            dprobs *= get_dprobs_factor(probs)[:,:,None] # (K,M,N) * (K,M,1)   (N = dim of vectorized gateset)
               #Note: this also sets jac[0:KM,:]
 
             if cptp_penalty_factor != 0:
@@ -2426,6 +2633,32 @@ def _do_mlgst_base(dataset, startGateset, gateStringsToUse,
             profiler.add_time("do_mlgst: JACOBIAN",tm)
             return jac
 
+    if streamJacobian: # Computes (J^T J, J^T f) without storing the jacobian
+        rowBlocks = _stream_row_blocks(gs, evTree, jacRowBlk)
+
+        def jacobian_products(vectorGS, fvec):
+            tm = _time.time()
+            gs.from_vector(vectorGS)
+
+            extraJac = None
+            if ex > 0:
+                extraJac = _np.empty( (ex,vec_gs_len), 'd' )
+                if cptp_penalty_factor != 0:
+                    _cptp_penalty_jac_fill(extraJac, gs, cptp_penalty_factor,
+                                           vec_gs_len, nGateParams, nSpamParams,
+                                           gateBasis)
+                if forcefn_grad is not None:
+                    extraJac[forceOffset-KM:,:] = -forcefn_grad
+
+            JTJ, JTf = _stream_jtj_jtf(gs, evTree, rowBlocks, spam_lbl_rows,
+                                       get_dprobs_factor, fvec, extraJac,
+                                       probClipInterval, comm, wrtBlkSize,
+                                       profiler, gthrMem, check, distributedSolve)
+            profiler.add_time("do_mlgst: JACOBIAN",tm)
+            return JTJ, JTf
+    else:
+        jacobian_products = None
+
     profiler.add_time("do_mlgst: pre-opt",tStart)
 
     #Run optimization (use leastsq)
@@ -2436,7 +2669,10 @@ def _do_mlgst_base(dataset, startGateset, gateStringsToUse,
             objective_func, jacobian, x0, f_norm2_tol=tol,
             jac_norm_tol=tol, rel_ftol=tol, rel_xtol=tol,
             max_iter=maxiter, comm=comm,
-            verbosity=printer.verbosity-1, profiler=profiler)
+            verbosity=printer.verbosity-1, profiler=profiler,
+            jtjf_fn=jacobian_products, broyden_updates=broydenUpdates,
+            geodesic_accel=geodesicAccel, distributed_solve=distributedSolve,
+            state=optimizerState)
         printer.log("Least squares message = %s" % msg,2)
         assert(converged)
     else:
@@ -2531,7 +2767,10 @@ def do_iterative_mlgst(dataset, startGateset, gateStringSetsToUseInEstimation,
                        gateStringSetLabels=None, useFreqWeightedChiSq=False,
                        verbosity=0, check=False, memLimit=None, 
                        profiler=None, comm=None,
-                       distributeMethod = "gatestrings"):
+                       distributeMethod = "gatestrings", evaltree_cache=None,
+                       cachePrecision=None, streamJacobian=False,
+                       broydenUpdates=0, geodesicAccel=False, distributedSolve=False,
+                        warmStart=True):
     """
     Performs Iterative Maximum Liklihood Estimation Gate Set Tomography on the dataset.
 
@@ -2623,6 +2862,31 @@ def do_iterative_mlgst(dataset, startGateset, gateStringSetsToUseInEstimation,
         when comm is not None).  "gatestrings" will divide the list of
         gatestrings; "deriv" will divide the columns of the jacobian matrix.
 
+    evaltree_cache : EvalTreeCache, optional
+        An on-disk cache used to store, and to load when available, the
+        evaluation tree of each iteration.  If None, each iteration's tree
+        is instead created by extending the previous iteration's tree.
+
+    cachePrecision : {"double", "single"}, optional
+        The precision of the product and derivative caches (see
+        `GateSet.cache_precision`) used during all but the last iteration,
+        whose chi^2 and maximum-likelihood optimizations are always
+        performed in double precision.  The returned gate sets use double
+        precision.  If None, the precision of `startGateset` is used.
+
+    streamJacobian : bool, optional
+        Whether each optimization accumulates J^T J and J^T f from blocks
+        of rows of the jacobian instead of storing it (see
+        :func:`do_mc2gst`).
+
+    broydenUpdates, geodesicAccel, distributedSolve : optional
+        Options of each least-squares optimization (see :func:`do_mc2gst`).
+
+    warmStart : bool, optional
+        Whether each optimization starts from the final damping of the
+        previous one (see `optimizerState` of :func:`do_mc2gst`) instead of
+        the default initial damping.
+
 
     Returns
     -------
@@ -2651,6 +2915,11 @@ def do_iterative_mlgst(dataset, startGateset, gateStringSetsToUseInEstimation,
     #Run extended MLGST iteratively on given sets of estimatable strings
     mleGatesets = [ ]; maxLogLs = [ ] #for returnAll == True case
     mleGateset = startGateset.copy(); nIters = len(gateStringLists)
+    optimizerState = _opt.CustomLMState() if warmStart else None #carried between iterations
+    if cachePrecision is not None:
+        mleGateset.cache_precision = cachePrecision
+    if evaltree_cache is None:
+        evaltree_cache = _create_incremental_evaltree_cache()
     tStart = _time.time()
     tRef = tStart
 
@@ -2667,13 +2936,18 @@ def do_iterative_mlgst(dataset, startGateset, gateStringSetsToUseInEstimation,
             mleGateset.set_basis(startGateset.get_basis_name(),
                                    startGateset.get_basis_dimension()) 
               #set basis in case of CPTP constraints
+            if i == nIters-1: #final chi2, logl & ML in double precision
+                mleGateset.cache_precision = "double"
 
             _, mleGateset = do_mc2gst(dataset, mleGateset, stringsToEstimate,
                                       maxiter, maxfev, tol, cptp_penalty_factor,
                                       minProbClip, probClipInterval,
                                       useFreqWeightedChiSq, 0,printer-1, check,
                                       check, None, None, memLimit, comm,
-                                      distributeMethod, profiler)
+                                      distributeMethod, profiler, evaltree_cache,
+                                      streamJacobian=streamJacobian,
+                                      broydenUpdates=broydenUpdates, geodesicAccel=geodesicAccel,
+                                      distributedSolve=distributedSolve, optimizerState=optimizerState)
                                        # Note maxLogL is really chi2 number here
 
             tNxt = _time.time();
@@ -2709,7 +2983,11 @@ def do_iterative_mlgst(dataset, startGateset, gateStringSetsToUseInEstimation,
                   dataset, mleGateset, stringsToEstimate, maxiter, maxfev, tol,
                   cptp_penalty_factor, minProbClip, probClipInterval, radius,
                   poissonPicture, printer-1, check, None, memLimit, comm,
-                  distributeMethod, profiler)
+                  distributeMethod, profiler, evaltree_cache,
+                  streamJacobian=streamJacobian,
+                  broydenUpdates=broydenUpdates, geodesicAccel=geodesicAccel,
+                  distributedSolve=distributedSolve)
+                  # no optimizerState: the chi2 damping doesn't suit the logl objective
 
                 printer.log("2*Delta(log(L)) = %g" % (2*(logL_ub - maxLogL_p)),2)
 
@@ -2729,6 +3007,9 @@ def do_iterative_mlgst(dataset, startGateset, gateStringSetsToUseInEstimation,
                 mleGatesets.append(mleGateset)
                 maxLogLs.append(maxLogL)
 
+    for gs in mleGatesets + [mleGateset]:
+        gs.cache_precision = "double" #returned gate sets compute in double precision
+
     printer.log('Iterative MLGST Total Time: %.1fs' % (_time.time()-tStart))
     profiler.add_time('do_iterative_mlgst: total time', tStart)
 
@@ -2741,6 +3022,157 @@ def do_iterative_mlgst(dataset, startGateset, gateStringSetsToUseInEstimation,
 #                 Other Tools
 ###################################################################################
 
+def _create_incremental_evaltree_cache():
+    """
+    Helper function - create an `evaltree_cache` dictionary for calls to
+    do_mc2gst and do_mlgst using successively longer lists of gate
+    strings, each beginning with the previous one (as in iterative GST).
+    The single un-split EvalTree it holds is extended with the new gate
+    strings of each call (see `GateSet.bulk_evaltree_from_resources`).
+    """
+    return { 'unsplitTree': _objs.EvalTree(), 'gateStrings': [] }
+
+
+def _get_evaltree(gs, gateStringsToUse, comm, mlim, distributeMethod,
+                  printer, evaltree_cache, memLimit=None):
+    """
+    Helper function - get the (possibly split) evaluation tree and
+    parameter-block size for the bulk_fill_probs and bulk_fill_dprobs calls
+    of do_mc2gst and _do_mlgst_base, using `evaltree_cache` if it's not None.
+    `mlim` is the memory available to the tree and `memLimit` the overall
+    memory limit, which (rather than `mlim`, which depends on the current
+    memory usage) identifies the tree in an `EvalTreeCache`.
+
+    Returns
+    -------
+    evTree : EvalTree
+    wrtBlkSize : int or None
+    """
+    subcalls = ["bulk_fill_probs","bulk_fill_dprobs"]
+
+    if isinstance(evaltree_cache, _objs.EvalTreeCache): #persistent cache
+        key = evaltree_cache.get_key(gateStringsToUse, gs, memLimit, comm,
+                                     distributeMethod, subcalls)
+        evTree, wrtBlkSize = evaltree_cache.get(key, comm)
+        if evTree is not None:
+            printer.log("Loaded evaluation tree %s from cache" % key, 2)
+        else:
+            evTree, wrtBlkSize, _ = gs.bulk_evaltree_from_resources(
+                gateStringsToUse, comm, mlim, distributeMethod, subcalls, printer)
+            evaltree_cache.put(key, evTree, wrtBlkSize, comm)
+
+    elif evaltree_cache and 'unsplitTree' in evaltree_cache: #incremental cache
+        prevStrings = evaltree_cache['gateStrings']
+        if list(gateStringsToUse[0:len(prevStrings)]) != list(prevStrings):
+            evaltree_cache['unsplitTree'] = _objs.EvalTree() #can't extend: start over
+        evTree, wrtBlkSize, _ = gs.bulk_evaltree_from_resources(
+            gateStringsToUse, comm, mlim, distributeMethod, subcalls,
+            printer, evaltree_cache['unsplitTree'])
+        evaltree_cache['gateStrings'] = gateStringsToUse
+        
+    elif evaltree_cache and 'evTree' in evaltree_cache \
+            and 'wrtBlkSize' in evaltree_cache:
+        #use cache dictionary to speed multiple calls which use
+        # the same gateset, gate strings, comm, memlim, etc.
+        evTree = evaltree_cache['evTree']
+        wrtBlkSize = evaltree_cache['wrtBlkSize']
+
+    else:
+        evTree, wrtBlkSize, _ = gs.bulk_evaltree_from_resources(
+            gateStringsToUse, comm, mlim, distributeMethod, subcalls, printer)
+
+        #Fill cache dict if one was given
+        if evaltree_cache is not None:
+            evaltree_cache['evTree'] = evTree
+            evaltree_cache['wrtBlkSize'] = wrtBlkSize
+
+    return evTree, wrtBlkSize
+
+
+def _stream_row_blocks(gs, evTree, rowBlockSize):
+    """
+    Helper function - divides the final gate strings of each sub-tree of
+    `evTree` into blocks of at most `rowBlockSize` strings, so that
+    _stream_jtj_jtf never holds more than that many strings' rows of the
+    jacobian.  Returns a list with an element per sub-tree, each a list of
+    (final slice of `evTree`, EvalTree) pairs.  A sub-tree which is already
+    small enough is used as is; otherwise each block gets its own (unsplit)
+    tree.
+    """
+    gateStrings = None
+    blocks = []
+    for evalSubTree in evTree.get_sub_trees():
+        fslc = evalSubTree.final_slice(evTree)
+        if evalSubTree.num_final_strings() <= rowBlockSize:
+            blocks.append( [(fslc, evalSubTree)] ); continue
+
+        if gateStrings is None:
+            gateStrings = evTree.generate_gatestring_list(permute=False)
+        subTreeBlocks = []
+        for i in range(fslc.start, fslc.stop, rowBlockSize):
+            slc = slice(i, min(i+rowBlockSize, fslc.stop))
+            subTreeBlocks.append( (slc, gs.bulk_evaltree(gateStrings[slc])) )
+        blocks.append(subTreeBlocks)
+    return blocks
+
+
+def _stream_jtj_jtf(gs, evTree, rowBlocks, spam_lbl_rows, dprobs_factor_fn,
+                    fvec, extraJac, clipTo, comm, wrtBlockSize, profiler,
+                    gatherMemLimit, check, distributeRows=False):
+    """
+    Helper function - computes J^T J and J^T f for the least-squares objective
+    vector `fvec` of do_mc2gst or _do_mlgst_base without storing J.  The
+    first K*M rows of J (K spam labels, M gate strings of `evTree`) are
+    dprobs_factor[k,i] times the derivative of the (k,i)-th probability and
+    the remaining rows are `extraJac` (which may be None).  J is computed
+    one block of `rowBlocks` (see _stream_row_blocks) at a time, and only
+    the rows of the current block are stored.  The probabilities are
+    computed along with their derivatives, and `dprobs_factor_fn(blkProbs,
+    slc)` gives the dprobs_factor of the gate strings in slice `slc` from
+    their probabilities `blkProbs`.  If `distributeRows` is True, only the
+    current processor's rows of J^T J (see mpitools.distribute_rows) are
+    returned, and the processors' contributions are summed straight into
+    these rows.
+    """
+    nP = gs.num_params(); ns = len(spam_lbl_rows); ng = evTree.num_final_strings()
+    fvecMx = fvec[0:ns*ng].reshape( (ns,ng) )
+    JTJ = _np.zeros( (nP,nP), 'd' )
+    JTf = _np.zeros( nP, 'd' )
+
+    mySubTreeIndices, subTreeOwners, mySubComm = evTree.distribute(comm)
+    for iSubTree in mySubTreeIndices:
+        for slc, blkTree in rowBlocks[iSubTree]:
+            nBlk = slc.stop - slc.start
+            dprobs = _np.empty( (ns,nBlk,nP), 'd' )
+            blkProbs = _np.empty( (ns,nBlk), 'd' )
+            gs.bulk_fill_dprobs(dprobs, spam_lbl_rows, blkTree,
+                                prMxToFill=blkProbs, clipTo=clipTo,
+                                check=check, comm=mySubComm,
+                                wrtBlockSize=wrtBlockSize, profiler=profiler,
+                                gatherMemLimit=gatherMemLimit)
+            dprobs *= dprobs_factor_fn(blkProbs, slc)[:,:,None]
+            blkJac = dprobs.reshape( (-1,nP) ) # this block's rows of J
+            JTJ += _np.dot(blkJac.T, blkJac)
+            JTf += _np.dot(blkJac.T, fvecMx[:,slc].reshape(-1))
+            dprobs = blkJac = None #free mem
+
+    #add together the contributions from different processors
+    myRows = _mpit.distribute_rows(nP, comm) if distributeRows else slice(None)
+    if comm is not None and len(set(subTreeOwners.values())) > 1:
+        if comm.Get_rank() not in subTreeOwners.values():
+            # this proc is not the "owner" of its subtrees and should not send a contribution to the sum
+            JTJ[:,:] = 0.0; JTf[:] = 0.0
+        JTJ = _mpit.reduce_rows(JTJ, comm) if distributeRows else comm.allreduce(JTJ)
+        JTf = comm.allreduce(JTf)
+    elif distributeRows:
+        JTJ = JTJ[myRows,:].copy() # so the full JTJ can be freed
+
+    if extraJac is not None:
+        JTJ += _np.dot(extraJac[:,myRows].T, extraJac)
+        JTf += _np.dot(extraJac.T, fvec[ns*ng:])
+    return JTJ, JTf
+
+
 def _cptp_penalty(gs,prefactor,gateBasis):
     """
     Helper function - CPTP penalty: (sum of tracenorms of gates),
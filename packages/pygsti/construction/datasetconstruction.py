@@ -83,96 +83,125 @@ def generate_fake_data(gatesetOrDataset, gatestring_list, nSamples,
     if isinstance(gatesetOrDataset, _ds.DataSet):
         dsGen = gatesetOrDataset #dataset
         gsGen = None
-        dataset = _ds.DataSet( spamLabels=dsGen.get_spam_labels(),
-                               collisionAction=collisionAction)
+        spamLabels = dsGen.get_spam_labels()
     else:
         gsGen = gatesetOrDataset #dataset
         dsGen = None
-        dataset = _ds.DataSet( spamLabels=gsGen.get_spam_labels(),
-                               collisionAction=collisionAction )
+        spamLabels = gsGen.get_spam_labels()
 
     if sampleError in ("binomial","multinomial"):
         if randState is None:
             rndm = _rndm.RandomState(seed) # ok if seed is None
         else:
             rndm = randState
+    elif sampleError not in ("none","round"):
+        raise ValueError("Invalid sample error parameter: '%s'  Valid options are 'none', 'round', 'binomial', or 'multinomial'" % sampleError)
 
+    #GateStrings throughout, since tuples and GateStrings may be mixed
+    gateStrings = [ s if isinstance(s,_gs.GateString) else _gs.GateString(s)
+                    for s in gatestring_list ]
     if aliasDict is not None:
         translated_list = _gstrc.translate_gatestring_list(
-                                      gatestring_list, aliasDict)
-    else: translated_list = gatestring_list
-
-    for k,(s,trans_s) in enumerate(zip(gatestring_list,translated_list)):
-
-        if gsGen:
-            ps = gsGen.probs(trans_s) 
-              # a dictionary of probabilities; keys = spam labels
-
-            if sampleError in ("binomial","multinomial"):
-                #Adjust to probabilities if needed (and warn if not close to in-bounds)
-                TOL = 1e-10
-                for sl in ps: 
-                    if ps[sl] < 0:
-                        if ps[sl] < -TOL: _warnings.warn("Clipping probs < 0 to 0")
-                        ps[sl] = 0.0
-                    elif ps[sl] > 1: 
-                        if ps[sl] > (1+TOL): _warnings.warn("Clipping probs > 1 to 1")
-                        ps[sl] = 1.0
-                
-                psum = sum(ps.values())
-                if psum > 1:
-                    if psum > 1+TOL: _warnings.warn("Adjusting sum(probs) > 1 to 1")
-                    extra_p = (psum-1.0) * (1.000000001) # to sum < 1+eps (numerical prec insurance)
-                    for sl in ps:
-                        if extra_p > 0:
-                            x = min(ps[sl],extra_p)
-                            ps[sl] -= x; extra_p -= x
-                        else: break
-                    
-                assert(-TOL <= sum(ps.values()) <= 1.+TOL)
-        else:
-            ps = { sl: dsGen[trans_s].fraction(sl) 
-                   for sl in dsGen.get_spam_labels() }
-
-        if nSamples is None and dsGen is not None:
-            N = dsGen[trans_s].total() #use the number of samples from the generating dataset
-        else:
-            try:
-                N = nSamples[k] #try to treat nSamples as a list
-            except:
-                N = nSamples #if not indexable, nSamples should be a single number
+                                      gateStrings, aliasDict)
+    else: translated_list = gateStrings
+    nStrings = len(gateStrings)
+
+    #Get the (nStrings, nSpamLabels) array of probabilities all at once
+    if gsGen:
+        evalTree = gsGen.bulk_evaltree(translated_list)
+        probs = _np.empty( (len(spamLabels), nStrings), 'd' )
+        gsGen.bulk_fill_probs(probs, { sl:i for (i,sl) in enumerate(spamLabels) },
+                              evalTree)
+        probs = _np.ascontiguousarray(probs.T)
+
+        if sampleError in ("binomial","multinomial"):
+            _adjust_probs(probs) #clip to valid probabilities
+    else:
+        probs = _np.array( [ [ dsGen[trans_s].fraction(sl) for sl in spamLabels ]
+                             for trans_s in translated_list ], 'd')
+        probs.shape = (nStrings, len(spamLabels)) #in case nStrings == 0
+
+    if nSamples is None and dsGen is not None:
+        N = _np.array( [ dsGen[trans_s].total() for trans_s in translated_list ], 'd')
+          #use the number of samples from the generating dataset
+    elif _np.ndim(nSamples) == 0:
+        N = _np.full(nStrings, nSamples, 'd')
+    else:
+        N = _np.array(nSamples[0:nStrings], 'd')
 
-        #Weight the number of samples according to a WeightedGateString
+    #Weight the number of samples according to a WeightedGateString
+    for k,s in enumerate(gateStrings):
         if isinstance(s, _gs.WeightedGateString):
-            nWeightedSamples = int(round(s.weight * N))
-        else:
-            nWeightedSamples = N
-
-        counts = { }
-        if sampleError == "binomial":
-            assert(len(list(ps.keys())) == 2)
-            spamLabel1, spamLabel2 = sorted(list(ps.keys())); p1 = ps[spamLabel1]
-            counts[spamLabel1] = rndm.binomial(nWeightedSamples, p1) #numpy.clip(p1,0,1) )
-            counts[spamLabel2] = nWeightedSamples - counts[spamLabel1]
-        elif sampleError == "multinomial":
-            #nOutcomes = len(list(ps.keys()))
-            spamLabels = list(ps.keys())
-            countsArray = rndm.multinomial(nWeightedSamples,
-                    [ps[sl] for sl in spamLabels], size=1)
-            for i,spamLabel in enumerate(spamLabels):
-                counts[spamLabel] = countsArray[0,i]
-        else:
-            for (spamLabel,p) in ps.items():
-                pc = _np.clip(p,0,1)
-                if sampleError == "none":
-                    counts[spamLabel] = float(nWeightedSamples * pc)
-                elif sampleError == "round":
-                    counts[spamLabel] = int(round(nWeightedSamples*pc))
-                else: raise ValueError("Invalid sample error parameter: '%s'  Valid options are 'none', 'round', 'binomial', or 'multinomial'" % sampleError)
-
-        dataset.add_count_dict(s, counts)
+            N[k] = int(round(s.weight * N[k]))
+
+    if sampleError == "binomial":
+        assert(len(spamLabels) == 2)
+        i1, i2 = [ spamLabels.index(sl) for sl in sorted(spamLabels) ]
+        nInt = _np.round(N).astype(_np.int64)
+        counts = _np.empty( (nStrings, 2), 'd' )
+        counts[:,i1] = rndm.binomial(nInt, probs[:,i1]) #numpy.clip(p1,0,1) )
+        counts[:,i2] = nInt - counts[:,i1]
+    elif sampleError == "multinomial":
+        counts = _sample_multinomial(rndm, _np.round(N).astype(_np.int64), probs)
+    else:
+        counts = N[:,None] * _np.clip(probs,0,1)
+        if sampleError == "round":
+            counts = _np.round(counts)
+
+    #Write the counts straight into a static DataSet when possible, i.e.
+    # when there are no duplicate or zero-count strings to treat specially
+    if len(set(gateStrings)) == nStrings and \
+            _np.all(_np.round(counts.sum(axis=1)) != 0):
+        return _ds.DataSet(counts, gateStrings=gateStrings, spamLabels=spamLabels,
+                           bStatic=True, collisionAction=collisionAction)
+
+    dataset = _ds.DataSet( spamLabels=spamLabels,
+                           collisionAction=collisionAction )
+    for s,countRow in zip(gateStrings,counts):
+        dataset.add_count_list(s, countRow)
     dataset.done_adding_data()
     return dataset
+
+
+def _adjust_probs(probs):
+    """
+    Clips the rows of the (nStrings,nSpamLabels) array `probs` in place so
+    they are valid probability distributions (and warns if they weren't
+    close to being so).
+    """
+    TOL = 1e-10
+    if _np.any(probs < -TOL): _warnings.warn("Clipping probs < 0 to 0")
+    if _np.any(probs > 1+TOL): _warnings.warn("Clipping probs > 1 to 1")
+    _np.clip(probs, 0, 1, out=probs)
+
+    psum = probs.sum(axis=1)
+    if _np.any(psum > 1+TOL): _warnings.warn("Adjusting sum(probs) > 1 to 1")
+    extra_p = _np.where(psum > 1, (psum-1.0) * (1.000000001), 0.0) # to sum < 1+eps (numerical prec insurance)
+    for i in range(probs.shape[1]): #remove any excess starting from the first spam label
+        x = _np.minimum(probs[:,i], extra_p)
+        probs[:,i] -= x; extra_p -= x
+
+    psum = probs.sum(axis=1)
+    assert(_np.all(psum >= -TOL) and _np.all(psum <= 1.+TOL))
+
+
+def _sample_multinomial(rndm, N, probs):
+    """
+    Samples counts from the multinomial distributions given by the rows of
+    `probs` (with N[i] trials for the i-th row) using, like numpy's
+    `multinomial`, a sequence of conditional binomial samples, each of which
+    is drawn for all the rows at once.
+    """
+    counts = _np.empty(probs.shape, 'd')
+    nLeft = N.copy(); pLeft = _np.ones(len(N), 'd')
+    for i in range(probs.shape[1]-1):
+        with _np.errstate(divide='ignore', invalid='ignore'):
+            p = _np.where(pLeft > 0, probs[:,i] / pLeft, 0.0)
+        counts[:,i] = rndm.binomial(nLeft, _np.clip(p,0,1))
+        nLeft -= counts[:,i].astype(_np.int64); pLeft -= probs[:,i]
+    counts[:,-1] = nLeft
+    return counts
+
     
 def merge_outcomes(dataset,label_merge_dict):
     """Creates a DataSet which merges certain outcomes in input DataSet;
@@ -125,6 +125,12 @@ def do_long_sequence_gst(dataFilenameOrSet, targetGateFilenameOrSet,
         - useFreqWeightedChiSq = True / False (default)
         - nestedGateStringLists = True (default) / False
         - distributeMethod = "gatestrings" or "deriv" (default)
+        - evaltreeCache = EvalTreeCache or None (default)
+        - cachePrecision = "double" or "single" or None (default)
+        - streamJacobian = True / False (default)
+        - broydenUpdates = int (default == 0)
+        - geodesicAccel = True / False (default)
+        - distributedSolve = True / False (default)
         - profile = int (default == 1)
         - check = True / False (default)
         - truncScheme = "whole germ powers" (default) or "truncated germ powers"
@@ -340,7 +346,13 @@ def do_long_sequence_gst(dataFilenameOrSet, targetGateFilenameOrSet,
             comm=comm, distributeMethod=advancedOptions.get(
                 'distributeMethod',"deriv"),
             check_jacobian=advancedOptions.get('check',False),
-            check=advancedOptions.get('check',False))
+            check=advancedOptions.get('check',False),
+            evaltree_cache=advancedOptions.get('evaltreeCache',None),
+            cachePrecision=advancedOptions.get('cachePrecision',None),
+            streamJacobian=advancedOptions.get('streamJacobian',False),
+            broydenUpdates=advancedOptions.get('broydenUpdates',0),
+            geodesicAccel=advancedOptions.get('geodesicAccel',False),
+            distributedSolve=advancedOptions.get('distributedSolve',False))
 
     elif objective == "logl":
         gs_lsgst_list = _alg.do_iterative_mlgst(
@@ -357,7 +369,13 @@ def do_long_sequence_gst(dataFilenameOrSet, targetGateFilenameOrSet,
                 'useFreqWeightedChiSq',False), 
           distributeMethod=advancedOptions.get(
                 'distributeMethod',"deriv"),
-          check=advancedOptions.get('check',False))
+          check=advancedOptions.get('check',False),
+          evaltree_cache=advancedOptions.get('evaltreeCache',None),
+          cachePrecision=advancedOptions.get('cachePrecision',None),
+          streamJacobian=advancedOptions.get('streamJacobian',False),
+          broydenUpdates=advancedOptions.get('broydenUpdates',0),
+          geodesicAccel=advancedOptions.get('geodesicAccel',False),
+          distributedSolve=advancedOptions.get('distributedSolve',False))
     else:
         raise ValueError("Invalid longSequenceObjective: %s" % objective)
 
@@ -31,10 +31,11 @@ def load_parameter_file(filename):
     # return _json.load( open(filename, "rb") )
 
 def load_dataset(filename, cache=False, collisionAction="aggregate",
-                 verbosity=1):
+                 verbosity=1, workers=None):
     """
     Load a DataSet from a file.  First tries to load file as a
-    saved DataSet object, then as a standard text-formatted DataSet.
+    saved DataSet object (including a directory written by
+    `DataSet.save_columnar`), then as a standard text-formatted DataSet.
 
     Parameters
     ----------
@@ -58,6 +59,11 @@ def load_dataset(filename, cache=False, collisionAction="aggregate",
         If zero, no output is shown.  If greater than zero,
         loading progress is shown.
 
+    workers : int, optional
+        The number of processes used to parse a text-formatted file, which
+        is divided into chunks of lines that are parsed in parallel.  None
+        or 1 parses the file in the current process.
+
     Returns
     -------
     DataSet
@@ -90,7 +96,8 @@ def load_dataset(filename, cache=False, collisionAction="aggregate",
             # otherwise must use standard dataset file format
             parser = _stdinput.StdInputParser()
             ds = parser.parse_datafile(filename, bToStdout,
-                                       collisionAction=collisionAction)
+                                       collisionAction=collisionAction,
+                                       workers=workers)
 
             printer.log("Writing cache file (to speed future loads): %s"
                         % cache_filename)
@@ -99,12 +106,13 @@ def load_dataset(filename, cache=False, collisionAction="aggregate",
             # otherwise must use standard dataset file format
             parser = _stdinput.StdInputParser()
             ds = parser.parse_datafile(filename, bToStdout,
-                                       collisionAction=collisionAction)
-        return ds
+                                       collisionAction=collisionAction,
+                                       workers=workers)
+    return ds
 
 
 def load_multidataset(filename, cache=False, collisionAction="aggregate",
-                      verbosity=1):
+                      verbosity=1, workers=None):
     """
     Load a MultiDataSet from a file.  First tries to load file as a
     saved MultiDataSet object, then as a standard text-formatted MultiDataSet.
@@ -131,6 +139,11 @@ def load_multidataset(filename, cache=False, collisionAction="aggregate",
         If zero, no output is shown.  If greater than zero,
         loading progress is shown.
 
+    workers : int, optional
+        The number of processes used to parse a text-formatted file, which
+        is divided into chunks of lines that are parsed in parallel.  None
+        or 1 parses the file in the current process.
+
 
     Returns
     -------
@@ -164,7 +177,8 @@ def load_multidataset(filename, cache=False, collisionAction="aggregate",
             # otherwise must use standard dataset file format
             parser = _stdinput.StdInputParser()
             mds = parser.parse_multidatafile(filename, bToStdout,
-                                             collisionAction=collisionAction)
+                                             collisionAction=collisionAction,
+                                             workers=workers)
 
             printer.log("Writing cache file (to speed future loads): %s" 
                         % cache_filename)
@@ -174,7 +188,8 @@ def load_multidataset(filename, cache=False, collisionAction="aggregate",
             # otherwise must use standard dataset file format
             parser = _stdinput.StdInputParser()
             mds = parser.parse_multidatafile(filename, bToStdout,
-                                             collisionAction=collisionAction)
+                                             collisionAction=collisionAction,
+                                             workers=workers)
     return mds
 
 
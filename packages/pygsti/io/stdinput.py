@@ -7,6 +7,7 @@ from __future__ import division, print_function, absolute_import, unicode_litera
 """ Text-parsering classes and functions to read input files."""
 
 import os as _os
+import re as _re
 import sys as _sys
 import numpy as _np
 import warnings as _warnings
@@ -16,10 +17,22 @@ import pyparsing as _pp
 
 from .. import objects as _objs
 from .. import tools as _tools
+from ..tools import sharedmemtools as _smt
+from ..objects.gatestringindex import CompactGateStringIndex as _CompactGateStringIndex
 
 _pp.ParserElement.enablePackrat()
 _sys.setrecursionlimit(10000)
 
+#Tokens of the gate strings pyGSTi itself writes, e.g. "Gx(GxGy)^4Gy" or "{}":
+# gate labels, the empty string, and parenthesized label runs with an optional
+# exponent.  Gate strings consisting only of these are parsed without pyparsing.
+_simple_gatestring_token = _re.compile(r'\{\}|G[a-z0-9_]+(?:\^\d+)?|\((?:G[a-z0-9_]+)+\)(?:\^\d+)?')
+_simple_gatestring = _re.compile(r'(?:\{\}|G[a-z0-9_]+(?:\^\d+)?|\((?:G[a-z0-9_]+)+\)(?:\^\d+)?)+$')
+_gate_label = _re.compile(r'G[a-z0-9_]+')
+_labels_only = _re.compile(r'(?:G[a-z0-9_]+)+$') #a gate string with no powers or parentheses
+
+_min_lines_per_chunk = 5000 #smallest chunk of a data file handed to a worker process
+
 class StdInputParser(object):
     """
     Encapsulates a text parser for reading GST input files.
@@ -292,7 +305,8 @@ class StdInputParser(object):
                 lookupDict[ label ] = _objs.GateString(tup, s)
         return lookupDict
 
-    def parse_datafile(self, filename, showProgress=True, collisionAction="aggregate"):
+    def parse_datafile(self, filename, showProgress=True, collisionAction="aggregate",
+                       workers=None):
         """
         Parse a data set file into a DataSet object.
 
@@ -310,22 +324,22 @@ class StdInputParser(object):
             sequence data with by appending a final "#<number>" gate label to the
             duplicated gate sequence.
 
+        workers : int, optional
+            The number of (forked) processes used to parse the data lines.  When
+            greater than 1, the lines are divided into chunks which are parsed in
+            parallel and then merged in their original order.  None or 1 parses
+            the file in the current process.
+
         Returns
         -------
         DataSet
             A static DataSet object.
         """
+        with open(filename, 'r') as datafile:
+            lines = datafile.readlines()
 
         #Parse preamble -- lines beginning with # or ## until first non-# line
-        preamble_directives = { }
-        with open(filename, 'r') as datafile:
-            for line in datafile:
-                line = line.strip()
-                if len(line) == 0 or line[0] != '#': break
-                if line.startswith("## "):
-                    parts = line[len("## "):].split("=")
-                    if len(parts) == 2: # key = value
-                        preamble_directives[ parts[0].strip() ] = parts[1].strip()
+        preamble_directives = _parse_preamble(lines)
 
         #Process premble
         orig_cwd = _os.getcwd()
@@ -343,50 +357,150 @@ class StdInputParser(object):
             _os.chdir(orig_cwd)
 
         #Read data lines of data file
-        dataset = _objs.DataSet(spamLabels=spamLabels,collisionAction=collisionAction)
-        nLines  = 0
-        with open(filename, 'r') as datafile:
-            nLines = sum(1 for line in datafile)
-        nSkip = int(nLines / 100.0)
-        if nSkip == 0: nSkip = 1
+        display_progress = _get_progress_display(filename, showProgress)
+        gateLabels, labels, offsets, values, lineNumbers = self._parse_datalines_in_chunks(
+            lines, lookupDict, nDataCols, filename, display_progress, workers)
+        counts = self._fillDataCounts(values, spamLabels, fillInfo)
+
+        #skip lines in dataset file with zero counts (no experiments done)
+        zeroRows = _np.all(abs(counts) < 1e-9, axis=1)
+        for i in _np.nonzero(zeroRows)[0]:
+            gateStringStr = self.parse_dataline(lines[lineNumbers[i]], lookupDict, nDataCols)[1]
+            _warnings.warn( "Dataline for gateString '%s' has zero counts and will be ignored" % gateStringStr)
+        keep = _np.logical_not(zeroRows) & (_np.round(counts.sum(axis=1)) != 0) #DataSet.add_count_list skips the latter
+
+        return _build_static_dataset(gateLabels, labels, offsets, counts, spamLabels,
+                                     collisionAction, keep)
+
+    def _parse_datalines(self, lines, lookupDict, nDataCols, filename,
+                         display_progress=None, firstLineNumber=0):
+        """
+        Parse the data lines (skipping blank and comment lines) of a data set
+        or multiple data set file.
 
-        def is_interactive():
-            import __main__ as main
-            return not hasattr(main, '__file__')
+        Lines whose gate string is a single column of the form pyGSTi writes
+        (see `_simple_gatestring`) are split directly, with each distinct
+        token (e.g. "(GxGy)^4") parsed by the full grammar only once, and a
+        plain sequence of gate labels split by a single regular expression;
+        all other lines go through `parse_dataline`.
 
-        if is_interactive() and showProgress:
-            try:
-                import time
-                from IPython.display import clear_output
-                def display_progress(i,N):
-                    time.sleep(0.001); clear_output()
-                    print("Loading %s: %.0f%%" % (filename, 100.0*float(i)/float(N)))
-                    _sys.stdout.flush()
-            except:
-                def display_progress(i,N): pass
-        else:
-            def display_progress(i,N): pass
+        The gate strings are returned encoded, as for a
+        `CompactGateStringIndex`, so that the results of parsing a chunk of
+        lines in another process are cheap to send back and merge.
 
-        countDict = {}
-        with open(filename, 'r') as inputfile:
-            for (iLine,line) in enumerate(inputfile):
-                if iLine % nSkip == 0 or iLine+1 == nLines: display_progress(iLine+1, nLines)
-
-                line = line.strip()
-                if len(line) == 0 or line[0] == '#': continue
+        Returns
+        -------
+        gateLabels : list
+            The distinct gate labels of the gate strings, in order of appearance.
+        labels : numpy array
+            1D (unsigned, usually 8-bit) integer array of the concatenated gate
+            strings of the data lines, as indices into `gateLabels`.
+        offsets : numpy array
+            The start (and end) of each data line's gate string within `labels`,
+            so the i-th gate string is `labels[offsets[i]:offsets[i+1]]`.
+        values : numpy array
+            A (nDataLines, nDataCols) array of the column values.
+        lineNumbers : numpy array
+            The index of each data line within `lines`, plus `firstLineNumber`.
+        """
+        nLines = len(lines)
+        nSkip = max(int(nLines / 100.0),1)
+        values = _np.empty( (nLines,nDataCols), 'd') #at most one row per line
+        gateLabels = []; labelIndex = {}
+        flat = []; offsets = [0]; lineNumbers = []
+        tokenCache = {} #token text => encoded gate labels
+        nCols = nDataCols + 1
+
+        def encode(gateLabelSeq):
+            """ The indices of the gate labels in gateLabels, adding new ones """
+            try:
+                return list(map(labelIndex.__getitem__, gateLabelSeq))
+            except KeyError:
+                for lbl in gateLabelSeq:
+                    if lbl not in labelIndex:
+                        labelIndex[lbl] = len(gateLabels)
+                        gateLabels.append(lbl)
+                return list(map(labelIndex.__getitem__, gateLabelSeq))
+
+        for (iLine,line) in enumerate(lines):
+            if display_progress is not None and (iLine % nSkip == 0 or iLine+1 == nLines):
+                display_progress(iLine+1, nLines)
+
+            parts = line.split()
+            if len(parts) == 0 or parts[0][0] == '#': continue
+
+            encoded = None
+            if len(parts) == nCols and _simple_gatestring.match(parts[0]) is not None:
                 try:
-                    gateStringTuple, gateStringStr, valueList = self.parse_dataline(line, lookupDict, nDataCols)
+                    valueList = [ float(p) for p in parts[1:] ]
+                    if _labels_only.match(parts[0]) is not None:
+                        encoded = encode(_gate_label.findall(parts[0]))
+                    else:
+                        encoded = [] #extended token by token
+                        for tok in _simple_gatestring_token.findall(parts[0]):
+                            if tok not in tokenCache:
+                                tokenCache[tok] = encode(self.parse_gatestring(tok))
+                            encoded.extend(tokenCache[tok])
+                except ValueError:
+                    encoded = None #let parse_dataline report the problem
+
+            if encoded is None:
+                try:
+                    gateStringTuple, _, valueList = self.parse_dataline(line, lookupDict, nDataCols)
                 except ValueError as e:
-                    raise ValueError("%s Line %d: %s" % (filename, iLine, str(e)))
+                    raise ValueError("%s Line %d: %s" % (filename, firstLineNumber+iLine, str(e)))
+                encoded = encode(gateStringTuple)
 
-                self._fillDataCountDict( countDict, fillInfo, valueList )
-                if all([ (abs(v) < 1e-9) for v in list(countDict.values())]):
-                    _warnings.warn( "Dataline for gateString '%s' has zero counts and will be ignored" % gateStringStr)
-                    continue #skip lines in dataset file with zero counts (no experiments done)
-                dataset.add_count_dict(gateStringTuple, countDict) #Note: don't use gateStringStr since DataSet currently doesn't hold GateString objs (just tuples)
+            values[len(lineNumbers)] = valueList
+            flat.extend(encoded); offsets.append(len(flat))
+            lineNumbers.append(firstLineNumber+iLine)
 
-        dataset.done_adding_data()
-        return dataset
+        labelType = _np.min_scalar_type(max(len(gateLabels)-1,0))
+        return gateLabels, _np.array(flat, labelType), _np.array(offsets, _np.int64), \
+            values[0:len(lineNumbers)], _np.array(lineNumbers, _np.int64)
+
+    def _parse_datalines_in_chunks(self, lines, lookupDict, nDataCols, filename,
+                                   display_progress, workers):
+        """
+        Parse data lines as `_parse_datalines` does, but divide them (at line
+        boundaries) into chunks that are parsed by up to `workers` forked
+        processes.  Each chunk's gate strings come back encoded with the
+        chunk's own label table; these are translated to a common table and
+        concatenated in their original order, so that the returned values are
+        the same as those of a serial parse.
+        """
+        if workers is None or workers <= 1:
+            return self._parse_datalines(lines, lookupDict, nDataCols, filename, display_progress)
+
+        nLines = len(lines)
+        nChunks = max(min(4*workers, nLines // _min_lines_per_chunk), 1)
+        bounds = [ (nLines*k) // nChunks for k in range(nChunks+1) ]
+
+        def parse_chunk(k):
+            return self._parse_datalines(lines[bounds[k]:bounds[k+1]], lookupDict, nDataCols,
+                                         filename, None, bounds[k])
+        results = _smt.map_in_processes(parse_chunk, list(range(nChunks)), workers)
+        display_progress(nLines, nLines)
+
+        gateLabels = []; labelIndex = {}
+        for chunkGateLabels, _, _, _, _ in results:
+            for lbl in chunkGateLabels:
+                if lbl not in labelIndex:
+                    labelIndex[lbl] = len(gateLabels)
+                    gateLabels.append(lbl)
+        labelType = _np.min_scalar_type(max(len(gateLabels)-1,0))
+
+        allLabels = []; allOffsets = []; nLabels = 0
+        for chunkGateLabels, labels, offsets, _, _ in results:
+            toCommon = _np.array([ labelIndex[lbl] for lbl in chunkGateLabels ], labelType)
+            allLabels.append( toCommon[labels] )
+            allOffsets.append( offsets[:-1] + nLabels )
+            nLabels += len(labels)
+        allOffsets.append( _np.array([nLabels], _np.int64) )
+
+        return gateLabels, _np.concatenate(allLabels), _np.concatenate(allOffsets), \
+            _np.concatenate([ r[3] for r in results ], axis=0), \
+            _np.concatenate([ r[4] for r in results ])
 
     def _extractLabelsFromColLabels(self, colLabels ):
         spamLabels = []; countCols = []; freqCols = []; impliedCountTotCol1Q = -1
@@ -414,29 +528,33 @@ class StdInputParser(object):
         return spamLabels, fillInfo
 
 
-    def _fillDataCountDict(self, countDict, fillInfo, colValues):
+    def _fillDataCounts(self, values, spamLabels, fillInfo):
         countCols, freqCols, impliedCountTotCol1Q = fillInfo
+        counts = _np.empty( (values.shape[0], len(spamLabels)), 'd')
 
         for spamLabel,iCol in countCols:
-            if colValues[iCol] > 0 and colValues[iCol] < 1:
+            col = values[:,iCol]
+            if _np.any( (col > 0) & (col < 1) ):
                 raise ValueError("Count column (%d) contains value(s) " % iCol +
                                  "between 0 and 1 - could this be a frequency?")
-            countDict[spamLabel] = colValues[iCol]
+            counts[:,spamLabels.index(spamLabel)] = col
 
         for spamLabel,iCol,iTotCol in freqCols:
-            if colValues[iCol] < 0 or colValues[iCol] > 1.0:
+            col = values[:,iCol]
+            if _np.any( (col < 0) | (col > 1.0) ):
                 raise ValueError("Frequency column (%d) contains value(s) " % iCol +
                                  "outside of [0,1.0] interval - could this be a count?")
-            countDict[spamLabel] = colValues[iCol] * colValues[iTotCol]
+            counts[:,spamLabels.index(spamLabel)] = col * values[:,iTotCol]
 
         if impliedCountTotCol1Q >= 0:
-            countDict['minus'] = colValues[impliedCountTotCol1Q] - countDict['plus']
+            counts[:,spamLabels.index('minus')] = values[:,impliedCountTotCol1Q] \
+                - counts[:,spamLabels.index('plus')]
         #TODO - add standard count completion for 2Qubit case?
-        return countDict
+        return counts
 
 
     def parse_multidatafile(self, filename, showProgress=True,
-                            collisionAction="aggregate"):
+                            collisionAction="aggregate", workers=None):
         """
         Parse a multiple data set file into a MultiDataSet object.
 
@@ -454,22 +572,22 @@ class StdInputParser(object):
             sequence data with by appending a final "#<number>" gate label to the
             duplicated gate sequence.
 
+        workers : int, optional
+            The number of (forked) processes used to parse the data lines.  When
+            greater than 1, the lines are divided into chunks which are parsed in
+            parallel and then merged in their original order.  None or 1 parses
+            the file in the current process.
+
         Returns
         -------
         MultiDataSet
             A MultiDataSet object.
         """
+        with open(filename, 'r') as multidatafile:
+            lines = multidatafile.readlines()
 
         #Parse preamble -- lines beginning with # or ## until first non-# line
-        preamble_directives = { }
-        with open(filename, 'r') as multidatafile:
-            for line in multidatafile:
-                line = line.strip()
-                if len(line) == 0 or line[0] != '#': break
-                if line.startswith("## "):
-                    parts = line[len("## "):].split("=")
-                    if len(parts) == 2: # key = value
-                        preamble_directives[ parts[0].strip() ] = parts[1].strip()
+        preamble_directives = _parse_preamble(lines)
 
         #Process premble
         orig_cwd = _os.getcwd()
@@ -488,55 +606,16 @@ class StdInputParser(object):
             _os.chdir(orig_cwd)
 
         #Read data lines of data file
-        datasets = _OrderedDict()
-        for dsLabel,spamLabels in dsSpamLabels.items():
-            datasets[dsLabel] = _objs.DataSet(spamLabels=spamLabels,
-                                              collisionAction=collisionAction)
-
-        dsCountDicts = _OrderedDict()
-        for dsLabel in dsSpamLabels: dsCountDicts[dsLabel] = {}
-
-        nLines = 0
-        with open(filename, 'r') as datafile:
-            nLines = sum(1 for line in datafile)
-        nSkip = max(int(nLines / 100.0),1)
-
-        def is_interactive():
-            import __main__ as main
-            return not hasattr(main, '__file__')
-
-        if is_interactive() and showProgress:
-            try:
-                import time
-                from IPython.display import clear_output
-                def display_progress(i,N):
-                    time.sleep(0.001); clear_output()
-                    print("Loading %s: %.0f%%" % (filename, 100.0*float(i)/float(N)))
-                    _sys.stdout.flush()
-            except:
-                def display_progress(i,N): pass
-        else:
-            def display_progress(i,N): pass
-
-        with open(filename, 'r') as inputfile:
-            for (iLine,line) in enumerate(inputfile):
-                if iLine % nSkip == 0 or iLine+1 == nLines: display_progress(iLine+1, nLines)
-
-                line = line.strip()
-                if len(line) == 0 or line[0] == '#': continue
-                try:
-                    gateStringTuple, _, valueList = self.parse_dataline(line, lookupDict, nDataCols)
-                except ValueError as e:
-                    raise ValueError("%s Line %d: %s" % (filename, iLine, str(e)))
-
-                self._fillMultiDataCountDicts(dsCountDicts, fillInfo, valueList)
-                for dsLabel, countDict in dsCountDicts.items():
-                    datasets[dsLabel].add_count_dict(gateStringTuple, countDict)
+        display_progress = _get_progress_display(filename, showProgress)
+        gateLabels, labels, offsets, values, _ = self._parse_datalines_in_chunks(
+            lines, lookupDict, nDataCols, filename, display_progress, workers)
+        dsCounts = self._fillMultiDataCounts(values, dsSpamLabels, fillInfo)
 
         mds = _objs.MultiDataSet()
-        for dsLabel,ds in datasets.items():
-            ds.done_adding_data()
-            mds.add_dataset(dsLabel, ds)
+        for dsLabel,counts in dsCounts.items():
+            keep = _np.round(counts.sum(axis=1)) != 0 #DataSet.add_count_list skips zero-count rows
+            mds.add_dataset(dsLabel, _build_static_dataset(
+                gateLabels, labels, offsets, counts, dsSpamLabels[dsLabel], collisionAction, keep))
         return mds
 
 
@@ -582,26 +661,117 @@ class StdInputParser(object):
         return dsSpamLabels, fillInfo
 
 
-    def _fillMultiDataCountDicts(self, countDicts, fillInfo, colValues):
+    def _fillMultiDataCounts(self, values, dsSpamLabels, fillInfo):
         countCols, freqCols, impliedCounts1Q = fillInfo
+        dsCounts = _OrderedDict()
+        for dsLabel,spamLabels in dsSpamLabels.items():
+            dsCounts[dsLabel] = _np.empty( (values.shape[0], len(spamLabels)), 'd')
 
         for dsLabel,spamLabel,iCol in countCols:
-            if colValues[iCol] > 0 and colValues[iCol] < 1:
+            col = values[:,iCol]
+            if _np.any( (col > 0) & (col < 1) ):
                 raise ValueError("Count column (%d) contains value(s) " % iCol +
                                  "between 0 and 1 - could this be a frequency?")
-            countDicts[dsLabel][spamLabel] = colValues[iCol]
+            dsCounts[dsLabel][:,dsSpamLabels[dsLabel].index(spamLabel)] = col
 
         for dsLabel,spamLabel,iCol,iTotCol in freqCols:
-            if colValues[iCol] < 0 or colValues[iCol] > 1.0:
+            col = values[:,iCol]
+            if _np.any( (col < 0) | (col > 1.0) ):
                 raise ValueError("Frequency column (%d) contains value(s) " % iCol +
                                  "outside of [0,1.0] interval - could this be a count?")
-            countDicts[dsLabel][spamLabel] = colValues[iCol] * colValues[iTotCol]
+            dsCounts[dsLabel][:,dsSpamLabels[dsLabel].index(spamLabel)] = col * values[:,iTotCol]
 
         for dsLabel,iTotCol in impliedCounts1Q:
-            countDicts[dsLabel]['minus'] = colValues[iTotCol] - countDicts[dsLabel]['plus']
+            spamLabels = dsSpamLabels[dsLabel]
+            dsCounts[dsLabel][:,spamLabels.index('minus')] = values[:,iTotCol] \
+                - dsCounts[dsLabel][:,spamLabels.index('plus')]
         #TODO - add standard count completion for 2Qubit case?
-        return countDicts
+        return dsCounts
+
+
+def _parse_preamble(lines):
+    """ Get the "## key = value" directives from the leading '#' lines of a data file """
+    preamble_directives = { }
+    for line in lines:
+        line = line.strip()
+        if len(line) == 0 or line[0] != '#': break
+        if line.startswith("## "):
+            parts = line[len("## "):].split("=")
+            if len(parts) == 2: # key = value
+                preamble_directives[ parts[0].strip() ] = parts[1].strip()
+    return preamble_directives
+
 
+def _get_progress_display(filename, showProgress):
+    """ Get a display_progress(i,N) function, which only prints when run interactively """
+    def is_interactive():
+        import __main__ as main
+        return not hasattr(main, '__file__')
+
+    if is_interactive() and showProgress:
+        try:
+            import time
+            from IPython.display import clear_output
+            def display_progress(i,N):
+                time.sleep(0.001); clear_output()
+                print("Loading %s: %.0f%%" % (filename, 100.0*float(i)/float(N)))
+                _sys.stdout.flush()
+        except:
+            def display_progress(i,N): pass
+    else:
+        def display_progress(i,N): pass
+    return display_progress
+
+
+def _build_static_dataset(gateLabels, labels, offsets, counts, spamLabels,
+                          collisionAction, keep=None):
+    """
+    Create a static DataSet from the encoded per-line gate strings returned by
+    `StdInputParser._parse_datalines` and a 2D counts array with a row per
+    line, treating repeated gate strings the way `DataSet.add_count_list`
+    does.  Only the lines where the boolean array `keep` is True are used.
+    """
+    lineIndices = _np.arange(len(offsets)-1) if (keep is None) else _np.nonzero(keep)[0]
+    gateLabels = list(gateLabels)
+    labelIndex = { lbl: i for i,lbl in enumerate(gateLabels) }
+    nMaxLabels = len(gateLabels) + (len(lineIndices) if collisionAction == "keepseparate" else 0)
+    labelType = _np.min_scalar_type(max(nMaxLabels-1,0)) #room for any "#<number>" tags
+    itemSize = labelType.itemsize
+    encoded = _np.asarray(labels, labelType).tobytes() #bytes slices are quick to hash
+    offsets = offsets.tolist()
+
+    gsIndex = _OrderedDict() #encoded gate string => row of dataset counts
+    rows = _np.empty(len(lineIndices), 'i')
+    for i,iLine in enumerate(lineIndices.tolist()):
+        key = encoded[itemSize*offsets[iLine]:itemSize*offsets[iLine+1]]
+        if key in gsIndex:
+            if collisionAction == "aggregate":
+                rows[i] = gsIndex[key]; continue
+            elif collisionAction == "keepseparate":
+                #find next available gatestring:
+                j=0; tagged_key = key
+                while tagged_key in gsIndex:
+                    j+=1; tag = "#%d" % j
+                    if tag not in labelIndex:
+                        labelIndex[tag] = len(gateLabels)
+                        gateLabels.append(tag)
+                    tagged_key = key + _np.array([labelIndex[tag]], labelType).tobytes()
+                key = tagged_key
+        rows[i] = gsIndex[key] = len(gsIndex)
+
+    counts = counts[lineIndices]
+    if len(gsIndex) < len(lineIndices):
+        dsCounts = _np.zeros( (len(gsIndex), len(spamLabels)), 'd')
+        _np.add.at(dsCounts, rows, counts)
+    else: dsCounts = counts
+
+    keys = list(gsIndex.keys())
+    dsOffsets = _np.zeros(len(keys)+1, _np.int64)
+    _np.cumsum([ len(key) // itemSize for key in keys ], out=dsOffsets[1:])
+    dsIndex = _CompactGateStringIndex(gateLabels, _np.frombuffer(b"".join(keys), labelType),
+                                      dsOffsets, _np.arange(len(keys), dtype=_np.int64))
+    return _objs.DataSet(dsCounts, gateStringIndices=dsIndex, spamLabels=spamLabels,
+                         bStatic=True, collisionAction=collisionAction)
 
 
 def _evalElement(el, bComplex):
@@ -14,6 +14,8 @@ from .confidenceregion import ConfidenceRegion
 from .dataset import DataSet
 from .exceptions import *
 from .evaltree import EvalTree
+from .evaltreecache import EvalTreeCache
+from .compactevaltree import CompactEvalTree
 from .gate import Gate
 from .gate import LinearlyParameterizedGate
 from .gate import FullyParameterizedGate
@@ -33,6 +35,7 @@ from .multidataset import MultiDataSet
 from .spamspec import SpamSpec
 from .profiler import Profiler
 from .profiler import DummyProfiler
+from .memorymodel import MemoryModel
 
 from .gaugegroup import FullGaugeGroup, TPGaugeGroup, \
     DiagGaugeGroup, TPDiagGaugeGroup, UnitaryGaugeGroup
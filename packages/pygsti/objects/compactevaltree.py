@@ -0,0 +1,486 @@
+from __future__ import division, print_function, absolute_import, unicode_literals
+#*****************************************************************
+#    pyGSTi 0.9:  Copyright 2015 Sandia Corporation
+#    This Software is released under the GPL license detailed
+#    in the file "license.txt" in the top-level pyGSTi directory
+#*****************************************************************
+""" Defines the CompactEvalTree class, an array-based evaluation tree. """
+
+import numpy as _np
+
+from ..tools import mpitools as _mpit
+from .verbosityprinter import VerbosityPrinter
+from .evaltree import EvalTree as _EvalTree
+
+
+class CompactEvalTree(object):
+    """
+    An Evaluation Tree whose elements are stored in integer arrays.
+
+    A CompactEvalTree specifies the same computation as an `EvalTree`
+    (and may be used anywhere an EvalTree can), but instead of holding
+    each element as an `(iLeft, iRight)` tuple in a list it stores the
+    left and right children of all the elements, the evaluation order and
+    the mapping of final strings into the computation order in contiguous
+    int32 numpy arrays.  This uses several times less memory for large
+    trees and makes trees much faster to pickle (e.g. when they're
+    communicated between processors).
+
+    Trees are built and split using `EvalTree`'s algorithms, so these
+    operations temporarily need the memory of an `EvalTree`.
+    """
+
+    def __init__(self, evalTree=None):
+        """
+        Create a new CompactEvalTree.
+
+        Parameters
+        ----------
+        evalTree : EvalTree, optional
+            A tree to copy (including its sub-trees, if it is split).  If
+            None, an empty tree is created, which must be initialized using
+            `initialize`.
+        """
+        self.gateLabels = []
+        self.init_indices = _np.empty(0, _np.int32)
+        self.eval_order = _np.empty(0, _np.int32)
+        self.left = _np.empty(0, _np.int32)  # -1 for initial elements
+        self.right = _np.empty(0, _np.int32) # -1 for initial elements
+        self.final_index = None # computation index of each (original) final string
+        self.num_final_strs = 0
+        self.myFinalToParentFinalMap = None
+        self.parentIndexMap = None
+        self.subTrees = []
+        self.distribution = {}
+        self.eval_levels = None
+        self.product_memo = None #kept by GateSetCalculator._compute_product_cache
+        self.split_prediction = None
+        if evalTree is not None:
+            self._set_from_evaltree(evalTree)
+
+
+    def _set_from_evaltree(self, evalTree):
+        """ Set this tree's contents from those of EvalTree `evalTree` """
+        nodes = _np.array([ (-1,-1) if (iLeft is None) else (iLeft,iRight)
+                            for iLeft,iRight in evalTree ], _np.int32).reshape(len(evalTree),2)
+        self.left = nodes[:,0].copy()
+        self.right = nodes[:,1].copy()
+        self.gateLabels = list(evalTree.gateLabels)
+        self.init_indices = _np.array(evalTree.init_indices, _np.int32)
+        self.eval_order = _np.array(evalTree.eval_order, _np.int32)
+        self.num_final_strs = evalTree.num_final_strs
+        self.myFinalToParentFinalMap = evalTree.myFinalToParentFinalMap
+        self.parentIndexMap = _np.array(evalTree.parentIndexMap, _np.int32) \
+            if (evalTree.parentIndexMap is not None) else None
+        if evalTree.original_index_lookup is not None:
+            self.final_index = _np.empty(self.num_final_strs, _np.int32)
+            for iorig,icur in evalTree.original_index_lookup.items():
+                if iorig < self.num_final_strs: self.final_index[iorig] = icur
+        else:
+            self.final_index = None
+        self.distribution = evalTree.distribution.copy()
+        self.subTrees = [ CompactEvalTree(st) for st in evalTree.subTrees ]
+        self.eval_levels = None
+        self.product_memo = None
+        self.split_prediction = evalTree.split_prediction
+
+
+    def expand(self):
+        """
+        Create an `EvalTree` (a list-based tree) equivalent to this tree.
+
+        Returns
+        -------
+        EvalTree
+        """
+        evt = _EvalTree([ (None,None) if (iLeft < 0) else (iLeft,iRight)
+                          for iLeft,iRight in zip(self.left.tolist(), self.right.tolist()) ])
+        evt.gateLabels = list(self.gateLabels)
+        evt.init_indices = self.init_indices.tolist()
+        evt.eval_order = self.eval_order.tolist()
+        evt.num_final_strs = self.num_final_strs
+        evt.myFinalToParentFinalMap = self.myFinalToParentFinalMap
+        evt.parentIndexMap = self.parentIndexMap.tolist() \
+            if (self.parentIndexMap is not None) else None
+        if self.final_index is not None:
+            evt.original_index_lookup = { iorig: icur for iorig,icur
+                                          in enumerate(self.final_index.tolist()) }
+            for i in range(self.num_final_strs, len(self)):
+                evt.original_index_lookup[i] = i #non-final elements aren't permuted
+        evt.distribution = self.distribution.copy()
+        evt.subTrees = [ st.expand() for st in self.subTrees ]
+        evt.split_prediction = self.split_prediction
+        return evt
+
+
+    def initialize(self, gateLabels, gatestring_list, numSubTreeComms=1):
+        """
+          Initialize an evaluation tree using a set of gate strings.
+          This function must be called before using a CompactEvalTree.
+
+          Parameters
+          ----------
+          gateLabels : list of strings
+              A list of all the single gate labels to
+              be stored at the beginning of the tree.  This
+              list must include all the gate labels contained
+              in the elements of gatestring_list.
+
+          gatestring_list : list of (tuples or GateStrings)
+              A list of tuples of gate labels or GateString
+              objects, specifying the gate strings that
+              should be present in the evaluation tree.
+
+          numSubTreeComms : int, optional
+              The number of processor groups (communicators)
+              to divide the subtrees of this tree among
+              when calling `distribute`.  By default, the
+              communicator is not divided.
+
+          Returns
+          -------
+          None
+        """
+        evt = _EvalTree()
+        evt.initialize(gateLabels, gatestring_list, numSubTreeComms)
+        self._set_from_evaltree(evt)
+
+
+    def copy(self):
+        """ Create a copy of this evaluation tree. """
+        newTree = CompactEvalTree()
+        newTree.gateLabels = self.gateLabels[:]
+        newTree.init_indices = self.init_indices.copy()
+        newTree.eval_order = self.eval_order.copy()
+        newTree.left = self.left.copy()
+        newTree.right = self.right.copy()
+        newTree.final_index = self.final_index.copy() \
+            if (self.final_index is not None) else None
+        newTree.num_final_strs = self.num_final_strs
+        newTree.myFinalToParentFinalMap = self.myFinalToParentFinalMap
+        newTree.parentIndexMap = self.parentIndexMap.copy() \
+            if (self.parentIndexMap is not None) else None
+        newTree.distribution = self.distribution.copy()
+        newTree.subTrees = [ st.copy() for st in self.subTrees ]
+        newTree.split_prediction = self.split_prediction
+        return newTree
+
+
+    def __len__(self):
+        return len(self.left)
+
+
+    def __getitem__(self, i):
+        """ Returns the `(iLeft, iRight)` tuple of element `i`, as `EvalTree` does """
+        iLeft = int(self.left[i])
+        if iLeft < 0: return (None,None)
+        return (iLeft, int(self.right[i]))
+
+
+    def __iter__(self):
+        for iLeft,iRight in zip(self.left.tolist(), self.right.tolist()):
+            yield (None,None) if (iLeft < 0) else (iLeft,iRight)
+
+
+    def get_init_labels(self):
+        """ Return a tuple of the gate labels (strings)
+            which form the beginning of the tree.
+        """
+        return tuple(self.gateLabels)
+
+    def get_init_indices(self):
+        """ Return a tuple of the indices corresponding
+             to the initial gate labels (strings)
+             which form the beginning of the tree.
+        """
+        return tuple(self.init_indices.tolist())
+
+    def get_evaluation_order(self):
+        """ Return a list of indices specifying the
+             order in which elements of this tree
+             should be visited when doing a computation
+             (after computing the initial indices).
+        """
+        return self.eval_order.tolist()
+
+
+    def get_evaluation_levels(self):
+        """
+        Return the elements of the evaluation order grouped into dependency
+        "levels".  See `EvalTree.get_evaluation_levels`.
+
+        Returns
+        -------
+        list
+            A list of `(indices, iLefts, iRights)` tuples of integer numpy
+            arrays, one tuple per level.
+        """
+        if self.eval_levels is not None:
+            return self.eval_levels
+
+        lefts = self.left.tolist(); rights = self.right.tolist()
+        depth = [0]*len(self)
+        for i in self.eval_order.tolist():
+            depth[i] = max(depth[lefts[i]],depth[rights[i]]) + 1
+
+        #group eval_order by depth, keeping the evaluation order within each level
+        orderDepths = _np.array(depth, _np.int32)[self.eval_order]
+        perm = _np.argsort(orderDepths, kind='mergesort')
+        sortedOrder = self.eval_order[perm]
+        levelStarts = _np.searchsorted(orderDepths[perm],
+                                       _np.arange(1,orderDepths.max()+2 if len(perm) else 1))
+
+        self.eval_levels = []
+        for iStart,iEnd in zip(levelStarts[:-1],levelStarts[1:]):
+            indices = sortedOrder[iStart:iEnd]
+            self.eval_levels.append( (indices, self.left[indices], self.right[indices]) )
+        return self.eval_levels
+
+
+    def final_view(self, a, axis=None):
+        """
+        Returns a view of array `a` restricting it to only the
+        *final* results computed by this tree (not the intermediate
+        results).  See `EvalTree.final_view`.
+
+        Parameters
+        ----------
+        a : ndarray
+            An array of results computed using this tree.
+
+        axis : int, optional
+            Specified the axis along which the selection of the
+            final elements is performed. If None, than this
+            selection if performed on flattened `a`.
+
+        Returns
+        -------
+        ndarray
+        """
+        if axis is None:
+            return a[0:self.num_final_strings()]
+        else:
+            sl = [slice(None)] * a.ndim
+            sl[axis] = slice(0,self.num_final_strings())
+            ret = a[tuple(sl)]
+            assert(ret.base is a) #check that what is returned is a view
+            assert(ret.size == 0 or _np.may_share_memory(ret,a))
+            return ret
+
+
+    def final_slice(self, parent_tree):
+        """
+        Return a slice that identifies the segment of `parent_tree`'s
+        final values that correspond to this tree's final values.
+        See `EvalTree.final_slice`.
+
+        Parameters
+        ----------
+        parent_tree : CompactEvalTree
+            This tree's parent tree.
+
+        Returns
+        -------
+        slice
+        """
+        if (self.myFinalToParentFinalMap is not None) and \
+                parent_tree.is_split():
+            return self.myFinalToParentFinalMap
+        else:
+            return slice(0,self.num_final_strings())
+
+
+    def num_final_strings(self):
+        """
+        Returns the integer number of "final" gate strings, equal
+          to the length of the gatestring_list passed to initialize.
+        """
+        return self.num_final_strs
+
+
+    def generate_gatestring_list(self, permute=True):
+        """
+        Generate a list of the final gate strings this tree evaluates.
+        See `EvalTree.generate_gatestring_list`.
+
+        Parameters
+        ----------
+        permute : bool, optional
+           Whether to permute the returned list of strings into the
+           same order as the original list passed to initialize(...).
+
+        Returns
+        -------
+        list of gate-label-tuples
+        """
+        gateStrings = [None]*len(self)
+        for i,gateLabel in zip(self.init_indices.tolist(), self.gateLabels):
+            if gateLabel == "": gateStrings[i] = () #special case of empty label
+            else: gateStrings[i] = (gateLabel,)
+
+        lefts = self.left.tolist(); rights = self.right.tolist()
+        for i in self.eval_order.tolist():
+            gateStrings[i] = gateStrings[lefts[i]] + gateStrings[rights[i]]
+
+        nFinal = self.num_final_strings()
+        if self.final_index is not None and permute == True:
+            return [ gateStrings[icur] for icur in self.final_index.tolist() ]
+        else:
+            assert(None not in gateStrings[0:nFinal])
+            return gateStrings[0:nFinal]
+
+
+    def permute_original_to_computation(self, a, axis=0):
+        """
+        Permute an array's elements using mapping from the "original"
+        gate string ordering to the "computation" ordering.
+        See `EvalTree.permute_original_to_computation`.
+
+        Paramters
+        ---------
+        a : numpy array
+           The array whose permuted elements are returned.
+
+        axis : int, optional
+           The axis to permute.  By default, the first dimension is used.
+
+        Returns
+        -------
+        numpy array
+        """
+        assert(a.shape[axis] == self.num_final_strings())
+        if self.final_index is None: return a.copy()
+        return _np.take(a, _np.argsort(self.final_index), axis=axis)
+
+
+    def permute_computation_to_original(self, a, axis=0):
+        """
+        Permute an array's elements using mapping from the "computation"
+        gate string ordering to the "original" ordering.
+        See `EvalTree.permute_computation_to_original`.
+
+        Paramters
+        ---------
+        a : numpy array
+           The array whose permuted elements are returned.
+
+        axis : int, optional
+           The axis to permute.  By default, the first dimension is used.
+
+        Returns
+        -------
+        numpy array
+        """
+        assert(a.shape[axis] == self.num_final_strings())
+        if self.final_index is None: return a.copy()
+        return _np.take(a, self.final_index, axis=axis)
+
+
+    def distribute(self, comm, verbosity=0):
+        """
+        Distributes this tree's sub-trees across multiple processors.
+        See `EvalTree.distribute`.
+
+        Parameters
+        ----------
+        comm : mpi4py.MPI.Comm
+            When not None, an MPI communicator for distributing subtrees
+            across processor groups
+
+        verbosity : int, optional
+            How much detail to send to stdout.
+
+        Returns
+        -------
+        mySubtreeIndices : list
+        subTreeOwners : dict
+        mySubComm : mpi4py.MPI.Comm or None
+        """
+        nprocs = 1 if (comm is None) else comm.Get_size()
+        nSubtreeComms = self.distribution.get('numSubtreeComms',1)
+        nSubtrees = len(self.get_sub_trees())
+
+        assert(nSubtreeComms <= nprocs) # => len(mySubCommIndices) == 1
+        mySubCommIndices, subCommOwners, mySubComm = \
+            _mpit.distribute_indices(list(range(nSubtreeComms)), comm)
+        assert(len(mySubCommIndices) == 1)
+        mySubCommIndex = mySubCommIndices[0]
+
+        assert(nSubtreeComms <= nSubtrees) # don't allow more comms than trees
+        mySubtreeIndices, subTreeOwners = _mpit.distribute_indices_base(
+            list(range(nSubtrees)), nSubtreeComms, mySubCommIndex)
+
+        # subTreeOwners contains index of owner subComm, but we really want
+        #  the owning processor, i.e. the owner of the subComm
+        subTreeOwners = { iSubTree: subCommOwners[subTreeOwners[iSubTree]]
+                          for iSubTree in subTreeOwners }
+
+        printer = VerbosityPrinter.build_printer(verbosity, comm)
+        printer.log("*** Distributing %d subtrees into %d sub-comms (%s processors) ***"% \
+                        (nSubtrees, nSubtreeComms, nprocs))
+
+        return mySubtreeIndices, subTreeOwners, mySubComm
+
+
+    def get_min_tree_size(self):
+        """
+        Returns the minimum sub tree size required to compute each
+        of the tree entries individually.  See `EvalTree.get_min_tree_size`.
+        """
+        return self.expand().get_min_tree_size()
+
+
+    def split(self, maxSubTreeSize=None, numSubTrees=None, verbosity=0,
+              strategy="greedy"):
+        """
+        Split this tree into sub-trees in order to reduce the
+          maximum size of any tree.  Must specify either maxSubTreeSize
+          or numSubTrees.  See `EvalTree.split`.
+
+        Parameters
+        ----------
+        maxSubTreeSize : int, optional
+            The maximum size (i.e. list length) of each sub-tree.
+
+        numSubTrees : int, optional
+            The number of sub-trees to create.
+
+        verbosity : int, optional
+            How much detail to send to stdout.
+
+        strategy : {"greedy", "balanced"} or function, optional
+            How to group the tree's elements into sub-trees.
+
+        Returns
+        -------
+        None
+        """
+        evt = self.expand()
+        evt.split(maxSubTreeSize, numSubTrees, verbosity, strategy)
+        self._set_from_evaltree(evt)
+
+
+    def is_split(self):
+        """ Returns boolean indicating whether tree is split into sub-trees or not. """
+        return len(self.subTrees) > 0
+
+
+    def get_sub_trees(self):
+        """
+        Returns a list of all the sub-trees (also CompactEvalTree instances)
+          of this tree.  If this tree is not split, returns a single-element
+          list containing just the tree.
+        """
+        if self.is_split():
+            return self.subTrees
+        else:
+            return [self] #return self as the only "subTree" when not split
+
+
+    def print_analysis(self):
+        """
+        Print a brief analysis of this tree. Used for
+        debugging and assessing tree quality.
+        """
+        self.expand().print_analysis()
+
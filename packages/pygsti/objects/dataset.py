@@ -6,6 +6,7 @@ from __future__ import division, print_function, absolute_import, unicode_litera
 #*****************************************************************
 """ Defines the DataSet class and supporting classes and functions """
 
+import os as _os
 import numpy as _np
 import pickle as _pickle
 import warnings as _warnings
@@ -14,6 +15,7 @@ from collections import OrderedDict as _OrderedDict
 from ..tools import listtools as _lt
 
 from . import gatestring as _gs
+from .gatestringindex import CompactGateStringIndex as _CompactGateStringIndex
 
 
 class DataSet_KeyValIterator(object):
@@ -190,8 +192,11 @@ class DataSet(object):
             return
 
         # self.gsIndex  :  Ordered dictionary where keys = GateString objects, values = integer indices into counts
+        #                  (a CompactGateStringIndex, which stores the gate strings in arrays, when bStatic == True)
         if gateStringIndices is not None:
             self.gsIndex = gateStringIndices
+        elif gateStrings is not None and bStatic:
+            self.gsIndex = _CompactGateStringIndex.from_gatestrings(gateStrings)
         elif gateStrings is not None:
             dictData = [ (gs if isinstance(gs,_gs.GateString) else _gs.GateString(gs),i) \
                            for (i,gs) in enumerate(gateStrings) ] #convert to GateStrings if necessary
@@ -565,7 +570,7 @@ class DataSet(object):
                 gateStringIndices.append( self.gsIndex[gateString] )
 
             if bThrowErrorIfStringIsMissing: gateStrings = listOfGateStringsToKeep
-            trunc_gsIndex = _OrderedDict( list(zip(gateStrings, gateStringIndices)) )
+            trunc_gsIndex = _CompactGateStringIndex.from_gatestrings(gateStrings, gateStringIndices)
             trunc_dataset = DataSet(self.counts, gateStringIndices=trunc_gsIndex, spamLabelIndices=self.slIndex, bStatic=True) #don't copy counts, just reference
             #trunc_dataset = StaticDataSet(self.counts.take(gateStringIndices,axis=0), gateStrings=gateStrings, spamLabelIndices=self.slIndex)
 
@@ -597,7 +602,7 @@ class DataSet(object):
         if self.bStatic:
             copyOfMe = DataSet(spamLabels=self.get_spam_labels(),
                                collisionAction=self.collisionAction)
-            copyOfMe.gsIndex = self.gsIndex.copy()
+            copyOfMe.gsIndex = _OrderedDict(list(self.gsIndex.items()))
             copyOfMe.counts = [ el.copy() for el in self.counts ]
             return copyOfMe
         else:
@@ -611,26 +616,37 @@ class DataSet(object):
         """
         if self.bStatic: return
         #Convert normal dataset to static mode.
-        #  gsIndex and slIndex stay the same ; counts is transformed to a 2D numpy array
+        #  slIndex stays the same ; gsIndex is stored in arrays and counts is transformed to a 2D numpy array
         if len(self.counts) > 0:
             newCounts = _np.concatenate( [el.reshape(1,-1) for el in self.counts], axis=0 )
         else:
             newCounts = _np.empty( (0,len(self.slIndex)), 'd')
+        self.gsIndex = _CompactGateStringIndex.from_gatestrings(
+            list(self.gsIndex.keys()), list(self.gsIndex.values()))
         self.counts, self.bStatic = newCounts, True
 
 
     def __getstate__(self):
-        toPickle = { 'gsIndexKeys': [_gs.CompressedGateString(key) for key in self.gsIndex.keys()], #list(map(_gs.CompressedGateString, list(self.gsIndex.keys()))),
-                     'gsIndexVals': list(self.gsIndex.values()),
-                     'slIndex': self.slIndex,
+        toPickle = { 'slIndex': self.slIndex,
                      'bStatic': self.bStatic,
                      'counts': self.counts,
                      'collisionAction': self.collisionAction}
+        if isinstance(self.gsIndex, _CompactGateStringIndex):
+            toPickle['gsIndex'] = self.gsIndex #already compact
+        else:
+            toPickle['gsIndexKeys'] = [_gs.CompressedGateString(key) for key in self.gsIndex.keys()] #list(map(_gs.CompressedGateString, list(self.gsIndex.keys()))),
+            toPickle['gsIndexVals'] = list(self.gsIndex.values())
         return toPickle
 
     def __setstate__(self, state_dict):
-        gsIndexKeys = [ cgs.expand() for cgs in state_dict['gsIndexKeys'] ]
-        self.gsIndex = _OrderedDict( list(zip( gsIndexKeys, state_dict['gsIndexVals'])) )
+        if 'gsIndex' in state_dict:
+            self.gsIndex = state_dict['gsIndex']
+        elif state_dict['bStatic']:
+            gsIndexKeys = [ cgs.expand() for cgs in state_dict['gsIndexKeys'] ]
+            self.gsIndex = _CompactGateStringIndex.from_gatestrings(gsIndexKeys, state_dict['gsIndexVals'])
+        else:
+            gsIndexKeys = [ cgs.expand() for cgs in state_dict['gsIndexKeys'] ]
+            self.gsIndex = _OrderedDict( list(zip( gsIndexKeys, state_dict['gsIndexVals'])) )
         self.slIndex = state_dict['slIndex']
         self.counts = state_dict['counts']
         self.bStatic = state_dict['bStatic']
@@ -687,7 +703,8 @@ class DataSet(object):
         ----------
         fileOrFilename string or file object.
             If a string,  interpreted as a filename.  If this filename ends
-            in ".gz", the file will be gzip uncompressed as it is read.
+            in ".gz", the file will be gzip uncompressed as it is read.  If
+            it is a directory, it is loaded as written by `save_columnar`.
 
         Returns
         -------
@@ -695,6 +712,8 @@ class DataSet(object):
         """
         # Compatability for unicode-literal filenames
         bOpen = not (hasattr(fileOrFilename, 'write'))
+        if bOpen and _os.path.isdir(fileOrFilename):
+            return self.load_columnar(fileOrFilename)
         if bOpen:
             if fileOrFilename.endswith(".gz"):
                 import gzip as _gzip
@@ -714,7 +733,10 @@ class DataSet(object):
         gsIndexKeys = [ expand(cgs) for cgs in state_dict['gsIndexKeys'] ]
 
         #gsIndexKeys = [ cgs.expand() for cgs in state_dict['gsIndexKeys'] ]
-        self.gsIndex = _OrderedDict( list(zip( gsIndexKeys, state_dict['gsIndexVals'])) )
+        if state_dict['bStatic']:
+            self.gsIndex = _CompactGateStringIndex.from_gatestrings(gsIndexKeys, state_dict['gsIndexVals'])
+        else:
+            self.gsIndex = _OrderedDict( list(zip( gsIndexKeys, state_dict['gsIndexVals'])) )
         self.slIndex = state_dict['slIndex']
         self.bStatic = state_dict['bStatic']
         self.collisionAction = state_dict.get("collisionAction","aggregate") #backward compatibility
@@ -727,6 +749,84 @@ class DataSet(object):
                 self.counts.append( _np.lib.format.read_array(f) ) #_np.load(f) doesn't play nice with gzip
         if bOpen: f.close()
 
+    def save_columnar(self, dirname):
+        """
+        Save this DataSet to a directory, which is created if it doesn't exist,
+        in a column-oriented binary format.
+
+        The gate strings are saved as integer arrays (indices into a table of
+        gate labels, along with the offset of each string) and the counts as
+        a 2D array, all in `.npy` files.  Unlike the format of :meth:`save`,
+        this lets :meth:`load_columnar` memory-map the data instead of
+        reading it into memory and creating an object for each gate string.
+
+        Parameters
+        ----------
+        dirname : str
+            The directory to save to.
+
+        Returns
+        -------
+        None
+        """
+        if not _os.path.isdir(dirname): _os.makedirs(dirname)
+
+        if isinstance(self.gsIndex, _CompactGateStringIndex):
+            gsIndex = self.gsIndex
+        else:
+            gsIndex = _CompactGateStringIndex.from_gatestrings(
+                list(self.gsIndex.keys()), list(self.gsIndex.values()))
+
+        if self.bStatic: counts = self.counts
+        elif len(self.counts) > 0: counts = _np.array(self.counts, 'd')
+        else: counts = _np.empty( (0,len(self.slIndex)), 'd')
+
+        _np.save(_os.path.join(dirname,"labels.npy"), _np.asarray(gsIndex.labels))
+        _np.save(_os.path.join(dirname,"offsets.npy"), _np.asarray(gsIndex.offsets))
+        _np.save(_os.path.join(dirname,"rows.npy"), _np.asarray(gsIndex.vals))
+        _np.save(_os.path.join(dirname,"hashes.npy"), _np.asarray(gsIndex.hashes))
+        _np.save(_os.path.join(dirname,"hashorder.npy"), _np.asarray(gsIndex.hashOrder))
+        _np.save(_os.path.join(dirname,"counts.npy"), counts)
+
+        info = { 'gateLabels': gsIndex.gateLabels,
+                 'slIndex': self.slIndex,
+                 'collisionAction': self.collisionAction }
+        with open(_os.path.join(dirname,"info.pkl"),"wb") as f:
+            _pickle.dump(info, f)
+
+    def load_columnar(self, dirname, mmap_mode='r'):
+        """
+        Load a DataSet saved by :meth:`save_columnar`, replacing any current
+        contents of this DataSet, which becomes static.
+
+        Parameters
+        ----------
+        dirname : str
+            The directory to load from.
+
+        mmap_mode : {None, 'r', 'r+', 'c'}, optional
+            The memory-map mode used to open the saved arrays (see
+            `numpy.load`).  With the default, 'r', the gate strings and
+            counts are read from disk only as they're accessed, and gate
+            strings are looked up without creating GateString objects.
+
+        Returns
+        -------
+        None
+        """
+        with open(_os.path.join(dirname,"info.pkl"),"rb") as f:
+            info = _pickle.load(f)
+        def load(name):
+            return _np.load(_os.path.join(dirname,name), mmap_mode=mmap_mode)
+
+        self.gsIndex = _CompactGateStringIndex(info['gateLabels'], load("labels.npy"),
+                                               load("offsets.npy"), load("rows.npy"),
+                                               load("hashes.npy"), load("hashorder.npy"))
+        self.slIndex = info['slIndex']
+        self.counts = load("counts.npy")
+        self.bStatic = True
+        self.collisionAction = info['collisionAction']
+
 
 #def upgrade_old_dataset(oldDataset):
 #    """ Deprecated: Returns a DataSet based on an old-version dataset object """
@@ -11,8 +11,16 @@ from ..tools import mpitools as _mpit
 from .verbosityprinter import VerbosityPrinter
 
 import numpy as _np
+import os as _os
+import pickle as _pickle
 import time as _time #DEBUG TIMERS
 
+# Minimum number of consecutive repetitions of a germ within a gate string
+# for the germ's power to be computed by repeated squaring (using "power"
+# elements germ^2, germ^4, ...) rather than one germ at a time.  None
+# disables the use of power elements.
+MIN_POWER_REPS = 4
+
 class EvalTree(list):
     """
     An Evaluation Tree.  Instances of this class specify how to
@@ -36,6 +44,9 @@ class EvalTree(list):
         self.parentIndexMap = None
         self.original_index_lookup = None
         self.distribution = {}
+        self.eval_levels = None
+        self.product_memo = None
+        self.split_prediction = None
         super(EvalTree, self).__init__(items)
 
     def initialize(self, gateLabels, gatestring_list, numSubTreeComms=1):
@@ -74,10 +85,14 @@ class EvalTree(list):
         if len(gatestring_list ) > 0 and isinstance(gatestring_list[0],_gs.GateString):
             gatestring_list = [gs.tup for gs in gatestring_list]
 
-        #Evaluation dictionary:
-        # keys == gate strings that have been evaluated so far
-        # values == index of gate string (key) within evalTree
-        evalDict = { }
+        #Evaluation trie:
+        # a prefix tree holding the gate strings that have been evaluated so
+        # far.  Each node is an [index, children] list, where `index` is the
+        # index of the node's gate string within evalTree (or None if it hasn't
+        # been evaluated) and `children` maps gate labels to child nodes.  This
+        # lets us find the longest evaluated prefix of a string (a "bite") and
+        # add new strings without slicing or hashing any tuples.
+        evalTrie = [None, {}]
 
         #Evaluation tree:
         # A list of tuples, where each element contains
@@ -102,19 +117,124 @@ class EvalTree(list):
         #Single gate (or zero-gate) computations are assumed to be atomic, and be computed independently.
         #  These labels serve as the initial values, and each gate string is assumed to be a tuple of
         #  gate labels.
+        firstIndexOfShortStr = {} # index of first occurrence of each zero- or single-gate string
+        for k,gateString in enumerate(gatestring_list):
+            if len(gateString) <= 1 and gateString not in firstIndexOfShortStr:
+                firstIndexOfShortStr[gateString] = k
+
         self.init_indices = [] #indices to put initial zero & single gate results
         for gateLabel in self.gateLabels:
             tup = () if gateLabel == "" else (gateLabel,) #special case of empty label == no gate
-            if tup in gatestring_list:
-                indx = gatestring_list.index(tup) 
+            if tup in firstIndexOfShortStr:
+                indx = firstIndexOfShortStr[tup]
                 self[indx] = (None,None) #iLeft = iRight = None for always-evaluated zero string
             else:
                 indx = len(self)
                 self.append( (None,None) ) #iLeft = iRight = None for always-evaluated zero string
             self.init_indices.append( indx )
-            evalDict[ tup ] = indx
+            if gateLabel == "": evalTrie[0] = indx
+            else: evalTrie[1].setdefault(gateLabel, [None, {}])[0] = indx
+
+        self._add_final_strings(evalTrie, gatestring_list, 0)
+
+        #see if there are superfluous tree nodes: those with iFinal == -1 and
+        self.myFinalToParentFinalMap = None #this tree has no "children",
+        self.parentIndexMap = None          # i.e. has not been created by a 'split'
+        self.original_index_lookup = None
+        self.subTrees = [] #no subtrees yet
+        self.eval_levels = None #computed lazily by get_evaluation_levels()
+        self.product_memo = None #kept by GateSetCalculator._compute_product_cache
+        self.split_prediction = None
+        assert(self.generate_gatestring_list() == gatestring_list)
+        assert(None not in gatestring_list)
+
+
+    def extend(self, gatestring_list):
+        """
+          Add gate strings to an (initialized and un-split) evaluation tree.
+
+          The gate strings in `gatestring_list` are appended to the tree's
+          final strings, so that the tree evaluates the strings it did
+          before, at the same final indices, followed by the new ones.  Only
+          the elements needed to compute the new strings are added to the
+          tree; existing elements keep their relative evaluation order.
+          This is much faster than initializing a new tree when
+          `gatestring_list` is short compared with the existing list of
+          strings (e.g. in iterative GST, where each iteration's list of
+          strings begins with the previous iteration's list).
+
+          Parameters
+          ----------
+          gatestring_list : list of (tuples or GateStrings)
+              The gate strings to add.
 
-        #print("DB: initial eval dict = ",evalDict)
+          Returns
+          -------
+          None
+        """
+        if self.is_split():
+            raise ValueError("Cannot extend a split EvalTree")
+        if len(self.init_indices) == 0:
+            raise ValueError("Cannot extend an EvalTree that hasn't been initialized")
+        if len(gatestring_list) == 0: return
+
+        if isinstance(gatestring_list[0],_gs.GateString):
+            gatestring_list = [gs.tup for gs in gatestring_list]
+
+        #Make room for the new final strings by shifting the indices
+        # of the non-final elements up by the number of new strings.
+        nOldFinal = self.num_final_strs; nNew = len(gatestring_list)
+        def shift(i): return i if (i is None or i < nOldFinal) else i+nNew
+        self[:] = [ (shift(iLeft),shift(iRight)) for iLeft,iRight in self[0:nOldFinal] ] + \
+            [None]*nNew + [ (shift(iLeft),shift(iRight)) for iLeft,iRight in self[nOldFinal:] ]
+        self.eval_order = [ shift(i) for i in self.eval_order ]
+        self.init_indices = [ shift(i) for i in self.init_indices ]
+        self.num_final_strs += nNew
+
+        self._add_final_strings(self._build_trie(), gatestring_list, nOldFinal)
+        self.eval_levels = None
+        self.product_memo = None
+        assert(self.generate_gatestring_list()[nOldFinal:] == gatestring_list)
+
+
+    def _build_trie(self):
+        """
+        Build the trie of the strings evaluated by this (un-split) tree,
+        as described in `initialize`, from the tree's elements.
+        """
+        evalTrie = [None, {}]
+        gateStrings = [None]*len(self) #the gate string computed by each element
+        nodes = [None]*len(self) #the trie node of each element
+
+        for i,gateLabel in zip(self.init_indices, self.gateLabels):
+            if gateLabel == "": #special case of empty label == no gate
+                gateStrings[i] = (); nodes[i] = evalTrie
+            else:
+                gateStrings[i] = (gateLabel,)
+                nodes[i] = evalTrie[1].setdefault(gateLabel, [None, {}])
+            nodes[i][0] = i
+
+        for i in self.eval_order:
+            iLeft, iRight = self[i]
+            node = nodes[iLeft]
+            for gateLabel in gateStrings[iRight]:
+                node = node[1].setdefault(gateLabel, [None, {}])
+            if node[0] is None: node[0] = i # (else i is a duplicate final string)
+            nodes[i] = node
+            gateStrings[i] = gateStrings[iLeft] + gateStrings[iRight]
+        return evalTrie
+
+
+    def _add_final_strings(self, evalTrie, gatestring_list, iFirstFinal):
+        """
+        Add the elements needed to compute the gate strings in
+        `gatestring_list`, which become the final strings with indices
+        `iFirstFinal` through `iFirstFinal+len(gatestring_list)-1`.  These
+        elements must already exist (as None, or as initial elements).
+        `evalTrie` is the trie of the strings already evaluated by this
+        tree (see `initialize`), and is updated.
+        """
+        iEmptyStr = evalTrie[0] # None unless the empty string is in the tree
 
         #Process gatestrings in order of length, so that we always place short strings
         # in the right place (otherwise assert stmt below can fail)
@@ -122,81 +242,157 @@ class EvalTree(list):
             sorted(list(range(len(gatestring_list))),
                    key=lambda i: len(gatestring_list[i]))
 
-        #avgBiteSize = 0
-        #useCounts = {}
         #OLD (sequential): for (k,gateString) in enumerate(gatestring_list):
         for k in indices_sorted_by_gatestring_len:
             gateString = gatestring_list[k]
+            iFinal = iFirstFinal + k
             L = len(gateString)
             if L == 0:
-                iEmptyStr = evalDict.get( (), None)
                 assert(iEmptyStr is not None) # duplicate () final strs require
-                if k != iEmptyStr:
-                    assert(self[k] is None)       # the empty string to be included in the tree too!
-                    self[k] = (iEmptyStr, iEmptyStr) # compute the duplicate () using by
-                    self.eval_order.append(k)        #  multiplying by the empty string.
+                if iFinal != iEmptyStr:
+                    assert(self[iFinal] is None)  # the empty string to be included in the tree too!
+                    self[iFinal] = (iEmptyStr, iEmptyStr) # compute the duplicate () using by
+                    self.eval_order.append(iFinal)   #  multiplying by the empty string.
 
-            start = 0; bite = 1
-            #nBites = 0
-            #print("\nDB: string = ",gateString, "(len=%d)" % len(gateString))
+            start = 0
+            curNode = None #trie node of gateString[0:start]
 
             while start < L:
 
-                #Take a bite out of gateString, starting at `start` that is in evalDict
-                for b in range(L-start,0,-1):
-                    if gateString[start:start+b] in evalDict:
-                        bite = b; break
-                else: assert(False) #Logic error - loop above should always exit when b == 1
+                #Take the longest bite out of gateString, starting at `start`, that is in the trie
+                node = evalTrie; bite = 0; biteNode = None
+                for j in range(start,L):
+                    node = node[1].get(gateString[j],None)
+                    if node is None: break
+                    if node[0] is not None:
+                        bite = j+1-start; biteNode = node
+                assert(bite > 0) #Logic error - all single gates should be in the trie
+
+                #If gateString[start:] begins with a longer run of a repeated
+                # germ, bite off the whole run instead, computing it as a power
+                # of the germ.  (When the run is all of gateString, it is
+                # computed directly at location iFinal.)
+                if MIN_POWER_REPS is not None:
+                    period, reps = _find_repeated_run(gateString, start, MIN_POWER_REPS)
+                    if period*reps > bite:
+                        bite = period*reps
+                        biteNode = self._add_power(evalTrie, gateString[start:start+period], reps,
+                                                   iFinal if (start == 0 and bite == L) else None)
 
-                #iInFinal = k if bool(start + bite == L) else -1
                 bFinal = bool(start + bite == L)
-                #print("DB: start=",start,": found ",gateString[start:start+bite],
-                #      " (len=%d) in evalDict" % bite, "(final=%s)" % bFinal)
 
-                if start == 0: #first in-evalDict bite - no need to add anything to self yet
-                    iCur = evalDict[ gateString[0:bite] ]
-                    #print("DB: taking bite: ", gateString[0:bite], "indx = ",iCur)
+                if start == 0: #first in-trie bite - no need to add anything to self yet
+                    iCur = biteNode[0]; curNode = biteNode
                     if bFinal:
-                        if iCur != k:  #then we have a duplicate final gate string
-                            iEmptyStr = evalDict.get( (), None)
+                        if iCur != iFinal:  #then we have a duplicate final gate string
                             assert(iEmptyStr is not None) # duplicate final strs require
                                       # the empty string to be included in the tree too!
-                            assert(self[k] is None) #make sure we haven't put anything here yet
-                            self[k] = (iCur, iEmptyStr) # compute the duplicate using by                             
-                            self.eval_order.append(k)   #  multiplying by the empty string.
+                            assert(self[iFinal] is None) #make sure we haven't put anything here yet
+                            self[iFinal] = (iCur, iEmptyStr) # compute the duplicate using by
+                            self.eval_order.append(iFinal) #  multiplying by the empty string.
                 else:
-                    # add (iCur, iBite)
-                    assert(gateString[0:start+bite] not in evalDict)
-                    iBite = evalDict[ gateString[start:start+bite] ]
-                    if bFinal: #place (iCur, iBite) at location k
-                        iNew = k
-                        evalDict[ gateString[0:start+bite] ] = iNew
+                    # add (iCur, iBite), extending the trie from the node of gateString[0:start]
+                    for j in range(start,start+bite):
+                        curNode = curNode[1].setdefault(gateString[j], [None, {}])
+                    assert(curNode[0] is None) # gateString[0:start+bite] not yet evaluated
+                    iBite = biteNode[0]
+                    if bFinal: #place (iCur, iBite) at location iFinal
+                        iNew = iFinal
                         assert(self[iNew] is None) #make sure we haven't put anything here yet
-                        self[k] = (iCur, iBite)
+                        self[iFinal] = (iCur, iBite)
                     else:
                         iNew = len(self)
-                        evalDict[ gateString[0:start+bite] ] = iNew
                         self.append( (iCur,iBite) )
+                    curNode[0] = iNew
 
-                    #print("DB: add %s (index %d)" % (str(gateString[0:start+bite]),iNew))
                     self.eval_order.append(iNew)
                     iCur = iNew
                 start += bite
-                #nBites += 1
 
-            #if nBites > 0: avgBiteSize += L / float(nBites)
-            assert(k in self.eval_order or k in self.init_indices)
-        
-        #avgBiteSize /= float(len(gatestring_list))
-        #print "DEBUG: Avg bite size = ",avgBiteSize
+            assert(self[iFinal] is not None) # iFinal is in eval_order or init_indices
 
-        #see if there are superfluous tree nodes: those with iFinal == -1 and
-        self.myFinalToParentFinalMap = None #this tree has no "children",
-        self.parentIndexMap = None          # i.e. has not been created by a 'split'
-        self.original_index_lookup = None
-        self.subTrees = [] #no subtrees yet
-        assert(self.generate_gatestring_list() == gatestring_list)
-        assert(None not in gatestring_list)
+
+    def _add_string(self, evalTrie, gateString):
+        """
+        Add the (non-final) elements needed to compute `gateString` and
+        return its trie node (see `initialize`).  Like the final strings,
+        `gateString` is built by taking the longest evaluated bites out of
+        it, from left to right.
+        """
+        curNode = None #trie node of gateString[0:start]
+        start = 0; L = len(gateString)
+        while start < L:
+            node = evalTrie; bite = 0; biteNode = None
+            for j in range(start,L):
+                node = node[1].get(gateString[j],None)
+                if node is None: break
+                if node[0] is not None:
+                    bite = j+1-start; biteNode = node
+            assert(bite > 0) #Logic error - all single gates should be in the trie
+
+            if MIN_POWER_REPS is not None:
+                period, reps = _find_repeated_run(gateString, start, MIN_POWER_REPS)
+                if period*reps > bite:
+                    bite = period*reps
+                    biteNode = self._add_power(evalTrie, gateString[start:start+period], reps)
+
+            if start == 0: curNode = biteNode
+            else: curNode = self._add_product(curNode, biteNode, gateString[start:start+bite])
+            start += bite
+        return curNode
+
+
+    def _add_power(self, evalTrie, germ, reps, iDest=None):
+        """
+        Add the elements needed to compute `germ` repeated `reps` times by
+        repeated squaring, and return the trie node of the resulting string.
+        The elements germ^2, germ^4, ... are computed as the squares of the
+        preceding ones and multiplied together according to the binary
+        representation of `reps`, so only O(log(reps)) elements are added.
+        If `iDest` is not None, the final product is placed at index `iDest`
+        (which must not be filled yet) rather than appended.
+        """
+        bits = [ j for j in range(reps.bit_length()) if (reps >> j) & 1 ]
+        J = bits[-1] # germ^(2^J) is the largest power needed
+
+        powerNodes = [ self._add_string(evalTrie, germ) ] # trie nodes of germ^(2^j)
+        powerStrs = [ germ ]
+        for j in range(1,J+1):
+            iSquareDest = iDest if (j == J and len(bits) == 1) else None
+            powerNodes.append( self._add_product(powerNodes[-1], powerNodes[-1],
+                                                 powerStrs[-1], iSquareDest) )
+            powerStrs.append( powerStrs[-1] + powerStrs[-1] )
+
+        node = powerNodes[J]
+        for k,j in enumerate(reversed(bits[:-1])):
+            iProdDest = iDest if (k == len(bits)-2) else None
+            node = self._add_product(node, powerNodes[j], powerStrs[j], iProdDest)
+        return node
+
+
+    def _add_product(self, leftNode, rightNode, rightStr, iDest=None):
+        """
+        Add an element computing the product of the (evaluated) strings with
+        trie nodes `leftNode` and `rightNode`, where `rightStr` is the latter
+        string, unless this product has already been evaluated.  The element
+        is placed at index `iDest` if it is not None, and is appended to the
+        tree otherwise.  Returns the trie node of the product.
+        """
+        node = leftNode
+        for gateLabel in rightStr:
+            node = node[1].setdefault(gateLabel, [None, {}])
+        if node[0] is None:
+            if iDest is None:
+                iDest = len(self)
+                self.append( (leftNode[0],rightNode[0]) )
+            else:
+                assert(self[iDest] is None) #make sure we haven't put anything here yet
+                self[iDest] = (leftNode[0],rightNode[0])
+            node[0] = iDest
+            self.eval_order.append(iDest)
+        else:
+            assert(iDest is None or node[0] == iDest)
+        return node
 
 
     def copy(self):
@@ -212,8 +408,91 @@ class EvalTree(list):
         newTree.subTrees = [ st.copy() for st in self.subTrees ]
         newTree.original_index_lookup = self.original_index_lookup[:] \
             if (self.original_index_lookup is not None) else None
+        newTree.split_prediction = self.split_prediction
         return newTree
 
+    def save(self, dirname):
+        """
+        Save this evaluation tree (and its sub-trees, if it is split) to a
+        directory, which is created if it doesn't exist.
+
+        The tree's elements and evaluation order are saved as `.npy` array
+        files, which are much faster to read back than pickled lists.
+
+        Parameters
+        ----------
+        dirname : str
+            The directory to save to.
+
+        Returns
+        -------
+        None
+        """
+        if not _os.path.isdir(dirname): _os.makedirs(dirname)
+
+        #None (for initial elements) is saved as -1
+        nodes = _np.array([ (-1,-1) if (iLeft is None) else (iLeft,iRight)
+                            for iLeft,iRight in self ], _np.int64).reshape(len(self),2)
+        _np.save(_os.path.join(dirname,"nodes.npy"), nodes)
+        _np.save(_os.path.join(dirname,"evalorder.npy"),
+                 _np.array(self.eval_order, _np.int64))
+
+        info = { 'gateLabels': list(self.gateLabels),
+                 'init_indices': list(self.init_indices),
+                 'num_final_strs': self.num_final_strs,
+                 'myFinalToParentFinalMap': self.myFinalToParentFinalMap,
+                 'parentIndexMap': self.parentIndexMap,
+                 'original_index_lookup': self.original_index_lookup,
+                 'distribution': self.distribution,
+                 'splitPrediction': self.split_prediction,
+                 'numSubTrees': len(self.subTrees) }
+        with open(_os.path.join(dirname,"info.pkl"),"wb") as f:
+            _pickle.dump(info, f)
+
+        for i,subTree in enumerate(self.subTrees):
+            subTree.save(_os.path.join(dirname,"subtree%d" % i))
+
+
+    def load(self, dirname):
+        """
+        Load an evaluation tree saved by :meth:`save`, replacing any
+        current contents of this tree.
+
+        Parameters
+        ----------
+        dirname : str
+            The directory to load from.
+
+        Returns
+        -------
+        None
+        """
+        with open(_os.path.join(dirname,"info.pkl"),"rb") as f:
+            info = _pickle.load(f)
+        nodes = _np.load(_os.path.join(dirname,"nodes.npy"))
+        evalOrder = _np.load(_os.path.join(dirname,"evalorder.npy"))
+
+        self[:] = [ (None,None) if (iLeft < 0) else (iLeft,iRight)
+                    for iLeft,iRight in nodes.tolist() ]
+        self.eval_order = evalOrder.tolist()
+        self.gateLabels = info['gateLabels']
+        self.init_indices = info['init_indices']
+        self.num_final_strs = info['num_final_strs']
+        self.myFinalToParentFinalMap = info['myFinalToParentFinalMap']
+        self.parentIndexMap = info['parentIndexMap']
+        self.original_index_lookup = info['original_index_lookup']
+        self.distribution = info['distribution']
+        self.split_prediction = info.get('splitPrediction',None)
+        self.eval_levels = None
+        self.product_memo = None
+
+        self.subTrees = []
+        for i in range(info['numSubTrees']):
+            subTree = EvalTree()
+            subTree.load(_os.path.join(dirname,"subtree%d" % i))
+            self.subTrees.append(subTree)
+
+
     def get_init_labels(self):
         """ Return a tuple of the gate labels (strings)
             which form the beginning of the tree.
@@ -236,6 +515,48 @@ class EvalTree(list):
         return self.eval_order
 
 
+    def get_evaluation_levels(self):
+        """
+        Return the elements of the evaluation order grouped into dependency
+        "levels".  Every element of a level is computed from the initial
+        elements and/or elements of *previous* levels only, so all the
+        elements within a level may be computed simultaneously (e.g. using
+        a single stacked matrix multiplication).
+
+        The levels are computed when first needed and cached.
+
+        Returns
+        -------
+        list
+            A list of `(indices, iLefts, iRights)` tuples of integer numpy
+            arrays, one tuple per level.  `indices` holds the tree indices
+            of the level's elements and `iLefts` and `iRights` the indices
+            of their left and right children, so that
+            `self[indices[k]] == (iLefts[k], iRights[k])`.
+        """
+        if self.eval_levels is not None:
+            return self.eval_levels
+
+        depth = {}
+        for i in self.init_indices: depth[i] = 0
+
+        levels = [] # levels[d] = list of indices at depth d+1
+        for i in self.eval_order:
+            iLeft, iRight = self[i]
+            d = max(depth[iLeft],depth[iRight]) + 1
+            depth[i] = d
+            if d > len(levels): levels.append([])
+            levels[d-1].append(i)
+
+        self.eval_levels = []
+        for lvl in levels:
+            indices = _np.array(lvl, 'i')
+            iLefts = _np.array([self[i][0] for i in lvl], 'i')
+            iRights = _np.array([self[i][1] for i in lvl], 'i')
+            self.eval_levels.append( (indices,iLefts,iRights) )
+        return self.eval_levels
+
+
     def final_view(self, a, axis=None):
         """ 
         Returns a view of array `a` restricting it to only the
@@ -530,7 +851,8 @@ class EvalTree(list):
         return max(list(map(len,singleItemTreeSetList)))
 
 
-    def split(self, maxSubTreeSize=None, numSubTrees=None, verbosity=0):
+    def split(self, maxSubTreeSize=None, numSubTrees=None, verbosity=0,
+              strategy="greedy"):
         """
         Split this tree into sub-trees in order to reduce the
           maximum size of any tree (useful for limiting memory consumption
@@ -551,6 +873,15 @@ class EvalTree(list):
         verbosity : int, optional
             How much detail to send to stdout.
 
+        strategy : {"greedy", "balanced"} or function, optional
+            How to group the tree's elements into sub-trees (see
+            `SPLIT_STRATEGIES`).  "greedy" is a fast heuristic; "balanced"
+            explicitly minimizes the cost computed by `split_cost`, giving
+            sub-trees of more even size with fewer duplicated elements.  A
+            function with the signature of `greedy_partition` may also be
+            given.  The cost of the chosen split is stored in the tree's
+            `split_prediction` attribute and reported by `print_analysis`.
+
         Returns
         -------
         None
@@ -579,188 +910,18 @@ class EvalTree(list):
         singleItemTreeSetList = self._createSingleItemTrees()
           #each element represents a subtree, and
           # is a set of the indices owned by that subtree
-        nSingleItemTrees = len(singleItemTreeSetList)
 
         printer.log("EvalTree.split created singles in %.0fs" %
                     (_time.time()-tm)); tm = _time.time()
 
         #   Part 2: determine whether we need to split/merge "single" trees
-        if numSubTrees is not None:
-
-            #Merges: find the best merges to perform if any are required
-            if nSingleItemTrees > numSubTrees:
-
-                #Find trees that have least intersection to begin:
-                # The goal is to find a set of single-item trees such that
-                # none of them intersect much with any other of them.
-                #
-                # Algorithm: 
-                #   - start with a set of the one tree that has least
-                #       intersection with any other tree.
-                #   - iteratively add the tree that has the least intersection
-                #       with the trees in the existing set
-                iStartingTrees = []
-                start_select_method = "fast"
-
-                if start_select_method == "best":
-                    availableIndices = list(range(nSingleItemTrees))
-                    i_min,_ = min( enumerate(  #index of a tree in the minimal intersection
-                            ( min((len(s1.intersection(s2)) for s2 in singleItemTreeSetList[i+1:]))
-                              for i,s1 in enumerate(singleItemTreeSetList[:-1]) )),
-                                   key=lambda x: x[1]) #argmin using generators (np.argmin doesn't work)
-                    iStartingTrees.append(i_min)
-                    startingTreeEls = singleItemTreeSetList[i_min].copy()
-                    del availableIndices[i_min]
-                                        
-                    while len(iStartingTrees) < numSubTrees:
-                        ii_min,_ = min( enumerate(
-                            ( len(startingTreeEls.intersection(singleItemTreeSetList[i])) 
-                              for i in availableIndices )), key=lambda x: x[1]) #argmin
-                        i_min = availableIndices[ii_min]
-                        iStartingTrees.append(i_min)
-                        startingTreeEls.update( singleItemTreeSetList[i_min] )
-                        del availableIndices[ii_min]
-                    
-                    printer.log("EvalTree.split found starting trees in %.0fs" %
-                                (_time.time()-tm)); tm = _time.time()
-
-                elif start_select_method == "fast":
-                    def get_start_indices(maxIntersect):
-                        starting = [0] #always start with 0th tree
-                        startingSet = singleItemTreeSetList[0].copy() 
-                        for i,s in enumerate(singleItemTreeSetList[1:],start=1):
-                            if len(startingSet.intersection(s)) <= maxIntersect:
-                                starting.append(i)
-                                startingSet.update(s)
-                        return starting,startingSet
-
-                    left,right = 0, max(map(len,singleItemTreeSetList))
-                    while left < right:
-                        mid = (left+right) // 2
-                        iStartingTrees,startingTreeEls = get_start_indices(mid)
-                        nStartingTrees = len(iStartingTrees)
-                        if nStartingTrees < numSubTrees:
-                            left = mid + 1
-                        elif nStartingTrees > numSubTrees:
-                            right = mid
-                        else: break # nStartingTrees == numSubTrees!
-
-                    if len(iStartingTrees) < numSubTrees:
-                        iStartingTrees,startingTreeEls = get_start_indices(mid+1)
-                    if len(iStartingTrees) > numSubTrees:
-                        iStartingTrees = iStartingTrees[0:numSubTrees]
-                        startingTreeEls = set()
-                        for i in iStartingTrees:
-                            startingTreeEls.update(singleItemTreeSetList[i])
-                                        
-                    printer.log("EvalTree.split fast-found starting trees in %.0fs" %
-                                (_time.time()-tm)); tm = _time.time()
-
-                else:
-                    raise ValueError("Invalid start select method: %s" % start_select_method)
-
-
-                #Merge all the non-starting trees into the starting trees
-                # so that we're left with the desired number of trees
-                subTreeSetList = [singleItemTreeSetList[i] for i in iStartingTrees]
-                assert(len(subTreeSetList) == numSubTrees)
-
-                indicesLeft = list(range(nSingleItemTrees))
-                for i in iStartingTrees:
-                    del indicesLeft[indicesLeft.index(i)]
-
-                printer.log("EvalTree.split deleted initial indices in %.0fs" %
-                            (_time.time()-tm)); tm = _time.time()
-                merge_method = "fast"
-
-                if merge_method == "best":
-                    while len(indicesLeft) > 0:
-                        iToMergeInto,_ = min(enumerate(map(len,subTreeSetList)), 
-                                             key=lambda x: x[1]) #argmin
-                        setToMergeInto = subTreeSetList[iToMergeInto]
-                        #intersectionSizes = [ len(setToMergeInto.intersection(
-                        #            singleItemTreeSetList[i])) for i in indicesLeft ]
-                        #iMaxIntsct = _np.argmax(intersectionSizes)
-                        iMaxIntsct,_ = max( enumerate( ( len(setToMergeInto.intersection(
-                                            singleItemTreeSetList[i])) for i in indicesLeft )),
-                                          key=lambda x: x[1]) #argmax
-                        setToMerge = singleItemTreeSetList[indicesLeft[iMaxIntsct]]
-                        subTreeSetList[iToMergeInto] = \
-                              subTreeSetList[iToMergeInto].union(setToMerge)
-                        del indicesLeft[iMaxIntsct]
-                        
-                elif merge_method == "fast":
-                    most_at_once = 10
-                    desiredLength = int(len(self) / numSubTrees)
-                    while len(indicesLeft) > 0:
-                        iToMergeInto,_ = min(enumerate(map(len,subTreeSetList)), 
-                                             key=lambda x: x[1]) #argmin
-                        setToMergeInto = subTreeSetList[iToMergeInto]
-                        intersectionSizes = sorted( [ (ii,len(setToMergeInto.intersection(
-                                        singleItemTreeSetList[i]))) for ii,i in enumerate(indicesLeft) ],
-                                                    key=lambda x: x[1], reverse=True)
-                        toDelete = []
-                        for i in range(min(most_at_once,len(indicesLeft))):
-                            #if len(subTreeSetList[iToMergeInto]) >= desiredLength: break
-                            iMaxIntsct,_ = intersectionSizes[i]
-                            setToMerge = singleItemTreeSetList[indicesLeft[iMaxIntsct]]
-                            subTreeSetList[iToMergeInto].update(setToMerge)
-                            toDelete.append(iMaxIntsct)
-                        for i in sorted(toDelete,reverse=True):
-                            del indicesLeft[i]
-
-                else:
-                    raise ValueError("Invalid merge method: %s" % merge_method)
-
-
-                assert(len(subTreeSetList) == numSubTrees)
-                printer.log("EvalTree.split merged trees in %.0fs" %
-                            (_time.time()-tm)); tm = _time.time()
-
-            #Splits (more subtrees desired than there are single item trees!)
-            else:
-                #Splits: find the best splits to perform
-                #TODO: how to split a tree intelligently -- for now, just do
-                # trivial splits by making empty trees.
-                subTreeSetList = singleItemTreeSetList[:]
-                nSplitsNeeded = numSubTrees - nSingleItemTrees
-                while nSplitsNeeded > 0:
-                    # LATER...
-                    # for iSubTree,subTreeSet in enumerate(subTreeSetList):
-                    subTreeSetList.append( [] ) # create empty subtree
-                    nSplitsNeeded -= 1
-
-        else:
-            assert(maxSubTreeSize is not None)
-            subTreeSetList = []
-
-            #Merges: find the best merges to perform if any are allowed given
-            # the maximum tree size
-            for singleItemTreeSet in singleItemTreeSetList:
-                if len(singleItemTreeSet) > maxSubTreeSize:
-                    raise ValueError("Max. sub tree size (%d) is too low (<%d)!"
-                                   % (maxSubTreeSize, self.get_min_tree_size()))
-
-                #See if we should merge this single-item-generated tree with
-                # another one or make it a new subtree.
-                newTreeSize = len(singleItemTreeSet)
-                maxIntersectSize = None; iMaxIntersectSize = None
-                for k,existingSubTreeSet in enumerate(subTreeSetList):
-                    mergedSize = len(existingSubTreeSet) + newTreeSize
-                    if mergedSize <= maxSubTreeSize:
-                        intersectionSize = \
-                            len(singleItemTreeSet.intersection(existingSubTreeSet))
-                        if maxIntersectSize is None or \
-                                maxIntersectSize < intersectionSize:
-                            maxIntersectSize = intersectionSize
-                            iMaxIntersectSize = k
-
-                if iMaxIntersectSize is not None:
-                    # then we merge the new tree with this existing set
-                    subTreeSetList[iMaxIntersectSize] = \
-                      subTreeSetList[iMaxIntersectSize].union(singleItemTreeSet)
-                else: # we create a new subtree
-                    subTreeSetList.append( singleItemTreeSet )
+        if callable(strategy): partition = strategy
+        elif strategy in SPLIT_STRATEGIES: partition = SPLIT_STRATEGIES[strategy]
+        else: raise ValueError("Invalid split strategy: %s" % strategy)
+        subTreeSetList = partition(singleItemTreeSetList, len(self),
+                                   maxSubTreeSize, numSubTrees, printer)
+        if numSubTrees is not None: assert(len(subTreeSetList) == numSubTrees)
+        self.split_prediction = split_cost(subTreeSetList, len(self))
 
         #TODO: improve tree efficiency via better splitting?
         #print "DEBUG TREE SPLITTING:"
@@ -841,6 +1002,8 @@ class EvalTree(list):
         assert( None not in parentIndexPerm) #all indices should be mapped somewhere!
         assert( self.original_index_lookup is None )
         self.original_index_lookup = { icur: inew for inew,icur in enumerate(parentIndexRevPerm) }
+        self.eval_levels = None # indices are about to be permuted
+        self.product_memo = None
 
         #if bDebug: print("PERM REV MAP = ", parentIndexRevPerm)
         #if bDebug: print("PERM MAP = ", parentIndexPerm)
@@ -1006,6 +1169,24 @@ class EvalTree(list):
             print("Size of original gatestring_list = %d" % self.num_final_strings())
             print("Tree is split into %d sub-trees" % len(self.subTrees))
             print("Sub-tree lengths = ", list(map(len,self.subTrees)), " (Sum = %d)" % sum(map(len,self.subTrees)))
+
+            #Load balance: predicted by the split's cost model vs. achieved
+            # by the final sub-trees and their distribution among processor groups
+            achieved = split_cost([ st.parentIndexMap for st in self.subTrees ], len(self))
+            nSubTrees = len(self.subTrees)
+            nComms = min(self.distribution.get('numSubtreeComms',1), nSubTrees)
+            groupLoads = [ sum([ len(self.subTrees[k]) for k in
+                                 _mpit.distribute_indices_base(list(range(nSubTrees)), nComms, i)[0] ])
+                           for i in range(nComms) ]
+            predicted = self.split_prediction
+            if predicted is not None:
+                print("Predicted: max sub-tree size = %d, duplicated elements = %d, balance = %.3f (cost = %g)"
+                      % (predicted['maxSize'], predicted['duplicated'], predicted['balance'], predicted['cost']))
+            print("Achieved: max sub-tree size = %d, duplicated elements = %d, balance = %.3f (cost = %g)"
+                  % (achieved['maxSize'], achieved['duplicated'], achieved['balance'], achieved['cost']))
+            print("Achieved balance among %d processor group(s) = %.3f" %
+                  (nComms, max(groupLoads) * nComms / max(sum(groupLoads),1)))
+
             for i,t in enumerate(self.subTrees):
                 print(">> sub-tree %d: " % i)
                 t.print_analysis()
@@ -1049,3 +1230,403 @@ class EvalTree(list):
                                                 'xlabel': "Index Interval", 'ylabel': 'Index' }
 
         return analysis
+
+
+def greedy_partition(singleItemTreeSetList, treeSize, maxSubTreeSize, numSubTrees, printer):
+    """
+    The default ("greedy") `EvalTree.split` strategy.
+
+    When `numSubTrees` is given, a set of starting trees with small mutual
+    intersection is chosen and the remaining single-item trees are merged
+    into the currently-smallest sub-tree they intersect most.  Otherwise
+    each single-item tree is merged into the existing sub-tree it
+    intersects most (that has room for it), or else starts a new sub-tree.
+
+    Parameters
+    ----------
+    singleItemTreeSetList : list of sets
+        The sets of tree indices needed to compute each of a disjoint
+        set of final elements (see `EvalTree.split`).
+
+    treeSize : int
+        The length of the tree being split.
+
+    maxSubTreeSize, numSubTrees : int or None
+        The constraints given to `EvalTree.split`; exactly one is not None.
+
+    printer : VerbosityPrinter
+        For logging.
+
+    Returns
+    -------
+    list
+        A list of sets (or lists) of tree indices, one per sub-tree.
+    """
+    tm = _time.time()
+    nSingleItemTrees = len(singleItemTreeSetList)
+
+    if numSubTrees is not None:
+
+        #Merges: find the best merges to perform if any are required
+        if nSingleItemTrees > numSubTrees:
+
+            #Find trees that have least intersection to begin:
+            # The goal is to find a set of single-item trees such that
+            # none of them intersect much with any other of them.
+            #
+            # Algorithm: 
+            #   - start with a set of the one tree that has least
+            #       intersection with any other tree.
+            #   - iteratively add the tree that has the least intersection
+            #       with the trees in the existing set
+            iStartingTrees = []
+            start_select_method = "fast"
+
+            if start_select_method == "best":
+                availableIndices = list(range(nSingleItemTrees))
+                i_min,_ = min( enumerate(  #index of a tree in the minimal intersection
+                        ( min((len(s1.intersection(s2)) for s2 in singleItemTreeSetList[i+1:]))
+                          for i,s1 in enumerate(singleItemTreeSetList[:-1]) )),
+                               key=lambda x: x[1]) #argmin using generators (np.argmin doesn't work)
+                iStartingTrees.append(i_min)
+                startingTreeEls = singleItemTreeSetList[i_min].copy()
+                del availableIndices[i_min]
+
+                while len(iStartingTrees) < numSubTrees:
+                    ii_min,_ = min( enumerate(
+                        ( len(startingTreeEls.intersection(singleItemTreeSetList[i])) 
+                          for i in availableIndices )), key=lambda x: x[1]) #argmin
+                    i_min = availableIndices[ii_min]
+                    iStartingTrees.append(i_min)
+                    startingTreeEls.update( singleItemTreeSetList[i_min] )
+                    del availableIndices[ii_min]
+
+                printer.log("EvalTree.split found starting trees in %.0fs" %
+                            (_time.time()-tm)); tm = _time.time()
+
+            elif start_select_method == "fast":
+                def get_start_indices(maxIntersect):
+                    starting = [0] #always start with 0th tree
+                    startingSet = singleItemTreeSetList[0].copy() 
+                    for i,s in enumerate(singleItemTreeSetList[1:],start=1):
+                        if len(startingSet.intersection(s)) <= maxIntersect:
+                            starting.append(i)
+                            startingSet.update(s)
+                    return starting,startingSet
+
+                left,right = 0, max(map(len,singleItemTreeSetList))
+                while left < right:
+                    mid = (left+right) // 2
+                    iStartingTrees,startingTreeEls = get_start_indices(mid)
+                    nStartingTrees = len(iStartingTrees)
+                    if nStartingTrees < numSubTrees:
+                        left = mid + 1
+                    elif nStartingTrees > numSubTrees:
+                        right = mid
+                    else: break # nStartingTrees == numSubTrees!
+
+                if len(iStartingTrees) < numSubTrees:
+                    iStartingTrees,startingTreeEls = get_start_indices(mid+1)
+                if len(iStartingTrees) > numSubTrees:
+                    iStartingTrees = iStartingTrees[0:numSubTrees]
+                    startingTreeEls = set()
+                    for i in iStartingTrees:
+                        startingTreeEls.update(singleItemTreeSetList[i])
+
+                printer.log("EvalTree.split fast-found starting trees in %.0fs" %
+                            (_time.time()-tm)); tm = _time.time()
+
+            else:
+                raise ValueError("Invalid start select method: %s" % start_select_method)
+
+
+            #Merge all the non-starting trees into the starting trees
+            # so that we're left with the desired number of trees
+            subTreeSetList = [singleItemTreeSetList[i] for i in iStartingTrees]
+            assert(len(subTreeSetList) == numSubTrees)
+
+            indicesLeft = list(range(nSingleItemTrees))
+            for i in iStartingTrees:
+                del indicesLeft[indicesLeft.index(i)]
+
+            printer.log("EvalTree.split deleted initial indices in %.0fs" %
+                        (_time.time()-tm)); tm = _time.time()
+            merge_method = "fast"
+
+            if merge_method == "best":
+                while len(indicesLeft) > 0:
+                    iToMergeInto,_ = min(enumerate(map(len,subTreeSetList)), 
+                                         key=lambda x: x[1]) #argmin
+                    setToMergeInto = subTreeSetList[iToMergeInto]
+                    #intersectionSizes = [ len(setToMergeInto.intersection(
+                    #            singleItemTreeSetList[i])) for i in indicesLeft ]
+                    #iMaxIntsct = _np.argmax(intersectionSizes)
+                    iMaxIntsct,_ = max( enumerate( ( len(setToMergeInto.intersection(
+                                        singleItemTreeSetList[i])) for i in indicesLeft )),
+                                      key=lambda x: x[1]) #argmax
+                    setToMerge = singleItemTreeSetList[indicesLeft[iMaxIntsct]]
+                    subTreeSetList[iToMergeInto] = \
+                          subTreeSetList[iToMergeInto].union(setToMerge)
+                    del indicesLeft[iMaxIntsct]
+
+            elif merge_method == "fast":
+                most_at_once = 10
+                desiredLength = int(treeSize / numSubTrees)
+                while len(indicesLeft) > 0:
+                    iToMergeInto,_ = min(enumerate(map(len,subTreeSetList)), 
+                                         key=lambda x: x[1]) #argmin
+                    setToMergeInto = subTreeSetList[iToMergeInto]
+                    intersectionSizes = sorted( [ (ii,len(setToMergeInto.intersection(
+                                    singleItemTreeSetList[i]))) for ii,i in enumerate(indicesLeft) ],
+                                                key=lambda x: x[1], reverse=True)
+                    toDelete = []
+                    for i in range(min(most_at_once,len(indicesLeft))):
+                        #if len(subTreeSetList[iToMergeInto]) >= desiredLength: break
+                        iMaxIntsct,_ = intersectionSizes[i]
+                        setToMerge = singleItemTreeSetList[indicesLeft[iMaxIntsct]]
+                        subTreeSetList[iToMergeInto].update(setToMerge)
+                        toDelete.append(iMaxIntsct)
+                    for i in sorted(toDelete,reverse=True):
+                        del indicesLeft[i]
+
+            else:
+                raise ValueError("Invalid merge method: %s" % merge_method)
+
+
+            assert(len(subTreeSetList) == numSubTrees)
+            printer.log("EvalTree.split merged trees in %.0fs" %
+                        (_time.time()-tm)); tm = _time.time()
+
+        #Splits (more subtrees desired than there are single item trees!)
+        else:
+            #Splits: find the best splits to perform
+            #TODO: how to split a tree intelligently -- for now, just do
+            # trivial splits by making empty trees.
+            subTreeSetList = singleItemTreeSetList[:]
+            nSplitsNeeded = numSubTrees - nSingleItemTrees
+            while nSplitsNeeded > 0:
+                # LATER...
+                # for iSubTree,subTreeSet in enumerate(subTreeSetList):
+                subTreeSetList.append( [] ) # create empty subtree
+                nSplitsNeeded -= 1
+
+    else:
+        assert(maxSubTreeSize is not None)
+        subTreeSetList = []
+
+        #Merges: find the best merges to perform if any are allowed given
+        # the maximum tree size
+        for singleItemTreeSet in singleItemTreeSetList:
+            if len(singleItemTreeSet) > maxSubTreeSize:
+                raise ValueError("Max. sub tree size (%d) is too low (<%d)!"
+                               % (maxSubTreeSize, max(map(len,singleItemTreeSetList))))
+
+            #See if we should merge this single-item-generated tree with
+            # another one or make it a new subtree.
+            newTreeSize = len(singleItemTreeSet)
+            maxIntersectSize = None; iMaxIntersectSize = None
+            for k,existingSubTreeSet in enumerate(subTreeSetList):
+                mergedSize = len(existingSubTreeSet) + newTreeSize
+                if mergedSize <= maxSubTreeSize:
+                    intersectionSize = \
+                        len(singleItemTreeSet.intersection(existingSubTreeSet))
+                    if maxIntersectSize is None or \
+                            maxIntersectSize < intersectionSize:
+                        maxIntersectSize = intersectionSize
+                        iMaxIntersectSize = k
+
+            if iMaxIntersectSize is not None:
+                # then we merge the new tree with this existing set
+                subTreeSetList[iMaxIntersectSize] = \
+                  subTreeSetList[iMaxIntersectSize].union(singleItemTreeSet)
+            else: # we create a new subtree
+                subTreeSetList.append( singleItemTreeSet )
+
+    return subTreeSetList
+
+
+def split_cost(subTreeSetList, treeSize):
+    """
+    The cost model used to assess (and, by the "balanced" strategy, to
+    choose) a split of an evaluation tree.
+
+    Each sub-tree is computed independently - in parallel by different
+    processor groups, or one after another to save memory - so the time
+    and memory needed are set by the largest sub-tree, while elements
+    needed by (and so duplicated in) several sub-trees are wasted work.
+    The scalar cost is the maximum sub-tree size plus the number of
+    duplicated elements per sub-tree.
+
+    Parameters
+    ----------
+    subTreeSetList : list
+        A list of sets (or lists) of the parent-tree indices in each
+        sub-tree.
+
+    treeSize : int
+        The length of the parent (un-split) tree.
+
+    Returns
+    -------
+    dict
+        With keys 'sizes' (the sub-tree sizes), 'maxSize', 'duplicated'
+        (the number of elements computed by more than one sub-tree beyond
+        the first), 'balance' (the maximum over the mean sub-tree size, so
+        1.0 is perfect balance) and 'cost'.
+    """
+    sizes = [ len(s) for s in subTreeSetList ]
+    nSubTrees = max(len(sizes),1)
+    maxSize = max(sizes) if len(sizes) > 0 else 0
+    nUnique = len(set().union(*subTreeSetList)) if len(sizes) > 0 else 0
+    duplicated = sum(sizes) - nUnique
+    meanSize = sum(sizes) / nSubTrees
+    return { 'sizes': sizes, 'maxSize': maxSize, 'duplicated': duplicated,
+             'balance': maxSize / meanSize if meanSize > 0 else 1.0,
+             'cost': maxSize + duplicated / nSubTrees }
+
+
+def balanced_partition(singleItemTreeSetList, treeSize, maxSubTreeSize, numSubTrees, printer):
+    """
+    The "balanced" `EvalTree.split` strategy, which minimizes the cost
+    given by `split_cost`.
+
+    Single-item trees are assigned, largest first, to the sub-tree that
+    they enlarge least without increasing the maximum sub-tree size (when
+    possible), so that intersecting trees are grouped together.  This
+    assignment is then refined by moving single-item trees between
+    sub-trees whenever this lowers the cost.  When `maxSubTreeSize` is
+    given, the number of sub-trees is found by bisection as the fewest for
+    which this assignment satisfies it.
+
+    Parameters
+    ----------
+    See `greedy_partition`.
+
+    Returns
+    -------
+    list
+        A list of sets of tree indices, one per sub-tree.
+    """
+    tm = _time.time()
+    if numSubTrees is not None:
+        subTreeSetList = _balanced_assignment(singleItemTreeSetList, numSubTrees)
+    else:
+        minSize = max(map(len,singleItemTreeSetList))
+        if minSize > maxSubTreeSize:
+            raise ValueError("Max. sub tree size (%d) is too low (<%d)!"
+                             % (maxSubTreeSize, minSize))
+
+        def assign(n): # an assignment to n sub-trees, or None if it exceeds maxSubTreeSize
+            subTreeSetList = _balanced_assignment(singleItemTreeSetList, n, maxSubTreeSize)
+            return subTreeSetList if max(map(len,subTreeSetList)) <= maxSubTreeSize else None
+
+        #Bisect for the fewest sub-trees that satisfy maxSubTreeSize, starting from
+        # the lower bound given by treeSize (one sub-tree per single-item tree always works)
+        nMax = len(singleItemTreeSetList)
+        lo = min(max( (treeSize + maxSubTreeSize - 1) // maxSubTreeSize, 1), nMax) - 1 # lo fails (or is 0)
+        hi = lo+1; subTreeSetList = assign(hi)
+        while subTreeSetList is None: # find a working hi by doubling
+            if hi >= nMax: raise ValueError("Could not split tree into sub-trees" +
+                                            " of size <= %d!" % maxSubTreeSize)
+            lo = hi; hi = min(2*hi, nMax)
+            subTreeSetList = assign(hi)
+        while hi - lo > 1:
+            mid = (lo + hi) // 2
+            midSetList = assign(mid)
+            if midSetList is None: lo = mid
+            else: hi, subTreeSetList = mid, midSetList
+        subTreeSetList = [ s for s in subTreeSetList if len(s) > 0 ]
+
+    printer.log("EvalTree.split balanced-partitioned into %d trees in %.0fs" %
+                (len(subTreeSetList), _time.time()-tm))
+    return subTreeSetList
+
+
+def _balanced_assignment(singleItemTreeSetList, nSubTrees, maxSubTreeSize=None, maxPasses=10):
+    """
+    Assign single-item trees to `nSubTrees` sub-trees for
+    `balanced_partition`, returning a list of the sub-trees' index sets.
+    """
+    nUnique = len(set().union(*singleItemTreeSetList))
+    counts = [ {} for i in range(nSubTrees) ] # counts[b][k] = # of b's items containing index k
+    owner = [None]*len(singleItemTreeSetList)
+
+    def cost(sizes): # see split_cost
+        return max(sizes) + (sum(sizes) - nUnique) / nSubTrees
+
+    def add(i,b):
+        for k in singleItemTreeSetList[i]:
+            counts[b][k] = counts[b].get(k,0) + 1
+        owner[i] = b
+
+    def remove(i,b):
+        for k in singleItemTreeSetList[i]:
+            if counts[b][k] == 1: del counts[b][k]
+            else: counts[b][k] -= 1
+
+    #Initial assignment: largest single-item trees first
+    curMax = 0
+    for i in sorted(range(len(singleItemTreeSetList)),
+                    key=lambda i: len(singleItemTreeSetList[i]), reverse=True):
+        s = singleItemTreeSetList[i]
+        best = None
+        for b in range(nSubTrees):
+            nAdded = sum([ 1 for k in s if k not in counts[b] ])
+            newSize = len(counts[b]) + nAdded
+            bFits = bool(maxSubTreeSize is None or newSize <= maxSubTreeSize)
+            key = (not bFits, max(curMax,newSize), nAdded, newSize)
+            if best is None or key < best[0]: best = (key,b)
+        b = best[1]
+        add(i,b)
+        curMax = max(curMax, len(counts[b]))
+
+    #Refinement: move single-item trees between sub-trees while this lowers the cost
+    for iPass in range(maxPasses):
+        bImproved = False
+        for i,s in enumerate(singleItemTreeSetList):
+            a = owner[i]
+            sizes = [ len(c) for c in counts ]
+            curCost = cost(sizes)
+            nRemoved = sum([ 1 for k in s if counts[a][k] == 1 ])
+            best = None
+            for b in range(nSubTrees):
+                if b == a: continue
+                nAdded = sum([ 1 for k in s if k not in counts[b] ])
+                if maxSubTreeSize is not None and sizes[b] + nAdded > maxSubTreeSize: continue
+                newSizes = sizes[:]
+                newSizes[a] -= nRemoved; newSizes[b] += nAdded
+                newCost = cost(newSizes)
+                if newCost < curCost - 1e-9 and (best is None or newCost < best[0]):
+                    best = (newCost,b)
+            if best is not None:
+                remove(i,a); add(i,best[1])
+                bImproved = True
+        if not bImproved: break
+
+    return [ set(c.keys()) for c in counts ]
+
+
+def _find_repeated_run(gateString, start, minReps):
+    """
+    Find the run of consecutive repetitions of a germ at the beginning of
+    `gateString[start:]` which covers the most gates, considering only runs
+    of at least `minReps` repetitions.  Returns a `(period, reps)` tuple
+    giving the germ length and number of repetitions, or `(0,0)` if there is
+    no such run.
+    """
+    L = len(gateString)
+    bestPeriod, bestReps = 0, 0
+    for period in range(1, (L-start)//minReps + 1):
+        if bestPeriod > 0 and period % bestPeriod == 0: continue # can't do better
+        if gateString[start+period] != gateString[start]: continue
+        j = start + period
+        while j < L and gateString[j] == gateString[j-period]: j += 1
+        reps = (j-start) // period
+        if reps >= minReps and period*reps > bestPeriod*bestReps:
+            bestPeriod, bestReps = period, reps
+    return bestPeriod, bestReps
+
+
+#: The named strategies available to `EvalTree.split`
+SPLIT_STRATEGIES = { "greedy": greedy_partition,
+                     "balanced": balanced_partition }
@@ -0,0 +1,179 @@
+from __future__ import division, print_function, absolute_import, unicode_literals
+#*****************************************************************
+#    pyGSTi 0.9:  Copyright 2015 Sandia Corporation
+#    This Software is released under the GPL license detailed
+#    in the file "license.txt" in the top-level pyGSTi directory
+#*****************************************************************
+""" Defines the EvalTreeCache class, an on-disk cache of evaluation trees. """
+
+import os as _os
+import shutil as _shutil
+import hashlib as _hashlib
+import pickle as _pickle
+
+from .evaltree import EvalTree as _EvalTree
+from . import memorymodel as _memorymodel
+
+
+class EvalTreeCache(object):
+    """
+    A persistent, on-disk cache of evaluation trees.
+
+    Each cached tree, along with its split and distribution information and
+    the parameter-block size it was created with, is stored in a
+    sub-directory of the cache directory named by a hash of everything that
+    determines the tree (see :meth:`get_key`).  Because trees are addressed
+    by content, a cache directory can be shared by separate runs (e.g.
+    repeated analyses of the same experiment design) which then re-use
+    each other's trees instead of re-building them.
+    """
+
+    def __init__(self, directory):
+        """
+        Create a new EvalTreeCache.
+
+        Parameters
+        ----------
+        directory : str
+            The directory holding the cached trees.  It is created if it
+            doesn't already exist.
+        """
+        self.directory = directory
+        if not _os.path.isdir(directory): _os.makedirs(directory)
+
+    def get_key(self, gatestring_list, gateset, memLimit=None, comm=None,
+                distributeMethod="gatestrings", subcalls=[]):
+        """
+        Get the key of the tree created by calling
+        `gateset.bulk_evaltree_from_resources` with the given arguments.
+
+        Parameters
+        ----------
+        gatestring_list : list of (tuples or GateStrings)
+            The gate strings of the tree.
+
+        gateset : GateSet
+            The gate set.  Its gate labels, number of parameters, dimension,
+            number of SPAM labels and cache precision (which together
+            determine the tree's memory requirements) are part of the key.
+
+        memLimit : int, optional
+            The memory limit used when creating the tree.  When not None,
+            the coefficients of the memory model used to split the tree
+            (`memorymodel.default_model`) are also part of the key.
+
+        comm : mpi4py.MPI.Comm, optional
+            The communicator used when creating the tree (only its size is
+            part of the key).
+
+        distributeMethod : str, optional
+            The distribution method used when creating the tree.
+
+        subcalls : list, optional
+            The names of the GateSet functions the tree is created for.
+
+        Returns
+        -------
+        str
+        """
+        nprocs = 1 if comm is None else comm.Get_size()
+        header = [ "\t".join(gateset.gates.keys()),
+                   repr(memLimit), repr(nprocs), str(distributeMethod),
+                   ",".join(subcalls), repr(gateset.num_params()),
+                   repr(gateset.get_dimension()),
+                   repr(len(gateset.get_spam_labels())),
+                   gateset.cache_precision ]
+        if memLimit is not None: #the split depends on the memory model
+            header.append( repr(sorted([ (fn,sorted(c.items())) for fn,c in
+                                         _memorymodel.default_model.coeffs.items() ])) )
+
+        sha = _hashlib.sha1()
+        sha.update(("\n".join(header) + "\n\n").encode('utf-8'))
+        for gateString in gatestring_list:
+            sha.update(("\t".join(gateString) + "\n").encode('utf-8'))
+        return sha.hexdigest()
+
+    def _path(self, key):
+        return _os.path.join(self.directory, key)
+
+    def __contains__(self, key):
+        return _os.path.isdir(self._path(key))
+
+    def get(self, key, comm=None):
+        """
+        Load a cached tree.
+
+        Parameters
+        ----------
+        key : str
+            The tree's key, from :meth:`get_key`.
+
+        comm : mpi4py.MPI.Comm, optional
+            When not None, the root processor of `comm` determines whether
+            the tree is cached, so that all the processors agree.
+
+        Returns
+        -------
+        evt : EvalTree or None
+            The tree, or None if it isn't in the cache.
+        paramBlockSize : int or None
+            The parameter-block size stored with the tree.
+        """
+        bFound = key in self
+        if comm is not None:
+            bFound = comm.bcast(bFound, root=0)
+        if not bFound: return None, None
+
+        path = self._path(key)
+        evt = _EvalTree()
+        evt.load(_os.path.join(path,"tree"))
+        with open(_os.path.join(path,"params.pkl"),"rb") as f:
+            paramBlockSize = _pickle.load(f)['paramBlockSize']
+        return evt, paramBlockSize
+
+    def put(self, key, evt, paramBlockSize=None, comm=None):
+        """
+        Add a tree to the cache (if it isn't already cached).
+
+        The tree is written to a temporary directory that is renamed once
+        complete, so that other processes never see a partially written
+        tree.
+
+        Parameters
+        ----------
+        key : str
+            The tree's key, from :meth:`get_key`.
+
+        evt : EvalTree
+            The tree.
+
+        paramBlockSize : int, optional
+            A parameter-block size to store with the tree.
+
+        comm : mpi4py.MPI.Comm, optional
+            When not None, only the root processor of `comm` writes the tree.
+
+        Returns
+        -------
+        None
+        """
+        if comm is not None and comm.Get_rank() != 0: return
+        if key in self: return
+
+        tmpPath = self._path(key) + ".tmp%d" % _os.getpid()
+        evt.save(_os.path.join(tmpPath,"tree"))
+        with open(_os.path.join(tmpPath,"params.pkl"),"wb") as f:
+            _pickle.dump({'paramBlockSize': paramBlockSize}, f)
+
+        try:
+            _os.rename(tmpPath, self._path(key))
+        except OSError: # another process cached the same tree first
+            _shutil.rmtree(tmpPath, ignore_errors=True)
+
+    def clear(self):
+        """ Remove all the trees from the cache. """
+        for name in _os.listdir(self.directory):
+            path = _os.path.join(self.directory, name)
+            if _os.path.isdir(path) and _os.path.isfile(
+                    _os.path.join(path,"params.pkl")):
+                _shutil.rmtree(path, ignore_errors=True)
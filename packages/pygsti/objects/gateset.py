@@ -20,10 +20,12 @@ from ..tools import likelihoodfns as _lf
 from ..tools import jamiolkowski as _jt
 
 from . import evaltree as _evaltree
+from . import compactevaltree as _compactevaltree
 from . import gate as _gate
 from . import spamvec as _sv
 from . import labeldicts as _ld
 from . import gscalc as _gscalc
+from . import memorymodel as _memorymodel
 from . import gaugegroup as _gg
 
 from .verbosityprinter import VerbosityPrinter
@@ -109,6 +111,7 @@ class GateSet(object):
         self._remainderlabel = remainder_label
         self._identitylabel = identity_label
         self._default_gauge_group = None
+        self._cache_precision = "double"
 
         super(GateSet, self).__init__()
 
@@ -146,6 +149,24 @@ class GateSet(object):
     def default_gauge_group(self, value):
         self._default_gauge_group = value
 
+    @property
+    def cache_precision(self):
+        """
+        The floating point precision, "double" (the default) or "single",
+        of the product and derivative caches used by this GateSet's bulk
+        computation routines (and assumed by bulk_evaltree_from_resources).
+        Single precision halves the memory and bandwidth these caches
+        require, and is usually accurate enough for the early iterations
+        of an iterative GST optimization.
+        """
+        return self._cache_precision
+
+    @cache_precision.setter
+    def cache_precision(self, value):
+        if value not in _gscalc.CACHE_DTYPES:
+            raise ValueError("Invalid cache precision: %s" % value)
+        self._cache_precision = value
+
 
     @property
     def dim(self):
@@ -486,6 +507,8 @@ class GateSet(object):
 
     def __setstate__(self, stateDict):
         self.__dict__.update(stateDict)
+        if '_cache_precision' not in stateDict: #backward compatibility
+            self._cache_precision = "double"
         #Additionally, must re-connect this gateset as the parent
         # of relevant OrderedDict-derived classes, which *don't*
         # preserve this information upon pickling so as to avoid
@@ -950,7 +973,8 @@ class GateSet(object):
         return _gscalc.GateSetCalculator(self._dim, self.gates, self.preps,
                                          self.effects, self.povm_identity,
                                          self.spamdefs, self._remainderlabel,
-                                         self._identitylabel)
+                                         self._identitylabel,
+                                         self._cache_precision)
 
     def product(self, gatestring, bScale=False):
         """
@@ -1240,7 +1264,7 @@ class GateSet(object):
 
     def bulk_evaltree_from_resources(self, gatestring_list, comm=None, memLimit=None,
                                      distributeMethod="gatestrings", subcalls=[],
-                                     verbosity=0):
+                                     verbosity=0, unsplitTree=None, splitStrategy="greedy"):
         """
         Create an evaluation tree based on available memory and CPUs.
 
@@ -1259,7 +1283,9 @@ class GateSet(object):
 
         memLimit : int, optional
             A rough memory limit in bytes which is used to determine subtree 
-            number and size.
+            number and size.  Memory usage is estimated by
+            `pygsti.objects.memorymodel.default_model`, which can be
+            calibrated for a given machine (see `MemoryModel.calibrate`).
 
         distributeMethod : {"gatestrings", "deriv"}
             How to distribute calculation amongst processors (only has effect
@@ -1277,6 +1303,20 @@ class GateSet(object):
         verbosity : int, optional
             How much detail to send to stdout.
 
+        unsplitTree : EvalTree, optional
+            An un-split evaluation tree whose final strings are the first
+            elements of `gatestring_list` (e.g. the tree of a previous call
+            with a shorter list), or a new, empty, EvalTree.  If given, this
+            tree is extended (or initialized) *in place* to evaluate all of
+            `gatestring_list`, and the returned tree is this tree or, when
+            splitting is needed, a split copy of it.  Thus `unsplitTree` can
+            be extended again by later calls instead of building each tree
+            from scratch.
+
+        splitStrategy : {"greedy", "balanced"} or function, optional
+            The strategy used to split the tree into sub-trees (see
+            `EvalTree.split`).
+
         Returns
         -------
         evt : EvalTree
@@ -1316,16 +1356,25 @@ class GateSet(object):
 
         printer = VerbosityPrinter.build_printer(verbosity, comm)
 
-        nspam = len(self.get_spam_labels())
         nprocs = 1 if comm is None else comm.Get_size()
         num_params = self.num_params()
-        dim = self._dim
         evt_cache = {} # cache of eval trees based on # min subtrees, to avoid re-computation
         floatSize = 8 # in bytes: TODO: a better way
+        gsSizes = _memorymodel.gateset_sizes(self) # (see memorymodel.default_model)
         C = 1.0/(1024.0**3)
 
         bNp2Matters = ("bulk_fill_hprobs" in subcalls) or ("bulk_hprobs_by_block" in subcalls)
 
+        if unsplitTree is not None:
+            if unsplitTree.is_split() or \
+                    unsplitTree.num_final_strings() > len(gatestring_list):
+                raise ValueError("`unsplitTree` must be an un-split tree of" +
+                                 " (a beginning part of) `gatestring_list`!")
+            if len(unsplitTree.get_init_indices()) == 0: #a new, empty, tree
+                unsplitTree.initialize([""] + list(self.gates.keys()), gatestring_list)
+            else:
+                unsplitTree.extend(gatestring_list[unsplitTree.num_final_strings():])
+
         if memLimit is not None:
             if memLimit <= 0:
                 raise MemoryError("Attempted evaltree generation " +
@@ -1346,58 +1395,40 @@ class GateSet(object):
             return factors
 
 
+        def get_evaltree(ng): # an EvalTree with at least ng subtrees
+            if unsplitTree is None:
+                return self.bulk_evaltree(gatestring_list,minSubtrees=ng,
+                                          verbosity=printer-1,
+                                          splitStrategy=splitStrategy)
+            elif ng == 1: return unsplitTree
+            else:
+                evt = unsplitTree.copy()
+                evt.split(None, ng, printer-1, splitStrategy)
+                return evt
+
         def memEstimate(ng,np1,np2,Ng,fastCacheSz=False,verb=0):
             tm = _time.time()
 
             #Get cache size
             if not fastCacheSz:
                 #Slower (but more accurate way)
-                if ng not in evt_cache: evt_cache[ng] = self.bulk_evaltree(
-                    gatestring_list,minSubtrees=ng,verbosity=printer-1)
+                if ng not in evt_cache: evt_cache[ng] = get_evaltree(ng)
                 tstTree = evt_cache[ng]
                 cacheSize = max([len(s) for s in tstTree.get_sub_trees()])
+                nFinal = max([s.num_final_strings() for s in tstTree.get_sub_trees()])
             else:
                 #heuristic (but fast)
                 cacheSize = int( 1.3 * len(gatestring_list) / ng )
+                nFinal = (len(gatestring_list)+ng-1) // ng
 
             wrtLen1 = (num_params+np1-1) // np1 # ceiling(num_params / np1)
             wrtLen2 = (num_params+np2-1) // np2 # ceiling(num_params / np2)
             nSubtreesPerProc = (ng+Ng-1) // Ng # ceiling(ng / Ng)
 
-            mem = 0
-            for fnName in subcalls:
-                if fnName == "bulk_fill_probs":
-                    mem += cacheSize * dim * dim # product cache
-                    mem += cacheSize # scale cache (exps)
-                    mem += cacheSize # scale vals
-
-                elif fnName == "bulk_fill_dprobs":
-                    mem += cacheSize * wrtLen1 * dim * dim # dproduct cache
-                    mem += cacheSize * dim * dim # product cache
-                    mem += cacheSize # scale cache
-                    mem += cacheSize # scale vals
-
-                elif fnName == "bulk_fill_hprobs":
-                    mem += cacheSize * wrtLen1 * wrtLen2 * dim * dim # hproduct cache
-                    mem += cacheSize * (wrtLen1 + wrtLen2) * dim * dim # dproduct cache
-                    mem += cacheSize * dim * dim # product cache
-                    mem += cacheSize # scale cache
-                    mem += cacheSize # scale vals
-
-                elif fnName == "bulk_hprobs_by_block":
-                    #Note: includes "results" memory since this is allocated within
-                    # the generator and yielded, *not* allocated by the user.
-                    mem += 2 * cacheSize * nspam * wrtLen1 * wrtLen2 # hprobs & dprobs12 results
-                    mem += cacheSize * nspam * (wrtLen1 + wrtLen2) # dprobs1 & dprobs2
-                    mem += cacheSize * wrtLen1 * wrtLen2 * dim * dim # hproduct cache
-                    mem += cacheSize * (wrtLen1 + wrtLen2) * dim * dim # dproduct cache
-                    mem += cacheSize * dim * dim # product cache
-                    mem += cacheSize # scale cache
-                    mem += cacheSize # scale vals
+            mem = _memorymodel.default_model.estimate(
+                subcalls, cacheSize=cacheSize, nFinal=nFinal, wrtLen1=wrtLen1,
+                wrtLen2=wrtLen2, nprocs=nprocs, **gsSizes) / floatSize
 
-                else:
-                    raise ValueError("Unknown subcall name: %s" % fnName)
-            
             if verb == 1:
                 fc_est_str = " (%.2fGB fc)" % (memEstimate(ng,np1,np2,Ng,True)*C)\
                     if (not fastCacheSz) else ""
@@ -1566,7 +1597,8 @@ class GateSet(object):
 
 
     def bulk_evaltree(self, gatestring_list, minSubtrees=None, maxTreeSize=None,
-                      numSubtreeComms=1, verbosity=0):
+                      numSubtreeComms=1, verbosity=0, compact=False,
+                      splitStrategy="greedy"):
         """
         Create an evaluation tree for all the gate strings in gatestring_list.
 
@@ -1594,9 +1626,18 @@ class GateSet(object):
         verbosity : int, optional
             How much detail to send to stdout.
 
+        compact : bool, optional
+            If True, return a `CompactEvalTree`, which stores its elements
+            in integer arrays and so uses less memory (and pickles faster)
+            than an `EvalTree`.
+
+        splitStrategy : {"greedy", "balanced"} or function, optional
+            The strategy used to split the tree into sub-trees (see
+            `EvalTree.split`).
+
         Returns
         -------
-        EvalTree
+        EvalTree or CompactEvalTree
             An evaluation tree object.
         """
         tm = _time.time()
@@ -1608,20 +1649,23 @@ class GateSet(object):
                     (len(gatestring_list),_time.time()-tm)); tm = _time.time()
 
         if maxTreeSize is not None:
-            evalTree.split(maxTreeSize, None, printer) # won't split if unnecessary
+            evalTree.split(maxTreeSize, None, printer, splitStrategy) # won't split if unnecessary
 
         if minSubtrees is not None:
             if not evalTree.is_split() or len(evalTree.get_sub_trees()) < minSubtrees:
-                evalTree.split(None, minSubtrees, printer)
+                evalTree.split(None, minSubtrees, printer, splitStrategy)
                 if maxTreeSize is not None and \
                         any([ len(sub)>maxTreeSize for sub in evalTree.get_sub_trees()]):
                     _warnings.warn("Could not create a tree with minSubtrees=%d" % minSubtrees
                                    + " and maxTreeSize=%d" % maxTreeSize)
-                    evalTree.split(maxTreeSize, None) # fall back to split for max size
+                    evalTree.split(maxTreeSize, None, 0, splitStrategy) # fall back to split for max size
         
         if maxTreeSize is not None or minSubtrees is not None:
             printer.log("bulk_evaltree: split tree (%d subtrees) in %.0fs" 
                         % (len(evalTree.get_sub_trees()),_time.time()-tm))
+
+        if compact:
+            evalTree = _compactevaltree.CompactEvalTree(evalTree)
         return evalTree
 
 
@@ -2141,7 +2185,8 @@ class GateSet(object):
 
 
     def bulk_fill_probs(self, mxToFill, spam_label_rows,
-                       evalTree, clipTo=None, check=False, comm=None):
+                       evalTree, clipTo=None, check=False, comm=None,
+                       nthreads=None, nprocesses=None, incremental=False):
         """
         Identical to bulk_probs(...) except results are
         placed into rows of a pre-allocated array instead
@@ -2180,19 +2225,46 @@ class GateSet(object):
            across multiple processors.  Distribution is performed over
            subtrees of evalTree (if it is split).
 
+        nthreads : int, optional
+           When greater than 1, the number of threads used to compute the
+           (local) subtrees of evalTree concurrently.  This is useful when
+           evalTree is split and MPI is not available, since numpy releases
+           the GIL during the matrix products that dominate the computation.
+
+        nprocesses : int, optional
+           When greater than 1, the number of forked processes used to
+           compute the subtrees of evalTree concurrently.  Results are
+           written into shared memory, so nothing is pickled.  Cannot be
+           used along with `nthreads` or a multi-processor `comm`.
+
+        incremental : bool, optional
+           If True, the product caches of (the sub-trees of) evalTree are
+           kept between calls, and only the products of gate strings which
+           contain gates that have changed since the last incremental call
+           are recomputed.  This speeds up sequences of calls which each
+           change only a few gates, at the cost of keeping the caches in
+           memory for as long as evalTree exists.  When every gate changes
+           between calls (as in an optimizer step) nothing is saved, so
+           this is off by default.  It also has no effect when the gates
+           are block-diagonal and multiplied block by block (see
+           `gscalc.BLOCK_SPARSE_MIN_DIM`) or when `nprocesses` > 1, since
+           the forked processes' caches are discarded.
+
 
         Returns
         -------
         None
         """
         return self._calc().bulk_fill_probs(mxToFill, spam_label_rows,
-                                            evalTree, clipTo, check, comm)
+                                            evalTree, clipTo, check, comm,
+                                            nthreads, nprocesses, incremental)
 
 
     def bulk_fill_dprobs(self, mxToFill, spam_label_rows,
                          evalTree, prMxToFill=None,clipTo=None,
                          check=False,comm=None, wrtBlockSize=None,
-                         profiler=None, gatherMemLimit=None):
+                         profiler=None, gatherMemLimit=None, nthreads=None,
+                         nprocesses=None):
 
         """
         Identical to bulk_dprobs(...) except results are
@@ -2257,6 +2329,20 @@ class GateSet(object):
           A memory limit in bytes to impose upon the "gather" operations
           performed as a part of MPI processor syncronization.
 
+        nthreads : int, optional
+          When greater than 1, the number of threads used to divide the
+          (local) computation, first among the subtrees of evalTree and then
+          among blocks of the parameters being differentiated with respect
+          to (which are created as needed when wrtBlockSize is None).  Note
+          that subtrees computed simultaneously each hold their own caches.
+
+        nprocesses : int, optional
+          When greater than 1, the number of forked processes to divide the
+          computation among, in the same way as `nthreads`.  Product caches
+          computed before forking and the results (written into shared
+          memory) are not copied or pickled.  Cannot be used along with
+          `nthreads` or a multi-processor `comm`.
+
 
         Returns
         -------
@@ -2265,7 +2351,8 @@ class GateSet(object):
         return self._calc().bulk_fill_dprobs(mxToFill, spam_label_rows,
                                              evalTree, prMxToFill, clipTo,
                                              check, comm, None, wrtBlockSize,
-                                             profiler, gatherMemLimit)
+                                             profiler, gatherMemLimit,
+                                             nthreads, nprocesses)
 
 
     def bulk_fill_hprobs(self, mxToFill, spam_label_rows,
@@ -2424,6 +2511,187 @@ class GateSet(object):
         return self._calc().bulk_hprobs_by_block(
             spam_label_rows, evalTree, wrtSlicesList,
             bReturnDProbs12, comm)
+
+
+    def bulk_sum_hprobs(self, weights, spam_label_rows, evalTree, comm=None):
+        """
+        Compute a weighted sum of the Hessians of the probabilities
+        generated by each gate sequence given by evalTree.
+
+        The result, `sum_{k,s} weights[k,s] * d2(P[k,s])/d(p1)d(p2)`, where
+        `P[k,s]` is the probability for the k-th spam label and s-th gate
+        string, is computed without creating caches of product Hessians, and
+        so needs much less memory than :func:`bulk_fill_hprobs` or
+        :func:`bulk_hprobs_by_block` when there are many gate set parameters.
+
+        Parameters
+        ----------
+        weights : numpy ndarray
+            An array of shape (K,S), where K is the length of
+            `spam_label_rows` and S is the number of gate strings (i.e.
+            evalTree.num_final_strings()), giving the weight of each
+            probability's Hessian.
+
+        spam_label_rows : dictionary
+            a dictionary with keys == spam labels and values which
+            are integer row indices into `weights`.
+
+        evalTree : EvalTree
+            given by a prior call to bulk_evaltree.  Specifies the gate strings
+            to compute the bulk operation on.
+
+        comm : mpi4py.MPI.Comm, optional
+           When not None, an MPI communicator for distributing the computation
+           across multiple processors.
+
+        Returns
+        -------
+        numpy array
+            The (symmetric) weighted sum, of shape (num_params, num_params).
+        """
+        return self._calc().bulk_sum_hprobs(
+            weights, spam_label_rows, evalTree, comm)
+
+
+    def bulk_fill_hvprobs(self, mxToFill, spam_label_rows, evalTree, v,
+                          prMxToFill=None, derivMxToFill=None, clipTo=None,
+                          check=False, comm=None, wrtBlockSize=None,
+                          gatherMemLimit=None):
+        """
+        Identical to bulk_hessian_vector_product(...) except results are
+        placed into rows of a pre-allocated array instead of being returned
+        in a dictionary.
+
+        Specifically, the products of the probability Hessians with `v` for
+        all gate strings and a given SPAM label are placed into
+        mxToFill[ spam_label_rows[spamLabel] ].
+        Optionally, probabilities and/or derivatives can be placed into
+        prMxToFill[ spam_label_rows[spamLabel] ] and
+        derivMxToFill[ spam_label_rows[spamLabel] ] respectively.
+
+        Parameters
+        ----------
+        mxToFill : numpy array
+          an already-allocated KxSxM numpy array, where K is larger
+          than the maximum value in spam_label_rows, S is equal
+          to the number of gate strings (i.e. evalTree.num_final_strings()),
+          and M is the length of the vectorized gateset.
+
+        spam_label_rows : dictionary
+          a dictionary with keys == spam labels and values which
+          are integer row indices into mxToFill, specifying the
+          correspondence between rows of mxToFill and spam labels.
+
+        evalTree : EvalTree
+           given by a prior call to bulk_evaltree.  Specifies the gate strings
+           to compute the bulk operation on.
+
+        v : numpy array
+          The vector (of length M) to multiply the Hessians by.
+
+        prMxToFill : numpy array, optional
+          when not None, an already-allocated KxS numpy array that is filled
+          with the probabilities as per spam_label_rows, similar to
+          bulk_fill_probs(...).
+
+        derivMxToFill : numpy array, optional
+          when not None, an already-allocated KxSxM numpy array that is filled
+          with the probability derivatives as per spam_label_rows, similar to
+          bulk_fill_dprobs(...).
+
+        clipTo : 2-tuple
+          (min,max) to clip returned probability to if not None.
+          Only relevant when prMxToFill is not None.
+
+        check : boolean, optional
+          If True, perform extra checks within code to verify correctness,
+          generating warnings when checks fail.  Used for testing, and runs
+          much slower when True.
+
+        comm : mpi4py.MPI.Comm, optional
+           When not None, an MPI communicator for distributing the computation
+           across multiple processors.  Distribution is first performed over
+           subtrees of evalTree (if it is split), and then over blocks (subsets)
+           of the parameters being differentiated with respect to (see
+           wrtBlockSize).
+
+        wrtBlockSize : int or float, optional
+          The maximum number of derivative columns to compute *products*
+          for simultaneously.  None means compute all columns at once.
+          Set this to non-None to reduce amount of intermediate memory
+          required.
+
+        gatherMemLimit : int, optional
+          A memory limit in bytes to impose upon the "gather" operations
+          performed as a part of MPI processor syncronization.
+
+        Returns
+        -------
+        None
+        """
+        return self._calc().bulk_fill_hvprobs(mxToFill, spam_label_rows,
+                                              evalTree, v, prMxToFill, derivMxToFill,
+                                              clipTo, check, comm, wrtBlockSize,
+                                              gatherMemLimit)
+
+
+    def bulk_hessian_vector_product(self, evalTree, v, returnPr=False,
+                                    returnDeriv=False, clipTo=None,
+                                    check=False, comm=None, wrtBlockSize=None):
+        """
+        Construct a dictionary containing the products of the
+        bulk-probability-Hessians with the vector `v` for every spam label
+        (each possible initialization & measurement pair) for each gate
+        sequence given by evalTree.
+
+        The Hessians are never formed, so this costs roughly as much as two
+        calls to bulk_dprobs, and needs only about twice its memory.  This
+        allows matrix-free (e.g. truncated-Newton or conjugate-gradient)
+        methods to be used on gate sets too large for dense Hessians.
+
+        Parameters
+        ----------
+        evalTree : EvalTree
+           given by a prior call to bulk_evaltree.  Specifies the gate strings
+           to compute the bulk operation on.
+
+        v : numpy array
+          The vector (of length num_params()) to multiply the Hessians by.
+
+        returnPr : bool, optional
+          when set to True, additionally return the probabilities.
+
+        returnDeriv : bool, optional
+          when set to True, additionally return the probability derivatives.
+
+        clipTo : 2-tuple, optional
+           (min,max) to clip returned probability to if not None.
+           Only relevant when returnPr == True.
+
+        check : boolean, optional
+          If True, perform extra checks within code to verify correctness,
+          generating warnings when checks fail.  Used for testing, and runs
+          much slower when True.
+
+        comm : mpi4py.MPI.Comm, optional
+           When not None, an MPI communicator for distributing the computation
+           across multiple processors.
+
+        wrtBlockSize : int or float, optional
+          The maximum number of derivative columns to compute *products*
+          for simultaneously.  None means compute all columns at once.
+
+        Returns
+        -------
+        hvprobs : dictionary
+            A dictionary whose keys are spam labels and whose values are
+            `hvp`, `(hvp,pr)`, `(hvp,deriv)` or `(hvp,deriv,pr)` tuples
+            (depending on `returnDeriv` and `returnPr`), where `hvp[s]`
+            is the product of the Hessian of the probability for the s-th
+            gate string with `v`.
+        """
+        return self._calc().bulk_hessian_vector_product(
+            evalTree, v, returnPr, returnDeriv, clipTo, check, comm, wrtBlockSize)
             
 
     def frobeniusdist(self, otherGateSet, transformMx=None,
@@ -2609,6 +2877,7 @@ class GateSet(object):
         newGateset._remainderlabel = self._remainderlabel
         newGateset._identitylabel = self._identitylabel
         newGateset._default_gauge_group = self._default_gauge_group
+        newGateset._cache_precision = self._cache_precision
         return newGateset
 
     def __str__(self):
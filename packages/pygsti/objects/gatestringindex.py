@@ -0,0 +1,250 @@
+from __future__ import division, print_function, absolute_import, unicode_literals
+#*****************************************************************
+#    pyGSTi 0.9:  Copyright 2015 Sandia Corporation
+#    This Software is released under the GPL license detailed
+#    in the file "license.txt" in the top-level pyGSTi directory
+#*****************************************************************
+""" Defines the CompactGateStringIndex class, an array-based gate string index. """
+
+import numpy as _np
+import bisect as _bisect
+import operator as _operator
+
+from . import gatestring as _gs
+
+_hash_mult = 0x100000001b3
+_hash_len_mult = 0x9e3779b97f4a7c15
+_hash_mask = 0xffffffffffffffff
+_short_string_len = 40 # strings longer than this are hashed using numpy
+
+#Python-int copies of the first hash powers (and of their partial sums, which
+# account for the +1 added to each label), so short strings are hashed
+# without creating any numpy objects
+_short_powers = [1]
+for _i in range(_short_string_len-1):
+    _short_powers.append((_short_powers[-1]*_hash_mult) & _hash_mask)
+_short_power_sums = [0]
+for _p in _short_powers:
+    _short_power_sums.append(_short_power_sums[-1] + _p)
+
+
+class CompactGateStringIndex(object):
+    """
+    A read-only, ordered mapping from gate strings to integer (row) indices
+    whose keys are stored in integer arrays.
+
+    The distinct gate labels are held once, in the `gateLabels` table, and
+    each gate string is encoded as a run of indices into this table within
+    the flat `labels` array (the i-th string is `labels[offsets[i]:offsets[i+1]]`).
+    Strings are looked up by binary-searching a sorted table of 64-bit hashes
+    of their encodings.  None of these arrays need to be turned into Python
+    objects, so they may be memory-mapped from disk (see
+    `DataSet.save_columnar`); GateString objects are only created (and then
+    kept) when the keys are asked for.
+
+    A CompactGateStringIndex supports the (non-modifying) parts of the
+    `OrderedDict` interface used for a `DataSet`'s `gsIndex`.
+    """
+
+    def __init__(self, gateLabels, labels, offsets, values, hashes=None, hashOrder=None):
+        """
+        Create a new CompactGateStringIndex from encoded gate strings.
+
+        Parameters
+        ----------
+        gateLabels : list
+            The gate label table.
+
+        labels : numpy array
+            1D integer array of the concatenated, encoded gate strings.
+
+        offsets : numpy array
+            1D integer array of length N+1 giving the start (and end) of each
+            of the N gate strings within `labels`.
+
+        values : numpy array
+            1D integer array of length N giving the index associated with each
+            gate string.
+
+        hashes, hashOrder : numpy array, optional
+            The sorted hashes of the encoded gate strings and the (key) indices
+            that sort them, as held by the `hashes` and `hashOrder` members of
+            an existing index.  If None, these are computed.
+        """
+        self.gateLabels = list(gateLabels)
+        self.labelIndex = { lbl: i for i,lbl in enumerate(self.gateLabels) }
+        #Note: asarray keeps memory-mapped data mapped, but is faster to slice
+        self.labels = _np.asarray(labels)
+        self.offsets = _np.asarray(offsets)
+        self.vals = _np.asarray(values)
+        if hashes is None:
+            hashes = _hash_encoded_strings(labels, offsets)
+            hashOrder = _np.argsort(hashes, kind='mergesort')
+            hashes = hashes[hashOrder]
+        self.hashes = _np.asarray(hashes)
+        self.hashOrder = _np.asarray(hashOrder)
+        self._powers = _hash_powers(_short_string_len)
+        self._keys = None # list of GateStrings, created when first needed
+
+        #memoryviews index (and slice) the arrays into Python ints much faster
+        # than the arrays themselves, so lookups use these instead
+        self._labelView = memoryview(self.labels)
+        self._offsetView = memoryview(self.offsets)
+        self._hashView = memoryview(self.hashes)
+        self._hashOrderView = memoryview(self.hashOrder)
+
+    @classmethod
+    def from_gatestrings(cls, gateStrings, values=None):
+        """
+        Create a CompactGateStringIndex holding the given gate strings.
+
+        Parameters
+        ----------
+        gateStrings : iterable
+            The gate strings, as GateStrings or tuples of labels.  As when
+            building an OrderedDict, a repeated gate string keeps the position
+            of its first occurrence and the value of its last.
+
+        values : array-like, optional
+            The index associated with each gate string.  If None, the strings
+            are associated with 0, 1, 2, etc.
+
+        Returns
+        -------
+        CompactGateStringIndex
+        """
+        gateStrings = list(gateStrings)
+        values = list(range(len(gateStrings))) if (values is None) else list(values)
+        assert(len(values) == len(gateStrings))
+
+        gateLabels = []; labelIndex = {}; positions = {}
+        flat = []; offsets = [0]; vals = []
+        for gs,val in zip(gateStrings,values):
+            key = tuple(gs)
+            if key in positions:
+                vals[positions[key]] = val; continue
+            positions[key] = len(vals); vals.append(val)
+            for lbl in key:
+                if lbl not in labelIndex:
+                    labelIndex[lbl] = len(gateLabels)
+                    gateLabels.append(lbl)
+            flat.extend([ labelIndex[lbl] for lbl in key ])
+            offsets.append(len(flat))
+        labelType = _np.min_scalar_type(max(len(gateLabels)-1,0)) # usually uint8
+        return cls(gateLabels, _np.array(flat, labelType), _np.array(offsets, _np.int64),
+                   _np.array(vals, _np.int64))
+
+    def _find(self, gatestring):
+        """ The position of `gatestring` among the keys, or -1 if it isn't one """
+        try:
+            enc = list(map(self.labelIndex.__getitem__, getattr(gatestring, 'tup', gatestring)))
+        except (KeyError, TypeError): # unknown label (or not a gate string)
+            return -1
+
+        h = self._hash(enc)
+        hashes = self._hashView; offsets = self._offsetView
+        i = _bisect.bisect_left(hashes, h)
+        while i < len(hashes) and hashes[i] == h:
+            k = self._hashOrderView[i]
+            if self._labelView[offsets[k]:offsets[k+1]].tolist() == enc:
+                return k
+            i += 1
+        return -1
+
+    def _hash(self, enc):
+        """ Same as _hash_encoded_strings, but faster for a single string """
+        n = len(enc)
+        if n <= _short_string_len:
+            h = (sum(map(_operator.mul, enc, _short_powers)) + _short_power_sums[n]) & _hash_mask
+        else:
+            if len(self._powers) < n: self._powers = _hash_powers(2*n)
+            h = int(_np.dot(_np.fromiter(enc, _np.uint64, n) + _np.uint64(1), self._powers[0:n]))
+        return h ^ ((n*_hash_len_mult) & _hash_mask)
+
+    def get_gatestring(self, k):
+        """ The k-th key, as a GateString """
+        return _gs.GateString(tuple([ self.gateLabels[i] for i in
+                                      self.labels[self.offsets[k]:self.offsets[k+1]].tolist() ]))
+
+    def __len__(self):
+        return len(self.offsets)-1
+
+    def __iter__(self):
+        if self._keys is None:
+            self._keys = [ self.get_gatestring(k) for k in range(len(self)) ]
+        return iter(self._keys)
+
+    def __contains__(self, gatestring):
+        return self._find(gatestring) >= 0
+
+    def __getitem__(self, gatestring):
+        k = self._find(gatestring)
+        if k < 0: raise KeyError(gatestring)
+        return int(self.vals[k])
+
+    def get(self, gatestring, default=None):
+        """ The index of `gatestring`, or `default` if it isn't a key """
+        k = self._find(gatestring)
+        return int(self.vals[k]) if k >= 0 else default
+
+    def keys(self):
+        """ List of the gate strings (GateString objects) of this index """
+        return list(self)
+
+    def values(self):
+        """ List of the indices of this index's gate strings """
+        return self.vals.tolist()
+
+    def items(self):
+        """ List of (gate string, index) pairs """
+        return list(zip(self, self.vals.tolist()))
+
+    def copy(self):
+        """ Return this index (it cannot be modified, so needn't be copied) """
+        return self
+
+    def __eq__(self, other):
+        if isinstance(other, CompactGateStringIndex):
+            if len(self) != len(other): return False
+            if self.gateLabels == other.gateLabels:
+                return _np.array_equal(self.offsets, other.offsets) and \
+                    _np.array_equal(self.labels, other.labels) and \
+                    _np.array_equal(self.vals, other.vals)
+        if not hasattr(other, 'items'): return False
+        return self.items() == list(other.items())
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __getstate__(self):
+        return { 'gateLabels': self.gateLabels,
+                 'labels': _np.asarray(self.labels), 'offsets': _np.asarray(self.offsets),
+                 'values': _np.asarray(self.vals), 'hashes': _np.asarray(self.hashes),
+                 'hashOrder': _np.asarray(self.hashOrder) }
+
+    def __setstate__(self, state_dict):
+        self.__init__(state_dict['gateLabels'], state_dict['labels'], state_dict['offsets'],
+                      state_dict['values'], state_dict['hashes'], state_dict['hashOrder'])
+
+
+def _hash_encoded_strings(labels, offsets):
+    """
+    Compute a 64-bit (polynomial) hash of each of the encoded gate strings
+    `labels[offsets[i]:offsets[i+1]]`.  Integer overflow wraps, as intended.
+    """
+    lengths = _np.diff(offsets)
+    lenTerm = lengths.astype(_np.uint64) * _np.uint64(_hash_len_mult)
+    if len(labels) == 0: return lenTerm
+
+    pows = _hash_powers(int(lengths.max()))
+    posInString = _np.arange(len(labels)) - _np.repeat(offsets[:-1], lengths)
+    terms = (_np.asarray(labels).astype(_np.uint64) + _np.uint64(1)) * pows[posInString]
+    cumTerms = _np.concatenate( ([_np.uint64(0)], _np.cumsum(terms, dtype=_np.uint64)) )
+    return (cumTerms[offsets[1:]] - cumTerms[offsets[:-1]]) ^ lenTerm
+
+
+def _hash_powers(n):
+    """ The first `n` powers of the hash multiplier (modulo 2**64) """
+    pows = _np.empty(max(n,1), _np.uint64); pows[0] = 1
+    _np.cumprod(_np.full(len(pows)-1, _hash_mult, _np.uint64), out=pows[1:])
+    return pows
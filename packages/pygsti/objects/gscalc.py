@@ -15,6 +15,7 @@ import collections as _collections
 from ..tools import gatetools as _gt
 from ..tools import mpitools as _mpit
 from ..tools import slicetools as _slct
+from ..tools import sharedmemtools as _smt
 from .profiler import DummyProfiler as _DummyProfiler
 _dummy_profiler = _DummyProfiler()
 
@@ -24,6 +25,118 @@ PSMALL = 1e-100
 DSMALL = 1e-100
 HSMALL = 1e-100
 
+# Maximum number of elements in the temporary arrays used when computing
+# all the elements of an evaluation-tree level at once.
+MAX_BATCH_ELEMENTS = 2**24
+
+# Floating point types of the product, derivative and Hessian caches for each
+# of the allowed values of a GateSetCalculator's `cachePrecision`.
+CACHE_DTYPES = { "double": _np.dtype('d'), "single": _np.dtype('f') }
+
+
+# Products of gates which share a block-diagonal structure (e.g. the gates of
+# a gate set on a direct-sum space) are computed one block at a time when
+# the gate dimension is at least BLOCK_SPARSE_MIN_DIM (None => never) and
+# this at least halves the cost of a multiplication.  Gate elements with
+# magnitude below BLOCK_ZERO_TOL are taken to be zero when finding blocks.
+BLOCK_SPARSE_MIN_DIM = 24
+BLOCK_ZERO_TOL = 1e-14
+
+
+def _find_blocks(mxs, tol):
+    """
+    Find the common block-diagonal structure, up to a permutation of rows
+    and columns, of the square matrices `mxs`.  Returns a list of sorted
+    index arrays, one per block, which are the connected components of the
+    graph whose edges are the elements of `mxs` with magnitude above `tol`.
+    """
+    dim = mxs[0].shape[0]
+    nonzero = _np.zeros( (dim,dim), 'bool' )
+    for mx in mxs:
+        nonzero |= _np.abs(mx) > tol
+    nonzero |= nonzero.T
+
+    iBlock = -_np.ones(dim, 'i'); blocks = []
+    for i in range(dim):
+        if iBlock[i] >= 0: continue
+        members = [i]; iBlock[i] = len(blocks); k = 0
+        while k < len(members):
+            for j in _np.nonzero(nonzero[members[k]])[0]:
+                if iBlock[j] < 0:
+                    iBlock[j] = len(blocks); members.append(j)
+            k += 1
+        blocks.append( _np.array(sorted(members), 'i') )
+    return blocks
+
+
+def _small_threshold(small, dtype):
+    """
+    Returns the threshold below which the elements of a `dtype` cache are
+    considered small: `small` (e.g. PSMALL), raised if needed so that the
+    product of two elements larger than the threshold doesn't underflow.
+    """
+    return max(small, _np.sqrt(_np.finfo(dtype).tiny))
+
+
+def _level_batches(evalTree, batchSize):
+    """
+    Iterate over the evaluation levels of `evalTree` (see
+    `EvalTree.get_evaluation_levels`), splitting any level with more
+    than `batchSize` elements into several consecutive batches.
+    """
+    for indices, iLefts, iRights in evalTree.get_evaluation_levels():
+        for s in range(0, len(indices), batchSize):
+            yield indices[s:s+batchSize], iLefts[s:s+batchSize], \
+                iRights[s:s+batchSize]
+
+
+def _run_in_threads(fn, args, nthreads):
+    """
+    Call `fn(arg)` for each element of `args`, concurrently using a pool of
+    (at most) `nthreads` threads when `nthreads` is greater than 1.  Returns
+    the list of results, in the same order as `args`.
+    """
+    if nthreads is None or nthreads <= 1 or len(args) <= 1:
+        return [ fn(arg) for arg in args ]
+
+    #Note: under python 2 this requires the "futures" backport package
+    from concurrent.futures import ThreadPoolExecutor as _ThreadPoolExecutor
+    with _ThreadPoolExecutor(max_workers=min(nthreads,len(args))) as executor:
+        return list(executor.map(fn, args))
+
+
+def _get_parallel_runner(comm, nthreads, nprocesses):
+    """
+    Returns a `(runFn, nWorkers)` tuple, where `runFn(fn, args, nWorkers)`
+    calls `fn` on each of `args` using either threads or forked processes
+    (see `_run_in_threads` and `sharedmemtools.run_in_processes`).
+    """
+    if nprocesses is not None and nprocesses > 1:
+        if nthreads is not None and nthreads > 1:
+            raise ValueError("Cannot specify both nthreads and nprocesses")
+        if comm is not None and comm.Get_size() > 1:
+            raise ValueError("Cannot use nprocesses along with a"
+                             + " multi-processor comm")
+        return _smt.run_in_processes, nprocesses
+    return _run_in_threads, nthreads
+
+
+def _shared_output(a):
+    """
+    Returns an array in shared memory, with the same shape and type as
+    `a`, for forked processes to write results into.  If `a` is None or
+    is already in shared memory, then `a` itself is returned.
+    """
+    if a is None or _smt.is_shared(a): return a
+    return _smt.shared_empty(a.shape, a.dtype)
+
+
+def _copy_output_rows(dest, src, spam_label_rows):
+    """ Copy the spam-label rows of a `_shared_output` array back to `dest` """
+    if dest is None or dest is src: return
+    for rowIndex in spam_label_rows.values():
+        dest[rowIndex] = src[rowIndex]
+
 class GateSetCalculator(object):
     """
     Encapsulates a calculation tool used by gate set objects to perform product
@@ -36,7 +149,7 @@ class GateSetCalculator(object):
     """
 
     def __init__(self, dim, gates, preps, effects, povm_identity, spamdefs,
-                 remainderLabel, identityLabel):
+                 remainderLabel, identityLabel, cachePrecision="double"):
         """
         Construct a new GateSetCalculator object.
 
@@ -71,7 +184,16 @@ class GateSetCalculator(object):
 
         identityLabel : string
             The string used to designate the identity POVM vector.
+
+        cachePrecision : {"double", "single"}, optional
+            The floating point precision of the product, derivative and
+            Hessian caches used by the bulk computation routines.  "single"
+            halves their memory and bandwidth requirements; probabilities
+            and their derivatives are still accumulated in double precision.
         """
+        if cachePrecision not in CACHE_DTYPES:
+            raise ValueError("Invalid cachePrecision: %s" % cachePrecision)
+        self.cacheDtype = CACHE_DTYPES[cachePrecision]
         self._remainderLabel = remainderLabel
         self._identityLabel = identityLabel
         self.dim = dim
@@ -98,6 +220,20 @@ class GateSetCalculator(object):
 
 
 
+    def _get_gate_blocks(self):
+        """
+        Returns the blocks of the block-diagonal structure shared by all the
+        gate matrices (see `_find_blocks`) as a list of index arrays, or None
+        if products shouldn't be computed block by block (see
+        BLOCK_SPARSE_MIN_DIM).
+        """
+        if BLOCK_SPARSE_MIN_DIM is None or self.dim < BLOCK_SPARSE_MIN_DIM \
+                or len(self.gates) == 0: return None
+        blocks = _find_blocks([ gate.base for gate in self.gates.values() ],
+                              BLOCK_ZERO_TOL)
+        blockCost = sum([ len(blk)**3 for blk in blocks ])
+        return blocks if 2*blockCost <= self.dim**3 else None
+
     def _is_remainder_spamlabel(self, label):
         """
         Returns whether or not the given SPAM label is the
@@ -958,7 +1094,7 @@ class GateSetCalculator(object):
         return hprobs
 
 
-    def _compute_product_cache(self, evalTree, comm=None):
+    def _compute_product_cache(self, evalTree, comm=None, incremental=False):
         """
         Computes a tree of products in a linear cache space. Will *not*
         parallelize computation, even if given a split tree (since there's
@@ -966,6 +1102,12 @@ class GateSetCalculator(object):
         those of the sub-trees).  Note also that there would be no memory savings
         from using a split tree.  In short, parallelization should be done at a
         higher level.
+
+        If `incremental` is True, the caches are kept (in `evalTree`) along
+        with the gates they were computed from, and when next computed with
+        `incremental` set only the elements whose gate strings contain a
+        gate that has since changed are recomputed.  The returned arrays
+        are then owned by `evalTree` and must not be modified.
         """
 
         dim = self.dim
@@ -980,46 +1122,180 @@ class GateSetCalculator(object):
 
         # ------------------------------------------------------------------
 
+        blocks = self._get_gate_blocks()
+        if blocks is not None: #multiply block-diagonal gates block by block
+            blkCaches, scaleCache = self._compute_block_product_cache(evalTree, blocks)
+            prodCache = _np.zeros( (len(evalTree), dim, dim), self.cacheDtype )
+            for blk,blkCache in zip(blocks,blkCaches):
+                prodCache[:,blk[:,None],blk] = blkCache
+            return prodCache, scaleCache
+
         if evalTree.is_split():
             _warnings.warn("Ignoring tree splitting in product cache calc.")
 
         cacheSize = len(evalTree)
-        prodCache = _np.zeros( (cacheSize, dim, dim) )
+        psmall = _small_threshold(PSMALL, self.cacheDtype)
+        gateLabels = list(self.gates.keys())
+
+        memo = evalTree.product_memo if incremental else None
+        if memo is not None and memo['dtype'] == self.cacheDtype and \
+           memo['prodCache'].shape == (cacheSize, dim, dim) and \
+           set(memo['gates'].keys()) == set(gateLabels):
+            #Only recompute the elements whose strings contain a changed gate
+            prodCache, scaleCache = memo['prodCache'], memo['scaleCache']
+            changed = [ lbl for lbl in gateLabels
+                        if not _np.array_equal(self.gates[lbl].base, memo['gates'][lbl]) ]
+            dirty = _np.zeros( cacheSize, 'bool' )
+            for lbl in changed:
+                memo['gates'][lbl] = self.gates[lbl].base.copy()
+                if lbl in memo['labelMasks']: dirty |= memo['labelMasks'][lbl]
+            if not _np.any(dirty): return prodCache, scaleCache
+
+            self._init_product_cache(evalTree, prodCache, scaleCache, changed)
+            for indices, iRights, iLefts in evalTree.get_evaluation_levels():
+                sel = dirty[indices]
+                if _np.any(sel):
+                    self._compute_product_level(prodCache, scaleCache, indices[sel],
+                                                iRights[sel], iLefts[sel], psmall)
+            return prodCache, scaleCache
+
+        prodCache = _np.zeros( (cacheSize, dim, dim), self.cacheDtype )
         scaleCache = _np.zeros( cacheSize, 'd' )
 
         #First element of cache are given by evalTree's initial single- or zero-gate labels
+        self._init_product_cache(evalTree, prodCache, scaleCache)
+
+        #evaluate gate strings using tree (skip over the zero and single-gate-strings)
+        # one dependency level at a time, so that all the products within a
+        # level are computed by a single stacked matrix multiplication.
+        for indices, iRights, iLefts in evalTree.get_evaluation_levels():
+            self._compute_product_level(prodCache, scaleCache, indices,
+                                        iRights, iLefts, psmall)
+
+        nanOrInfCacheIndices = (~_np.isfinite(prodCache)).nonzero()[0]  #may be duplicates (a list, not a set)
+        assert( len(nanOrInfCacheIndices) == 0 ) # since all scaled gates start with norm <= 1, products should all have norm <= 1
+
+        if incremental: #remember the caches & the gates they were computed from
+            labelMasks = {}
+            for i,gateLabel in zip(evalTree.get_init_indices(), evalTree.get_init_labels()):
+                if gateLabel == "": continue
+                labelMasks[gateLabel] = _np.zeros( cacheSize, 'bool' )
+                labelMasks[gateLabel][i] = True
+            for indices, iRights, iLefts in evalTree.get_evaluation_levels():
+                for mask in labelMasks.values():
+                    mask[indices] = mask[iLefts] | mask[iRights]
+            evalTree.product_memo = { 'gates': { lbl: self.gates[lbl].base.copy() for lbl in gateLabels },
+                                      'dtype': self.cacheDtype, 'prodCache': prodCache,
+                                      'scaleCache': scaleCache, 'labelMasks': labelMasks }
+
+        return prodCache, scaleCache
+
+
+    def _init_product_cache(self, evalTree, prodCache, scaleCache, gateLabels=None):
+        """
+        Sets the elements of a product cache (and scale cache) corresponding
+        to `evalTree`'s initial single- or zero-gate labels.  If `gateLabels`
+        is not None, only the elements of the gates it contains are set.
+        """
         for i,gateLabel in zip(evalTree.get_init_indices(), evalTree.get_init_labels()):
+            if gateLabels is not None and gateLabel not in gateLabels: continue
             if gateLabel == "": #special case of empty label == no gate
-                prodCache[i] = _np.identity( dim )
-                # Note: scaleCache[i] = 0.0 from initialization
+                prodCache[i] = _np.identity( self.dim )
+                scaleCache[i] = 0.0
             else:
                 gate = self.gates[gateLabel].base
                 nG = max(_nla.norm(gate), 1.0)
                 prodCache[i] = gate / nG
                 scaleCache[i] = _np.log(nG)
 
-        #evaluate gate strings using tree (skip over the zero and single-gate-strings)
-        #cnt = 0
-        for i in evalTree.get_evaluation_order():
-            # combine iLeft + iRight => i
-            # LEXICOGRAPHICAL VS MATRIX ORDER Note: we reverse iLeft <=> iRight from evalTree because
-            # (iRight,iLeft,iFinal) = tup implies gatestring[i] = gatestring[iLeft] + gatestring[iRight], but we want:
-            (iRight,iLeft) = evalTree[i]   # since then matrixOf(gatestring[i]) = matrixOf(gatestring[iLeft]) * matrixOf(gatestring[iRight])
-            L,R = prodCache[iLeft], prodCache[iRight]
-            prodCache[i] = _np.dot(L,R)
-            scaleCache[i] = scaleCache[iLeft] + scaleCache[iRight]
 
-            if prodCache[i].max() < PSMALL and prodCache[i].min() > -PSMALL:
-                nL,nR = max(_nla.norm(L), _np.exp(-scaleCache[iLeft]),1e-300), max(_nla.norm(R), _np.exp(-scaleCache[iRight]),1e-300)
-                sL, sR = L/nL, R/nR
-                prodCache[i] = _np.dot(sL,sR); scaleCache[i] += _np.log(nL) + _np.log(nR)
+    def _compute_product_level(self, prodCache, scaleCache, indices, iRights, iLefts, psmall):
+        """
+        Computes the elements `indices` of a product cache (and scale cache)
+        from the already-computed elements `iLefts` and `iRights`, using a
+        single stacked matrix multiplication.
+        """
+        # combine iLeft + iRight => i
+        # LEXICOGRAPHICAL VS MATRIX ORDER Note: we reverse iLeft <=> iRight from evalTree because
+        # (iRight,iLeft) = tup implies gatestring[i] = gatestring[iLeft] + gatestring[iRight], but we want:
+        # matrixOf(gatestring[i]) = matrixOf(gatestring[iLeft]) * matrixOf(gatestring[iRight])
+        L,R = prodCache[iLefts], prodCache[iRights]
+        P = _np.matmul(L,R)
+        scales = scaleCache[iLefts] + scaleCache[iRights]
+
+        #rescale those products whose elements have all become very small
+        small = _np.abs(P).max(axis=(1,2)) < psmall
+        if _np.any(small):
+            L,R = L[small], R[small]
+            nL = _np.maximum(_np.maximum(_nla.norm(L.reshape(len(L),-1),axis=1),
+                                         _np.exp(-scaleCache[iLefts[small]])), 1e-300)
+            nR = _np.maximum(_np.maximum(_nla.norm(R.reshape(len(R),-1),axis=1),
+                                         _np.exp(-scaleCache[iRights[small]])), 1e-300)
+            P[small] = _np.matmul(L / nL[:,None,None], R / nR[:,None,None])
+            scales[small] += _np.log(nL) + _np.log(nR)
+
+        prodCache[indices] = P
+        scaleCache[indices] = scales
+
+
+    def _compute_block_product_cache(self, evalTree, blocks):
+        """
+        Computes a tree of products, as _compute_product_cache does, of gates
+        with the block-diagonal structure given by `blocks` (see
+        `_get_gate_blocks`).  Only the diagonal blocks of the products are
+        computed and stored, so each multiplication costs sum_b d_b^3 instead
+        of dim^3.  Returns a list of per-block product caches, each of shape
+        (cacheSize, d_b, d_b), and the scale cache shared by all the blocks.
+        """
+        if evalTree.is_split():
+            _warnings.warn("Ignoring tree splitting in product cache calc.")
 
-        #print "bulk_product DEBUG: %d rescalings out of %d products" % (cnt, len(evalTree))
+        cacheSize = len(evalTree)
+        blkCaches = [ _np.zeros( (cacheSize, len(blk), len(blk)), self.cacheDtype )
+                      for blk in blocks ]
+        scaleCache = _np.zeros( cacheSize, 'd' )
+        psmall = _small_threshold(PSMALL, self.cacheDtype)
 
-        nanOrInfCacheIndices = (~_np.isfinite(prodCache)).nonzero()[0]  #may be duplicates (a list, not a set)
-        assert( len(nanOrInfCacheIndices) == 0 ) # since all scaled gates start with norm <= 1, products should all have norm <= 1
+        #First element of cache are given by evalTree's initial single- or zero-gate labels
+        for i,gateLabel in zip(evalTree.get_init_indices(), evalTree.get_init_labels()):
+            if gateLabel == "": #special case of empty label == no gate
+                for blk,blkCache in zip(blocks,blkCaches):
+                    blkCache[i] = _np.identity( len(blk) )
+            else:
+                gate = self.gates[gateLabel].base
+                nG = max(_nla.norm(gate), 1.0)
+                for blk,blkCache in zip(blocks,blkCaches):
+                    blkCache[i] = gate[blk[:,None],blk] / nG
+                scaleCache[i] = _np.log(nG)
 
-        return prodCache, scaleCache
+        #evaluate gate strings using tree one dependency level at a time (see
+        # _compute_product_cache for the LEXICOGRAPHICAL VS MATRIX ORDER note)
+        for indices, iRights, iLefts in evalTree.get_evaluation_levels():
+            Ls = [ blkCache[iLefts] for blkCache in blkCaches ]
+            Rs = [ blkCache[iRights] for blkCache in blkCaches ]
+            Ps = [ _np.matmul(L,R) for L,R in zip(Ls,Rs) ]
+            scales = scaleCache[iLefts] + scaleCache[iRights]
+
+            #rescale those products whose elements have all become very small
+            small = _np.max([ _np.abs(P).max(axis=(1,2)) for P in Ps ], axis=0) < psmall
+            if _np.any(small):
+                def norms(Ms, iCache): # norms of the (block-diagonal) products
+                    nrm = _np.sqrt(sum([ _nla.norm(M[small].reshape(_np.count_nonzero(small),-1),axis=1)**2
+                                        for M in Ms ]))
+                    return _np.maximum(_np.maximum(nrm, _np.exp(-scaleCache[iCache[small]])), 1e-300)
+                nL, nR = norms(Ls, iLefts), norms(Rs, iRights)
+                for P,L,R in zip(Ps,Ls,Rs):
+                    P[small] = _np.matmul(L[small] / nL[:,None,None], R[small] / nR[:,None,None])
+                scales[small] += _np.log(nL) + _np.log(nR)
+
+            for blkCache,P in zip(blkCaches,Ps):
+                blkCache[indices] = P
+            scaleCache[indices] = scales
+
+        assert( all([ _np.all(_np.isfinite(blkCache)) for blkCache in blkCaches ]) )
+          # since all scaled gates start with norm <= 1, products should all have norm <= 1
+
+        return blkCaches, scaleCache
 
 
     def _compute_dproduct_cache(self, evalTree, prodCache, scaleCache,
@@ -1085,7 +1361,8 @@ class GateSetCalculator(object):
         if evalTree.is_split():
             _warnings.warn("Ignoring tree splitting in dproduct cache calc.")
 
-        dProdCache = _np.zeros( (cacheSize,) + deriv_shape )
+        dProdCache = _np.zeros( (cacheSize,) + deriv_shape, self.cacheDtype )
+        dsmall = _small_threshold(DSMALL, self.cacheDtype)
 
         # This iteration **must** match that in bulk_evaltree
         #   in order to associate the right single-gate-strings w/indices
@@ -1100,26 +1377,33 @@ class GateSetCalculator(object):
         #profiler.print_mem("DEBUGMEM: POINT1"); profiler.comm.barrier()
 
         #evaluate gate strings using tree (skip over the zero and single-gate-strings)
-        for i in evalTree.get_evaluation_order():
+        # one dependency level at a time.  Levels are processed in batches of
+        # at most `batchSize` elements to bound the size of the temporaries.
+        batchSize = max(MAX_BATCH_ELEMENTS // max(nGateDerivCols*dim*dim,1), 1)
+        for indices, iRights, iLefts in _level_batches(evalTree, batchSize):
             tm = _time.time()
             # combine iLeft + iRight => i
             # LEXICOGRAPHICAL VS MATRIX ORDER Note: we reverse iLeft <=> iRight from evalTree because
-            # (iRight,iLeft,iFinal) = tup implies gatestring[i] = gatestring[iLeft] + gatestring[iRight], but we want:
-            (iRight,iLeft) = evalTree[i]   # since then matrixOf(gatestring[i]) = matrixOf(gatestring[iLeft]) * matrixOf(gatestring[iRight])
-            L,R = prodCache[iLeft], prodCache[iRight]
-            dL,dR = dProdCache[iLeft], dProdCache[iRight]
-            dProdCache[i] = _np.dot(dL, R) + \
-                _np.swapaxes(_np.dot(L, dR),0,1) #dot(dS, T) + dot(S, dT)
+            # (iRight,iLeft) = tup implies gatestring[i] = gatestring[iLeft] + gatestring[iRight], but we want:
+            # matrixOf(gatestring[i]) = matrixOf(gatestring[iLeft]) * matrixOf(gatestring[iRight])
+            L,R = prodCache[iLefts], prodCache[iRights]
+            dL,dR = dProdCache[iLefts], dProdCache[iRights]
+            dP = _np.matmul(dL, R[:,None,:,:]) # dot(dS, T) + dot(S, dT), with each
+            dP += _np.matmul(L[:,None,:,:], dR) #  L,R broadcast over the deriv axis
             profiler.add_time("compute_dproduct_cache: dots", tm)
-            profiler.add_count("compute_dproduct_cache: dots")
-
-            scale = scaleCache[i] - (scaleCache[iLeft] + scaleCache[iRight])
-            if abs(scale) > 1e-8: # _np.isclose(scale,0) is SLOW!
-                dProdCache[i] /= _np.exp(scale)
-                if dProdCache[i].max() < DSMALL and dProdCache[i].min() > -DSMALL:
+            profiler.add_count("compute_dproduct_cache: dots", len(indices))
+
+            scales = scaleCache[indices] - (scaleCache[iLefts] + scaleCache[iRights])
+            rescale = _np.abs(scales) > 1e-8 # _np.isclose(scale,0) is SLOW!
+            if _np.any(rescale):
+                dP[rescale] /= _np.exp(scales[rescale])[:,None,None,None]
+            if dP.size > 0:
+                small = _np.abs(dP).reshape(len(dP),-1).max(axis=1) < dsmall
+                if _np.any(small & rescale):
                     _warnings.warn("Scaled dProd small in order to keep prod managable.")
-            elif _np.count_nonzero(dProdCache[i]) and dProdCache[i].max() < DSMALL and dProdCache[i].min() > -DSMALL:
-                _warnings.warn("Would have scaled dProd but now will not alter scaleCache.")
+                if _np.count_nonzero(dP[small & ~rescale]):
+                    _warnings.warn("Would have scaled dProd but now will not alter scaleCache.")
+            dProdCache[indices] = dP
 
         #profiler.print_mem("DEBUGMEM: POINT2"); profiler.comm.barrier()
 
@@ -1166,7 +1450,7 @@ class GateSetCalculator(object):
                                " are more cpus than hessian elements.")
 
             # allocate final result memory
-            hProdCache = _np.zeros( (cacheSize,) + hessn_shape )            
+            hProdCache = _np.zeros( (cacheSize,) + hessn_shape, self.cacheDtype )
 
             # Use comm to distribute columns
             allDeriv1ColSlice = slice(0,nGateDerivCols1)
@@ -1227,7 +1511,8 @@ class GateSetCalculator(object):
         if evalTree.is_split():
             _warnings.warn("Ignoring tree splitting in hproduct cache calc.")
 
-        hProdCache = _np.zeros( (cacheSize,) + hessn_shape )
+        hProdCache = _np.zeros( (cacheSize,) + hessn_shape, self.cacheDtype )
+        hsmall = _small_threshold(HSMALL, self.cacheDtype)
 
         #First element of cache are given by evalTree's initial single- or zero-gate labels
         for i,_ in zip(evalTree.get_init_indices(), evalTree.get_init_labels()):
@@ -1266,14 +1551,111 @@ class GateSetCalculator(object):
             scale = scaleCache[i] - (scaleCache[iLeft] + scaleCache[iRight])
             if abs(scale) > 1e-8: # _np.isclose(scale,0) is SLOW!
                 hProdCache[i] /= _np.exp(scale)
-                if hProdCache[i].max() < HSMALL and hProdCache[i].min() > -HSMALL:
+                if hProdCache[i].max() < hsmall and hProdCache[i].min() > -hsmall:
                     _warnings.warn("Scaled hProd small in order to keep prod managable.")
-            elif _np.count_nonzero(hProdCache[i]) and hProdCache[i].max() < HSMALL and hProdCache[i].min() > -HSMALL:
+            elif _np.count_nonzero(hProdCache[i]) and hProdCache[i].max() < hsmall and hProdCache[i].min() > -hsmall:
                 _warnings.warn("hProd is small (oh well!).")
 
         return hProdCache
 
 
+    def _compute_dirproduct_cache(self, evalTree, prodCache, scaleCache, gateDir):
+        """
+        Computes a tree of the directional derivatives of products along the
+        direction `gateDir` in the space of gate parameters, i.e. the
+        derivative products contracted with `gateDir`, in a linear cache
+        space.  Elements are scaled in the same way as those of `prodCache`.
+        """
+        dim = self.dim
+        if evalTree.is_split():
+            _warnings.warn("Ignoring tree splitting in dirproduct cache calc.")
+
+        dirCache = _np.zeros( (len(evalTree), dim, dim), self.cacheDtype )
+
+        #First element of cache are given by evalTree's initial single- or zero-gate labels
+        for i,gateLabel in zip(evalTree.get_init_indices(), evalTree.get_init_labels()):
+            if gateLabel != "": # (empty label == no gate => zero derivative)
+                dgate = self.dproduct( (gateLabel,) )
+                dirCache[i] = _np.tensordot(gateDir, dgate, (0,0)) / _np.exp(scaleCache[i])
+
+        #evaluate gate strings using tree, one dependency level at a time (see
+        # _compute_product_cache for the LEXICOGRAPHICAL VS MATRIX ORDER note)
+        for indices, iRights, iLefts in evalTree.get_evaluation_levels():
+            D = _np.matmul(dirCache[iLefts], prodCache[iRights])
+            D += _np.matmul(prodCache[iLefts], dirCache[iRights])
+
+            scales = scaleCache[indices] - (scaleCache[iLefts] + scaleCache[iRights])
+            rescale = _np.abs(scales) > 1e-8
+            if _np.any(rescale):
+                D[rescale] /= _np.exp(scales[rescale])[:,None,None]
+            dirCache[indices] = D
+
+        return dirCache
+
+
+    def _compute_hvproduct_cache(self, evalTree, prodCache, dProdCache,
+                                 dirCache, scaleCache, comm=None):
+        """
+        Computes a tree of product Hessian-vector products, i.e. the
+        directional derivatives (along the direction used to compute
+        `dirCache`) of the product derivatives in `dProdCache`, in a linear
+        cache space.  The result has the same shape as `dProdCache`, whose
+        derivative columns are distributed among the processors of `comm`.
+        """
+        dim = self.dim
+        nGateDerivCols = dProdCache.shape[1]
+        cacheSize = len(evalTree)
+
+        # ------------------------------------------------------------------
+
+        if comm is not None and comm.Get_size() > 1:
+            _, myDerivColSlice, _, mySubComm = \
+                _mpit.distribute_slice(slice(0,nGateDerivCols), comm)
+            if mySubComm is not None and mySubComm.Get_size() > 1:
+                _warnings.warn("Too many processors to make use of in " +
+                               " _compute_hvproduct_cache.")
+                if mySubComm.Get_rank() > 0: myDerivColSlice = slice(0,0)
+                  #don't compute anything on "extra", i.e. rank != 0, cpus
+
+            my_results = self._compute_hvproduct_cache(
+                evalTree, prodCache, dProdCache[:,myDerivColSlice], dirCache,
+                scaleCache, None)
+            all_results = comm.allgather(my_results)
+            return _np.concatenate(all_results, axis=1)
+
+        # ------------------------------------------------------------------
+
+        if evalTree.is_split():
+            _warnings.warn("Ignoring tree splitting in hvproduct cache calc.")
+
+        #Initial elements are zero since all gate elements are assumed to be
+        # at most linear in their parameters (as in _compute_hproduct_cache).
+        hvProdCache = _np.zeros( (cacheSize, nGateDerivCols, dim, dim),
+                                 self.cacheDtype )
+
+        #evaluate gate strings using tree, one dependency level at a time (see
+        # _compute_product_cache for the LEXICOGRAPHICAL VS MATRIX ORDER note)
+        batchSize = max(MAX_BATCH_ELEMENTS // max(nGateDerivCols*dim*dim,1), 1)
+        for indices, iRights, iLefts in _level_batches(evalTree, batchSize):
+            L,R = prodCache[iLefts][:,None], prodCache[iRights][:,None]
+            DL,DR = dirCache[iLefts][:,None], dirCache[iRights][:,None]
+            dL,dR = dProdCache[iLefts], dProdCache[iRights]
+
+            # d/dv of dot(dL, R) + dot(L, dR)
+            M = _np.matmul(hvProdCache[iLefts], R)
+            M += _np.matmul(dL, DR)
+            M += _np.matmul(DL, dR)
+            M += _np.matmul(L, hvProdCache[iRights])
+
+            scales = scaleCache[indices] - (scaleCache[iLefts] + scaleCache[iRights])
+            rescale = _np.abs(scales) > 1e-8
+            if _np.any(rescale):
+                M[rescale] /= _np.exp(scales[rescale])[:,None,None,None]
+            hvProdCache[indices] = M
+
+        return hvProdCache
+
+
 ## END CACHE FUNCTIONS
 
 
@@ -1639,7 +2021,11 @@ class GateSetCalculator(object):
         E   = _np.conjugate(_np.transpose(self._get_evec(elabel)))
         return rho,E
 
-    def _probs_from_rhoE(self, spamLabel, rho, E, Gs, scaleVals):
+    def _probs_from_rhoE(self, spamLabel, rho, E, Gs, scaleVals, blocks=None):
+        if blocks is not None: #Gs is a list of the products' diagonal blocks
+            return sum([ _np.squeeze( _np.dot(E[:,blk], _np.dot(blkGs, rho[blk])), axis=(0,2) )
+                         for blk,blkGs in zip(blocks,Gs) ]) * scaleVals
+
         #Compute probability and save in return array
         # want vp[iFinal] = float(dot(E, dot(G, rho)))  ##OLD, slightly slower version: p = trace(dot(self.SPAMs[spamLabel], G))
         #  vp[i] = sum_k,l E[0,k] Gs[i,k,l] rho[l,0] * scaleVals[i]
@@ -1910,6 +2296,70 @@ class GateSetCalculator(object):
         return sub_vhp
 
 
+    def _spam_directions(self, spamLabel, v):
+        """
+        Returns the directional derivatives, along the gate set parameter
+        direction `v`, of the state preparation column vector and effect row
+        vector of `spamLabel`, as a `(rhoDir, EDir)` tuple.
+        """
+        (rholabel,elabel) = self.spamdefs[spamLabel]
+        rhoIndex = list(self.preps.keys()).index(rholabel)
+        rhoDir = _np.dot(self.preps[rholabel].deriv_wrt_params(),
+                         v[self.rho_offset[rhoIndex]:self.rho_offset[rhoIndex+1]])
+
+        vE = v[self.tot_rho_params:self.tot_spam_params]
+        if elabel == self._remainderLabel:
+            EDir = -sum([ _np.dot(evec.deriv_wrt_params(), vE[self.e_offset[ei]:self.e_offset[ei+1]])
+                          for ei,evec in enumerate(self.effects.values()) ])
+        else:
+            eIndex = list(self.effects.keys()).index(elabel)
+            EDir = _np.dot(self.effects[elabel].deriv_wrt_params(),
+                           vE[self.e_offset[eIndex]:self.e_offset[eIndex+1]])
+        return rhoDir.reshape((self.dim,1)), _np.conjugate(EDir).reshape((1,self.dim))
+
+
+    def _hvprobs_from_rhoE(self, spamLabel, rho, E, Gs, dGs, Ds, hvGs, scaleVals,
+                           v, wrtSlices=None):
+        (rholabel,elabel) = self.spamdefs[spamLabel]
+        nGateStrings = Gs.shape[0]
+        rhoDir, EDir = self._spam_directions(spamLabel, v)
+
+        #The result is the directional derivative, along v, of each row of
+        # _dprobs_from_rhoE(...), where the product Gs, its derivatives dGs,
+        # rho and E have directional derivatives Ds, hvGs, rhoDir and EDir.
+        old_err2 = _np.seterr(invalid='ignore', over='ignore')
+        hv_dGates = _np.squeeze( _np.dot( E, _np.dot( hvGs, rho ) ) +
+                                 _np.dot( EDir, _np.dot( dGs, rho ) ) +
+                                 _np.dot( E, _np.dot( dGs, rhoDir ) ), axis=(0,3) ) * scaleVals[:,None]
+        _np.seterr(**old_err2)
+        hv_dGates[ _np.isnan(hv_dGates) ] = 0
+
+        #SPAM -------------
+        rhoIndex = list(self.preps.keys()).index(rholabel)
+        hv_drhos = _np.zeros( (nGateStrings, self.tot_rho_params ) )
+        hv_drhos[: , self.rho_offset[rhoIndex]:self.rho_offset[rhoIndex+1] ] = \
+            _np.squeeze(_np.dot(_np.dot(EDir, Gs) + _np.dot(E, Ds), rho.deriv_wrt_params()),axis=(0,)) \
+            * scaleVals[:,None] # may overflow, but OK
+
+        hv_dEs = _np.zeros( (nGateStrings, self.tot_e_params) )
+        hv_dAnyE = _np.squeeze(_np.dot(Ds, rho) + _np.dot(Gs, rhoDir),axis=(2,)) * scaleVals[:,None]
+        if elabel == self._remainderLabel:
+            for ei,evec in enumerate(self.effects.values()):
+                hv_dEs[:,self.e_offset[ei]:self.e_offset[ei+1]] = -1.0 * _np.dot(hv_dAnyE, evec.deriv_wrt_params())
+        else:
+            eIndex = list(self.effects.keys()).index(elabel)
+            hv_dEs[:,self.e_offset[eIndex]:self.e_offset[eIndex+1]] = \
+                _np.dot(hv_dAnyE, self.effects[elabel].deriv_wrt_params())
+
+        if wrtSlices is None:
+            sub_vhvp = _np.concatenate( (hv_drhos,hv_dEs,hv_dGates), axis=1 )
+        else:
+            sub_vhvp = _np.concatenate((hv_drhos[:,wrtSlices['preps']],
+                                        hv_dEs[:,wrtSlices['effects']],
+                                        hv_dGates), axis=1 )
+        return sub_vhvp
+
+
     def _check(self, evalTree, spam_label_rows, prMxToFill=None, dprMxToFill=None, hprMxToFill=None, clipTo=None):
         # compare with older slower version that should do the same thing (for debugging)
         for spamLabel,rowIndex in spam_label_rows.items():
@@ -2075,7 +2525,8 @@ class GateSetCalculator(object):
 
 
     def bulk_fill_probs(self, mxToFill, spam_label_rows,
-                        evalTree, clipTo=None, check=False, comm=None):
+                        evalTree, clipTo=None, check=False, comm=None,
+                        nthreads=None, nprocesses=None, incremental=False):
 
         """
         Identical to bulk_probs(...) except results are
@@ -2115,6 +2566,30 @@ class GateSetCalculator(object):
            across multiple processors.  Distribution is performed over
            subtrees of evalTree (if it is split).
 
+        nthreads : int, optional
+           When greater than 1, the number of threads used to compute the
+           (local) subtrees of evalTree concurrently.  This is useful when
+           evalTree is split and MPI is not available, since numpy releases
+           the GIL during the matrix products that dominate the computation.
+
+        nprocesses : int, optional
+           When greater than 1, the number of forked processes used to
+           compute the subtrees of evalTree concurrently.  Results are
+           written into shared memory, so nothing is pickled.  Cannot be
+           used along with `nthreads` or a multi-processor `comm`.
+
+        incremental : bool, optional
+           If True, the product caches of (the sub-trees of) evalTree are
+           kept between calls, and only the products of gate strings which
+           contain gates that have changed since the last incremental call
+           are recomputed.  This speeds up sequences of calls which each
+           change only a few gates (e.g. finite-difference or per-gate
+           steps), at the cost of keeping the caches in memory for as long
+           as evalTree exists.  This has no effect when the gates are
+           multiplied block by block (see `BLOCK_SPARSE_MIN_DIM`) or when
+           `nprocesses` > 1, since the forked processes' caches are
+           discarded.
+
         Returns
         -------
         None
@@ -2131,21 +2606,30 @@ class GateSetCalculator(object):
         subtrees = evalTree.get_sub_trees()
         mySubTreeIndices, subTreeOwners, mySubComm = evalTree.distribute(comm)
 
+        runParallel, nWorkers = _get_parallel_runner(comm, nthreads, nprocesses)
+        outMxToFill = mxToFill
+        if runParallel is _smt.run_in_processes:
+            mxToFill = _shared_output(mxToFill)
+        blocks = self._get_gate_blocks()
+
         #eval on each local subtree
-        for iSubTree in mySubTreeIndices:
+        def compute_subtree(iSubTree):
             evalSubTree = subtrees[iSubTree]
             fslc = evalSubTree.final_slice(evalTree)
 
-            #Free memory from previous subtree iteration before computing caches
-            scaleVals = Gs = prodCache = scaleCache = None
-
-            #Fill cache info
-            prodCache, scaleCache = self._compute_product_cache(evalSubTree, mySubComm)
+            #Fill cache info, keeping only the diagonal blocks of the products
+            # of block-diagonal gates (see _get_gate_blocks)
+            if blocks is not None:
+                blkCaches, scaleCache = self._compute_block_product_cache(evalSubTree, blocks)
+                Gs = [ evalSubTree.final_view(blkCache, axis=0) for blkCache in blkCaches ]
+            else:
+                prodCache, scaleCache = self._compute_product_cache(evalSubTree, mySubComm,
+                                                                    incremental)
+                Gs  = evalSubTree.final_view( prodCache, axis=0)
+                  # ( nGateStrings, dim, dim )
 
             #use cached data to final values
             scaleVals = self._scaleExp( evalSubTree.final_view(scaleCache) )
-            Gs  = evalSubTree.final_view( prodCache, axis=0)
-              # ( nGateStrings, dim, dim )
 
             def calc_and_fill(spamLabel, isp, fslc, pslc1, pslc2, sumInto):
                 tm = _time.time()
@@ -2153,15 +2637,19 @@ class GateSetCalculator(object):
                 rho,E = self._rhoE_from_spamLabel(spamLabel)
                 if sumInto:
                     mxToFill[isp,fslc] += self._probs_from_rhoE(spamLabel, rho,
-                                                              E, Gs, scaleVals)
+                                                              E, Gs, scaleVals, blocks)
                 else:
                     mxToFill[isp,fslc] =  self._probs_from_rhoE(spamLabel, rho,
-                                                              E, Gs, scaleVals)
+                                                              E, Gs, scaleVals, blocks)
                 _np.seterr(**old_err)
 
             self._fill_result_tuple( (mxToFill,), spam_label_rows,
                                      fslc, slice(None), slice(None), calc_and_fill )
 
+        runParallel(compute_subtree, mySubTreeIndices, nWorkers)
+        _copy_output_rows(outMxToFill, mxToFill, spam_label_rows)
+        mxToFill = outMxToFill
+
         #collect/gather results
         subtreeFinalSlices = [ t.final_slice(evalTree) for t in subtrees]
         _mpit.gather_slices(subtreeFinalSlices, subTreeOwners, mxToFill,
@@ -2178,7 +2666,8 @@ class GateSetCalculator(object):
     def bulk_fill_dprobs(self, mxToFill, spam_label_rows, evalTree,
                          prMxToFill=None,clipTo=None,check=False,
                          comm=None, wrtFilter=None, wrtBlockSize=None,
-                         profiler=None, gatherMemLimit=None):
+                         profiler=None, gatherMemLimit=None, nthreads=None,
+                         nprocesses=None):
 
         """
         Identical to bulk_dprobs(...) except results are
@@ -2251,6 +2740,21 @@ class GateSetCalculator(object):
           A memory limit in bytes to impose upon the "gather" operations
           performed as a part of MPI processor syncronization.
 
+        nthreads : int, optional
+          When greater than 1, the number of threads used to divide the
+          (local) computation, first among the subtrees of evalTree and then
+          among blocks of the parameters being differentiated with respect
+          to (which are created as needed when wrtBlockSize is None).  Note
+          that subtrees computed simultaneously each hold their own caches.
+
+        nprocesses : int, optional
+          When greater than 1, the number of forked processes to divide the
+          computation among, in the same way as `nthreads`.  Product caches
+          computed before forking and the results (written into shared
+          memory) are not copied or pickled.  Cannot be used along with
+          `nthreads` or a multi-processor `comm`.  Profiling information is
+          not collected from the worker processes.
+
         Returns
         -------
         None
@@ -2298,16 +2802,23 @@ class GateSetCalculator(object):
         #          (comm.Get_rank(),",".join([str(len(subtrees[i]))
         #                                     for i in mySubTreeIndices])))
 
-        #eval on each local subtree
         #my_results = []
-        for iSubTree in mySubTreeIndices:
+        runParallel, nWorkers = _get_parallel_runner(comm, nthreads, nprocesses)
+        if nWorkers is not None and nWorkers > 1:
+            nSubTreeWorkers = min(nWorkers, max(len(mySubTreeIndices),1))
+            nBlkWorkers = nWorkers // nSubTreeWorkers
+        else:
+            nSubTreeWorkers = nBlkWorkers = 1
+
+        outMxToFill, outPrMxToFill = mxToFill, prMxToFill
+        if runParallel is _smt.run_in_processes:
+            mxToFill = _shared_output(mxToFill)
+            prMxToFill = _shared_output(prMxToFill)
+
+        def compute_subtree(iSubTree):
             evalSubTree = subtrees[iSubTree]
             fslc = evalSubTree.final_slice(evalTree)
 
-            #Free memory from previous subtree iteration before computing caches
-            scaleVals = Gs = dGs = None
-            prodCache = scaleCache = dProdCache = None
-
             #Fill cache info (not requiring column distribution)
             tm = _time.time()
             prodCache, scaleCache = self._compute_product_cache(evalSubTree, mySubComm)
@@ -2319,26 +2830,28 @@ class GateSetCalculator(object):
               #( nGateStrings, dim, dim )
             profiler.mem_check("bulk_fill_dprobs: post compute product")
 
-            def calc_and_fill(spamLabel, isp, fslc, pslc1, pslc2, sumInto):
-                tm = _time.time()
-                old_err = _np.seterr(over='ignore')
-                rho,E = self._rhoE_from_spamLabel(spamLabel)
-                
-                if sumInto:
-                    if prMxToFill is not None:
-                        prMxToFill[isp,fslc] += \
-                            self._probs_from_rhoE(spamLabel, rho, E, Gs, scaleVals)
-                    mxToFill[isp,fslc,pslc1] += self._dprobs_from_rhoE( 
-                        spamLabel, rho, E, Gs, dGs, scaleVals, wrtSlices)
-                else:
-                    if prMxToFill is not None:
-                        prMxToFill[isp,fslc] = \
-                            self._probs_from_rhoE(spamLabel, rho, E, Gs, scaleVals)
-                    mxToFill[isp,fslc,pslc1] = self._dprobs_from_rhoE( 
-                        spamLabel, rho, E, Gs, dGs, scaleVals, wrtSlices)
+            def make_calc_and_fill(dGs):
+                def calc_and_fill(spamLabel, isp, fslc, pslc1, pslc2, sumInto):
+                    tm = _time.time()
+                    old_err = _np.seterr(over='ignore')
+                    rho,E = self._rhoE_from_spamLabel(spamLabel)
 
-                _np.seterr(**old_err)
-                profiler.add_time("bulk_fill_dprobs: calc_and_fill", tm)
+                    if sumInto:
+                        if prMxToFill is not None:
+                            prMxToFill[isp,fslc] += \
+                                self._probs_from_rhoE(spamLabel, rho, E, Gs, scaleVals)
+                        mxToFill[isp,fslc,pslc1] += self._dprobs_from_rhoE(
+                            spamLabel, rho, E, Gs, dGs, scaleVals, wrtSlices)
+                    else:
+                        if prMxToFill is not None:
+                            prMxToFill[isp,fslc] = \
+                                self._probs_from_rhoE(spamLabel, rho, E, Gs, scaleVals)
+                        mxToFill[isp,fslc,pslc1] = self._dprobs_from_rhoE(
+                            spamLabel, rho, E, Gs, dGs, scaleVals, wrtSlices)
+
+                    _np.seterr(**old_err)
+                    profiler.add_time("bulk_fill_dprobs: calc_and_fill", tm)
+                return calc_and_fill
 
             #Set wrtBlockSize to use available processors if it isn't specified
             if wrtFilter is None:
@@ -2347,6 +2860,10 @@ class GateSetCalculator(object):
                     comm_blkSize = self.tot_gate_params / mySubComm.Get_size()
                     blkSize = comm_blkSize if (blkSize is None) \
                         else min(comm_blkSize, blkSize) #override with smaller comm_blkSize
+                if nBlkWorkers > 1 and self.tot_gate_params > 0:
+                    worker_blkSize = self.tot_gate_params / nBlkWorkers
+                    blkSize = worker_blkSize if (blkSize is None) \
+                        else min(worker_blkSize, blkSize) #override with smaller worker_blkSize
             else:
                 blkSize = None # wrtFilter dictates block
 
@@ -2364,7 +2881,8 @@ class GateSetCalculator(object):
 
                 #Compute all requested derivative columns at once
                 self._fill_result_tuple( (prMxToFill, mxToFill), spam_label_rows,
-                                         fslc, slice(None), slice(None), calc_and_fill )
+                                         fslc, slice(None), slice(None),
+                                         make_calc_and_fill(dGs) )
                 profiler.mem_check("bulk_fill_dprobs: post fill")
                 dProdCache = dGs = None #free mem
 
@@ -2381,9 +2899,10 @@ class GateSetCalculator(object):
 
                 #Compute spam derivative columns and possibly probs
                 # (computation that is *not* divided into blocks)
-                self._fill_result_tuple( 
+                self._fill_result_tuple(
                     (prMxToFill, mxToFill), spam_label_rows, fslc,
-                    slice(0,self.tot_spam_params), slice(None), calc_and_fill )
+                    slice(0,self.tot_spam_params), slice(None),
+                    make_calc_and_fill(dGs) )
                 profiler.mem_check("bulk_fill_dprobs: post fill spam")
 
                 #distribute derivative computation across blocks
@@ -2391,26 +2910,10 @@ class GateSetCalculator(object):
                     _mpit.distribute_indices(list(range(nBlks)), mySubComm)
                 if blkComm is not None:
                     _warnings.warn("Note: more CPUs(%d)" % mySubComm.Get_size()
-                       +" than derivative columns(%d)!" % self.tot_gate_params 
+                       +" than derivative columns(%d)!" % self.tot_gate_params
                        +" [blkSize = %.1f, nBlks=%d]" % (blkSize,nBlks))
 
-                def calc_and_fill_blk(spamLabel, isp, fslc, pslc1, pslc2, sumInto):
-                    tm = _time.time()
-                    old_err = _np.seterr(over='ignore')
-                    rho,E = self._rhoE_from_spamLabel(spamLabel)
-                    wrtNoSpam = {'preps':slice(0,0),'effects':slice(0,0)}
-                    
-                    if sumInto:
-                        mxToFill[isp,fslc,pslc1] += self._dprobs_from_rhoE(
-                            spamLabel, rho, E, Gs, dGs, scaleVals, wrtNoSpam)
-                            
-                    else:
-                        mxToFill[isp,fslc,pslc1] = self._dprobs_from_rhoE(
-                            spamLabel, rho, E, Gs, dGs, scaleVals, wrtNoSpam)
-                    _np.seterr(**old_err)
-                    profiler.add_time("bulk_fill_dprobs: calc_and_fill_blk", tm)
-
-                for iBlk in myBlkIndices:
+                def compute_block(iBlk):
                     tm = _time.time()
                     gateSlice = _slct.shift(blocks[iBlk],-self.tot_spam_params)
                     dProdCache = self._compute_dproduct_cache(evalSubTree, prodCache, scaleCache,
@@ -2423,13 +2926,32 @@ class GateSetCalculator(object):
 
                     dGs = evalSubTree.final_view(dProdCache, axis=0)
                       #( nGateStrings, nDerivCols, dim, dim )
-                    self._fill_result_tuple( 
-                        (mxToFill,), spam_label_rows, fslc, 
-                        blocks[iBlk], slice(None), calc_and_fill_blk )                    
+
+                    def calc_and_fill_blk(spamLabel, isp, fslc, pslc1, pslc2, sumInto):
+                        tm = _time.time()
+                        old_err = _np.seterr(over='ignore')
+                        rho,E = self._rhoE_from_spamLabel(spamLabel)
+                        wrtNoSpam = {'preps':slice(0,0),'effects':slice(0,0)}
+
+                        if sumInto:
+                            mxToFill[isp,fslc,pslc1] += self._dprobs_from_rhoE(
+                                spamLabel, rho, E, Gs, dGs, scaleVals, wrtNoSpam)
+
+                        else:
+                            mxToFill[isp,fslc,pslc1] = self._dprobs_from_rhoE(
+                                spamLabel, rho, E, Gs, dGs, scaleVals, wrtNoSpam)
+                        _np.seterr(**old_err)
+                        profiler.add_time("bulk_fill_dprobs: calc_and_fill_blk", tm)
+
+                    self._fill_result_tuple(
+                        (mxToFill,), spam_label_rows, fslc,
+                        blocks[iBlk], slice(None), calc_and_fill_blk )
 
                     profiler.mem_check("bulk_fill_dprobs: post fill blk")
                     dProdCache = dGs = None #free mem
 
+                runParallel(compute_block, myBlkIndices, nBlkWorkers)
+
                 #gather results
                 tm = _time.time()
                 _mpit.gather_slices(blocks, blkOwners, mxToFill[:,fslc],
@@ -2438,6 +2960,12 @@ class GateSetCalculator(object):
                 profiler.add_time("MPI IPC", tm)
                 profiler.mem_check("bulk_fill_dprobs: post gather blocks")
 
+        #eval on each local subtree
+        runParallel(compute_subtree, mySubTreeIndices, nSubTreeWorkers)
+        _copy_output_rows(outMxToFill, mxToFill, spam_label_rows)
+        _copy_output_rows(outPrMxToFill, prMxToFill, spam_label_rows)
+        mxToFill, prMxToFill = outMxToFill, outPrMxToFill
+
         #collect/gather results
         tm = _time.time()
         subtreeFinalSlices = [ t.final_slice(evalTree) for t in subtrees]
@@ -2722,7 +3250,6 @@ class GateSetCalculator(object):
                             dProdCache2 =self._compute_dproduct_cache(
                                 evalSubTree, prodCache, scaleCache, blk2Comm, gateSlice2)
                             dGs2 = evalSubTree.final_view(dProdCache2, axis=0) 
-                        rank = comm.Get_rank()
 
                         hProdCache = self._compute_hproduct_cache(
                             evalSubTree, prodCache, dProdCache1, dProdCache2,
@@ -2781,6 +3308,226 @@ class GateSetCalculator(object):
 
 
 
+    def bulk_fill_hvprobs(self, mxToFill, spam_label_rows, evalTree, v,
+                          prMxToFill=None, derivMxToFill=None, clipTo=None,
+                          check=False, comm=None, wrtBlockSize=None,
+                          gatherMemLimit=None):
+
+        """
+        Identical to bulk_hessian_vector_product(...) except results are
+        placed into rows of a pre-allocated array instead of being returned
+        in a dictionary.
+
+        Specifically, the products of the probability Hessians with `v` for
+        all gate strings and a given SPAM label are placed into
+        mxToFill[ spam_label_rows[spamLabel] ].
+        Optionally, probabilities and/or derivatives can be placed into
+        prMxToFill[ spam_label_rows[spamLabel] ] and
+        derivMxToFill[ spam_label_rows[spamLabel] ] respectively.
+
+        Parameters
+        ----------
+        mxToFill : numpy array
+          an already-allocated KxSxM numpy array, where K is larger
+          than the maximum value in spam_label_rows, S is equal
+          to the number of gate strings (i.e. evalTree.num_final_strings()),
+          and M is the length of the vectorized gateset.
+
+        spam_label_rows : dictionary
+          a dictionary with keys == spam labels and values which
+          are integer row indices into mxToFill, specifying the
+          correspondence between rows of mxToFill and spam labels.
+
+        evalTree : EvalTree
+           given by a prior call to bulk_evaltree.  Specifies the gate strings
+           to compute the bulk operation on.
+
+        v : numpy array
+          The vector (of length M) to multiply the Hessians by.
+
+        prMxToFill : numpy array, optional
+          when not None, an already-allocated KxS numpy array that is filled
+          with the probabilities as per spam_label_rows, similar to
+          bulk_fill_probs(...).
+
+        derivMxToFill : numpy array, optional
+          when not None, an already-allocated KxSxM numpy array that is filled
+          with the probability derivatives as per spam_label_rows, similar to
+          bulk_fill_dprobs(...).
+
+        clipTo : 2-tuple, optional
+          (min,max) to clip returned probability to if not None.
+          Only relevant when prMxToFill is not None.
+
+        check : boolean, optional
+          If True, perform extra checks within code to verify correctness,
+          generating warnings when checks fail.  Used for testing, and runs
+          much slower when True.
+
+        comm : mpi4py.MPI.Comm, optional
+           When not None, an MPI communicator for distributing the computation
+           across multiple processors.  Distribution is first performed over
+           subtrees of evalTree (if it is split), and then over blocks (subsets)
+           of the parameters being differentiated with respect to (see
+           wrtBlockSize).
+
+        wrtBlockSize : int or float, optional
+          The maximum number of derivative columns to compute *products*
+          for simultaneously.  None means compute all columns at once.
+          The  minimum of wrtBlockSize and the size that makes maximal use
+          of available processors is used as the final block size.  Set
+          this to non-None to reduce amount of intermediate memory required.
+
+        gatherMemLimit : int, optional
+          A memory limit in bytes to impose upon the "gather" operations
+          performed as a part of MPI processor syncronization.
+
+        Returns
+        -------
+        None
+        """
+        remainder_row_index = None
+        for spamLabel,rowIndex in spam_label_rows.items():
+            if self._is_remainder_spamlabel(spamLabel):
+                assert(self.assumeSumToOne) # ensure the remainder label is allowed
+                assert(remainder_row_index is None) # ensure there is at most one dummy spam label
+                remainder_row_index = rowIndex
+
+        v = _np.asarray(v, 'd')
+        assert(v.shape == (self.tot_params,))
+        gateDir = v[self.tot_spam_params:]
+
+        #get distribution across subtrees (groups if needed)
+        subtrees = evalTree.get_sub_trees()
+        mySubTreeIndices, subTreeOwners, mySubComm = evalTree.distribute(comm)
+
+        for iSubTree in mySubTreeIndices:
+            evalSubTree = subtrees[iSubTree]
+            fslc = evalSubTree.final_slice(evalTree)
+
+            #Free memory from previous subtree iteration before computing caches
+            scaleVals = Gs = Ds = dGs = hvGs = None
+            prodCache = scaleCache = dirCache = dProdCache = hvProdCache = None
+
+            #Fill product and directional-derivative cache info
+            # (not requiring column distribution)
+            prodCache, scaleCache = self._compute_product_cache(evalSubTree, mySubComm)
+            dirCache = self._compute_dirproduct_cache(evalSubTree, prodCache, scaleCache, gateDir)
+            scaleVals = self._scaleExp( evalSubTree.final_view(scaleCache))
+            Gs  = evalSubTree.final_view(prodCache, axis=0)
+            Ds  = evalSubTree.final_view(dirCache, axis=0)
+              #( nGateStrings, dim, dim )
+
+            def make_calc_and_fill(dGs, hvGs, wrtSlices):
+                def calc_and_fill(spamLabel, isp, fslc, pslc1, pslc2, sumInto):
+                    old_err = _np.seterr(over='ignore')
+                    rho,E = self._rhoE_from_spamLabel(spamLabel)
+                    hvp = self._hvprobs_from_rhoE(spamLabel, rho, E, Gs, dGs, Ds, hvGs,
+                                                  scaleVals, v, wrtSlices)
+                    if sumInto:
+                        if prMxToFill is not None and wrtSlices is None:
+                            prMxToFill[isp,fslc] += \
+                                self._probs_from_rhoE(spamLabel, rho, E, Gs, scaleVals)
+                        if derivMxToFill is not None:
+                            derivMxToFill[isp,fslc,pslc1] += self._dprobs_from_rhoE(
+                                spamLabel, rho, E, Gs, dGs, scaleVals, wrtSlices)
+                        mxToFill[isp,fslc,pslc1] += hvp
+                    else:
+                        if prMxToFill is not None and wrtSlices is None:
+                            prMxToFill[isp,fslc] = \
+                                self._probs_from_rhoE(spamLabel, rho, E, Gs, scaleVals)
+                        if derivMxToFill is not None:
+                            derivMxToFill[isp,fslc,pslc1] = self._dprobs_from_rhoE(
+                                spamLabel, rho, E, Gs, dGs, scaleVals, wrtSlices)
+                        mxToFill[isp,fslc,pslc1] = hvp
+                    _np.seterr(**old_err)
+                return calc_and_fill
+
+            #Set wrtBlockSize to use available processors if it isn't specified
+            blkSize = wrtBlockSize #could be None
+            if (mySubComm is not None) and (mySubComm.Get_size() > 1):
+                comm_blkSize = self.tot_gate_params / mySubComm.Get_size()
+                blkSize = comm_blkSize if (blkSize is None) \
+                    else min(comm_blkSize, blkSize) #override with smaller comm_blkSize
+
+            if blkSize is None:
+                #Fill derivative and hessian-vector-product cache info
+                dProdCache = self._compute_dproduct_cache(evalSubTree, prodCache,
+                                                          scaleCache, mySubComm)
+                hvProdCache = self._compute_hvproduct_cache(evalSubTree, prodCache, dProdCache,
+                                                            dirCache, scaleCache, mySubComm)
+                dGs = evalSubTree.final_view(dProdCache, axis=0)
+                hvGs = evalSubTree.final_view(hvProdCache, axis=0)
+                  #( nGateStrings, nDerivCols, dim, dim )
+
+                #Compute all derivative columns at once
+                self._fill_result_tuple( (prMxToFill, derivMxToFill, mxToFill),
+                                         spam_label_rows, fslc, slice(None), slice(None),
+                                         make_calc_and_fill(dGs, hvGs, None) )
+
+            else: # Divide columns into blocks of at most blkSize
+                nBlks = int(_np.ceil(self.tot_gate_params / blkSize))
+                  # num blocks required to achieve desired average size == blkSize
+                blocks = _mpit.slice_up_range(self.tot_gate_params, nBlks,
+                                              start=self.tot_spam_params)
+
+                #Compute spam columns and possibly probs (computation that is
+                # *not* divided into blocks), using placeholders for *no* gate params
+                noGates = _np.empty( (Gs.shape[0],0,self.dim,self.dim), 'd')
+                self._fill_result_tuple(
+                    (prMxToFill, derivMxToFill, mxToFill), spam_label_rows, fslc,
+                    slice(0,self.tot_spam_params), slice(None),
+                    make_calc_and_fill(noGates, noGates, None) )
+
+                #distribute derivative computation across blocks
+                myBlkIndices, blkOwners, blkComm = \
+                    _mpit.distribute_indices(list(range(nBlks)), mySubComm)
+                if blkComm is not None:
+                    _warnings.warn("Note: more CPUs(%d)" % mySubComm.Get_size()
+                       +" than derivative columns(%d)!" % self.tot_gate_params
+                       +" [blkSize = %.1f, nBlks=%d]" % (blkSize,nBlks))
+
+                wrtNoSpam = {'preps':slice(0,0),'effects':slice(0,0)}
+                for iBlk in myBlkIndices:
+                    gateSlice = _slct.shift(blocks[iBlk],-self.tot_spam_params)
+                    dProdCache = self._compute_dproduct_cache(evalSubTree, prodCache, scaleCache,
+                                                              blkComm, gateSlice)
+                    hvProdCache = self._compute_hvproduct_cache(evalSubTree, prodCache, dProdCache,
+                                                                dirCache, scaleCache, blkComm)
+                    dGs = evalSubTree.final_view(dProdCache, axis=0)
+                    hvGs = evalSubTree.final_view(hvProdCache, axis=0)
+
+                    self._fill_result_tuple(
+                        (derivMxToFill, mxToFill), spam_label_rows, fslc,
+                        blocks[iBlk], slice(None), make_calc_and_fill(dGs, hvGs, wrtNoSpam) )
+                    dProdCache = hvProdCache = dGs = hvGs = None #free mem
+
+                #gather results; gather axis 2 of mxToFill[:,fslc], dim=(K,s,M)
+                _mpit.gather_slices(blocks, blkOwners, mxToFill[:,fslc],
+                                    2, mySubComm, gatherMemLimit)
+                if derivMxToFill is not None:
+                    _mpit.gather_slices(blocks, blkOwners, derivMxToFill[:,fslc],
+                                        2, mySubComm, gatherMemLimit)
+
+        #collect/gather results
+        subtreeFinalSlices = [ t.final_slice(evalTree) for t in subtrees]
+        _mpit.gather_slices(subtreeFinalSlices, subTreeOwners, 
+                            mxToFill, 1, comm, gatherMemLimit) 
+        if derivMxToFill is not None:
+            _mpit.gather_slices(subtreeFinalSlices, subTreeOwners,
+                                derivMxToFill, 1, comm, gatherMemLimit) 
+        if prMxToFill is not None:
+            _mpit.gather_slices(subtreeFinalSlices, subTreeOwners,
+                                prMxToFill, 1, comm) 
+
+        if clipTo is not None and prMxToFill is not None:
+            _np.clip( prMxToFill, clipTo[0], clipTo[1], out=prMxToFill ) # in-place clip
+
+        if check:
+            self._check(evalTree, spam_label_rows, prMxToFill, derivMxToFill,
+                        clipTo=clipTo)
+
+
     def bulk_pr(self, spamLabel, evalTree, clipTo=None,
                 check=False, comm=None):
         """
@@ -3418,6 +4165,246 @@ class GateSetCalculator(object):
         dProdCache1 = dGs1 = None #free mem
                     
 
+    def bulk_sum_hprobs(self, weights, spam_label_rows, evalTree, comm=None):
+        """
+        Compute a weighted sum of the Hessians of the probabilities
+        generated by each gate sequence given by evalTree.
+
+        The result, `sum_{k,s} weights[k,s] * d2(P[k,s])/d(p1)d(p2)`, where
+        `P[k,s]` is the probability for the k-th spam label and s-th gate
+        string, is computed directly from a forward (state-side) and a
+        reverse (effect-side) sweep through each gate string.  Unlike
+        `bulk_fill_hprobs` and `bulk_hprobs_by_block`, no per-tree-element
+        caches of product Hessians (or derivatives) are created, so the
+        memory required is only O(num_params * (num_params + dim)).  This
+        makes it possible to compute, e.g., the Hessian of the
+        log-likelihood of gate sets with many parameters as the sum of
+        J^T W J (from first derivatives) and this second-order term.
+
+        As in `bulk_hproduct`, gates and SPAM vectors are assumed to be at
+        most linear in their parameters.  Products are not scaled, so gate
+        strings whose products underflow or overflow are not supported.
+
+        Parameters
+        ----------
+        weights : numpy ndarray
+            An array of shape (K,S), where K is the length of
+            `spam_label_rows` and S is the number of gate strings (i.e.
+            evalTree.num_final_strings()), giving the weight of each
+            probability's Hessian.  Its rows correspond to spam labels via
+            `spam_label_rows` and its columns are in the same order as the
+            results of the other bulk_* functions for `evalTree`.
+
+        spam_label_rows : dictionary
+            a dictionary with keys == spam labels and values which
+            are integer row indices into `weights`.
+
+        evalTree : EvalTree
+            given by a prior call to bulk_evaltree.  Specifies the gate strings
+            to compute the bulk operation on.
+
+        comm : mpi4py.MPI.Comm, optional
+           When not None, an MPI communicator for distributing the computation
+           across multiple processors.  The gate strings are divided among
+           the processors.
+
+        Returns
+        -------
+        numpy array
+            The (symmetric) weighted sum, of shape (num_params, num_params).
+        """
+        dim = self.dim
+        nP = self.tot_params
+        rank = 0 if (comm is None) else comm.Get_rank()
+        nprocs = 1 if (comm is None) else comm.Get_size()
+        gatestrings = evalTree.generate_gatestring_list(permute=False) #computation order
+
+        #Gate information: base matrix, derivatives, and parameter slice
+        # within the (gate-parameter-only) vector of gate parameters
+        gateInfo = {}; off = 0
+        for gateLabel,gate in self.gates.items():
+            nGP = gate.num_params()
+            dG = _np.swapaxes(gate.deriv_wrt_params(),0,1).reshape((nGP,dim,dim))
+            gateInfo[gateLabel] = (gate.base, dG, slice(off,off+nGP))
+            off += nGP
+        nGateP = off
+        gslc = slice(self.tot_spam_params, nP) # gate parameters in full vector
+
+        #Probabilities of the remainder spam label are 1 - (sum of all the
+        # others), so fold its weights into the weights of the other labels.
+        labelWeights = _collections.OrderedDict()
+        for spamLabel,rowIndex in spam_label_rows.items():
+            if self._is_remainder_spamlabel(spamLabel):
+                for sl in self.spamdefs:
+                    if self._is_remainder_spamlabel(sl): continue
+                    labelWeights[sl] = labelWeights.get(sl,0) - weights[rowIndex]
+            else:
+                labelWeights[spamLabel] = labelWeights.get(spamLabel,0) + weights[rowIndex]
+
+        #Group labels by prep: prepLabel => list of (E, E-derivs, weight vector)
+        # where E-derivs is a list of (paramSlice, dE/dParams) pairs
+        byPrep = _collections.OrderedDict()
+        for spamLabel,w in labelWeights.items():
+            rholabel,elabel = self.spamdefs[spamLabel]
+            E = _np.conjugate(_np.transpose(self._get_evec(elabel)))[0,:] # (dim,)
+            if elabel == self._remainderLabel:
+                dEs = [ (slice(self.tot_rho_params+self.e_offset[ei],
+                               self.tot_rho_params+self.e_offset[ei+1]),
+                         -1.0 * evec.deriv_wrt_params())
+                        for ei,evec in enumerate(self.effects.values()) ]
+            else:
+                ei = list(self.effects.keys()).index(elabel)
+                dEs = [ (slice(self.tot_rho_params+self.e_offset[ei],
+                               self.tot_rho_params+self.e_offset[ei+1]),
+                         self.effects[elabel].deriv_wrt_params()) ]
+            byPrep.setdefault(rholabel,[]).append( (E,dEs,w) )
+
+        hessian = _np.zeros( (nP,nP), 'd' ) # only "upper" terms; symmetrized below
+        myIndices, _ = _mpit.distribute_indices_base(
+            list(range(len(gatestrings))), nprocs, rank, allow_split_comm=False)
+
+        for rholabel,effectInfo in byPrep.items():
+            rho = self.preps[rholabel]
+            rhoIndex = list(self.preps.keys()).index(rholabel)
+            rslc = slice(self.rho_offset[rhoIndex],self.rho_offset[rhoIndex+1])
+            drho = rho.deriv_wrt_params() # (dim, nRhoParams)
+            hGates = hessian[gslc,gslc] # views
+            hGatesRho = hessian[gslc,rslc]
+
+            #Sums over gate strings of (weight * d(final state)/dParams), which
+            # give the effect-gate and effect-prep blocks once all strings are done
+            dStateSums = [ _np.zeros( (nGateP,dim), 'd' ) for E,dEs,w in effectInfo ]
+            dRhoSums = [ _np.zeros( (dim,drho.shape[1]), 'd' ) for E,dEs,w in effectInfo ]
+
+            for iStr in myIndices:
+                gatestring = gatestrings[iStr]
+                strWeights = [ w[iStr] for E,dEs,w in effectInfo ]
+                if all([ c == 0 for c in strWeights ]): continue
+
+                #Reverse sweep: effectVecs[n] = Ew^T G_L ... G_{n+1}, where Ew is
+                # the weighted sum of the effect vectors
+                L = len(gatestring)
+                effectVecs = [None]*L
+                l = sum([ c*E for c,(E,dEs,w) in zip(strWeights,effectInfo) ])
+                for n in reversed(range(L)):
+                    effectVecs[n] = l
+                    l = _np.dot(l, gateInfo[gatestring[n]][0])
+
+                #Forward sweep: state r = G_{n-1} ... G_1 rho, and its derivatives
+                # dState (w.r.t. gate params) and dRho (w.r.t. prep params)
+                r = rho.base[:,0]
+                dState = _np.zeros( (nGateP,dim), 'd' )
+                dRho = drho.copy()
+                for n,gateLabel in enumerate(gatestring):
+                    G, dG, pslc = gateInfo[gateLabel]
+                    W = _np.dot(effectVecs[n], dG) # (nGP, dim): Ew^T ... dG/dp
+                    hGates[pslc] += _np.dot(W, dState.T)
+                    hGatesRho[pslc] += _np.dot(W, dRho)
+
+                    dState = _np.dot(dState, G.T)
+                    dState[pslc] += _np.dot(dG, r)
+                    dRho = _np.dot(G, dRho)
+                    r = _np.dot(G, r)
+
+                for k,c in enumerate(strWeights):
+                    if c == 0: continue
+                    dStateSums[k] += c * dState
+                    dRhoSums[k] += c * dRho
+
+            for k,(E,dEs,w) in enumerate(effectInfo):
+                for eslc,dE in dEs:
+                    hessian[gslc,eslc] += _np.dot(dStateSums[k], dE)
+                    hessian[eslc,rslc] += _np.dot(dE.T, dRhoSums[k])
+
+        if comm is not None and nprocs > 1:
+            hessian = comm.allreduce(hessian)
+        return hessian + hessian.T
+
+
+    def bulk_hessian_vector_product(self, evalTree, v, returnPr=False,
+                                    returnDeriv=False, clipTo=None,
+                                    check=False, comm=None, wrtBlockSize=None):
+        """
+        Construct a dictionary containing the products of the bulk-probability-
+        Hessians with a vector `v` for every spam label (each possible
+        initialization & measurement pair) for each gate sequence given by
+        evalTree.
+
+        The products are computed from caches of product derivatives and
+        their directional derivatives along `v`, without ever creating the
+        Hessians themselves, and so cost roughly as much as computing
+        the probability derivatives twice.
+
+        Parameters
+        ----------
+        evalTree : EvalTree
+           given by a prior call to bulk_evaltree.  Specifies the gate strings
+           to compute the bulk operation on.
+
+        v : numpy array
+          The vector (of length equal to the number of gate set parameters)
+          to multiply the Hessians by.
+
+        returnPr : bool, optional
+          when set to True, additionally return the probabilities.
+
+        returnDeriv : bool, optional
+          when set to True, additionally return the probability derivatives.
+
+        clipTo : 2-tuple, optional
+           (min,max) to clip returned probability to if not None.
+           Only relevant when returnPr == True.
+
+        check : boolean, optional
+          If True, perform extra checks within code to verify correctness,
+          generating warnings when checks fail.  Used for testing, and runs
+          much slower when True.
+
+        comm : mpi4py.MPI.Comm, optional
+           When not None, an MPI communicator for distributing the computation
+           across multiple processors.
+
+        wrtBlockSize : int or float, optional
+          The maximum number of derivative columns to compute *products*
+          for simultaneously.  None means compute all columns at once.
+
+        Returns
+        -------
+        dict
+            A dictionary whose keys are spam labels and whose values are
+            `hvp`, `(hvp,pr)`, `(hvp,deriv)` or `(hvp,deriv,pr)` tuples
+            (depending on `returnDeriv` and `returnPr`), where `hvp` and
+            `deriv` are arrays of shape (S,M) and `pr` is an array of shape
+            (S,), for S gate strings and M gate set parameters.
+        """
+        spam_label_rows = \
+            { spamLabel: i for (i,spamLabel) in enumerate(self.spamdefs) }
+        nGateStrings = evalTree.num_final_strings()
+        nSpamLabels = len(self.spamdefs)
+
+        vhvp = _np.empty( (nSpamLabels,nGateStrings,self.tot_params), 'd' )
+        vdp = _np.empty( (nSpamLabels,nGateStrings,self.tot_params), 'd' ) \
+            if returnDeriv else None
+        vp = _np.empty( (nSpamLabels,nGateStrings), 'd' ) if returnPr else None
+
+        self.bulk_fill_hvprobs(vhvp, spam_label_rows, evalTree, v, vp, vdp,
+                               clipTo, check, comm, wrtBlockSize)
+        if returnDeriv:
+            if returnPr:
+                return { spamLabel: (vhvp[i],vdp[i],vp[i]) \
+                         for (i,spamLabel) in enumerate(self.spamdefs) }
+            else:
+                return { spamLabel: (vhvp[i],vdp[i]) \
+                         for (i,spamLabel) in enumerate(self.spamdefs) }
+        else:
+            if returnPr:
+                return { spamLabel: (vhvp[i],vp[i]) \
+                         for (i,spamLabel) in enumerate(self.spamdefs) }
+            else:
+                return { spamLabel: vhvp[i] \
+                         for (i,spamLabel) in enumerate(self.spamdefs) }
+
+
     def frobeniusdist(self, otherCalc, transformMx=None,
                       gateWeight=1.0, spamWeight=1.0, itemWeights=None,
                       normalize=True):
@@ -0,0 +1,358 @@
+from __future__ import division, print_function, absolute_import, unicode_literals
+#*****************************************************************
+#    pyGSTi 0.9:  Copyright 2015 Sandia Corporation
+#    This Software is released under the GPL license detailed
+#    in the file "license.txt" in the top-level pyGSTi directory
+#*****************************************************************
+""" Defines the MemoryModel class, used to plan bulk computations. """
+
+import json as _json
+import time as _time
+import numpy as _np
+
+try:
+    import tracemalloc as _tracemalloc
+except ImportError:
+    _tracemalloc = None # (python 2) calibration is unavailable
+
+from .verbosityprinter import VerbosityPrinter
+from .gscalc import CACHE_DTYPES as _CACHE_DTYPES
+
+
+# The memory used by each of the GateSet's bulk functions is modeled as a
+# sum of "features", each the size (in 8-byte floats) of a kind of array the
+# function allocates, times a coefficient.  The default coefficients are the
+# number of such arrays the function allocates at once; calibration replaces
+# them with measured values.
+DEFAULT_COEFFS = {
+    "bulk_fill_probs": { "prodCache": 1.0, "scaleCache": 2.0,
+                         "probsTmp": 1.0, "gather": 1.0 },
+    "bulk_fill_dprobs": { "dprodCache": 1.0, "prodCache": 1.0, "scaleCache": 2.0,
+                          "dprobsTmp": 1.0, "dprobsOut": 2.0, "gather": 1.0 },
+    "bulk_fill_hprobs": { "hprodCache": 1.0, "dprodCache": 1.0, "prodCache": 1.0,
+                          "scaleCache": 2.0, "hprobsTmp": 1.0, "hprobsOut": 2.0,
+                          "gather": 1.0 },
+    "bulk_fill_hvprobs": { "dprodCache": 2.0, "prodCache": 2.0, "scaleCache": 2.0,
+                           "dprobsTmp": 2.0, "dprobsOut": 2.0, "gather": 1.0 },
+    "bulk_hprobs_by_block": { "results": 2.0, "derivResults": 1.0, "hprodCache": 1.0,
+                              "dprodCache": 1.0, "prodCache": 1.0, "scaleCache": 2.0,
+                              "hprobsTmp": 1.0 },
+}
+
+# Weight of the calibrated coefficients' deviations from their defaults
+# (relative to the probes' relative errors) in MemoryModel.calibrate's fit.
+CALIBRATION_DAMPING = 1e-3
+
+
+def features(fnName, cacheSize, nFinal, wrtLen1, wrtLen2, dim, nspam, nparams,
+             nprocs=1, cacheFloatRatio=1.0, prodCacheDim2=None):
+    """
+    Computes the memory model's features for one of the GateSet's bulk
+    functions, i.e. the sizes, in 8-byte floats, of the kinds of arrays
+    that it allocates when evaluating a single (sub-)tree.
+
+    Parameters
+    ----------
+    fnName : str
+        The name of the bulk function, e.g. "bulk_fill_dprobs".
+
+    cacheSize, nFinal : int
+        The number of elements and final elements of the (sub-)tree.
+
+    wrtLen1, wrtLen2 : int
+        The number of parameters derivatives are computed with respect to
+        at once (the parameter block sizes).
+
+    dim, nspam, nparams : int
+        The gate set's dimension, number of SPAM labels and parameters.
+
+    nprocs : int, optional
+        The number of processors, which determines whether the results of
+        different processors are gathered.
+
+    cacheFloatRatio : float, optional
+        The size of a cache element relative to an 8-byte float.
+
+    prodCacheDim2 : int, optional
+        The number of elements stored per product in bulk_fill_probs's
+        product cache (less than dim**2 for block-diagonal gates).
+
+    Returns
+    -------
+    dict
+        A dictionary of feature values whose keys are those of
+        `DEFAULT_COEFFS[fnName]`.
+    """
+    cr = cacheFloatRatio; dim2 = dim*dim
+    gather = 1.0 if nprocs > 1 else 0.0
+    if fnName == "bulk_fill_probs":
+        return { "prodCache": cr * cacheSize * (dim2 if prodCacheDim2 is None else prodCacheDim2),
+                 "scaleCache": cacheSize,
+                 "probsTmp": nFinal * dim,
+                 "gather": gather * nspam * nFinal }
+    elif fnName == "bulk_fill_dprobs":
+        return { "dprodCache": cr * cacheSize * wrtLen1 * dim2,
+                 "prodCache": cr * cacheSize * dim2,
+                 "scaleCache": cacheSize,
+                 "dprobsTmp": nFinal * wrtLen1 * dim, # dot(dGs,rho) in _dprobs_from_rhoE
+                 "dprobsOut": nFinal * wrtLen1,
+                 "gather": gather * nspam * nFinal * nparams } # mpitools.gather_slices buffer
+    elif fnName == "bulk_fill_hprobs":
+        return { "hprodCache": cr * cacheSize * wrtLen1 * wrtLen2 * dim2,
+                 "dprodCache": cr * cacheSize * (wrtLen1 + wrtLen2) * dim2,
+                 "prodCache": cr * cacheSize * dim2,
+                 "scaleCache": cacheSize,
+                 "hprobsTmp": nFinal * wrtLen1 * wrtLen2 * dim,
+                 "hprobsOut": nFinal * wrtLen1 * wrtLen2,
+                 "gather": gather * nspam * nFinal * nparams**2 }
+    elif fnName == "bulk_fill_hvprobs":
+        return { "dprodCache": cr * cacheSize * wrtLen1 * dim2,
+                 "prodCache": cr * cacheSize * dim2,
+                 "scaleCache": cacheSize,
+                 "dprobsTmp": nFinal * wrtLen1 * dim,
+                 "dprobsOut": nFinal * wrtLen1,
+                 "gather": gather * nspam * nFinal * nparams }
+    elif fnName == "bulk_hprobs_by_block":
+        #Note: includes "results" memory since this is allocated within
+        # the generator and yielded, *not* allocated by the user.
+        return { "results": nspam * nFinal * wrtLen1 * wrtLen2,
+                 "derivResults": nspam * nFinal * (wrtLen1 + wrtLen2),
+                 "hprodCache": cr * cacheSize * wrtLen1 * wrtLen2 * dim2,
+                 "dprodCache": cr * cacheSize * (wrtLen1 + wrtLen2) * dim2,
+                 "prodCache": cr * cacheSize * dim2,
+                 "scaleCache": cacheSize,
+                 "hprobsTmp": nFinal * wrtLen1 * wrtLen2 * dim }
+    else:
+        raise ValueError("Unknown subcall name: %s" % fnName)
+
+
+def gateset_sizes(gateset):
+    """
+    Returns a dictionary of the sizes (keyword arguments of :func:`features`)
+    which are determined by `gateset`.
+    """
+    dim = gateset.get_dimension()
+    blocks = gateset._calc()._get_gate_blocks() #bulk_fill_probs caches only these
+    return { 'dim': dim, 'nspam': len(gateset.get_spam_labels()),
+             'nparams': gateset.num_params(),
+             'cacheFloatRatio': _CACHE_DTYPES[gateset.cache_precision].itemsize / 8.0,
+             'prodCacheDim2': sum([len(blk)**2 for blk in blocks]) if blocks else dim*dim }
+
+
+class MemoryModel(object):
+    """
+    A model of the peak memory used by the GateSet's bulk functions (e.g.
+    `bulk_fill_dprobs`) as a function of the size of the evaluation tree and
+    of the parameter block sizes, used by
+    `GateSet.bulk_evaltree_from_resources` to decide how to split trees and
+    parameters.  The model's coefficients can be measured for a particular
+    machine and gate set by :meth:`calibrate` and saved to and loaded from
+    a file.
+    """
+
+    def __init__(self, coeffs=None):
+        """
+        Create a new MemoryModel.
+
+        Parameters
+        ----------
+        coeffs : dict, optional
+            A dictionary of per-function dictionaries of feature
+            coefficients (see `DEFAULT_COEFFS`), which update the defaults.
+        """
+        self.coeffs = { fn: dict(c) for fn,c in DEFAULT_COEFFS.items() }
+        if coeffs is not None:
+            for fn,c in coeffs.items():
+                self.coeffs[fn].update(c)
+
+    def estimate(self, subcalls, **sizes):
+        """
+        Estimate the peak memory used by a processor calling each of the
+        bulk functions `subcalls` (one after another) on the same tree.
+
+        Parameters
+        ----------
+        subcalls : list
+            The names of the bulk functions.
+
+        sizes : keyword arguments
+            The sizes given to :func:`features`.
+
+        Returns
+        -------
+        float
+            The estimated memory, in bytes.
+        """
+        mem = 0
+        for fnName in subcalls:
+            c = self.coeffs[fnName]
+            mem += sum([ c[k]*v for k,v in features(fnName, **sizes).items() ])
+        return mem * 8
+
+    def calibrate(self, gateset, gatestring_list, subcalls=None,
+                  sizeFractions=(0.25,0.5,1.0), nParamBlocks=(1,3), verbosity=0):
+        """
+        Measure the memory used by the bulk functions and fit this model's
+        coefficients to the measurements.
+
+        Each function in `subcalls` is run ("probed") on evaluation trees of
+        the gate strings `gatestring_list[0:n]`, for each `n` given by
+        `sizeFractions`, and with each of the parameter block sizes given by
+        `nParamBlocks`, and the peak memory it allocates is measured.  The
+        coefficients are then fit (non-negatively) to the measurements.  For
+        the best results, probe sizes should be representative of, though
+        they can be much smaller than, the sizes of the planned computations.
+
+        Parameters
+        ----------
+        gateset : GateSet
+            The gate set to probe with.
+
+        gatestring_list : list of (tuples or GateStrings)
+            The gate strings to probe with.
+
+        subcalls : list, optional
+            The names of the functions to calibrate.  Defaults to all the
+            functions known to the model.
+
+        sizeFractions : tuple, optional
+            The fractions of `gatestring_list` to probe with.
+
+        nParamBlocks : tuple, optional
+            The numbers of parameter blocks to probe with.
+
+        verbosity : int, optional
+            How much detail to send to stdout.
+
+        Returns
+        -------
+        None
+        """
+        from scipy.optimize import nnls as _nnls
+        if _tracemalloc is None:
+            raise ValueError("Memory calibration requires the tracemalloc module")
+
+        printer = VerbosityPrinter.build_printer(verbosity)
+        if subcalls is None: subcalls = sorted(DEFAULT_COEFFS.keys())
+        spam_label_rows = { sl: i for i,sl in enumerate(gateset.get_spam_labels()) }
+        gsSizes = gateset_sizes(gateset)
+        nspam, nparams = gsSizes['nspam'], gsSizes['nparams']
+
+        for fnName in subcalls:
+            tm = _time.time()
+            names = sorted(DEFAULT_COEFFS[fnName].keys())
+            A = []; b = []
+            for frac in sizeFractions:
+                nStrs = max(int(round(frac*len(gatestring_list))), 1)
+                evt = gateset.bulk_evaltree(gatestring_list[0:nStrs])
+                for nBlks in nParamBlocks:
+                    wrtLen = (nparams+nBlks-1) // nBlks
+                    peak = _measure_peak(_probe(gateset, fnName, evt, spam_label_rows,
+                                                nspam, nparams, wrtLen))
+                    f = features(fnName, len(evt), nStrs, wrtLen, wrtLen, **gsSizes)
+                    A.append( [ f[k] for k in names ] ); b.append( peak / 8.0 )
+
+            #Fit the coefficients' ratios to their defaults, y, minimizing the
+            # probes' relative errors, |A.x - b|/b, plus CALIBRATION_DAMPING * |y - 1|^2
+            # so that features which can't be told apart (e.g. because they
+            # are proportional for these probes) keep their relative sizes.
+            A = _np.array(A,'d'); b = _np.array(b,'d')
+            measured = [ j for j in range(len(names)) if _np.any(A[:,j] > 0) ]
+            x0 = _np.array([ DEFAULT_COEFFS[fnName][names[j]] or 1.0 for j in measured ])
+            M = _np.concatenate( (A[:,measured] * x0[None,:] / b[:,None],
+                                  _np.sqrt(CALIBRATION_DAMPING) * _np.identity(len(measured))), axis=0)
+            rhs = _np.concatenate( (_np.ones(len(b)), _np.sqrt(CALIBRATION_DAMPING) * _np.ones(len(measured))) )
+            y,_ = _nnls(M, rhs)
+            for j,xj in zip(measured, x0*y):
+                self.coeffs[fnName][names[j]] = float(xj)
+            relErr = _np.max(_np.abs(_np.dot(A[:,measured], x0*y) - b) / b)
+            printer.log("Calibrated %s memory model in %.1fs (%d probes, max rel. error = %.2g)"
+                        % (fnName, _time.time()-tm, len(b), relErr))
+
+    def save(self, filename):
+        """
+        Save this model's coefficients to a (JSON) file.
+
+        Parameters
+        ----------
+        filename : str
+            The file to save to.
+
+        Returns
+        -------
+        None
+        """
+        with open(filename, "w") as f:
+            _json.dump(self.coeffs, f, indent=2, sort_keys=True)
+
+    @classmethod
+    def load(cls, filename):
+        """
+        Load a model saved by :meth:`save`.
+
+        Parameters
+        ----------
+        filename : str
+            The file to load.
+
+        Returns
+        -------
+        MemoryModel
+        """
+        with open(filename, "r") as f:
+            return cls(_json.load(f))
+
+    def __str__(self):
+        return "\n".join([ "%s: %s" % (fn, ", ".join([ "%s=%.3g" % kv for kv in sorted(c.items()) ]))
+                           for fn,c in sorted(self.coeffs.items()) ])
+
+
+def _probe(gateset, fnName, evt, spam_label_rows, nspam, nparams, wrtLen):
+    """ Returns a function that calls `fnName` with freshly allocated results """
+    nStrs = evt.num_final_strings()
+    def probe():
+        if fnName == "bulk_fill_probs":
+            gateset.bulk_fill_probs(_np.empty( (nspam,nStrs) ), spam_label_rows, evt)
+        elif fnName == "bulk_fill_dprobs":
+            gateset.bulk_fill_dprobs(_np.empty( (nspam,nStrs,nparams) ), spam_label_rows,
+                                     evt, wrtBlockSize=wrtLen)
+        elif fnName == "bulk_fill_hprobs":
+            gateset.bulk_fill_hprobs(_np.empty( (nspam,nStrs,nparams,nparams) ), spam_label_rows,
+                                     evt, wrtBlockSize1=wrtLen, wrtBlockSize2=wrtLen)
+        elif fnName == "bulk_fill_hvprobs":
+            gateset.bulk_fill_hvprobs(_np.empty( (nspam,nStrs,nparams) ), spam_label_rows,
+                                      evt, _np.ones(nparams), wrtBlockSize=wrtLen)
+        elif fnName == "bulk_hprobs_by_block":
+            for blk in gateset.bulk_hprobs_by_block(
+                    spam_label_rows, evt, [(slice(0,wrtLen),slice(0,wrtLen))], True):
+                blk = None
+        else:
+            raise ValueError("Unknown subcall name: %s" % fnName)
+    return probe
+
+
+def _measure_peak(fn):
+    """
+    Returns the peak memory, in bytes, allocated while calling `fn`.
+
+    (Profiler.mem_check samples the process's memory at given points, and
+    so misses temporaries freed within a call, whereas numpy reports its
+    allocations to `tracemalloc`, which records their peak.)
+    """
+    wasTracing = _tracemalloc.is_tracing()
+    if wasTracing and hasattr(_tracemalloc, "reset_peak"): # python >= 3.9
+        _tracemalloc.reset_peak()
+    else:
+        if wasTracing: _tracemalloc.stop() # restarting clears the peak
+        _tracemalloc.start()
+
+    try:
+        base = _tracemalloc.get_traced_memory()[0]
+        fn()
+        peak = _tracemalloc.get_traced_memory()[1]
+    finally:
+        if not wasTracing: _tracemalloc.stop()
+    return max(peak - base, 0)
+
+
+default_model = MemoryModel()
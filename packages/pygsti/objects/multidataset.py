@@ -12,6 +12,7 @@ from collections import OrderedDict as _OrderedDict
 
 from .dataset import DataSet as _DataSet
 from . import gatestring as _gs
+from .gatestringindex import CompactGateStringIndex as _CompactGateStringIndex
 
 
 class MultiDataSet_KeyValIterator(object):
@@ -114,12 +115,11 @@ class MultiDataSet(object):
             return
 
         # self.gsIndex  :  Ordered dictionary where keys = gate strings (tuples), values = integer indices into counts
+        #                  (a CompactGateStringIndex, as for a static DataSet, unless gateStringIndices is given)
         if gateStringIndices is not None:
             self.gsIndex = gateStringIndices
         elif gateStrings is not None:
-            dictData = [ (gs if isinstance(gs,_gs.GateString) else _gs.GateString(gs),i) \
-                           for (i,gs) in enumerate(gateStrings) ] #convert to GateStrings if necessary
-            self.gsIndex = _OrderedDict( dictData )
+            self.gsIndex = _CompactGateStringIndex.from_gatestrings(gateStrings)
         else:
             self.gsIndex = None
 
@@ -320,16 +320,22 @@ class MultiDataSet(object):
 
 
     def __getstate__(self):
-        toPickle = { 'gsIndexKeys': list(map(_gs.CompressedGateString, list(self.gsIndex.keys()))) if self.gsIndex else [],
-                     'gsIndexVals': list(self.gsIndex.values()) if self.gsIndex else [],
-                     'slIndex': self.slIndex,
+        toPickle = { 'slIndex': self.slIndex,
                      'countsDict': self.countsDict,
                      'collisionActions': self.collisionActions }
+        if isinstance(self.gsIndex, _CompactGateStringIndex):
+            toPickle['gsIndex'] = self.gsIndex #already compact
+        else:
+            toPickle['gsIndexKeys'] = list(map(_gs.CompressedGateString, list(self.gsIndex.keys()))) if self.gsIndex else []
+            toPickle['gsIndexVals'] = list(self.gsIndex.values()) if self.gsIndex else []
         return toPickle
 
     def __setstate__(self, state_dict):
-        gsIndexKeys = [ cgs.expand() for cgs in state_dict['gsIndexKeys'] ]
-        self.gsIndex = _OrderedDict( list(zip(gsIndexKeys, state_dict['gsIndexVals'])) )
+        if 'gsIndex' in state_dict:
+            self.gsIndex = state_dict['gsIndex']
+        else:
+            gsIndexKeys = [ cgs.expand() for cgs in state_dict['gsIndexKeys'] ]
+            self.gsIndex = _OrderedDict( list(zip(gsIndexKeys, state_dict['gsIndexVals'])) )
         self.slIndex = state_dict['slIndex']
         self.countsDict = state_dict['countsDict']
         self.collisionActions = state_dict['collisionActions']
@@ -399,7 +405,7 @@ class MultiDataSet(object):
         gsIndexKeys = [ expand(cgs) for cgs in state_dict['gsIndexKeys'] ]
 
         #gsIndexKeys = [ cgs.expand() for cgs in state_dict['gsIndexKeys'] ]
-        self.gsIndex = _OrderedDict( list(zip(gsIndexKeys, state_dict['gsIndexVals'])) )
+        self.gsIndex = _CompactGateStringIndex.from_gatestrings(gsIndexKeys, state_dict['gsIndexVals'])
         self.slIndex = state_dict['slIndex']
         self.collisionActions = state_dict['collisionActions']
         self.countsDict = _OrderedDict()
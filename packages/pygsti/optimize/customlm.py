@@ -14,11 +14,57 @@ from ..tools import mpitools as _mpit
 
 #constants
 MACH_PRECISION = 1e-12
+GEODESIC_H = 0.1      # finite-difference step (relative to dx) for the 2nd directional derivative
+GEODESIC_ALPHA = 0.75 # max. allowed 2*|acceleration|/|velocity| of a geodesic-accelerated step
+BROYDEN_MIN_GAIN = 0.25 # min. gain ratio for which a Broyden-updated jacobian is kept
+
+
+class CustomLMState(object):
+    """
+    The damping state of :func:`custom_leastsq`, which can be carried from
+    one optimization to the next, similar, one (e.g. the next stage of an
+    iterative GST optimization) so that it doesn't start from scratch.
+    """
+    def __init__(self):
+        self.mu = None # damping parameter at the end of the last optimization
+        self.max_jtj_diag = None # max. diagonal element of J^T J for `mu`
+        self.step_norms = [] # norms of all the accepted steps
+
+    def __str__(self):
+        return "CustomLMState: mu=%s, max(diag(JTJ))=%s, %d steps taken" % \
+            (str(self.mu), str(self.max_jtj_diag), len(self.step_norms))
 
 
 def custom_leastsq(obj_fn, jac_fn, x0, f_norm2_tol=1e-6, jac_norm_tol=1e-6,
                    rel_ftol=1e-6, rel_xtol=1e-6, max_iter=100, comm=None,
-                   verbosity=0, profiler=None):
+                   verbosity=0, profiler=None, jtjf_fn=None,
+                   distributed_solve=False, broyden_updates=0,
+                   geodesic_accel=False, state=None):
+    #Note: if `jtjf_fn` is given, it is called as jtjf_fn(x, obj_fn(x)) and
+    # returns the (JTJ, JTf) products of the jacobian, which is then never
+    # needed in full, and `jac_fn` isn't used (it may be None).
+    #Note: if `distributed_solve` is True each processor keeps only its block
+    # of rows of JTJ, and the damped normal equations are solved by a
+    # distributed conjugate gradient method (see mpitools.mpi_cg_solve)
+    # instead of serially on every processor.  This is opt-in: it divides
+    # the memory of JTJ among the processors, but the iterative solve is
+    # usually slower than a direct one unless JTJ is very large.  In this
+    # case `jtjf_fn` must return just the current processor's rows of JTJ
+    # (see mpitools.distribute_rows), so that the whole of JTJ is never
+    # needed on any processor.
+    #Note: if `broyden_updates` > 0, up to this many successive outer
+    # iterations use a jacobian obtained by rank-one (Broyden) updates of the
+    # last one computed by `jac_fn`, which is updated *in place*.  The
+    # jacobian is recomputed when progress stalls (a step is rejected or has
+    # a poor gain ratio) and before declaring convergence.  If
+    # `geodesic_accel` is True, each step includes the "geodesic
+    # acceleration" correction of Transtrum & Sethna (arXiv:1201.5885), at
+    # the cost of one more `obj_fn` evaluation per step.  Both require the
+    # jacobian itself, so they are ignored when `jtjf_fn` is given.
+    #Note: `state` may be a CustomLMState, which is updated with the final
+    # damping of this optimization.  If it holds the damping of a previous
+    # optimization, that damping (relative to the largest diagonal element
+    # of J^T J) is used initially instead of the default, when smaller.
     msg = ""
     converged = False
     x = x0
@@ -28,7 +74,17 @@ def custom_leastsq(obj_fn, jac_fn, x0, f_norm2_tol=1e-6, jac_norm_tol=1e-6,
     tau = 1e-3
     nu = 2
     mu = 0 #initialized on 1st iter
+    max_JTJ_diag = None
     my_cols_slice = None
+    Jac = None
+    broyden_jac = False # whether Jac holds a Broyden-updated jacobian
+    nBroyden = 0 # number of Broyden updates applied to Jac
+
+    if jtjf_fn is not None:
+        broyden_updates = 0; geodesic_accel = False
+
+    my_rows_slice = _mpit.distribute_rows(len(x0), comm) \
+        if distributed_solve else None
 
     if comm is not None and comm.Get_rank() != 0:
         verbosity = 0 #Only print to stdout from root process
@@ -36,6 +92,11 @@ def custom_leastsq(obj_fn, jac_fn, x0, f_norm2_tol=1e-6, jac_norm_tol=1e-6,
     if not _np.isfinite(norm_f):
         msg = "Infinite norm of objective function at initial point!"
 
+    def damped_solve(rhs): # solves (damped) JTJ * x = rhs
+        if distributed_solve:
+            return _mpit.mpi_cg_solve(JTJ, rhs, my_rows_slice, comm)
+        return _np.linalg.solve(JTJ, rhs), True
+
 
     for k in range(max_iter): #outer loop
         # assume x, f, fnorm hold valid values
@@ -51,33 +112,58 @@ def custom_leastsq(obj_fn, jac_fn, x0, f_norm2_tol=1e-6, jac_norm_tol=1e-6,
             print("--- Outer Iter %d: norm_f = %g, mu=%g" % (k,norm_f,mu))
             
         if profiler: profiler.mem_check("custom_leastsq: begin outer iter *before de-alloc*")
-        Jac = None; JTJ = None; JTf = None
+        JTJ = None; JTf = None
+        if not broyden_jac: Jac = None
 
         if profiler: profiler.mem_check("custom_leastsq: begin outer iter")
-        Jac = jac_fn(x)
-        if profiler: profiler.mem_check("custom_leastsq: after jacobian:" 
-                                        + "shape=%s, GB=%.2f" % (str(Jac.shape),
-                                                        Jac.nbytes/(1024.0**3)) )
-
-        tm = _time.time()
-        if my_cols_slice is None:
-            my_cols_slice = _mpit.distribute_for_dot(Jac.shape[0], comm)
-        JTJ = _mpit.mpidot(Jac.T,Jac,my_cols_slice,comm)   #_np.dot(Jac.T,Jac)
-        JTf = _np.dot(Jac.T,f)
-        if profiler: profiler.add_time("custom_leastsq: dotprods",tm)
-
-        idiag = _np.diag_indices_from(JTJ)
+        if jtjf_fn is not None:
+            JTJ, JTf = jtjf_fn(x, f) # only this processor's rows of JTJ if distributed_solve
+            if profiler: profiler.mem_check("custom_leastsq: after JTJ and JTf:"
+                                            + "shape=%s, GB=%.2f" % (str(JTJ.shape),
+                                                            JTJ.nbytes/(1024.0**3)) )
+        else:
+            if Jac is None:
+                Jac = jac_fn(x); nBroyden = 0
+                if profiler: profiler.mem_check("custom_leastsq: after jacobian:" 
+                                                + "shape=%s, GB=%.2f" % (str(Jac.shape),
+                                                                Jac.nbytes/(1024.0**3)) )
+
+            tm = _time.time()
+            if distributed_solve: # just this processor's rows of JTJ
+                JTJ = _np.dot(Jac[:,my_rows_slice].T,Jac)
+            else:
+                if my_cols_slice is None:
+                    my_cols_slice = _mpit.distribute_for_dot(Jac.shape[0], comm)
+                JTJ = _mpit.mpidot(Jac.T,Jac,my_cols_slice,comm)   #_np.dot(Jac.T,Jac)
+            JTf = _np.dot(Jac.T,f)
+            if profiler: profiler.add_time("custom_leastsq: dotprods",tm)
+
+        if distributed_solve: # diagonal elements within this processor's rows
+            nLocRows = JTJ.shape[0]
+            idiag = (_np.arange(nLocRows), my_rows_slice.start + _np.arange(nLocRows))
+        else:
+            idiag = _np.diag_indices_from(JTJ)
         norm_JTf = _np.linalg.norm(JTf,ord=_np.inf)
         norm_x = _np.dot(x,x) # _np.linalg.norm(x)**2
-        undampled_JTJ_diag = JTJ.diagonal().copy()
+        undampled_JTJ_diag = JTJ[idiag].copy()
 
         if norm_JTf < jac_norm_tol:
+            if broyden_jac: # check with the actual jacobian before stopping
+                broyden_jac = False; continue
             msg = "norm(jacobian) is at most %g" % jac_norm_tol
             converged = True; break
 
+        if k == 0 or state is not None:
+            max_JTJ_diag = _np.max(undampled_JTJ_diag) if len(undampled_JTJ_diag) > 0 else 0.0
+            if distributed_solve and comm is not None:
+                max_JTJ_diag = max(comm.allgather(max_JTJ_diag))
+
         if k == 0:
             #mu = tau # initial damping element
-            mu = tau * _np.max(undampled_JTJ_diag) # initial damping element
+            mu = tau * max_JTJ_diag # initial damping element
+            if state is not None and state.mu is not None and state.max_jtj_diag > 0:
+                warm_mu = state.mu * max_JTJ_diag / state.max_jtj_diag
+                if 0 < warm_mu < mu: mu = warm_mu # warm start
 
         #determing increment using adaptive damping
         while True:  #inner loop
@@ -89,9 +175,18 @@ def custom_leastsq(obj_fn, jac_fn, x0, f_norm2_tol=1e-6, jac_norm_tol=1e-6,
             try:
                 if profiler: profiler.mem_check("custom_leastsq: before linsolve")
                 tm = _time.time()
-                success = True
-                dx = _np.linalg.solve(JTJ, -JTf) 
+                dx, success = damped_solve(-JTf)
                 if profiler: profiler.add_time("custom_leastsq: linsolve",tm)
+
+                if success and geodesic_accel:
+                    #2nd directional derivative of f along dx, by finite difference
+                    tm = _time.time()
+                    f_h = obj_fn(x + GEODESIC_H*dx)
+                    rvv = (2.0/GEODESIC_H) * ((f_h - f)/GEODESIC_H - _np.dot(Jac,dx))
+                    accel, accel_ok = damped_solve(-_np.dot(Jac.T,rvv))
+                    if accel_ok and 2*_np.linalg.norm(accel) <= GEODESIC_ALPHA*_np.linalg.norm(dx):
+                        dx = dx + 0.5*accel # else the acceleration is unreliable: just use dx
+                    if profiler: profiler.add_time("custom_leastsq: geodesic accel",tm)
             except _np.linalg.LinAlgError:
                 success = False
             
@@ -104,6 +199,8 @@ def custom_leastsq(obj_fn, jac_fn, x0, f_norm2_tol=1e-6, jac_norm_tol=1e-6,
                     print("  - Inner Loop: mu=%g, norm_dx=%g" % (mu,norm_dx))
 
                 if norm_dx < (rel_xtol**2)*norm_x:
+                    if broyden_jac: # check with the actual jacobian before stopping
+                        broyden_jac = False; break
                     msg = "Relative change in |x| is at most %g" % rel_xtol
                     converged = True; break
 
@@ -116,7 +213,11 @@ def custom_leastsq(obj_fn, jac_fn, x0, f_norm2_tol=1e-6, jac_norm_tol=1e-6,
                 if not _np.isfinite(norm_new_f): # avoid infinite loop...
                     msg = "Infinite norm of objective function!"; break
 
-                dL = _np.dot(dx, mu*dx - JTf) # expected decrease in ||F||^2 from linear model
+                if geodesic_accel: # dx doesn't solve the damped equations
+                    Jdx = _np.dot(Jac,dx)
+                    dL = -2*_np.dot(dx,JTf) - _np.dot(Jdx,Jdx) # expected decrease in ||F||^2 from linear model
+                else:
+                    dL = _np.dot(dx, mu*dx - JTf) # expected decrease in ||F||^2 from linear model
                 dF = norm_f - norm_new_f      # actual decrease in ||F||^2
 
                 if verbosity > 1:
@@ -124,6 +225,8 @@ def custom_leastsq(obj_fn, jac_fn, x0, f_norm2_tol=1e-6, jac_norm_tol=1e-6,
                           (norm_new_f,dL,dF,dL/norm_f,dF/norm_f))
 
                 if dL/norm_f < rel_ftol and dF/norm_f < rel_ftol and dF/dL < 2.0:
+                    if broyden_jac: # check with the actual jacobian before stopping
+                        broyden_jac = False; break
                     msg = "Both actual and predicted relative reductions in the" + \
                         " sum of squares are at most %g" % rel_ftol
                     converged = True; break
@@ -135,7 +238,16 @@ def custom_leastsq(obj_fn, jac_fn, x0, f_norm2_tol=1e-6, jac_norm_tol=1e-6,
                     t = 1.0 - (2*dF/dL-1.0)**3 # dF/dL == gain ratio
                     mu *= max(t,1.0/3.0)
                     nu = 2
+
+                    if nBroyden < broyden_updates and dF/dL >= BROYDEN_MIN_GAIN:
+                        #rank-one update so that Jac*dx == new_f - f
+                        Jac += _np.outer(new_f - f - _np.dot(Jac,dx), dx/norm_dx)
+                        nBroyden += 1; broyden_jac = True
+                    else:
+                        broyden_jac = False
+
                     x,f, norm_f = new_x, new_f, norm_new_f
+                    if state is not None: state.step_norms.append(_np.sqrt(norm_dx))
 
                     if verbosity > 1:
                         print("      Accepted! gain ratio=%g  mu * %g => %g"
@@ -153,6 +265,9 @@ def custom_leastsq(obj_fn, jac_fn, x0, f_norm2_tol=1e-6, jac_norm_tol=1e-6,
 
             # if this point is reached, either the linear solve failed
             # or the error did not reduce.  In either case, reject increment.
+
+            if broyden_jac: # progress stalled - first try the actual jacobian
+                broyden_jac = False; break
                 
             #Increase damping (mu), then increase damping factor to 
             # accelerate further damping increases.
@@ -171,6 +286,9 @@ def custom_leastsq(obj_fn, jac_fn, x0, f_norm2_tol=1e-6, jac_norm_tol=1e-6,
         #if no break stmt hit, then we've exceeded maxIter
         msg = "Maximum iterations (%d) exceeded" % max_iter
 
+    if state is not None and mu > 0 and max_JTJ_diag:
+        state.mu = mu; state.max_jtj_diag = max_JTJ_diag
+
     #JTJ[idiag] = undampled_JTJ_diag #restore diagonal
     return x, converged, msg
     #solution = _optResult()
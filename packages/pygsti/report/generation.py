@@ -2028,7 +2028,8 @@ def get_logl_confidence_region(gateset, dataset, confidenceLevel,
                                gatestring_list=None, probClipInterval=(-1e6,1e6),
                                minProbClip=1e-4, radius=1e-4, hessianProjection="std",
                                regionType="std", comm=None, memLimit=None,
-                               cptp_penalty_factor=None, distributeMethod="deriv"):
+                               cptp_penalty_factor=None, distributeMethod="deriv",
+                               hessianMethod="direct"):
 
     """
     Constructs a ConfidenceRegion given a gateset and dataset using the log-likelihood Hessian.
@@ -2108,6 +2109,11 @@ def get_logl_confidence_region(gateset, dataset, confidenceLevel,
         The distribute-method used in MLGST when computing error bars via
         linear-response.
 
+    hessianMethod : {"direct", "hprobs"}, optional
+        How the log-likelihood Hessian is computed (see the `method` argument
+        of `logl_hessian`).  "direct" avoids holding the Hessians of
+        individual probabilities, and so needs much less memory.
+
 
     Returns
     -------
@@ -2121,7 +2127,8 @@ def get_logl_confidence_region(gateset, dataset, confidenceLevel,
         vb = 3 if memLimit else 0 #only show details of hessian comp when there's a mem limit (a heuristic)
         hessian = _tools.logl_hessian(gateset, dataset, gatestring_list,
                                       minProbClip, probClipInterval, radius,
-                                      comm=comm, memLimit=memLimit, verbosity=vb)
+                                      comm=comm, memLimit=memLimit, verbosity=vb,
+                                      method=hessianMethod)
         mlgst_args = None
     else: 
         hessian = None
@@ -183,6 +183,100 @@ def chi2(dataset, gateset, gateStrings=None,
 
 
 
+def chi2_hessian_vector_product(dataset, gateset, v, gateStrings=None,
+                                minProbClipForWeighting=1e-4, clipTo=None,
+                                check=False, comm=None, memLimit=None):
+    """
+    Computes the product of the Hessian of the total chi^2 with a vector.
+
+    This is the same as `numpy.dot(d2chi2, v)`, where `d2chi2` is the Hessian
+    returned by :func:`chi2`, but is computed without the Hessians of the
+    probabilities (see `GateSet.bulk_fill_hvprobs`), and so needs much less
+    memory when there are many gate set parameters.
+
+    Parameters
+    ----------
+    dataset : DataSet
+        The data used to specify frequencies and counts
+
+    gateset : GateSet
+        The gate set used to specify the probabilities and SPAM labels
+
+    v : numpy array
+        The vector, of length nGatesetParams, to multiply the Hessian by.
+
+    gateStrings : list of GateStrings or tuples, optional
+        List of gate strings whose terms will be included in chi^2 sum.
+        Default value (None) means "all strings in dataset".
+
+    minProbClipForWeighting : float, optional
+        defines the clipping interval for the statistical weight (see chi2fn).
+
+    clipTo : 2-tuple, optional
+        (min,max) to clip probabilities to within GateSet probability
+        computation routines (see GateSet.bulk_fill_probs)
+
+    check : bool, optional
+        If True, perform extra checks within code to verify correctness.  Used
+        for testing, and runs much slower when True.
+
+    comm : mpi4py.MPI.Comm, optional
+        When not None, an MPI communicator for distributing the computation
+        across multiple processors.  All processors return the same result.
+
+    memLimit : int, optional
+        A rough memory limit in bytes which restricts the amount of intermediate
+        values that are computed and stored.
+
+    Returns
+    -------
+    numpy array
+        The Hessian-vector product, of length nGatesetParams.
+    """
+    spamLabels = gateset.get_spam_labels() #this list fixes the ordering of the spam labels
+    spam_lbl_rows = { sl:i for (i,sl) in enumerate(spamLabels) }
+    vec_gs_len = gateset.num_params()
+    v = _np.asarray(v,'d')
+    assert(v.shape == (vec_gs_len,))
+
+    if gateStrings is None:
+        gateStrings = list(dataset.keys())
+
+    evTree, blkSize, _ = gateset.bulk_evaltree_from_resources(
+        gateStrings, comm, memLimit, "gatestrings", ['bulk_fill_hvprobs'])
+
+    nSpamLabels = len(spamLabels)
+    nGateStrings = len(gateStrings)
+    N      = _np.empty( nGateStrings )
+    f      = _np.empty( (nSpamLabels, nGateStrings) )
+    probs  = _np.empty( (nSpamLabels, nGateStrings) )
+    dprobs = _np.empty( (nSpamLabels, nGateStrings, vec_gs_len) )
+    hvprobs = _np.empty( (nSpamLabels, nGateStrings, vec_gs_len) )
+
+    #evTree may have re-ordered the gate strings (if it was split)
+    for (i,gateStr) in enumerate(evTree.generate_gatestring_list(permute=False)):
+        N[i] = float(dataset[gateStr].total())
+        for k,sl in enumerate(spamLabels):
+            f[k,i] = dataset[gateStr].fraction(sl)
+
+    gateset.bulk_fill_hvprobs(hvprobs, spam_lbl_rows, evTree, v,
+                              probs, dprobs, clipTo, check, comm,
+                              wrtBlockSize=blkSize)
+
+    # d2(chi^2)/dydx = sum_i N_i * [ (1/c_i - (p_i-f_i)/c_i^2) * (2 - 2 t_i) * dp_i/dx * dp_i/dy
+    #                                + t_i * [2 - t_i] * d2p_i/dydx ]    (see chi2 above)
+    cprobs = _np.clip(probs,minProbClipForWeighting,1e10) #effectively no upper bound
+    t = (probs - f)/cprobs # (K,M)
+    dprobs12_coeffs = N[None,:] * (1.0/cprobs - (probs-f)/cprobs**2) * (2 - 2*t)
+    hprobs_coeffs = N[None,:] * t * (2 - t)
+
+    hvp = _np.zeros( vec_gs_len, 'd' )
+    for k in range(nSpamLabels):
+        hvp += _np.dot(dprobs[k].T, dprobs12_coeffs[k] * _np.dot(dprobs[k],v))
+        hvp += _np.dot(hvprobs[k].T, hprobs_coeffs[k])
+    return hvp
+
+
 #def _oldTotalChiSquared( dataset, gateset, gateStrings=None, useFreqWeightedChiSq=False,
 #                     minProbClipForWeighting=1e-4):
 #    """
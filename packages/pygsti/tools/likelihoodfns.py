@@ -413,7 +413,8 @@ def logl_jacobian(gateset, dataset, gatestring_list=None,
 
 def logl_hessian(gateset, dataset, gatestring_list=None, minProbClip=1e-6,
                  probClipInterval=(-1e6,1e6), radius=1e-4, poissonPicture=True,
-                 check=False, comm=None, memLimit=None, verbosity=0):
+                 check=False, comm=None, memLimit=None, verbosity=0,
+                 method="hprobs"):
     """
     The hessian of the log-likelihood function.
 
@@ -463,12 +464,26 @@ def logl_hessian(gateset, dataset, gatestring_list=None, minProbClip=1e-6,
     verbosity : int, optional
         How much detail to print to stdout.
 
+    method : {"hprobs", "direct"}, optional
+        How the Hessian is computed.  "hprobs" computes blocks of the
+        Hessians of all the probabilities (see `GateSet.bulk_hprobs_by_block`),
+        which requires memory proportional to the number of gate set
+        parameters squared *for each* evaluation-tree element.  "direct"
+        accumulates J^T W J, where J is the Jacobian of the probabilities,
+        plus the second-order terms computed by `GateSet.bulk_sum_hprobs`
+        without ever holding the Hessians of individual probabilities, so
+        that only O(nGateStrings * nParams + nParams^2) memory is needed.
+        This is usually the better choice for gate sets with many
+        parameters.
+
 
     Returns
     -------
     numpy array
       array of shape (M,M), where M is the length of the vectorized gateset.
     """
+    if method not in ("hprobs","direct"):
+        raise ValueError("Invalid logl_hessian method: %s" % method)
 
     nP = gateset.num_params()
 
@@ -493,9 +508,14 @@ def logl_hessian(gateset, dataset, gatestring_list=None, minProbClip=1e-6,
     #  - figure out how many row & column partitions are needed
     #    to fit computation within available memory (and use all cpus)
     mlim = None if (memLimit is None) else memLimit-persistentMem
-    evalTree, blkSize1, blkSize2 = gateset.bulk_evaltree_from_resources(
-        gatestring_list, comm, mlim, "deriv", ['bulk_hprobs_by_block'],
-        verbosity)
+    if method == "direct":
+        evalTree, blkSize1, blkSize2 = gateset.bulk_evaltree_from_resources(
+            gatestring_list, comm, mlim, "gatestrings", ['bulk_fill_dprobs'],
+            verbosity)
+    else:
+        evalTree, blkSize1, blkSize2 = gateset.bulk_evaltree_from_resources(
+            gatestring_list, comm, mlim, "deriv", ['bulk_hprobs_by_block'],
+            verbosity)
     
     rowParts = int(round(nP / blkSize1)) if (blkSize1 is not None) else 1
     colParts = int(round(nP / blkSize2)) if (blkSize2 is not None) else 1
@@ -503,83 +523,23 @@ def logl_hessian(gateset, dataset, gatestring_list=None, minProbClip=1e-6,
     a = radius # parameterizes "roundness" of f == 0 terms
     min_p = minProbClip
 
-    if poissonPicture:
-        #NOTE: hessian_from_hprobs MAY modify hprobs and dprobs12 (to save mem)
-        def hessian_from_hprobs(hprobs, dprobs12, cntVecMx, totalCntVec, pos_probs):
-            # Notation:  (K=#spam, M=#strings, N=#wrtParams1, N'=#wrtParams2 )
-            totCnts = totalCntVec[None,:]  #shorthand (just a view)
-            S = cntVecMx / min_p - totCnts # slope term that is derivative of logl at min_p
-            S2 = -0.5 * cntVecMx / (min_p**2)          # 2nd derivative of logl term at min_p
-
-            #hprobs_pos  = (-cntVecMx / pos_probs**2)[:,:,None,None] * dprobs12   # (K,M,1,1) * (K,M,N,N')
-            #hprobs_pos += (cntVecMx / pos_probs - totalCntVec[None,:])[:,:,None,None] * hprobs  # (K,M,1,1) * (K,M,N,N')
-            #hprobs_neg  = (2*S2)[:,:,None,None] * dprobs12 + (S + 2*S2*(probs - min_p))[:,:,None,None] * hprobs # (K,M,1,1) * (K,M,N,N')
-            #hprobs_zerofreq = _np.where( (probs >= a)[:,:,None,None],
-            #                             -totalCntVec[None,:,None,None] * hprobs,
-            #                             (-totalCntVec[None,:] * ( (-2.0/a**2)*probs + 2.0/a))[:,:,None,None] * dprobs12
-            #                             - (totalCntVec[None,:] * ((-1.0/a**2)*probs**2 + 2*probs/a))[:,:,None,None] * hprobs )
-            #hessian = _np.where( (probs < min_p)[:,:,None,None], hprobs_neg, hprobs_pos)
-            #hessian = _np.where( (cntVecMx == 0)[:,:,None,None], hprobs_zerofreq, hessian) # (K,M,N,N')
-            
-            #Accomplish the same thing as the above commented-out lines, 
-            # but with more memory effiency:
-            dprobs12_coeffs = \
-                _np.where(probs < min_p, 2*S2, -cntVecMx / pos_probs**2)
-            zfc = _np.where(probs >= a, 0.0, -totCnts*((-2.0/a**2)*probs+2.0/a))
-            dprobs12_coeffs = _np.where(cntVecMx == 0, zfc, dprobs12_coeffs)
-
-            hprobs_coeffs = \
-                _np.where(probs < min_p, S + 2*S2*(probs - min_p),
-                          cntVecMx / pos_probs - totCnts)
-            zfc = _np.where(probs >= a, -totCnts, 
-                            -totCnts * ((-1.0/a**2)*probs**2 + 2*probs/a))
-            hprobs_coeffs = _np.where(cntVecMx == 0, zfc, hprobs_coeffs)
-
-              # hessian = hprobs_coeffs * hprobs + dprobs12_coeff * dprobs12
-              #  but re-using dprobs12 and hprobs memory (which is overwritten!)
-            hprobs *= hprobs_coeffs[:,:,None,None]
-            dprobs12 *= dprobs12_coeffs[:,:,None,None]
-            hessian = dprobs12; hessian += hprobs
-
-            # hessian[iSpamLabel,iGateString,iGateSetParam1,iGateSetParams2] contains all
-            #  d2(logl)/d(gatesetParam1)d(gatesetParam2) contributions
-            return _np.sum(hessian, axis=(0,1))
-              # sum over spam label and gate string dimensions (gate strings in evalSubTree)
-              # adds current subtree contribution for (N,N')-sized block of Hessian
-
-
-    else:
-
-        #(the non-poisson picture requires that the probabilities of the spam labels for a given string are constrained to sum to 1)
-        #NOTE: hessian_from_hprobs MAY modify hprobs and dprobs12 (to save mem)
-        def hessian_from_hprobs(hprobs, dprobs12, cntVecMx, totalCntVec, pos_probs):
-            S = cntVecMx / min_p # slope term that is derivative of logl at min_p
-            S2 = -0.5 * cntVecMx / (min_p**2) # 2nd derivative of logl term at min_p
-
-            #hprobs_pos  = (-cntVecMx / pos_probs**2)[:,:,None,None] * dprobs12   # (K,M,1,1) * (K,M,N,N')
-            #hprobs_pos += (cntVecMx / pos_probs)[:,:,None,None] * hprobs  # (K,M,1,1) * (K,M,N,N')
-            #hprobs_neg  = (2*S2)[:,:,None,None] * dprobs12 + (S + 2*S2*(probs - min_p))[:,:,None,None] * hprobs # (K,M,1,1) * (K,M,N,N')
-            #hessian = _np.where( (probs < min_p)[:,:,None,None], hprobs_neg, hprobs_pos)
-            #hessian = _np.where( (cntVecMx == 0)[:,:,None,None], 0.0, hessian) # (K,M,N,N')
-
-            #Accomplish the same thing as the above commented-out lines, 
-            # but with more memory effiency:
-            dprobs12_coeffs = \
-                _np.where(probs < min_p, 2*S2, -cntVecMx / pos_probs**2)
-            dprobs12_coeffs = _np.where(cntVecMx == 0, 0.0, dprobs12_coeffs)
+    #NOTE: hessian_from_hprobs MAY modify hprobs and dprobs12 (to save mem)
+    def hessian_from_hprobs(hprobs, dprobs12, cntVecMx, totalCntVec, probs, pos_probs):
+        dprobs12_coeffs, hprobs_coeffs = \
+            _logl_hessian_coeffs(cntVecMx, totalCntVec, probs, pos_probs,
+                                 min_p, a, poissonPicture)
 
-            hprobs_coeffs = \
-                _np.where(probs < min_p, S + 2*S2*(probs - min_p),
-                          cntVecMx / pos_probs)
-            hprobs_coeffs = _np.where(cntVecMx == 0, 0.0, hprobs_coeffs)
+          # hessian = hprobs_coeffs * hprobs + dprobs12_coeff * dprobs12
+          #  but re-using dprobs12 and hprobs memory (which is overwritten!)
+        hprobs *= hprobs_coeffs[:,:,None,None]
+        dprobs12 *= dprobs12_coeffs[:,:,None,None]
+        hessian = dprobs12; hessian += hprobs
 
-              # hessian = hprobs_coeffs * hprobs + dprobs12_coeff * dprobs12
-              #  but re-using dprobs12 and hprobs memory (which is overwritten!)
-            hprobs *= hprobs_coeffs[:,:,None,None]
-            dprobs12 *= dprobs12_coeffs[:,:,None,None]
-            hessian = dprobs12; hessian += hprobs
-
-            return _np.sum(hessian, axis=(0,1)) #see comments as above
+        # hessian[iSpamLabel,iGateString,iGateSetParam1,iGateSetParams2] contains all
+        #  d2(logl)/d(gatesetParam1)d(gatesetParam2) contributions
+        return _np.sum(hessian, axis=(0,1))
+          # sum over spam label and gate string dimensions (gate strings in evalSubTree)
+          # adds current subtree contribution for (N,N')-sized block of Hessian
 
 
     #Note - we could in the future use comm to distribute over
@@ -617,6 +577,27 @@ def logl_hessian(gateset, dataset, gatestring_list=None, minProbClip=1e-6,
                             evalSubTree.generate_gatestring_list())
         totalCntVec = _np.sum(cntVecMx, axis=0)
 
+        if method == "direct":
+            # J^T W J (from the probability jacobian) + second-order terms
+            dprobs = _np.empty( (len(spamLabels),sub_nGateStrings,nP), 'd' )
+            gateset.bulk_fill_dprobs(dprobs, spam_lbl_rows, evalSubTree,
+                                     prMxToFill=probs, clipTo=probClipInterval,
+                                     check=check, comm=mySubComm,
+                                     wrtBlockSize=blkSize1)
+            pos_probs = _np.where(probs < min_p, min_p, probs)
+            dprobs12_coeffs, hprobs_coeffs = \
+                _logl_hessian_coeffs(cntVecMx, totalCntVec, probs, pos_probs,
+                                 min_p, a, poissonPicture)
+
+            subtree_hessian = gateset.bulk_sum_hprobs(
+                hprobs_coeffs, spam_lbl_rows, evalSubTree, mySubComm)
+            for k in range(len(spamLabels)):
+                subtree_hessian += _np.dot(dprobs[k].T,
+                                           dprobs12_coeffs[k][:,None] * dprobs[k])
+            dprobs = None #free mem
+            final_hessian += subtree_hessian
+            continue
+
         #compute pos_probs separately
         gateset.bulk_fill_probs(probs, spam_lbl_rows, evalSubTree,
                                 clipTo=probClipInterval, check=check,
@@ -651,7 +632,7 @@ def logl_hessian(gateset, dataset, gatestring_list=None, minProbClip=1e-6,
 
             subtree_hessian[slice1,slice2] = \
                 hessian_from_hprobs(hprobs, dprobs12, cntVecMx,
-                                        totalCntVec, pos_probs)
+                                        totalCntVec, probs, pos_probs)
                 #NOTE: hessian_from_hprobs MAY modify hprobs and dprobs12
 
         #Gather columns from different procs and add to running final hessian
@@ -674,6 +655,182 @@ def logl_hessian(gateset, dataset, gatestring_list=None, minProbClip=1e-6,
     return final_hessian # (N,N)
 
 
+def logl_hessian_vector_product(gateset, dataset, v, gatestring_list=None,
+                                minProbClip=1e-6, probClipInterval=(-1e6,1e6),
+                                radius=1e-4, poissonPicture=True, check=False,
+                                comm=None, memLimit=None, verbosity=0):
+    """
+    The product of the hessian of the log-likelihood function with a vector.
+
+    The product is computed without forming the hessian, as the sum of
+    J^T W (J v), where J is the Jacobian of the probabilities, and the
+    products of the probabilities' hessians with `v` (see
+    `GateSet.bulk_fill_hvprobs`).  This costs roughly as much as two
+    evaluations of the log-likelihood's jacobian, and so allows matrix-free
+    (e.g. truncated-Newton or conjugate-gradient) methods to be used on gate
+    sets too large for a dense hessian.
+
+    Parameters
+    ----------
+    gateset : GateSet
+        Gateset of parameterized gates (including SPAM)
+
+    dataset : DataSet
+        Probability data
+
+    v : numpy array
+        The vector, of length equal to the number of gate set parameters,
+        to multiply the hessian by.
+
+    gatestring_list : list of (tuples or GateStrings), optional
+        Each element specifies a gate string to include in the log-likelihood
+        sum.  Default value of None implies all the gate strings in dataset
+        should be used.
+
+    minProbClip, probClipInterval, radius, poissonPicture : optional
+        See `logl_hessian`.
+
+    check : boolean, optional
+        If True, perform extra checks within code to verify correctness.  Used
+        for testing, and runs much slower when True.
+
+    comm : mpi4py.MPI.Comm, optional
+        When not None, an MPI communicator for distributing the computation
+        across multiple processors.
+
+    memLimit : int, optional
+        A rough memory limit in bytes which restricts the amount of intermediate
+        values that are computed and stored.
+
+    verbosity : int, optional
+        How much detail to print to stdout.
+
+    Returns
+    -------
+    numpy array
+      array of shape (M,), where M is the length of the vectorized gateset.
+    """
+    nP = gateset.num_params()
+    v = _np.asarray(v,'d')
+    assert(v.shape == (nP,))
+
+    if gatestring_list is None:
+        gatestring_list = list(dataset.keys())
+
+    spamLabels = gateset.get_spam_labels() #fixes the ordering of the spam labels
+    spam_lbl_rows = { sl:i for (i,sl) in enumerate(spamLabels) }
+
+    evalTree, blkSize, _ = gateset.bulk_evaltree_from_resources(
+        gatestring_list, comm, memLimit, "gatestrings", ['bulk_fill_hvprobs'],
+        verbosity)
+
+    #get distribution across subtrees (groups if needed)
+    subtrees = evalTree.get_sub_trees()
+    mySubTreeIndices, subTreeOwners, mySubComm = evalTree.distribute(comm)
+
+    final_hvp = _np.zeros( nP, 'd')
+    for iSubTree in mySubTreeIndices:
+        evalSubTree = subtrees[iSubTree]
+        sub_nGateStrings = evalSubTree.num_final_strings()
+
+        cntVecMx = _np.empty( (len(spamLabels),sub_nGateStrings), 'd' )
+        fill_count_vecs(cntVecMx,spam_lbl_rows,dataset,
+                        evalSubTree.generate_gatestring_list())
+        totalCntVec = _np.sum(cntVecMx, axis=0)
+
+        probs = _np.empty( (len(spamLabels),sub_nGateStrings), 'd' )
+        dprobs = _np.empty( (len(spamLabels),sub_nGateStrings,nP), 'd' )
+        hvprobs = _np.empty( (len(spamLabels),sub_nGateStrings,nP), 'd' )
+        gateset.bulk_fill_hvprobs(hvprobs, spam_lbl_rows, evalSubTree, v,
+                                  probs, dprobs, probClipInterval, check,
+                                  mySubComm, blkSize)
+        pos_probs = _np.where(probs < minProbClip, minProbClip, probs)
+        dprobs12_coeffs, hprobs_coeffs = \
+            _logl_hessian_coeffs(cntVecMx, totalCntVec, probs, pos_probs,
+                                 minProbClip, radius, poissonPicture)
+
+        # J^T W (J v) + sum of hprobs_coeffs-weighted hessian-vector products
+        for k in range(len(spamLabels)):
+            final_hvp += _np.dot(dprobs[k].T,
+                                 dprobs12_coeffs[k] * _np.dot(dprobs[k],v))
+            final_hvp += _np.dot(hvprobs[k].T, hprobs_coeffs[k])
+
+    #gather (add together) final_hvps from different processors
+    if comm is not None and len(set(subTreeOwners.values())) > 1:
+        if comm.Get_rank() not in subTreeOwners.values():
+            final_hvp[:] = 0.0 #zero out so this proc won't contribute
+        final_hvp = comm.allreduce(final_hvp)
+
+    return final_hvp # (N,)
+
+
+def _logl_hessian_coeffs(cntVecMx, totalCntVec, probs, pos_probs, min_p, a,
+                         poissonPicture):
+    """
+    Returns the `(dprobs12_coeffs, hprobs_coeffs)` coefficients, each of
+    shape (K,M) for K spam labels and M gate strings, such that the
+    Hessian of the log-likelihood is the sum over spam labels and gate
+    strings of `dprobs12_coeffs * dprobs12 + hprobs_coeffs * hprobs`, where
+    `dprobs12` is the outer product of a probability's derivative with
+    itself and `hprobs` is the probability's Hessian.  `min_p` and `a` are
+    the `minProbClip` and `radius` arguments of `logl_hessian`.
+    """
+    if poissonPicture:
+        #The Hessian is sum_{K,M} dprobs12_coeffs * dprobs12 + hprobs_coeffs * hprobs
+        # Notation:  (K=#spam, M=#strings, N=#wrtParams1, N'=#wrtParams2 )
+        totCnts = totalCntVec[None,:]  #shorthand (just a view)
+        S = cntVecMx / min_p - totCnts # slope term that is derivative of logl at min_p
+        S2 = -0.5 * cntVecMx / (min_p**2)          # 2nd derivative of logl term at min_p
+
+        #hprobs_pos  = (-cntVecMx / pos_probs**2)[:,:,None,None] * dprobs12   # (K,M,1,1) * (K,M,N,N')
+        #hprobs_pos += (cntVecMx / pos_probs - totalCntVec[None,:])[:,:,None,None] * hprobs  # (K,M,1,1) * (K,M,N,N')
+        #hprobs_neg  = (2*S2)[:,:,None,None] * dprobs12 + (S + 2*S2*(probs - min_p))[:,:,None,None] * hprobs # (K,M,1,1) * (K,M,N,N')
+        #hprobs_zerofreq = _np.where( (probs >= a)[:,:,None,None],
+        #                             -totalCntVec[None,:,None,None] * hprobs,
+        #                             (-totalCntVec[None,:] * ( (-2.0/a**2)*probs + 2.0/a))[:,:,None,None] * dprobs12
+        #                             - (totalCntVec[None,:] * ((-1.0/a**2)*probs**2 + 2*probs/a))[:,:,None,None] * hprobs )
+        #hessian = _np.where( (probs < min_p)[:,:,None,None], hprobs_neg, hprobs_pos)
+        #hessian = _np.where( (cntVecMx == 0)[:,:,None,None], hprobs_zerofreq, hessian) # (K,M,N,N')
+
+        #Accomplish the same thing as the above commented-out lines, 
+        # but with more memory effiency:
+        dprobs12_coeffs = \
+            _np.where(probs < min_p, 2*S2, -cntVecMx / pos_probs**2)
+        zfc = _np.where(probs >= a, 0.0, -totCnts*((-2.0/a**2)*probs+2.0/a))
+        dprobs12_coeffs = _np.where(cntVecMx == 0, zfc, dprobs12_coeffs)
+
+        hprobs_coeffs = \
+            _np.where(probs < min_p, S + 2*S2*(probs - min_p),
+                      cntVecMx / pos_probs - totCnts)
+        zfc = _np.where(probs >= a, -totCnts, 
+                        -totCnts * ((-1.0/a**2)*probs**2 + 2*probs/a))
+        hprobs_coeffs = _np.where(cntVecMx == 0, zfc, hprobs_coeffs)
+        return dprobs12_coeffs, hprobs_coeffs
+
+    else:
+        #(the non-poisson picture requires that the probabilities of the spam labels for a given string are constrained to sum to 1)
+        S = cntVecMx / min_p # slope term that is derivative of logl at min_p
+        S2 = -0.5 * cntVecMx / (min_p**2) # 2nd derivative of logl term at min_p
+
+        #hprobs_pos  = (-cntVecMx / pos_probs**2)[:,:,None,None] * dprobs12   # (K,M,1,1) * (K,M,N,N')
+        #hprobs_pos += (cntVecMx / pos_probs)[:,:,None,None] * hprobs  # (K,M,1,1) * (K,M,N,N')
+        #hprobs_neg  = (2*S2)[:,:,None,None] * dprobs12 + (S + 2*S2*(probs - min_p))[:,:,None,None] * hprobs # (K,M,1,1) * (K,M,N,N')
+        #hessian = _np.where( (probs < min_p)[:,:,None,None], hprobs_neg, hprobs_pos)
+        #hessian = _np.where( (cntVecMx == 0)[:,:,None,None], 0.0, hessian) # (K,M,N,N')
+
+        #Accomplish the same thing as the above commented-out lines, 
+        # but with more memory effiency:
+        dprobs12_coeffs = \
+            _np.where(probs < min_p, 2*S2, -cntVecMx / pos_probs**2)
+        dprobs12_coeffs = _np.where(cntVecMx == 0, 0.0, dprobs12_coeffs)
+
+        hprobs_coeffs = \
+            _np.where(probs < min_p, S + 2*S2*(probs - min_p),
+                      cntVecMx / pos_probs)
+        hprobs_coeffs = _np.where(cntVecMx == 0, 0.0, hprobs_coeffs)
+        return dprobs12_coeffs, hprobs_coeffs
+
+
 def logl_max(dataset, gatestring_list=None, countVecMx=None, poissonPicture=True, check=False):
     """
     The maximum log-likelihood possible for a DataSet.  That is, the
@@ -599,3 +599,139 @@ def mpidot(a,b,loc_slice,comm):
     #                [CTels, (sizes,displacements[:-1]), MPI.F_DOUBLE_COMPLEX])
 
     
+
+
+def distribute_rows(nrows, comm):
+    """
+    Divides the rows of a `nrows`-row matrix into contiguous blocks, one
+    per processor, for use with :func:`mpi_cg_solve`.
+
+    Parameters
+    ----------
+    nrows : int
+        The number of rows to distribute.
+
+    comm : mpi4py.MPI.Comm or None
+        The communicator used to perform the distribution.
+
+    Returns
+    -------
+    slice
+        The rows belonging to the current processor (possibly empty when
+        there are more processors than rows).
+    """
+    if comm is None: return slice(0,nrows)
+    return slice_up_range(nrows, comm.Get_size())[comm.Get_rank()]
+
+
+def reduce_rows(a, comm):
+    """
+    Sums the 2D array `a` over the processors of `comm`, giving each
+    processor only its block of rows of the sum (see
+    :func:`distribute_rows`).  Each block is summed onto its processor
+    directly, so no processor holds the whole sum.
+
+    Parameters
+    ----------
+    a : numpy.ndarray
+        This processor's contribution to the sum.
+
+    comm : mpi4py.MPI.Comm or None
+        The communicator used to perform the sum.
+
+    Returns
+    -------
+    numpy.ndarray
+        The current processor's rows of the sum.
+    """
+    if comm is None: return a
+    from mpi4py import MPI #not at top so can import pygsti on cluster login nodes
+    a = _np.ascontiguousarray(a,'d')
+    myRank = comm.Get_rank(); myRows = None
+    for rank,slc in enumerate(slice_up_range(a.shape[0], comm.Get_size())):
+        recvbuf = _np.empty( (slc.stop-slc.start,) + a.shape[1:], 'd') \
+            if rank == myRank else None
+        comm.Reduce(a[slc], recvbuf, op=MPI.SUM, root=rank)
+        if rank == myRank: myRows = recvbuf
+    return myRows
+
+
+def mpi_cg_solve(a_rows, b, loc_slice, comm, tol=1e-10, max_iter=None):
+    """
+    Solves the symmetric positive-definite system `dot(a,x) = b` using a
+    Jacobi-preconditioned conjugate gradient method when the rows of `a`
+    are distributed among the processors of `comm`.
+
+    Each processor holds only its rows of `a`, so the storage of `a` and the
+    cost of each matrix-vector product are divided among the processors.
+    The (length-n) vectors used by the method are small and are kept, with
+    identical values, on every processor.
+
+    Parameters
+    ----------
+    a_rows : numpy.ndarray
+        The `loc_slice` rows of `a`, of shape `(nLocalRows, n)`.
+
+    b : numpy.ndarray
+        The full right hand side, of length `n`.
+
+    loc_slice : slice
+        The rows of `a` held by the current processor (obtained from
+        :func:`distribute_rows`).
+
+    comm : mpi4py.MPI.Comm or None
+        The communicator over which the rows of `a` are distributed.
+
+    tol : float, optional
+        The tolerance on the norm of the residual relative to the norm of
+        `b`.
+
+    max_iter : int, optional
+        The maximum number of iterations.  Defaults to `10*n`.
+
+    Returns
+    -------
+    x : numpy.ndarray
+        The solution vector (the same on all processors).
+
+    converged : bool
+        Whether the relative residual reached `tol`.
+    """
+    n = len(b)
+    if max_iter is None: max_iter = 10*n
+    start = loc_slice.start if loc_slice.start is not None else 0
+    nloc = a_rows.shape[0]
+
+    if comm is not None:
+        from mpi4py import MPI #not at top so can import pygsti on cluster login nodes
+        starts_and_sizes = comm.allgather( (start,nloc) ) # once; vectors below are sent as raw buffers
+        displacements = [ st for st,_ in starts_and_sizes ]
+        sizes = [ sz for _,sz in starts_and_sizes ]
+
+    def allgather(loc_vec):
+        if comm is None: return loc_vec
+        gathered = _np.empty(n,'d')
+        comm.Allgatherv(_np.ascontiguousarray(loc_vec,'d'),
+                        [gathered, sizes, displacements, MPI.DOUBLE])
+        return gathered
+
+    inv_diag = 1.0 / allgather(a_rows[_np.arange(nloc), start+_np.arange(nloc)])
+    if not _np.all(_np.isfinite(inv_diag)) or _np.any(inv_diag <= 0):
+        return _np.zeros(n,'d'), False # not positive-definite
+
+    norm_b = _np.linalg.norm(b)
+    x = _np.zeros(n,'d')
+    if norm_b == 0: return x, True
+    r = b.copy(); z = inv_diag * r; p = z.copy()
+    rz = _np.dot(r,z)
+    for i in range(max_iter):
+        Ap = allgather(_np.dot(a_rows,p))
+        pAp = _np.dot(p,Ap)
+        if pAp <= 0: return x, False # not positive-definite
+        alpha = rz / pAp
+        x += alpha*p; r -= alpha*Ap
+        if _np.linalg.norm(r) <= tol*norm_b: return x, True
+        z = inv_diag * r
+        rz_new = _np.dot(r,z)
+        p = z + (rz_new/rz) * p; rz = rz_new
+    return x, False
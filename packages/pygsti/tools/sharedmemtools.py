@@ -0,0 +1,188 @@
+from __future__ import division, print_function, absolute_import, unicode_literals
+#*****************************************************************
+#    pyGSTi 0.9:  Copyright 2015 Sandia Corporation
+#    This Software is released under the GPL license detailed
+#    in the file "license.txt" in the top-level pyGSTi directory
+#*****************************************************************
+"""
+Functions for dividing computations among (forked) shared-memory processes
+
+The worker processes are created with the "fork" start method, since they
+must inherit the (unpicklable) callables they run and the shared arrays
+they write into; the "spawn" and "forkserver" methods cannot provide either.
+Forking a process whose BLAS/LAPACK library has already started its own
+threads (as OpenBLAS and MKL do on their first large matrix operation) can
+deadlock the child, because locks held by those threads are copied into the
+child without the threads that would release them.  When using these
+functions, limit the numerical library to a single thread (e.g. set
+OMP_NUM_THREADS=1, OPENBLAS_NUM_THREADS=1 or MKL_NUM_THREADS=1 before numpy
+is imported) or otherwise use a BLAS that is fork-safe.
+"""
+
+import os as _os
+import ctypes as _ctypes
+import multiprocessing as _multiprocessing
+import numpy as _np
+
+
+def is_available():
+    """
+    Returns whether processes can be created by forking the current one,
+    which is required by :func:`run_in_processes` (this is not the case,
+    e.g., on Windows).
+    """
+    return hasattr(_os, 'fork')
+
+
+def shared_empty(shape, dtype='d'):
+    """
+    Create an un-initialized numpy array whose data lives in shared memory.
+
+    Such an array, when created before calling :func:`run_in_processes`, is
+    shared by (not copied to) the worker processes, so that their writes to
+    it are seen by the calling process.
+
+    Parameters
+    ----------
+    shape : tuple
+        The array shape.
+
+    dtype : numpy dtype, optional
+        The array's data type.
+
+    Returns
+    -------
+    numpy.ndarray
+    """
+    dtype = _np.dtype(dtype)
+    nBytes = max(int(_np.prod(shape)) * dtype.itemsize, 1)
+    buf = _multiprocessing.RawArray(_ctypes.c_char, nBytes)
+    return _np.frombuffer(buf, dtype, int(_np.prod(shape))).reshape(shape)
+
+
+def is_shared(a):
+    """
+    Returns whether numpy array `a` (or the array it is a view of) was
+    created by :func:`shared_empty`.
+    """
+    while a is not None:
+        if isinstance(a, _ctypes.Array): return True
+        a = getattr(a, 'base', None)
+    return False
+
+
+def run_in_processes(fn, args, nprocesses):
+    """
+    Call `fn(arg)` for each element of `args`, dividing the calls among
+    (at most) `nprocesses` forked processes.
+
+    Because the worker processes are created by forking, `fn` may be any
+    callable (e.g. a closure) and all the data it references is available
+    to the workers without being pickled.  Return values of `fn` are *not*
+    collected: results must be written into arrays created by
+    :func:`shared_empty`.  See the module documentation regarding forking
+    with a multi-threaded BLAS.
+
+    Parameters
+    ----------
+    fn : function
+        The function to call.
+
+    args : list
+        The arguments to call `fn` with, one per call.
+
+    nprocesses : int
+        The maximum number of processes to use.  When this is None or 1 all
+        the calls are made (serially) by the current process.
+
+    Returns
+    -------
+    None
+    """
+    if nprocesses is None or nprocesses <= 1 or len(args) <= 1:
+        for arg in args: fn(arg)
+        return
+
+    if not is_available():
+        raise ValueError("Process-based parallelization requires os.fork,"
+                         + " which is not available on this platform.")
+
+    try:
+        ctx = _multiprocessing.get_context('fork')
+    except AttributeError: # python 2 (always forks)
+        ctx = _multiprocessing
+
+    def worker(myArgs):
+        for arg in myArgs: fn(arg)
+
+    nprocesses = min(nprocesses, len(args))
+    procs = [ ctx.Process(target=worker, args=(args[k::nprocesses],))
+              for k in range(nprocesses) ]
+    for p in procs: p.start()
+    for p in procs: p.join()
+
+    failed = [ p.exitcode for p in procs if p.exitcode != 0 ]
+    if len(failed) > 0:
+        raise RuntimeError("%d of %d worker processes failed (exit codes %s)"
+                           % (len(failed), nprocesses, str(failed)))
+
+
+_mapped_call = None #(fn, args) inherited by the workers of map_in_processes
+
+def _call_mapped_fn(i):
+    fn, args = _mapped_call
+    return fn(args[i])
+
+
+def map_in_processes(fn, args, nprocesses):
+    """
+    Return `[fn(arg) for arg in args]`, dividing the calls among (at most)
+    `nprocesses` forked processes.
+
+    As with :func:`run_in_processes`, `fn` may be any callable and the data
+    it references is inherited by the workers.  The return values of `fn`,
+    however, are pickled and sent back to the calling process, so this is
+    best suited to calls whose results are small compared with the work
+    needed to compute them.  An exception raised by `fn` in a worker is
+    re-raised by the calling process.  See the module documentation
+    regarding forking with a multi-threaded BLAS.
+
+    Parameters
+    ----------
+    fn : function
+        The function to call.
+
+    args : list
+        The arguments to call `fn` with, one per call.
+
+    nprocesses : int
+        The maximum number of processes to use.  When this is None or 1 all
+        the calls are made (serially) by the current process.
+
+    Returns
+    -------
+    list
+        The values returned by `fn`, in the order of `args`.
+    """
+    global _mapped_call
+    if nprocesses is None or nprocesses <= 1 or len(args) <= 1:
+        return [ fn(arg) for arg in args ]
+
+    if not is_available():
+        raise ValueError("Process-based parallelization requires os.fork,"
+                         + " which is not available on this platform.")
+
+    try:
+        ctx = _multiprocessing.get_context('fork')
+    except AttributeError: # python 2 (always forks)
+        ctx = _multiprocessing
+
+    _mapped_call = (fn, args) #must be set before the workers are forked
+    try:
+        pool = ctx.Pool(min(nprocesses, len(args)))
+        try:
+            return pool.map(_call_mapped_fn, range(len(args)), 1)
+        finally:
+            pool.terminate(); pool.join()
+    finally:
+        _mapped_call = None
@@ -228,6 +228,40 @@ class TestCoreMethods(BaseTestCase):
         self.assertAlmostEqual(gs_lsgst.frobeniusdist(gs_lsgst_verb),0)
         self.assertAlmostEqual(gs_lsgst.frobeniusdist(all_gs_lsgst_tups[-1]),0)
 
+        #single-precision caches, with a double-precision final iteration.  Warm-starting the
+        # damping makes each stage stop at a slightly different point along nearly flat
+        # directions, so compare runs which start every stage with the default damping.
+        gs_lsgst_cold = pygsti.do_iterative_mc2gst(ds, gs_clgst, self.lsgstStrings,
+                                                   minProbClipForWeighting=1e-6, probClipInterval=(-1e6,1e6),
+                                                   warmStart=False)
+        all_gs_lsgst_single = pygsti.do_iterative_mc2gst(ds, gs_clgst, self.lsgstStrings,
+                                                     minProbClipForWeighting=1e-6, probClipInterval=(-1e6,1e6),
+                                                     cachePrecision="single", returnAll=True, warmStart=False)
+        gs_lsgst_single = all_gs_lsgst_single[-1]
+        self.assertEqual([gs.cache_precision for gs in all_gs_lsgst_single], ["double"]*len(self.lsgstStrings))
+        self.assertAlmostEqual(gs_lsgst_cold.frobeniusdist(gs_lsgst_single),0,places=4)
+        self.assertAlmostEqual(gs_lsgst.frobeniusdist(gs_lsgst_cold),0,places=4)
+        chi2_double = pygsti.chi2(ds, gs_lsgst, self.lsgstStrings[-1], minProbClipForWeighting=1e-6)
+        chi2_single = pygsti.chi2(ds, gs_lsgst_single, self.lsgstStrings[-1], minProbClipForWeighting=1e-6)
+        self.assertAlmostEqual(chi2_double, chi2_single, places=4)
+
+        #J^T J and J^T f accumulated without storing the jacobian
+        gs_lsgst_stream = pygsti.do_iterative_mc2gst(ds, gs_clgst, self.lsgstStrings,
+                                                     minProbClipForWeighting=1e-6, probClipInterval=(-1e6,1e6),
+                                                     streamJacobian=True)
+        self.assertAlmostEqual(gs_lsgst.frobeniusdist(gs_lsgst_stream),0,places=5)
+        for kwargs in ({'regularizeFactor': 1e-3}, {'cptp_penalty_factor': 1.0}):
+            _,gs_single_stream = pygsti.do_mc2gst(ds, gs_clgst, self.lsgstStrings[0], minProbClipForWeighting=1e-6,
+                                                  probClipInterval=(-1e6,1e6), streamJacobian=True, **kwargs)
+            _,gs_single = gs_single_lsgst if 'regularizeFactor' in kwargs else gs_single_lsgst_cp
+            self.assertAlmostEqual(gs_single.frobeniusdist(gs_single_stream),0,places=5)
+
+        #distributed (conjugate gradient) solve, through the iterative driver
+        gs_lsgst_dist = pygsti.do_iterative_mc2gst(ds, gs_clgst, self.lsgstStrings,
+                                                   minProbClipForWeighting=1e-6, probClipInterval=(-1e6,1e6),
+                                                   streamJacobian=True, distributedSolve=True)
+        self.assertAlmostEqual(gs_lsgst.frobeniusdist(gs_lsgst_dist),0,places=5)
+
 
         #Run internal checks on less max-L values (so it doesn't take forever)
         gs_lsgst_chk = pygsti.do_iterative_mc2gst(ds, gs_clgst, self.lsgstStrings[0:2], verbosity=0,
@@ -306,6 +340,54 @@ class TestCoreMethods(BaseTestCase):
         self.assertAlmostEqual(gs_mlegst.frobeniusdist(gs_mlegst_verb),0)
         self.assertAlmostEqual(gs_mlegst.frobeniusdist(all_gs_mlegst_tups[-1]),0)
 
+        #single-precision caches, with a double-precision final iteration
+        maxLogL_single, all_gs_mlegst_single = pygsti.do_iterative_mlgst(
+            ds, gs_clgst, self.lsgstStrings, minProbClip=1e-6,
+            probClipInterval=(-1e2,1e2), returnMaxLogL=True, cachePrecision="single", returnAll=True)
+        self.assertEqual([gs.cache_precision for gs in all_gs_mlegst_single], ["double"]*len(self.lsgstStrings))
+        self.assertAlmostEqual(maxLogL_single/maxLogL, 1.0, places=6)
+
+        #J^T J and J^T f accumulated without storing the jacobian
+        maxLogL_stream, gs_mlegst_stream = pygsti.do_iterative_mlgst(
+            ds, gs_clgst, self.lsgstStrings, minProbClip=1e-6,
+            probClipInterval=(-1e2,1e2), returnMaxLogL=True, streamJacobian=True)
+        self.assertAlmostEqual(maxLogL_stream/maxLogL, 1.0, places=6)
+        self.assertAlmostEqual(gs_mlegst.frobeniusdist(gs_mlegst_stream),0,places=5)
+
+        #Broyden-updated jacobians and geodesic acceleration
+        maxLogL_broyden, gs_mlegst_broyden = pygsti.do_iterative_mlgst(
+            ds, gs_clgst, self.lsgstStrings, minProbClip=1e-6, probClipInterval=(-1e2,1e2),
+            returnMaxLogL=True, broydenUpdates=3, geodesicAccel=True)
+        self.assertAlmostEqual(maxLogL_broyden/maxLogL, 1.0, places=6)
+        for poisson in (True,False):
+            _,gs_single = pygsti.do_mlgst(ds, gs_clgst, self.lsgstStrings[0], minProbClip=1e-6,
+                                          probClipInterval=(-1e2,1e2), poissonPicture=poisson,
+                                          cptp_penalty_factor=1.0)
+            _,gs_single_stream = pygsti.do_mlgst(ds, gs_clgst, self.lsgstStrings[0], minProbClip=1e-6,
+                                                 probClipInterval=(-1e2,1e2), poissonPicture=poisson,
+                                                 cptp_penalty_factor=1.0, streamJacobian=True)
+            self.assertAlmostEqual(gs_single.frobeniusdist(gs_single_stream),0,places=5)
+
+        #distributed (conjugate gradient) solve of the damped normal equations
+        _,gs_single = pygsti.do_mlgst(ds, gs_clgst, self.lsgstStrings[0], minProbClip=1e-6,
+                                      probClipInterval=(-1e2,1e2))
+        for stream in (False,True):
+            _,gs_single_dist = pygsti.do_mlgst(ds, gs_clgst, self.lsgstStrings[0], minProbClip=1e-6,
+                                               probClipInterval=(-1e2,1e2), streamJacobian=stream,
+                                               distributedSolve=True)
+            self.assertAlmostEqual(gs_single.frobeniusdist(gs_single_dist),0,places=5)
+
+        #Trees stored in (first run) and loaded from (second run) an on-disk cache
+        evtCache = pygsti.objects.EvalTreeCache(temp_files + "/mlgst_evaltree_cache")
+        evtCache.clear()
+        for i in range(2):
+            gs_mlegst_cached = pygsti.do_iterative_mlgst(ds, gs_clgst, self.lsgstStrings, verbosity=0,
+                                                         minProbClip=1e-6, probClipInterval=(-1e2,1e2),
+                                                         memLimit=CM + 1024**3, evaltree_cache=evtCache)
+            self.assertAlmostEqual(gs_mlegst.frobeniusdist(gs_mlegst_cached),0)
+        nDistinctLists = len(set([ tuple(gsList) for gsList in self.lsgstStrings ])) #final ML stage re-uses last tree
+        self.assertEqual(len(os.listdir(temp_files + "/mlgst_evaltree_cache")), nDistinctLists)
+
 
         #Run internal checks on less max-L values (so it doesn't take forever)
         gs_mlegst_chk = pygsti.do_iterative_mlgst(ds, gs_clgst, self.lsgstStrings[0:2], verbosity=0,
@@ -354,6 +436,34 @@ class TestCoreMethods(BaseTestCase):
 
         self.assertAlmostEqual( gs_mlegst_go.frobeniusdist(gs_mle_compare), 0, places=5)
 
+    def test_stream_jtj_jtf(self):
+        from pygsti.algorithms.core import _stream_row_blocks, _stream_jtj_jtf
+        gs = self.datagen_gateset
+        spam_lbl_rows = { sl:i for (i,sl) in enumerate(gs.get_spam_labels()) }
+        evt = gs.bulk_evaltree(self.lsgstStrings[-1], minSubtrees=3)
+        self.assertEqual(len(evt.get_sub_trees()), 3)
+        ns, ng, nP = len(spam_lbl_rows), evt.num_final_strings(), gs.num_params()
+
+        np.random.seed(0)
+        factor = np.random.random( (ns,ng) )
+        fvec = np.random.random( ns*ng+2 )
+        extraJac = np.random.random( (2,nP) )
+
+        dprobs = np.empty( (ns,ng,nP), 'd' )
+        gs.bulk_fill_dprobs(dprobs, spam_lbl_rows, evt)
+        jac = np.concatenate( ((dprobs*factor[:,:,None]).reshape((ns*ng,nP)), extraJac), axis=0 )
+
+        for rowBlockSize in (ng, 10): # whole sub-trees, then several blocks per sub-tree
+            rowBlocks = _stream_row_blocks(gs, evt, rowBlockSize)
+            for distributeRows in (False,True): # (all the rows belong to the only processor)
+                JTJ, JTf = _stream_jtj_jtf(gs, evt, rowBlocks, spam_lbl_rows,
+                                           lambda p,slc: factor[:,slc], fvec, extraJac,
+                                           None, None, None, pygsti.objects.profiler.DummyProfiler(),
+                                           None, False, distributeRows)
+                self.assertArraysAlmostEqual(JTJ, np.dot(jac.T,jac))
+                self.assertArraysAlmostEqual(JTf, np.dot(jac.T,fvec))
+        self.assertTrue(all([ len(blks) > 1 for blks in rowBlocks ]))
+
     def test_LGST_1overSqrtN_dependence(self):
         my_datagen_gateset = self.gateset.depolarize(gate_noise=0.05, spam_noise=0)
         # !!don't depolarize spam or 1/sqrt(N) dependence saturates!!
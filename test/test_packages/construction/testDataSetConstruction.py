@@ -1,6 +1,7 @@
 from ..testutils import BaseTestCase, compare_files, temp_files
 
 import unittest
+import numpy as np
 import pygsti
 import pygsti.construction as pc
 
@@ -51,6 +52,47 @@ class DataSetConstructionTestCase(BaseTestCase):
         dataset = pc.generate_fake_data(self.dataset, self.gatestring_list, nSamples=None, sampleError='multinomial', seed=100)
         dataset = pc.generate_fake_data(dataset, self.gatestring_list, nSamples=1000, sampleError='round', seed=100)
 
+    def test_generate_fake_data_matches_per_string(self):
+        def per_string(strs, nSamples, sampleError, collisionAction="aggregate"):
+            #reference: each gate string's probabilities computed on their own
+            ds = pygsti.objects.DataSet(spamLabels=self.depolGateset.get_spam_labels(),
+                                        collisionAction=collisionAction)
+            for k,s in enumerate(strs):
+                N = nSamples[k] if isinstance(nSamples,list) else nSamples
+                ps = self.depolGateset.probs(s)
+                if sampleError == "none":
+                    ds.add_count_dict(s, { sl: float(N*np.clip(p,0,1)) for sl,p in ps.items() })
+                else:
+                    ds.add_count_dict(s, { sl: int(round(N*np.clip(p,0,1))) for sl,p in ps.items() })
+            ds.done_adding_data()
+            return ds
+
+        def assertSameData(ds1, ds2):
+            self.assertEqual(list(ds1.keys()), list(ds2.keys()))
+            for (s1,row1),(s2,row2) in zip(ds1.iteritems(), ds2.iteritems()):
+                for sl in ds1.get_spam_labels():
+                    self.assertAlmostEqual(row1[sl], row2[sl])
+
+        strs = self.lsgst_lists[2]
+        nList = [ 10*(k+1) for k in range(len(strs)) ]
+        for sampleError in ("none","round"):
+            for nSamples in (1000, nList):
+                assertSameData(pc.generate_fake_data(self.depolGateset, strs, nSamples, sampleError),
+                               per_string(strs, nSamples, sampleError))
+
+        #duplicate gate strings
+        dupStrs = list(strs[0:5]) + list(strs[0:3])
+        for collisionAction in ("aggregate","keepseparate"):
+            ds = pc.generate_fake_data(self.depolGateset, dupStrs, 100, "round",
+                                       collisionAction=collisionAction)
+            assertSameData(ds, per_string(dupStrs, 100, "round", collisionAction))
+        self.assertEqual(len(ds), len(dupStrs))
+
+        #tuples mixed with GateStrings
+        mixed = list(strs) + [('Gx',), ('Gx','Gy')]
+        assertSameData(pc.generate_fake_data(self.depolGateset, mixed, 1000, "none"),
+                       per_string(mixed, 1000, "none"))
+
 
 
 if __name__ == '__main__':
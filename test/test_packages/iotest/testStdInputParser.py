@@ -364,6 +364,44 @@ G2            20  100  5  200
         #TODO: add asserts
 
 
+    def test_fast_datalines(self):
+        #lines taking the fast path must parse the same as with parse_dataline
+        lines = [ "## Columns = plus count, count total\n",
+                  "{}                 10 100\n",
+                  "Gx(GxGy)^4Gy       20 100\n",
+                  "  (Gi)             30 100\n",
+                  "G_my_x^2G_my_y     40 100\n",
+                  "Gx (Gy)^2          50 100\n", #multi-column gate string
+                  "Gx*Gy              60 100\n",
+                  "\n", "# comment\n",
+                  "Gx(GxGy)^4Gy       70 100\n" ]
+        std = pygsti.io.StdInputParser()
+        gateLabels, labels, offsets, values, lineNumbers = std._parse_datalines(lines, {}, 2, "test")
+        tups = [ tuple([ gateLabels[l] for l in labels[offsets[i]:offsets[i+1]] ])
+                 for i in range(len(offsets)-1) ]
+        expected = [ std.parse_dataline(l, {}, 2) for l in lines
+                     if len(l.strip()) > 0 and l.strip()[0] != '#' ]
+        self.assertEqual(tups, [ e[0] for e in expected ])
+        self.assertEqual([ std.parse_dataline(lines[i], {}, 2)[1] for i in lineNumbers ],
+                         [ e[1] for e in expected ])
+        self.assertArraysAlmostEqual(values, np.array([ e[2] for e in expected ]))
+
+        with self.assertRaises(ValueError):
+            std._parse_datalines(["Gx(GxGy)^4Gy 20 abc\n"], {}, 2, "test")
+
+        with open(temp_files + "/sip_fast.data","w") as f:
+            f.writelines(lines)
+        ds = std.parse_datafile(temp_files + "/sip_fast.data", collisionAction="aggregate")
+        self.assertEqual(len(ds), 6)
+        self.assertEqual(ds[('Gx','Gx','Gy','Gx','Gy','Gx','Gy','Gx','Gy','Gy')]['plus'], 90)
+        self.assertEqual(ds[('Gx','Gx','Gy','Gx','Gy','Gx','Gy','Gx','Gy','Gy')]['minus'], 110)
+
+        ds = std.parse_datafile(temp_files + "/sip_fast.data", collisionAction="keepseparate")
+        self.assertEqual(len(ds), 7)
+        gs = pygsti.objects.GateString(('Gx','Gx','Gy','Gx','Gy','Gx','Gy','Gx','Gy','Gy'))
+        self.assertEqual(ds.get_row(gs,1)['plus'], 70)
+
+
     def test_GateSetFile(self):
 
         gatesetfile_test = \
@@ -88,6 +88,52 @@ Gx^4 20 80 0.2 100
               # gate string list must be GateString objects
 
 
+    def test_load_long_gatestrings(self):
+        #written-out (label only) and exponentiated gate strings take different parsing paths
+        strs = [ ('Gx','Gy')*500, ('Gx',)+('Gi','Gy')*300, ('Gx1','Gy_2') ]
+        with open(temp_files + "/LongStringsDataset.txt","w") as output:
+            output.write("## Columns = plus count, count total\n")
+            output.write("%s 10 100\n" % "".join(strs[0]))
+            output.write("Gx(GiGy)^300 20 100\n")
+            output.write("Gx1Gy_2 30 100\n")
+        ds = pygsti.io.load_dataset(temp_files + "/LongStringsDataset.txt")
+        self.assertEqual([ gs.tup for gs in ds.keys() ], strs)
+        self.assertEqual([ ds[s]['plus'] for s in strs ], [10,20,30])
+
+    @unittest.skipUnless(hasattr(os,'fork'), "requires os.fork")
+    def test_parallel_load(self):
+        #enough lines to be split into several chunks, with duplicates spanning chunks
+        lines = [ "## Columns = DS0 plus count, DS0 count total, DS1 plus frequency, DS1 count total\n" ]
+        for i in range(12000):
+            gs = "Gy^%d(GxGy)^%dGx" % (i//100 % 50, i % 50) if i % 10 else "Gx (Gy)^%d" % (i % 50)
+            lines.append("%s %d 100 0.%d 100\n" % (gs, i % 100, i % 10))
+        with open(temp_files + "/BigMultiDataset.txt","w") as output:
+            output.writelines(lines)
+        with open(temp_files + "/BigDataset.txt","w") as output:
+            output.write("## Columns = plus count, count total\n")
+            output.writelines([ " ".join(l.split()[0:-2]) + "\n" for l in lines[1:] ])
+
+        for collisionAction in ("aggregate","keepseparate"):
+            ds = pygsti.io.load_dataset(temp_files + "/BigDataset.txt", collisionAction=collisionAction)
+            ds_par = pygsti.io.load_dataset(temp_files + "/BigDataset.txt", collisionAction=collisionAction,
+                                            workers=3)
+            self.assertEqual(list(ds.keys()), list(ds_par.keys()))
+            self.assertArraysAlmostEqual(ds.counts, ds_par.counts)
+
+            mds = pygsti.io.load_multidataset(temp_files + "/BigMultiDataset.txt",
+                                              collisionAction=collisionAction)
+            mds_par = pygsti.io.load_multidataset(temp_files + "/BigMultiDataset.txt",
+                                                  collisionAction=collisionAction, workers=3)
+            for dsLabel in ('DS0','DS1'):
+                self.assertEqual(list(mds[dsLabel].keys()), list(mds_par[dsLabel].keys()))
+                self.assertArraysAlmostEqual(mds[dsLabel].counts, mds_par[dsLabel].counts)
+
+        #errors in any chunk are reported with their line in the whole file
+        lines[9001] = "FooBar 10 100 0.1 100\n"
+        with open(temp_files + "/BigMultiDataset.txt","w") as output:
+            output.writelines(lines)
+        with self.assertRaisesRegex(ValueError, "Line 9001"):
+            pygsti.io.load_multidataset(temp_files + "/BigMultiDataset.txt", workers=3)
 
 
     def test_gatestring_list_file(self):
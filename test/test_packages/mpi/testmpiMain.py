@@ -737,5 +737,19 @@ def test_MPI_derivcols(comm):
 
 
 
+@mpitest(4)
+def test_MPI_cg_solve(comm):
+    np.random.seed(0) #same matrix on all procs
+    A = np.random.random((20,13)); ATA = np.dot(A.T,A); b = np.random.random(13)
+
+    loc_slice = pygsti.tools.mpitools.distribute_rows(13, comm)
+    x,converged = pygsti.tools.mpitools.mpi_cg_solve(ATA[loc_slice,:], b, loc_slice, comm)
+    assert(converged)
+    assert(np.linalg.norm(x - np.linalg.solve(ATA,b)) < 1e-6)
+    x_root = comm.bcast(x, root=0)
+    assert(np.array_equal(x, x_root)) #identical on all procs
+
+
+
 if __name__ == "__main__":
     unittest.main(verbosity=2)
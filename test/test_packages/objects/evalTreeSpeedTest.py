@@ -0,0 +1,32 @@
+import time
+import sys
+
+import pygsti
+from pygsti.construction import std1Q_XYI as std
+
+#Benchmark of evaluation tree construction for long-sequence GST, where the
+# gate strings (germ powers sandwiched between fiducials) can be thousands
+# of gates long.  Usage: python evalTreeSpeedTest.py [maxLength]
+
+def timeEvalTreeConstruction(maxLength=2048, nRepeats=3):
+    gs_target = std.gs_target
+    maxLengths = [1]
+    while maxLengths[-1] < maxLength: maxLengths.append(2*maxLengths[-1])
+
+    lsgstLists = pygsti.construction.make_lsgst_lists(
+        list(gs_target.gates.keys()), std.fiducials, std.fiducials,
+        std.germs, maxLengths)
+
+    print("%6s %8s %8s %10s %10s" % ("L", "strings", "maxlen", "nodes", "time(s)"))
+    for L,gatestrings in zip(maxLengths,lsgstLists):
+        times = []
+        for i in range(nRepeats):
+            tStart = time.time()
+            evt = gs_target.bulk_evaltree(gatestrings)
+            times.append(time.time()-tStart)
+        print("%6d %8d %8d %10d %10.3f" % (L, len(gatestrings),
+              max([len(s) for s in gatestrings]), len(evt), min(times)))
+
+
+if __name__ == "__main__":
+    timeEvalTreeConstruction(int(sys.argv[1]) if len(sys.argv) > 1 else 2048)
@@ -177,6 +177,103 @@ Gx^4 0.2 100
         self.assertEqualDatasets(ds, ds2)
 
 
+    def test_columnar_format(self):
+        gateStrings = pygsti.construction.gatestring_list(
+            [ (), ('Gx',), ('Gx','Gy'), ('Gy','Gx'), ('Gx','Gx','Gx','Gx'), ('Gx','#1') ])
+        counts = np.array([ [0,100], [10,90], [40,60], [60,40], [20,80], [5,95] ], 'd')
+        ds = pygsti.objects.DataSet(counts, gateStrings=gateStrings, spamLabels=['plus','minus'],
+                                    bStatic=True, collisionAction="keepseparate")
+        ds.save_columnar(temp_files + "/columnar_dataset")
+
+        ds2 = pygsti.io.load_dataset(temp_files + "/columnar_dataset")
+        self.assertTrue(isinstance(ds2.counts, np.memmap))
+        self.assertEqual(ds2.collisionAction, "keepseparate")
+        self.assertEqual(list(ds2.keys()), gateStrings)
+        self.assertEqualDatasets(ds, ds2)
+        self.assertEqual(ds2[('Gy','Gx')]['plus'], 60)
+        self.assertEqual(ds2.get_row(gateStrings[1],1)['minus'], 95)
+        self.assertFalse(('Gy',) in ds2)
+        self.assertFalse(('Gz',) in ds2)
+        with self.assertRaises(KeyError):
+            ds2[('Gy','Gy')]
+
+        trunc = ds2.truncate(gateStrings[1:3])
+        self.assertEqual(list(trunc.keys()), gateStrings[1:3])
+        self.assertEqual(trunc[('Gx','Gy')]['minus'], 60)
+
+        ds3 = pickle.loads(pickle.dumps(ds2))
+        self.assertEqualDatasets(ds, ds3)
+
+        ds4 = ds2.copy_nonstatic()
+        ds4.add_count_dict(('Gy',), {'plus': 1, 'minus': 2})
+        self.assertEqual(len(ds4), len(ds)+1)
+
+        #non-static datasets and re-saving a loaded dataset
+        ds5 = ds4.copy_nonstatic()
+        ds5.save_columnar(temp_files + "/columnar_dataset2")
+        ds6 = pygsti.objects.DataSet(fileToLoadFrom=temp_files + "/columnar_dataset2")
+        ds6.save_columnar(temp_files + "/columnar_dataset3")
+        ds7 = pygsti.objects.DataSet(spamLabels=["plus","minus"])
+        ds7.load_columnar(temp_files + "/columnar_dataset3", mmap_mode=None)
+        self.assertEqual(list(ds7.keys()), list(ds4.keys()))
+        self.assertEqualDatasets(ds4, ds7)
+
+    def test_compact_gatestring_index(self):
+        ds = pygsti.objects.DataSet(spamLabels=['plus','minus'], collisionAction="keepseparate")
+        ds.add_count_dict( ('Gx',), {'plus': 10, 'minus': 90} )
+        ds.add_count_dict( ('Gx','Gy'), {'plus': 40, 'minus': 60} )
+        ds.add_count_dict( ('Gx',), {'plus': 20, 'minus': 80} )
+        ds.add_count_dict( ('Gy',)*41, {'plus': 30, 'minus': 70} ) #long enough to be hashed with numpy
+        ds.done_adding_data()
+
+        gsIndex = ds.gsIndex
+        self.assertTrue(isinstance(gsIndex, pygsti.objects.gatestringindex.CompactGateStringIndex))
+        self.assertEqual(gsIndex.gateLabels, ['Gx','Gy','#1'])
+        self.assertEqual(len(ds), 4)
+        self.assertEqual(ds[('Gx',)]['plus'], 10)
+        self.assertEqual(ds.get_row(pygsti.obj.GateString(('Gx',)),1)['plus'], 20)
+        self.assertEqual(ds[('Gy',)*41]['minus'], 70)
+        self.assertTrue(pygsti.obj.GateString(('Gx','Gy')) in ds)
+        self.assertFalse(('Gy',)*40 in ds)
+        self.assertFalse(('Gy','Gx') in ds)
+        self.assertFalse("Gx" in ds)
+        self.assertEqual(gsIndex.get(('Gz',),-1), -1)
+        self.assertEqual(ds.keys(), [ ('Gx',), ('Gx','Gy'), ('Gx','#1'), ('Gy',)*41 ])
+        self.assertTrue(all([isinstance(gs,pygsti.obj.GateString) for gs in ds.keys()]))
+        self.assertTrue(gsIndex.keys()[0] is gsIndex.keys()[0]) #GateStrings are only created once
+        self.assertEqual(ds.keys(stripOccuranceTags=True), [ ('Gx',), ('Gx','Gy'), ('Gx',), ('Gy',)*41 ])
+        self.assertEqual(list(gsIndex.items()), list(zip(ds.keys(), [0,1,2,3])))
+
+        trunc = ds.truncate( [('Gy',)*41, ('Gx',)] )
+        self.assertTrue(isinstance(trunc.gsIndex, pygsti.objects.gatestringindex.CompactGateStringIndex))
+        self.assertEqual(trunc.keys(), [ ('Gy',)*41, ('Gx',) ])
+        self.assertEqual(trunc[('Gx',)]['plus'], 10)
+        self.assertEqual(trunc[('Gy',)*41]['plus'], 30)
+
+        #a repeated gate string takes the last row given for it, as with an OrderedDict
+        dup = pygsti.objects.DataSet(np.array([[1,9],[2,8],[3,7]],'d'), gateStrings=[('Gx',),('Gy',),('Gx',)],
+                                     spamLabels=['plus','minus'], bStatic=True)
+        self.assertEqual(len(dup), 2)
+        self.assertEqual(dup.keys(), [ ('Gx',), ('Gy',) ])
+        self.assertEqual(dup[('Gx',)]['plus'], 3)
+        self.assertEqual(ds.truncate( [('Gx',), ('Gx',)] ).keys(), [ ('Gx',) ])
+
+        #gate strings are kept as arrays when pickled, saved, and in MultiDataSets
+        ds2 = pickle.loads(pickle.dumps(ds))
+        self.assertEqual(ds2.gsIndex, gsIndex)
+        self.assertEqualDatasets(ds, ds2)
+        ds.save(temp_files + "/compact_index_dataset.saved")
+        ds3 = pygsti.objects.DataSet(fileToLoadFrom=temp_files + "/compact_index_dataset.saved")
+        self.assertEqual(ds3.gsIndex, gsIndex)
+
+        mds = pygsti.objects.MultiDataSet()
+        mds.add_dataset("DS", ds)
+        mds.add_dataset("DS2", ds3)
+        self.assertEqual(mds['DS2'][('Gx','Gy')]['plus'], 40)
+        mds2 = pickle.loads(pickle.dumps(mds))
+        self.assertEqual(mds2.gsIndex, gsIndex)
+
+
     def test_generate_fake_data(self):
 
         gateset = pygsti.construction.build_gateset( [2], [('Q0',)],['Gi','Gx','Gy','Gz'],
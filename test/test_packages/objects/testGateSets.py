@@ -527,6 +527,20 @@ class TestGateSetMethods(GateSetTestCase):
         self.assertNoWarnings(self.gateset.bulk_fill_hprobs, hprobs_to_fillB, spam_label_rows, evt, check=True)
         self.assertArraysAlmostEqual(hprobs_to_fill,hprobs_to_fillB)
 
+        #hessian-vector products
+        v = np.linspace(-1.0, 1.0, nParams)
+        hvprobs_to_fill = np.empty( (nSpamLabels,nGateStrings,nParams), 'd')
+        self.assertNoWarnings(self.gateset.bulk_fill_hvprobs, hvprobs_to_fill, spam_label_rows, evt, v,
+                              prMxToFill=probs_to_fillB, derivMxToFill=dprobs_to_fillB, check=True)
+        self.assertArraysAlmostEqual(hvprobs_to_fill, np.dot(hprobs_to_fill,v))
+        self.assertArraysAlmostEqual(probs_to_fill,probs_to_fillB)
+        self.assertArraysAlmostEqual(dprobs_to_fill,dprobs_to_fillB)
+        self.gateset.bulk_fill_hvprobs(hvprobs_to_fill, spam_label_rows, evt, v, wrtBlockSize=5)
+        self.assertArraysAlmostEqual(hvprobs_to_fill, np.dot(hprobs_to_fill,v))
+        bulk_hvp = self.gateset.bulk_hessian_vector_product(evt_split, v, check=True)
+        self.assertArraysAlmostEqual(np.dot(bulk_hProbs['plus'],v),
+                 evt_split.permute_computation_to_original(bulk_hvp['plus']))
+
         N = self.gateset.get_dimension()**2 #number of elements in a gate matrix
 
         hProds = self.gateset.bulk_hproduct(evt)
@@ -626,6 +640,24 @@ class TestGateSetMethods(GateSetTestCase):
 
 
 
+    def test_bulk_sum_hprobs(self):
+        gatestrings = [('Gx',), ('Gx','Gy'), ('Gx','Gy','Gy'), ('Gy','Gx','Gx','Gy'), ()]
+        evt = self.gateset.bulk_evaltree(gatestrings)
+        nParams = self.gateset.num_params()
+        spam_label_rows = { 'plus': 0, 'minus': 1 }
+
+        hprobs = np.empty( (2,len(gatestrings),nParams,nParams), 'd')
+        self.gateset.bulk_fill_hprobs(hprobs, spam_label_rows, evt)
+
+        weights = np.array( [[0.5, -1.0, 2.0, 0.3, 1.5],
+                             [1.0, 0.2, -0.7, 0.0, 3.0]], 'd')
+        hsum = self.gateset.bulk_sum_hprobs(weights, spam_label_rows, evt)
+        self.assertArraysAlmostEqual(hsum, np.einsum('ks,ksij->ij', weights, hprobs))
+
+        #only one spam label
+        hsum = self.gateset.bulk_sum_hprobs(weights[1:2], { 'minus': 0 }, evt)
+        self.assertArraysAlmostEqual(hsum, np.einsum('s,sij->ij', weights[1], hprobs[1]))
+
     def test_tree_splitting(self):
         gatestrings = [('Gx',),
                        ('Gy',),
@@ -670,6 +702,406 @@ class TestGateSetMethods(GateSetTestCase):
         self.assertArraysAlmostEqual(bulk_prA,
              evtC.permute_computation_to_original(bulk_prC) )
 
+        #"balanced" split strategy (and a user-supplied one)
+        for kwargs in ({'numSubTrees': 3}, {'maxSubTreeSize': 4}):
+            evtD = self.gateset.bulk_evaltree( gatestrings )
+            evtD.split(strategy="balanced", **kwargs)
+            self.assertTrue(evtD.is_split())
+            self.assertEqual(evtD.generate_gatestring_list(), gatestrings)
+            self.assertArraysAlmostEqual(bulk_prA,
+                 evtD.permute_computation_to_original(self.gateset.bulk_pr('plus',evtD)) )
+            self.assertEqual(evtD.split_prediction['sizes'], list(map(len,evtD.get_sub_trees())))
+        self.assertEqual(len(evtD.get_sub_trees()), 5) #empirically
+        self.assertLessEqual(max(map(len,evtD.get_sub_trees())), 4)
+        self.assertLessEqual(evtD.split_prediction['cost'], evtB.split_prediction['cost'])
+        self.runSilent(evtD.print_analysis)
+
+        evtE = self.gateset.bulk_evaltree( gatestrings )
+        evtE.split(numSubTrees=2, strategy=pygsti.objects.evaltree.SPLIT_STRATEGIES['balanced'])
+        self.assertEqual(len(evtE.get_sub_trees()), 2)
+
+        #strategy selected through bulk_evaltree and bulk_evaltree_from_resources
+        evtF = self.gateset.bulk_evaltree( gatestrings, maxTreeSize=4, splitStrategy="balanced" )
+        self.assertEqual(evtF.split_prediction, evtD.split_prediction)
+        evtG = self.gateset.bulk_evaltree( gatestrings, maxTreeSize=len(evtA)+1, splitStrategy="balanced" )
+        self.assertFalse(evtG.is_split())
+        evtH,_,_ = self.gateset.bulk_evaltree_from_resources(
+            gatestrings, memLimit=100000, subcalls=['bulk_fill_dprobs'], splitStrategy="balanced",
+            unsplitTree=pygsti.objects.EvalTree())
+        self.assertTrue(evtH.is_split()) #empirically, with memLimit=100000
+        self.assertEqual(evtH.generate_gatestring_list(), gatestrings)
+        self.assertArraysAlmostEqual(bulk_prA,
+             evtH.permute_computation_to_original(self.gateset.bulk_pr('plus',evtH)) )
+
+        with self.assertRaises(ValueError):
+            evtBad = self.gateset.bulk_evaltree( gatestrings )
+            evtBad.split(numSubTrees=3, strategy="foobar")
+
+
+    def test_threaded_bulk_fills(self):
+        gatestrings = pygsti.construction.gatestring_list(
+            [('Gx',), ('Gy',), ('Gx','Gy'), ('Gy','Gy'), ('Gy','Gx'),
+             ('Gx','Gx','Gx'), ('Gx','Gy','Gx'), ('Gx','Gy','Gy'),
+             ('Gy','Gy','Gy'), ('Gy','Gx','Gx')])
+        spam_label_rows = { 'plus': 0, 'minus': 1 }
+        nP = self.gateset.num_params()
+
+        for nSubTrees in (1,3):
+            evt = self.gateset.bulk_evaltree( gatestrings, minSubtrees=nSubTrees )
+            probs = np.empty( (2,len(gatestrings)), 'd')
+            probs_threaded = np.empty( (2,len(gatestrings)), 'd')
+            self.gateset.bulk_fill_probs(probs, spam_label_rows, evt)
+            self.gateset.bulk_fill_probs(probs_threaded, spam_label_rows, evt, nthreads=3)
+            self.assertArraysAlmostEqual(probs, probs_threaded)
+
+            dprobs = np.empty( (2,len(gatestrings),nP), 'd')
+            dprobs_threaded = np.empty( (2,len(gatestrings),nP), 'd')
+            self.gateset.bulk_fill_dprobs(dprobs, spam_label_rows, evt)
+            self.gateset.bulk_fill_dprobs(dprobs_threaded, spam_label_rows, evt,
+                                          prMxToFill=probs_threaded, nthreads=4)
+            self.assertArraysAlmostEqual(dprobs, dprobs_threaded)
+            self.assertArraysAlmostEqual(probs, probs_threaded)
+
+            self.gateset.bulk_fill_dprobs(dprobs_threaded, spam_label_rows, evt,
+                                          wrtBlockSize=10, nthreads=2)
+            self.assertArraysAlmostEqual(dprobs, dprobs_threaded)
+
+            if not pygsti.tools.sharedmemtools.is_available(): continue
+            probs_forked = np.zeros( (2,len(gatestrings)), 'd')
+            dprobs_forked = np.zeros( (2,len(gatestrings),nP), 'd')
+            self.gateset.bulk_fill_probs(probs_forked, spam_label_rows, evt, nprocesses=3)
+            self.assertArraysAlmostEqual(probs, probs_forked)
+            self.gateset.bulk_fill_dprobs(dprobs_forked, spam_label_rows, evt,
+                                          prMxToFill=probs_forked, nprocesses=4)
+            self.assertArraysAlmostEqual(dprobs, dprobs_forked)
+            self.assertArraysAlmostEqual(probs, probs_forked)
+
+            with self.assertRaises(ValueError):
+                self.gateset.bulk_fill_probs(probs_forked, spam_label_rows, evt,
+                                             nthreads=2, nprocesses=2)
+
+
+    def test_evaluation_levels(self):
+        gatestrings = [('Gx',), ('Gx','Gy'), ('Gx','Gy','Gy'), ('Gy','Gx'),
+                       ('Gx','Gy','Gy','Gx'), ('Gy','Gy','Gy','Gy','Gx'), ()]
+        evt = self.gateset.bulk_evaltree( gatestrings )
+        levels = evt.get_evaluation_levels()
+        self.assertTrue(levels is evt.get_evaluation_levels()) # cached
+
+        #every element of the evaluation order appears in exactly one level,
+        # and depends only on earlier levels (or initial elements)
+        computed = set(evt.get_init_indices())
+        for indices, iLefts, iRights in levels:
+            for i,iLeft,iRight in zip(indices,iLefts,iRights):
+                self.assertEqual(evt[i], (iLeft,iRight))
+                self.assertTrue(iLeft in computed and iRight in computed)
+            computed.update(indices)
+        self.assertEqual(sorted(computed - set(evt.get_init_indices())),
+                         sorted(evt.get_evaluation_order()))
+
+        #level-scheduled products agree with products computed one-by-one
+        bulk_prods = self.gateset.bulk_product(evt)
+        for gs,prod in zip(gatestrings,bulk_prods):
+            self.assertArraysAlmostEqual(prod, self.gateset.product(gs))
+
+        #same for derivatives, also when levels are split into small batches
+        bulk_dprods = self.gateset.bulk_dproduct(evt)
+        MAXORIG = pygsti.objects.gscalc.MAX_BATCH_ELEMENTS
+        pygsti.objects.gscalc.MAX_BATCH_ELEMENTS = 1
+        bulk_dprods_batched = self.gateset.bulk_dproduct(evt)
+        pygsti.objects.gscalc.MAX_BATCH_ELEMENTS = MAXORIG
+        for gs,dprod,dprod2 in zip(gatestrings,bulk_dprods,bulk_dprods_batched):
+            self.assertArraysAlmostEqual(dprod, self.gateset.dproduct(gs))
+            self.assertArraysAlmostEqual(dprod2, self.gateset.dproduct(gs))
+
+
+    def test_evaltree_long_strings(self):
+        germs = [('Gx',), ('Gx','Gy'), ('Gx','Gx','Gy')]
+        gatestrings = [ ('Gy',) + germ*n for germ in germs for n in (1,4,16,64,256) ]
+        gatestrings += [ germ*n + ('Gx',) for germ in germs for n in (3,32,200) ]
+        gatestrings += gatestrings[0:3] + [('Gx',), (), ('Gx',), ()] #duplicates
+
+        evt = self.gateset.bulk_evaltree( gatestrings )
+        self.assertEqual(evt.generate_gatestring_list(), gatestrings)
+        self.assertEqual(len(evt.get_evaluation_order()), len(set(evt.get_evaluation_order())))
+
+        #every string is constructed from earlier ones
+        strs = {}
+        for i in evt.get_init_indices():
+            strs[i] = () if evt.gateLabels[evt.get_init_indices().index(i)] == "" \
+                      else (evt.gateLabels[evt.get_init_indices().index(i)],)
+        for i in evt.get_evaluation_order():
+            iLeft, iRight = evt[i]
+            strs[i] = strs[iLeft] + strs[iRight]
+        for i,gs in enumerate(gatestrings):
+            self.assertEqual(strs[i], gs)
+
+        bulk_prods = self.gateset.bulk_product(evt)
+        for gs,prod in zip(gatestrings,bulk_prods):
+            self.assertArraysAlmostEqual(prod, self.gateset.product(gs))
+
+
+    def test_evaltree_powers(self):
+        germs = [('Gx',), ('Gx','Gy'), ('Gx','Gx','Gx','Gx','Gy')]
+        gatestrings = [ ('Gy',) + germ*n + ('Gx',) for germ in germs for n in (1,4,16,64,100,1000) ]
+        gatestrings += [ germ*4 for germ in germs ] + [(), ('Gx','Gx','Gy')]
+
+        evt = self.gateset.bulk_evaltree( gatestrings )
+        self.assertEqual(evt.generate_gatestring_list(), gatestrings)
+
+        #powers of germs are computed by repeated squaring, using far fewer elements
+        MINORIG = pygsti.objects.evaltree.MIN_POWER_REPS
+        pygsti.objects.evaltree.MIN_POWER_REPS = None
+        evt_nopowers = self.gateset.bulk_evaltree( gatestrings )
+        pygsti.objects.evaltree.MIN_POWER_REPS = MINORIG
+        self.assertEqual(evt_nopowers.generate_gatestring_list(), gatestrings)
+        self.assertLess(len(evt), len(evt_nopowers) // 3)
+
+        bulk_prods = self.gateset.bulk_product(evt)
+        for gs,prod in zip(gatestrings,bulk_prods):
+            self.assertArraysAlmostEqual(prod, self.gateset.product(gs))
+
+        #power elements survive extending and splitting
+        evt.extend( [ ('Gx','Gy')*200, ('Gy',)+('Gx','Gy')*2000 ] )
+        evt.split(numSubTrees=3)
+        self.assertEqual(evt.generate_gatestring_list(),
+                         gatestrings + [ ('Gx','Gy')*200, ('Gy',)+('Gx','Gy')*2000 ])
+
+
+    def test_cache_precision(self):
+        gatestrings = [('Gx',), ('Gx','Gy'), ('Gx','Gy','Gy'), ('Gy','Gx')*10, ()]
+        evt = self.gateset.bulk_evaltree( gatestrings )
+        gs_single = self.gateset.copy()
+        gs_single.cache_precision = "single"
+        self.assertEqual(gs_single.copy().cache_precision, "single")
+        with self.assertRaises(ValueError):
+            gs_single.cache_precision = "half"
+
+        probs = self.gateset.bulk_probs(evt)
+        dprobs = self.gateset.bulk_dprobs(evt)
+        probs_single = gs_single.bulk_probs(evt)
+        dprobs_single = gs_single.bulk_dprobs(evt)
+        for sl in probs:
+            self.assertEqual(probs_single[sl].dtype, np.float64)
+            self.assertLess(np.max(np.abs(probs[sl] - probs_single[sl])), 1e-5)
+            self.assertLess(np.max(np.abs(dprobs[sl] - dprobs_single[sl])), 1e-4)
+
+        #single-precision caches need half the memory, so larger blocks fit
+        _,blkSize,_ = self.gateset.bulk_evaltree_from_resources(
+            gatestrings, memLimit=40000, distributeMethod="deriv",
+            subcalls=['bulk_fill_dprobs'])
+        _,blkSize_single,_ = gs_single.bulk_evaltree_from_resources(
+            gatestrings, memLimit=40000, distributeMethod="deriv",
+            subcalls=['bulk_fill_dprobs'])
+        self.assertGreater(blkSize_single, blkSize)
+
+
+    def test_memory_model(self):
+        from pygsti.objects import memorymodel
+        gatestrings = [('Gx',), ('Gx','Gy'), ('Gx','Gy','Gy'), ('Gy','Gx')*10, ()] + \
+            [ ('Gx',)*i + ('Gy',)*j for i in range(1,8) for j in range(1,8) ]
+        subcalls = ['bulk_fill_probs','bulk_fill_dprobs']
+        model = pygsti.objects.MemoryModel()
+        model.calibrate(self.gateset, gatestrings, subcalls)
+        for fn in subcalls:
+            self.assertTrue(all([ c >= 0 for c in model.coeffs[fn].values() ]))
+
+        #the calibrated model predicts the measured memory of the probes
+        evt = self.gateset.bulk_evaltree(gatestrings)
+        sizes = memorymodel.gateset_sizes(self.gateset)
+        spam_label_rows = { sl: i for i,sl in enumerate(self.gateset.get_spam_labels()) }
+        peak = memorymodel._measure_peak(memorymodel._probe(
+            self.gateset, 'bulk_fill_dprobs', evt, spam_label_rows,
+            sizes['nspam'], sizes['nparams'], sizes['nparams']))
+        est = model.estimate(['bulk_fill_dprobs'], cacheSize=len(evt), nFinal=len(gatestrings),
+                             wrtLen1=sizes['nparams'], wrtLen2=sizes['nparams'], **sizes)
+        self.assertLess(abs(est - peak), 0.5*peak)
+
+        model.save(temp_files + "/memory_model.json")
+        model2 = pygsti.objects.MemoryModel.load(temp_files + "/memory_model.json")
+        self.assertEqual(model2.coeffs, model.coeffs)
+
+        #the planner uses the default model
+        default = memorymodel.default_model
+        try:
+            memorymodel.default_model = pygsti.objects.MemoryModel(
+                { 'bulk_fill_dprobs': { k: 10*v for k,v in default.coeffs['bulk_fill_dprobs'].items() }})
+            evt_big,_,_ = self.gateset.bulk_evaltree_from_resources(
+                gatestrings, memLimit=4000000, subcalls=['bulk_fill_dprobs'])
+        finally:
+            memorymodel.default_model = default
+        evt_small,_,_ = self.gateset.bulk_evaltree_from_resources(
+            gatestrings, memLimit=4000000, subcalls=['bulk_fill_dprobs'])
+        self.assertGreater(len(evt_big.get_sub_trees()), len(evt_small.get_sub_trees()))
+
+
+    def test_block_sparse_products(self):
+        #a qubit plus a "leakage" level, whose gates are block-diagonal
+        gs = pygsti.construction.build_gateset(
+            [2,1], [('Q0',),('L0',)],['Gi','Gx','Gy'],
+            [ "I(Q0)","X(pi/8,Q0)", "Y(pi/8,Q0)"],
+            prepLabels=["rho0"], prepExpressions=["0"],
+            effectLabels=["E0"], effectExpressions=["1"],
+            spamdefs={'plus': ('rho0','E0'),
+                      'minus': ('rho0','remainder') }, basis="gm")
+        gs = gs.depolarize(gate_noise=0.1)
+        gatestrings = [(), ('Gx',), ('Gx','Gy'), ('Gx','Gy')*20, ('Gy','Gi','Gx')*300]
+        evt = gs.bulk_evaltree( gatestrings )
+
+        MINDIM_ORIG = pygsti.objects.gscalc.BLOCK_SPARSE_MIN_DIM
+        pygsti.objects.gscalc.BLOCK_SPARSE_MIN_DIM = None
+        probs = gs.bulk_probs(evt)
+        prods = gs.bulk_product(evt)
+        dprobs = gs.bulk_dprobs(evt)
+        pygsti.objects.gscalc.BLOCK_SPARSE_MIN_DIM = 0
+        blocks = gs._calc()._get_gate_blocks()
+        self.assertGreater(len(blocks), 1)
+        probs_blk = gs.bulk_probs(evt)
+        prods_blk = gs.bulk_product(evt)
+        dprobs_blk = gs.bulk_dprobs(evt)
+        pygsti.objects.gscalc.BLOCK_SPARSE_MIN_DIM = MINDIM_ORIG
+
+        self.assertArraysAlmostEqual(prods, prods_blk)
+        for sl in probs:
+            self.assertArraysAlmostEqual(probs[sl], probs_blk[sl])
+            self.assertArraysAlmostEqual(dprobs[sl], dprobs_blk[sl])
+
+
+    def test_incremental_probs(self):
+        gs = self.gateset.copy()
+        gatestrings = [(), ('Gx',), ('Gx','Gy'), ('Gy','Gy','Gx'), ('Gx','Gx','Gx')*5,
+                       ('Gy','Gy'), ('Gx','Gy')*10]
+        spam_label_rows = { sl: i for i,sl in enumerate(gs.get_spam_labels()) }
+        evt = gs.bulk_evaltree( gatestrings )
+        evt_split = evt.copy(); evt_split.split(numSubTrees=2)
+        evt_compact = gs.bulk_evaltree( gatestrings, compact=True )
+
+        for tree in (evt, evt_split, evt_compact, evt_compact.copy()):
+            probs = np.empty( (len(spam_label_rows), len(gatestrings)), 'd')
+            probs_full = probs.copy()
+            gs.bulk_fill_probs(probs, spam_label_rows, tree, incremental=True)
+            for gl in ('Gy','Gx'): #change one gate at a time
+                gs.gates[gl] = np.dot(gs.gates[gl], gs.gates[gl].base * 0.95)
+                gs.bulk_fill_probs(probs, spam_label_rows, tree, incremental=True)
+                gs.bulk_fill_probs(probs_full, spam_label_rows, tree)
+                self.assertArraysAlmostEqual(probs, probs_full)
+
+            gs.bulk_fill_probs(probs, spam_label_rows, tree, incremental=True) #no changes
+            self.assertArraysAlmostEqual(probs, probs_full)
+
+
+    def test_evaltree_extend(self):
+        gatestrings = [('Gx',), ('Gx','Gy'), ('Gx','Gy','Gy'), ('Gy','Gx')]
+        new_gatestrings = [('Gx','Gy','Gy','Gx'), ('Gx','Gy'), (), ('Gy',),
+                           ('Gy','Gy','Gy','Gy','Gx'), ('Gx','Gy','Gy','Gx','Gx')]
+        evt = self.gateset.bulk_evaltree( gatestrings )
+        evt.extend( pygsti.construction.gatestring_list(new_gatestrings) )
+        self.assertEqual(evt.num_final_strings(), len(gatestrings + new_gatestrings))
+        self.assertEqual(evt.generate_gatestring_list(), gatestrings + new_gatestrings)
+
+        bulk_prods = self.gateset.bulk_product(evt)
+        for gs,prod in zip(gatestrings + new_gatestrings,bulk_prods):
+            self.assertArraysAlmostEqual(prod, self.gateset.product(gs))
+
+        #extend via bulk_evaltree_from_resources, which splits a copy when needed
+        unsplit = pygsti.objects.EvalTree()
+        evt,_,_ = self.gateset.bulk_evaltree_from_resources(gatestrings, unsplitTree=unsplit)
+        self.assertTrue(evt is unsplit)
+        evt,_,_ = self.gateset.bulk_evaltree_from_resources(
+            gatestrings + new_gatestrings, memLimit=1024, subcalls=['bulk_fill_probs'],
+            unsplitTree=unsplit)
+        self.assertTrue(evt.is_split())
+        self.assertFalse(unsplit.is_split())
+        self.assertEqual(unsplit.generate_gatestring_list(), gatestrings + new_gatestrings)
+        self.assertEqual(evt.generate_gatestring_list(), gatestrings + new_gatestrings)
+
+        with self.assertRaises(ValueError):
+            evt.extend(new_gatestrings) # can't extend a split tree
+
+
+    def test_evaltree_cache(self):
+        gatestrings = [('Gx',), ('Gx','Gy'), ('Gx','Gy','Gy'), ('Gy','Gx'), (),
+                       ('Gx','Gy','Gy','Gx'), ('Gy','Gy','Gy','Gy','Gx'), ('Gy',)]
+        evt = self.gateset.bulk_evaltree( gatestrings, minSubtrees=3 )
+        evt.save(temp_files + "/evaltree")
+        evt2 = pygsti.objects.EvalTree()
+        evt2.load(temp_files + "/evaltree")
+        self.assertEqual(list(evt2), list(evt))
+        self.assertEqual(len(evt2.get_sub_trees()), len(evt.get_sub_trees()))
+        self.assertEqual(evt2.generate_gatestring_list(), gatestrings)
+        self.assertArraysAlmostEqual(self.gateset.bulk_product(evt2), self.gateset.bulk_product(evt))
+
+        cache = pygsti.objects.EvalTreeCache(temp_files + "/evaltree_cache")
+        cache.clear()
+        key = cache.get_key(gatestrings, self.gateset, memLimit=1000000)
+        self.assertEqual(key, cache.get_key(pygsti.construction.gatestring_list(gatestrings),
+                                            self.gateset, memLimit=1000000))
+        self.assertNotEqual(key, cache.get_key(gatestrings, self.gateset, memLimit=2000000))
+        self.assertNotEqual(key, cache.get_key(gatestrings[1:], self.gateset, memLimit=1000000))
+
+        self.assertFalse(key in cache)
+        self.assertEqual(cache.get(key), (None,None))
+        cache.put(key, evt, 10)
+        self.assertTrue(key in cache)
+        evt3, blkSize = cache.get(key)
+        self.assertEqual(blkSize, 10)
+        self.assertEqual(evt3.generate_gatestring_list(), gatestrings)
+        self.assertEqual([list(t) for t in evt3.get_sub_trees()],
+                         [list(t) for t in evt.get_sub_trees()])
+        cache.clear()
+        self.assertFalse(key in cache)
+
+
+
+    def test_compact_evaltree(self):
+        gatestrings = [('Gx',), ('Gx','Gy'), ('Gx','Gy','Gy'), ('Gy','Gx'), (),
+                       ('Gx','Gy','Gy','Gx'), ('Gy','Gy','Gy','Gy','Gx'), ('Gy',), ('Gx',)]
+        spam_label_rows = { 'plus': 0, 'minus': 1 }
+        nP = self.gateset.num_params()
+
+        for nSubTrees in (None,3):
+            evt = self.gateset.bulk_evaltree( gatestrings, minSubtrees=nSubTrees )
+            cevt = self.gateset.bulk_evaltree( gatestrings, minSubtrees=nSubTrees, compact=True )
+            self.assertTrue(isinstance(cevt, pygsti.objects.CompactEvalTree))
+            self.assertEqual(list(cevt), list(evt))
+            self.assertEqual(cevt.is_split(), evt.is_split())
+            self.assertEqual([list(t) for t in cevt.get_sub_trees()],
+                             [list(t) for t in evt.get_sub_trees()])
+            self.assertEqual(cevt.generate_gatestring_list(), gatestrings)
+            self.assertEqual(cevt.generate_gatestring_list(False), evt.generate_gatestring_list(False))
+            self.assertEqual(cevt.get_evaluation_order(), evt.get_evaluation_order())
+            for (i1,l1,r1),(i2,l2,r2) in zip(cevt.get_evaluation_levels(), evt.get_evaluation_levels()):
+                self.assertEqual(list(i1),list(i2)); self.assertEqual(list(l1),list(l2))
+                self.assertEqual(list(r1),list(r2))
+
+            probs = np.empty( (2,len(gatestrings)), 'd')
+            cprobs = np.empty( (2,len(gatestrings)), 'd')
+            self.gateset.bulk_fill_probs(probs, spam_label_rows, evt)
+            self.gateset.bulk_fill_probs(cprobs, spam_label_rows, cevt)
+            self.assertArraysAlmostEqual(probs, cprobs)
+            self.assertArraysAlmostEqual(cevt.permute_computation_to_original(cprobs, axis=1),
+                                         evt.permute_computation_to_original(probs, axis=1))
+            self.assertArraysAlmostEqual(cevt.permute_original_to_computation(cprobs, axis=1),
+                                         evt.permute_original_to_computation(probs, axis=1))
+
+            dprobs = np.empty( (2,len(gatestrings),nP), 'd')
+            cdprobs = np.empty( (2,len(gatestrings),nP), 'd')
+            self.gateset.bulk_fill_dprobs(dprobs, spam_label_rows, evt)
+            self.gateset.bulk_fill_dprobs(cdprobs, spam_label_rows, cevt)
+            self.assertArraysAlmostEqual(dprobs, cdprobs)
+
+            cevt2 = pickle.loads(pickle.dumps(cevt))
+            self.assertEqual(list(cevt2.copy()), list(evt))
+            self.assertEqual(list(cevt.expand()), list(evt))
+
+        #splitting a compact tree gives the same sub-trees as splitting an EvalTree
+        evt = self.gateset.bulk_evaltree( gatestrings )
+        cevt = pygsti.objects.CompactEvalTree(evt)
+        evt.split(maxSubTreeSize=5)
+        cevt.split(maxSubTreeSize=5)
+        self.assertEqual([list(t) for t in cevt.get_sub_trees()],
+                         [list(t) for t in evt.get_sub_trees()])
+        self.assertEqual(cevt.generate_gatestring_list(), gatestrings)
 
 
     def test_failures(self):
@@ -63,6 +63,71 @@ class TestOptimizeMethods(BaseTestCase):
         pygsti.optimize.check_jac(f_vec, x0, jac(x0), eps=1e-10, tol=1e-6, errType='rel')
         pygsti.optimize.check_jac(f_vec, x0, jac(x0), eps=1e-10, tol=1e-6, errType='abs')
 
+    def test_distributed_solve(self):
+        np.random.seed(0)
+        A = np.random.random((20,10)); b = np.random.random(20)
+        def obj_fn(x): return np.dot(A,x) - b
+        def jac_fn(x): return A
+        x0 = np.zeros(10,'d')
+
+        tols = { 'jac_norm_tol': 1e-12, 'rel_ftol': 1e-12, 'rel_xtol': 1e-12 }
+        x1,converged1,_ = pygsti.optimize.custom_leastsq(obj_fn, jac_fn, x0, distributed_solve=False, **tols)
+        x2,converged2,_ = pygsti.optimize.custom_leastsq(obj_fn, jac_fn, x0, distributed_solve=True, **tols)
+        self.assertTrue(converged1 and converged2)
+        self.assertArraysAlmostEqual(x1, np.linalg.lstsq(A,b,rcond=None)[0])
+        self.assertArraysAlmostEqual(x1, x2)
+
+        ATA = np.dot(A.T,A)
+        x,converged = pygsti.tools.mpitools.mpi_cg_solve(ATA, np.dot(A.T,b), slice(0,10), None)
+        self.assertTrue(converged)
+        self.assertArraysAlmostEqual(np.dot(ATA,x), np.dot(A.T,b))
+
+    def test_broyden_and_geodesic(self):
+        def obj_fn(x): # Rosenbrock function as a least-squares problem
+            return np.array([10*(x[1]-x[0]**2), 1-x[0]])
+        nJac = [0]
+        def jac_fn(x):
+            nJac[0] += 1
+            return np.array([[-20*x[0], 10.0], [-1.0, 0.0]])
+        x0 = np.array([-1.2, 1.0])
+        tols = { 'f_norm2_tol': 1e-20, 'jac_norm_tol': 1e-10, 'rel_ftol': 1e-12,
+                 'rel_xtol': 1e-12, 'max_iter': 500 }
+
+        x,converged,_ = pygsti.optimize.custom_leastsq(obj_fn, jac_fn, x0, **tols)
+        self.assertTrue(converged)
+        self.assertArraysAlmostEqual(x, np.ones(2))
+        nJacPlain = nJac[0]
+
+        for opts in ({'broyden_updates': 3}, {'geodesic_accel': True},
+                     {'broyden_updates': 3, 'geodesic_accel': True}):
+            nJac[0] = 0
+            x,converged,_ = pygsti.optimize.custom_leastsq(obj_fn, jac_fn, x0, **dict(tols,**opts))
+            self.assertTrue(converged)
+            self.assertArraysAlmostEqual(x, np.ones(2))
+            if 'broyden_updates' in opts:
+                self.assertLess(nJac[0], nJacPlain)
+
+    def test_warm_start(self):
+        np.random.seed(0)
+        A = np.random.random((20,10)); b = np.random.random(20)
+        def obj_fn(x): return np.dot(A,x) - b + 0.1*np.sin(x).sum()
+        def jac_fn(x): return A + 0.1*np.cos(x)[None,:]
+        x0 = np.zeros(10,'d')
+
+        tols = { 'jac_norm_tol': 1e-12, 'rel_ftol': 1e-12, 'rel_xtol': 1e-12 }
+        state = pygsti.optimize.CustomLMState()
+        x1,converged1,_ = pygsti.optimize.custom_leastsq(obj_fn, jac_fn, x0, state=state, **tols)
+        self.assertTrue(converged1)
+        self.assertTrue(state.mu > 0 and state.max_jtj_diag > 0)
+        nSteps = len(state.step_norms)
+        self.assertTrue(nSteps > 0)
+        str(state)
+
+        x2,converged2,_ = pygsti.optimize.custom_leastsq(obj_fn, jac_fn, x0, state=state, **tols)
+        self.assertTrue(converged2)
+        self.assertAlmostEqual(np.linalg.norm(x1-x2), 0, places=5)
+        self.assertLessEqual(len(state.step_norms) - nSteps, nSteps) #warm start takes no more steps
+
 
 if __name__ == "__main__":
     unittest.main(verbosity=2)
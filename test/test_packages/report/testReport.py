@@ -244,9 +244,14 @@ class TestReport(ReportBaseCase):
         gen.get_logl_confidence_region(gateset_tp, ds, 95,
                                        gatestring_list=None, probClipInterval=(-1e6,1e6),
                                        minProbClip=1e-4, radius=1e-4, hessianProjection="std")
-        gen.get_logl_confidence_region(gateset, ds, 95,
+        cr_direct = gen.get_logl_confidence_region(gateset, ds, 95,
                                        gatestring_list=None, probClipInterval=(-1e6,1e6),
                                        minProbClip=1e-4, radius=1e-4, hessianProjection="std")
+        cr_hprobs = gen.get_logl_confidence_region(gateset, ds, 95,
+                                       gatestring_list=None, probClipInterval=(-1e6,1e6),
+                                       minProbClip=1e-4, radius=1e-4, hessianProjection="std",
+                                       hessianMethod="hprobs")
+        self.assertArraysAlmostEqual(cr_direct.regionQuadcForm, cr_hprobs.regionQuadcForm)
 
 
     def test_table_formatting(self):
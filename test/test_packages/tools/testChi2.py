@@ -1,6 +1,7 @@
 from ..testutils import BaseTestCase, compare_files, temp_files
 from pygsti.construction import std1Q_XYI as std
 import pygsti
+import numpy as np
 import unittest
 
 
@@ -29,6 +30,17 @@ class Chi2LogLTestCase(BaseTestCase):
             pygsti.chi2(ds, std.gs_target, memLimit=0) # No memory for you
         pygsti.chi2(ds, std.gs_target, memLimit=100000)
 
+    def test_chi2_hessian_vector_product(self):
+        ds = pygsti.objects.DataSet(fileToLoadFrom=compare_files + "/analysis.dataset")
+        gs = std.gs_target.depolarize(gate_noise=0.02, spam_noise=0.01)
+        v = np.linspace(-1.0, 1.0, gs.num_params())
+        chi2, hessian = pygsti.chi2(ds, gs, returnHessian=True)
+        hv = pygsti.chi2_hessian_vector_product(ds, gs, v)
+        hv_split = pygsti.chi2_hessian_vector_product(ds, gs, v, memLimit=3000000)
+        scale = np.linalg.norm(np.dot(hessian,v)) # chi2 hessian elements are large
+        self.assertArraysAlmostEqual(np.dot(hessian,v)/scale, hv/scale)
+        self.assertArraysAlmostEqual(np.dot(hessian,v)/scale, hv_split/scale)
+
 
 if __name__ == '__main__':
     unittest.main(verbosity=2)
@@ -1,6 +1,7 @@
 from ..testutils import BaseTestCase, compare_files, temp_files
 from pygsti.construction import std1Q_XYI as std
 import pygsti
+import numpy as np
 
 
 class LogLTestCase(BaseTestCase):
@@ -79,7 +80,7 @@ class LogLTestCase(BaseTestCase):
         with self.assertRaises(MemoryError):
             pygsti.logl_hessian(gateset, ds,
                                 probClipInterval=(-1e6,1e6),
-                                poissonPicture=True, check=False, memLimit=100000) # Splitting unproductive
+                                poissonPicture=True, check=False, memLimit=50000) # Splitting unproductive
 
 
         #print("****DEBUG LOGL HESSIAN L****")
@@ -94,6 +95,41 @@ class LogLTestCase(BaseTestCase):
         self.assertArraysAlmostEqual(L, L2)
         self.assertArraysAlmostEqual(L, L3)
 
+    def test_hessian_direct(self):
+        ds   = pygsti.objects.DataSet(fileToLoadFrom=compare_files + "/analysis.dataset")
+        gateset = pygsti.io.load_gateset(compare_files + "/analysis.gateset")
+        for poissonPicture in (True,False):
+            L = pygsti.logl_hessian(gateset, ds, probClipInterval=(-1e6,1e6),
+                                    poissonPicture=poissonPicture, check=False)
+            Ld = pygsti.logl_hessian(gateset, ds, probClipInterval=(-1e6,1e6),
+                                     poissonPicture=poissonPicture, check=False,
+                                     method="direct")
+            Ld2 = pygsti.logl_hessian(gateset, ds, probClipInterval=(-1e6,1e6),
+                                      poissonPicture=poissonPicture, check=False,
+                                      memLimit=3000000, method="direct") # splits tree
+            self.assertArraysAlmostEqual(L, Ld)
+            self.assertArraysAlmostEqual(L, Ld2)
+
+        with self.assertRaises(ValueError):
+            pygsti.logl_hessian(gateset, ds, method="foobar")
+
+    def test_hessian_vector_product(self):
+        ds   = pygsti.objects.DataSet(fileToLoadFrom=compare_files + "/analysis.dataset")
+        gateset = pygsti.io.load_gateset(compare_files + "/analysis.gateset")
+        v = np.linspace(-1.0, 1.0, gateset.num_params())
+        for poissonPicture in (True,False):
+            L = pygsti.logl_hessian(gateset, ds, probClipInterval=(-1e6,1e6),
+                                    poissonPicture=poissonPicture, check=False)
+            Lv = pygsti.logl_hessian_vector_product(
+                gateset, ds, v, probClipInterval=(-1e6,1e6),
+                poissonPicture=poissonPicture, check=False)
+            Lv2 = pygsti.logl_hessian_vector_product(
+                gateset, ds, v, probClipInterval=(-1e6,1e6),
+                poissonPicture=poissonPicture, check=False,
+                memLimit=3000000) # splits tree
+            self.assertArraysAlmostEqual(np.dot(L,v), Lv)
+            self.assertArraysAlmostEqual(np.dot(L,v), Lv2)
+
     def test_forbidden_probablity(self):
         ds   = pygsti.objects.DataSet(fileToLoadFrom=compare_files + "/analysis.dataset")
         prob = pygsti.forbidden_prob(std.gs_target, ds)